@@ -16,7 +16,7 @@ The data is stored with the specified date.
 
 Features:
 - Real OHLC data (not just close price repeated 4x)
-- Parallel async fetching with rate limiting
+- Parallel async fetching through the shared rate-limited client (stratos_engine.http)
 - Volume data from market_chart endpoint
 - Upsert to daily_bars table (no duplicates)
 - Comprehensive logging
@@ -30,6 +30,7 @@ Usage:
 Environment Variables:
     DATABASE_URL: PostgreSQL connection string
     COINGECKO_API_KEY: CoinGecko Pro API key
+    COINGECKO_CALLS_PER_MINUTE: CoinGecko Pro quota (default 500)
 """
 
 import os
@@ -41,10 +42,12 @@ from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from typing import Optional
 
-import aiohttp
 import psycopg2
 from psycopg2.extras import execute_values
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.http import HttpClient, HttpError, default_vendors
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -52,13 +55,9 @@ from psycopg2.extras import execute_values
 COINGECKO_API_KEY = os.environ.get("COINGECKO_API_KEY")
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
-# Rate limiting: CoinGecko Pro allows ~30 calls/min
-# We need 2 calls per asset (OHLC + volume), so ~15 assets/min
-# With 253 assets, that's ~17 minutes total
-# We'll use concurrent requests with delays to stay under limit
-MAX_CONCURRENT = 5  # Concurrent requests
-RATE_LIMIT_DELAY = 2.5  # Seconds between requests (24 req/min)
-REQUEST_TIMEOUT = 30  # Seconds
+# Rate limiting: the shared client paces the "coingecko" vendor at
+# COINGECKO_CALLS_PER_MINUTE and backs off on 429s (honouring Retry-After).
+# We need 2 calls per asset (OHLC + volume).
 
 # Logging setup
 logging.basicConfig(
@@ -153,91 +152,42 @@ def insert_daily_bars(conn, records: list[dict]) -> int:
 # CoinGecko API Functions
 # ============================================================================
 
-async def fetch_ohlc(
-    session: aiohttp.ClientSession,
-    coingecko_id: str,
-    semaphore: asyncio.Semaphore
-) -> dict:
+async def _fetch_coingecko(http: HttpClient, coingecko_id: str, path: str, params: dict) -> dict:
+    """GET a CoinGecko Pro endpoint; errors are returned in the result dict."""
+    headers = {"x-cg-pro-api-key": COINGECKO_API_KEY}
+    try:
+        data = await http.get_json("coingecko", path, params, headers)
+        return {"coingecko_id": coingecko_id, "error": None, "data": data}
+    except HttpError as e:
+        error = f"http_{e.status}" if e.status else e.message[:50]
+        return {"coingecko_id": coingecko_id, "error": error, "data": None}
+
+
+async def fetch_ohlc(http: HttpClient, coingecko_id: str) -> dict:
     """
     Fetch OHLC data from CoinGecko Pro API.
     Uses days=7 which returns 4-hour candles that we aggregate to daily.
     
     Returns: [timestamp_ms, open, high, low, close] arrays
     """
-    url = f"https://pro-api.coingecko.com/api/v3/coins/{coingecko_id}/ohlc"
     params = {
         "vs_currency": "usd",
         "days": "7"  # Returns 4-hour candles
     }
-    headers = {"x-cg-pro-api-key": COINGECKO_API_KEY}
-    
-    async with semaphore:
-        await asyncio.sleep(RATE_LIMIT_DELAY)  # Rate limiting
-        
-        try:
-            async with session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT) as response:
-                if response.status == 429:
-                    logger.warning(f"Rate limited for {coingecko_id}, waiting 60s...")
-                    await asyncio.sleep(60)
-                    # Retry once
-                    async with session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT) as retry:
-                        if retry.status == 200:
-                            data = await retry.json()
-                            return {"coingecko_id": coingecko_id, "error": None, "data": data}
-                        return {"coingecko_id": coingecko_id, "error": f"retry_http_{retry.status}", "data": None}
-                
-                if response.status != 200:
-                    return {"coingecko_id": coingecko_id, "error": f"http_{response.status}", "data": None}
-                
-                data = await response.json()
-                return {"coingecko_id": coingecko_id, "error": None, "data": data}
-                
-        except asyncio.TimeoutError:
-            return {"coingecko_id": coingecko_id, "error": "timeout", "data": None}
-        except Exception as e:
-            return {"coingecko_id": coingecko_id, "error": str(e)[:50], "data": None}
-
-
-async def fetch_volume(
-    session: aiohttp.ClientSession,
-    coingecko_id: str,
-    semaphore: asyncio.Semaphore
-) -> dict:
+    return await _fetch_coingecko(http, coingecko_id, f"/coins/{coingecko_id}/ohlc", params)
+
+
+async def fetch_volume(http: HttpClient, coingecko_id: str) -> dict:
     """
     Fetch volume data from market_chart endpoint.
     OHLC endpoint doesn't include volume, so we fetch it separately.
     """
-    url = f"https://pro-api.coingecko.com/api/v3/coins/{coingecko_id}/market_chart"
     params = {
         "vs_currency": "usd",
         "days": "7",
         "interval": "daily"
     }
-    headers = {"x-cg-pro-api-key": COINGECKO_API_KEY}
-    
-    async with semaphore:
-        await asyncio.sleep(RATE_LIMIT_DELAY)  # Rate limiting
-        
-        try:
-            async with session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT) as response:
-                if response.status == 429:
-                    await asyncio.sleep(60)
-                    async with session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT) as retry:
-                        if retry.status == 200:
-                            data = await retry.json()
-                            return {"coingecko_id": coingecko_id, "error": None, "data": data}
-                        return {"coingecko_id": coingecko_id, "error": f"retry_http_{retry.status}", "data": None}
-                
-                if response.status != 200:
-                    return {"coingecko_id": coingecko_id, "error": f"http_{response.status}", "data": None}
-                
-                data = await response.json()
-                return {"coingecko_id": coingecko_id, "error": None, "data": data}
-                
-        except asyncio.TimeoutError:
-            return {"coingecko_id": coingecko_id, "error": "timeout", "data": None}
-        except Exception as e:
-            return {"coingecko_id": coingecko_id, "error": str(e)[:50], "data": None}
+    return await _fetch_coingecko(http, coingecko_id, f"/coins/{coingecko_id}/market_chart", params)
 
 
 def aggregate_ohlc_to_daily(ohlc_data: list, target_date: str) -> Optional[dict]:
@@ -311,18 +261,17 @@ def extract_volume_for_date(market_data: dict, target_date: str) -> Optional[Dec
 # ============================================================================
 
 async def process_asset(
-    session: aiohttp.ClientSession,
+    http: HttpClient,
     asset_id: int,
     symbol: str,
     coingecko_id: str,
-    target_date: str,
-    semaphore: asyncio.Semaphore
+    target_date: str
 ) -> Optional[dict]:
     """
     Process a single asset: fetch OHLC and volume, aggregate to daily.
     """
     # Fetch OHLC data
-    ohlc_result = await fetch_ohlc(session, coingecko_id, semaphore)
+    ohlc_result = await fetch_ohlc(http, coingecko_id)
     
     if ohlc_result["error"]:
         logger.debug(f"✗ {symbol}: OHLC error - {ohlc_result['error']}")
@@ -336,7 +285,7 @@ async def process_asset(
         return None
     
     # Fetch volume data
-    vol_result = await fetch_volume(session, coingecko_id, semaphore)
+    vol_result = await fetch_volume(http, coingecko_id)
     volume = None
     
     if not vol_result["error"] and vol_result["data"]:
@@ -386,26 +335,26 @@ async def run_ingestion(target_date: str, limit: Optional[int] = None) -> int:
         conn.close()
         return 0
     
-    # Estimate time: 2 API calls per asset, ~2.5s each
-    est_time = len(assets) * 2 * RATE_LIMIT_DELAY / 60
+    # Estimate time: 2 API calls per asset at the vendor quota
+    vendors = default_vendors()
+    est_time = len(assets) * 2 / vendors["coingecko"].calls_per_minute
     logger.info(f"Estimated time: ~{est_time:.1f} minutes")
     
     # Process all assets
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
     all_records = []
     success = 0
     errors = 0
     
-    async with aiohttp.ClientSession() as session:
+    async with HttpClient(vendors=vendors) as http:
         # Process in batches for progress reporting
-        batch_size = 25
+        batch_size = 50
         batches = [assets[i:i + batch_size] for i in range(0, len(assets), batch_size)]
         
         for batch_idx, batch in enumerate(batches):
             logger.info(f"Processing batch {batch_idx + 1}/{len(batches)} ({len(batch)} assets)...")
             
             tasks = [
-                process_asset(session, asset_id, symbol, cg_id, target_date, semaphore)
+                process_asset(http, asset_id, symbol, cg_id, target_date)
                 for asset_id, symbol, cg_id in batch
             ]
             
@@ -8,6 +8,8 @@ Designed to run after equity_daily_features.py completes.
 Usage:
     python jobs/equity_daily_ai_signals.py --date 2026-01-06
     python jobs/equity_daily_ai_signals.py  # defaults to yesterday
+    python jobs/equity_daily_ai_signals.py --batch  # one provider batch job (cheaper, not interactive)
+    python jobs/equity_daily_ai_signals.py --batch --dry-run  # parsed reviews to a file, nothing saved
 """
 
 import os
@@ -22,7 +24,10 @@ from datetime import datetime, timedelta, date
 from typing import Dict, Any, List, Optional
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+# stratos_engine.llm_batch is imported in batch mode only
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +47,16 @@ EQUITY_LIMIT = 500  # Top 500 equities by dollar volume
 REQUESTS_PER_MINUTE = 15  # Conservative rate for Gemini API
 REQUEST_DELAY = 60.0 / REQUESTS_PER_MINUTE
 
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "temperature": 0.3,
+}
+# Same settings as a Gemini batch generationConfig
+BATCH_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "temperature": 0.3,
+}
+
 
 def to_float(value):
     """Convert Decimal or other numeric types to float, handling None."""
@@ -224,27 +239,27 @@ def analyze_asset(client, model: str, symbol: str, name: str, ohlcv_data: List[D
         response = client.models.generate_content(
             model=model,
             contents=prompt,
-            config={
-                "response_mime_type": "application/json",
-                "temperature": 0.3,
-            }
+            config=GENERATION_CONFIG
         )
         
-        # Parse response
-        result_text = response.text.strip()
-        if result_text.startswith("```json"):
-            result_text = result_text[7:]
-        if result_text.endswith("```"):
-            result_text = result_text[:-3]
-        
-        result = json.loads(result_text)
-        return result
+        return parse_response(response.text)
         
     except Exception as e:
         logger.error(f"Error analyzing {symbol}: {e}")
         return None
 
 
+def parse_response(text: str) -> Dict:
+    """Parse the model's JSON answer (tolerates a ```json fence)."""
+    result_text = text.strip()
+    if result_text.startswith("```json"):
+        result_text = result_text[7:]
+    if result_text.endswith("```"):
+        result_text = result_text[:-3]
+    
+    return json.loads(result_text)
+
+
 def calculate_fingerprint(ohlcv_data: List[Dict]) -> str:
     """Calculate a fingerprint of the OHLCV data for change detection."""
     if not ohlcv_data:
@@ -256,53 +271,59 @@ def calculate_fingerprint(ohlcv_data: List[Dict]) -> str:
     return hashlib.sha256(content.encode()).hexdigest()[:16]
 
 
+REVIEW_UPSERT = """
+    INSERT INTO asset_ai_reviews (
+        asset_id, as_of_date, model_name, prompt_version,
+        raw_ai_setup_quality_score, smoothed_ai_setup_quality_score,
+        raw_ai_direction_score, smoothed_ai_direction_score,
+        ai_direction_score, confidence, subscores,
+        primary_signal, reasoning, fingerprint,
+        created_at
+    ) VALUES %s
+    ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
+        model_name = EXCLUDED.model_name,
+        raw_ai_setup_quality_score = EXCLUDED.raw_ai_setup_quality_score,
+        smoothed_ai_setup_quality_score = EXCLUDED.smoothed_ai_setup_quality_score,
+        raw_ai_direction_score = EXCLUDED.raw_ai_direction_score,
+        smoothed_ai_direction_score = EXCLUDED.smoothed_ai_direction_score,
+        ai_direction_score = EXCLUDED.ai_direction_score,
+        confidence = EXCLUDED.confidence,
+        subscores = EXCLUDED.subscores,
+        primary_signal = EXCLUDED.primary_signal,
+        reasoning = EXCLUDED.reasoning,
+        fingerprint = EXCLUDED.fingerprint,
+        created_at = NOW()
+"""
+REVIEW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+
+
+def review_row(asset_id: int, target_date: str, ai_result: Dict, fingerprint: str, model: str) -> tuple:
+    """asset_ai_reviews values for one review (see REVIEW_UPSERT)."""
+    # Calculate scores
+    subscores = ai_result.get('subscores', {})
+    total_subscore = sum(subscores.values()) if subscores else 0
+    raw_quality_score = total_subscore * 4.0  # Scale to 0-100
+    
+    return (
+        str(asset_id), target_date, model, AI_REVIEW_VERSION,
+        raw_quality_score, raw_quality_score,  # smoothed = raw for now
+        ai_result.get('ai_direction_score', 0), ai_result.get('ai_direction_score', 0),
+        ai_result.get('ai_direction_score', 0),
+        ai_result.get('confidence', 50),
+        json.dumps(subscores),
+        ai_result.get('primary_signal', 'neutral'),
+        ai_result.get('reasoning', ''),
+        fingerprint
+    )
+
+
 def save_review(conn, asset_id: int, target_date: str, symbol: str, 
                 ai_result: Dict, fingerprint: str, model: str) -> bool:
     """Save the AI review to the database."""
     try:
-        # Calculate scores
-        subscores = ai_result.get('subscores', {})
-        total_subscore = sum(subscores.values()) if subscores else 0
-        raw_quality_score = total_subscore * 4.0  # Scale to 0-100
-        
+        row = review_row(asset_id, target_date, ai_result, fingerprint, model)
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO asset_ai_reviews (
-                    asset_id, as_of_date, model_name, prompt_version,
-                    raw_ai_setup_quality_score, smoothed_ai_setup_quality_score,
-                    raw_ai_direction_score, smoothed_ai_direction_score,
-                    ai_direction_score, confidence, subscores,
-                    primary_signal, reasoning, fingerprint,
-                    created_at
-                ) VALUES (
-                    %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, NOW()
-                )
-                ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
-                    model_name = EXCLUDED.model_name,
-                    raw_ai_setup_quality_score = EXCLUDED.raw_ai_setup_quality_score,
-                    smoothed_ai_setup_quality_score = EXCLUDED.smoothed_ai_setup_quality_score,
-                    raw_ai_direction_score = EXCLUDED.raw_ai_direction_score,
-                    smoothed_ai_direction_score = EXCLUDED.smoothed_ai_direction_score,
-                    ai_direction_score = EXCLUDED.ai_direction_score,
-                    confidence = EXCLUDED.confidence,
-                    subscores = EXCLUDED.subscores,
-                    primary_signal = EXCLUDED.primary_signal,
-                    reasoning = EXCLUDED.reasoning,
-                    fingerprint = EXCLUDED.fingerprint,
-                    created_at = NOW()
-            """, (
-                str(asset_id), target_date, model, AI_REVIEW_VERSION,
-                raw_quality_score, raw_quality_score,  # smoothed = raw for now
-                ai_result.get('ai_direction_score', 0), ai_result.get('ai_direction_score', 0),
-                ai_result.get('ai_direction_score', 0),
-                ai_result.get('confidence', 50),
-                json.dumps(subscores),
-                ai_result.get('primary_signal', 'neutral'),
-                ai_result.get('reasoning', ''),
-                fingerprint
-            ))
+            execute_values(cur, REVIEW_UPSERT, [row], template=REVIEW_TEMPLATE)
             conn.commit()
         return True
     except Exception as e:
@@ -311,6 +332,80 @@ def save_review(conn, asset_id: int, target_date: str, symbol: str,
         return False
 
 
+def save_reviews(conn, rows: List[tuple]) -> int:
+    """Upsert many reviews in one statement; returns the number written."""
+    if not rows:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, REVIEW_UPSERT, rows, template=REVIEW_TEMPLATE, page_size=500)
+            conn.commit()
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error saving {len(rows)} reviews: {e}")
+        conn.rollback()
+        return 0
+
+
+def run_batch_mode(conn, assets: List[Dict], target_date: str, model: str, skip_existing: bool,
+                   dry_run: bool = False) -> Dict[str, int]:
+    """
+    Send every prompt as one provider batch job and bulk-ingest the reviews.
+    On a dry run (always with LLM_BATCH_PROVIDER=stub) the parsed rows go to a file instead.
+    """
+    from stratos_engine.llm_batch import BatchRequest, get_batch_provider, run_batch, write_rows
+    
+    provider = get_batch_provider()
+    dry_run = dry_run or provider.dry_run
+    counts = {'success': 0, 'error': 0, 'skip': 0}
+    requests = []
+    for asset in assets:
+        asset_id = asset['asset_id']
+        symbol = asset['symbol']
+        
+        if skip_existing and check_existing_review(conn, asset_id, target_date):
+            counts['skip'] += 1
+            continue
+        
+        ohlcv_data = get_ohlcv_data(conn, asset_id, target_date)
+        if len(ohlcv_data) < 20:
+            logger.warning(f"Insufficient data for {symbol}: {len(ohlcv_data)} bars")
+            counts['error'] += 1
+            continue
+        
+        features = get_features(conn, asset_id, target_date)
+        requests.append(BatchRequest(
+            key=str(asset_id),
+            prompt=build_analysis_prompt(symbol, asset['name'] or symbol, ohlcv_data, features),
+            config=BATCH_GENERATION_CONFIG,
+            context={'asset_id': asset_id, 'symbol': symbol, 'fingerprint': calculate_fingerprint(ohlcv_data)},
+        ))
+    
+    logger.info(f"Submitting {len(requests)} prompts as one batch job")
+    display_name = f"{ASSET_TYPE}-ai-signals-{target_date}"
+    rows = []
+    for result in run_batch(requests, model, provider=provider, display_name=display_name):
+        context = result.request.context
+        try:
+            if not result.ok:
+                raise ValueError(result.error)
+            ai_result = parse_response(result.text)
+            rows.append(review_row(context['asset_id'], target_date, ai_result, context['fingerprint'], model))
+        except Exception as e:
+            logger.error(f"Error analyzing {context['symbol']}: {e}")
+            counts['error'] += 1
+    
+    if dry_run:
+        path = write_rows(rows, display_name)
+        logger.info(f"Dry run ({provider.name}): {len(rows)} parsed reviews written to {path}, nothing saved")
+        return counts
+    
+    saved = save_reviews(conn, rows)
+    counts['success'] += saved
+    counts['error'] += len(rows) - saved
+    return counts
+
+
 def main():
     parser = argparse.ArgumentParser(description='Equity Daily AI Signals Generation')
     parser.add_argument('--date', type=str, help='Target date (YYYY-MM-DD). Defaults to yesterday.')
@@ -318,6 +413,10 @@ def main():
                        help='Gemini model to use')
     parser.add_argument('--limit', type=int, default=EQUITY_LIMIT, help='Number of top equities to process')
     parser.add_argument('--skip-existing', action='store_true', help='Skip assets with existing reviews')
+    parser.add_argument('--batch', action='store_true',
+                       help='Submit all prompts as one provider batch job (LLM_BATCH_PROVIDER) instead of live calls')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='With --batch: write the parsed reviews to LLM_BATCH_DIR instead of the database')
     args = parser.parse_args()
     
     # Determine target date
@@ -335,7 +434,7 @@ def main():
     
     # Initialize
     conn = get_connection()
-    client = get_gemini_client()
+    client = None if args.batch else get_gemini_client()
     
     # Get top equity assets
     logger.info("Fetching top equity assets by dollar volume...")
@@ -349,47 +448,51 @@ def main():
     error_count = 0
     skip_count = 0
     
-    for i, asset in enumerate(assets):
-        asset_id = asset['asset_id']
-        symbol = asset['symbol']
-        name = asset['name'] or symbol
+    if args.batch:
+        counts = run_batch_mode(conn, assets, target_date, args.model, args.skip_existing, args.dry_run)
+        success_count, error_count, skip_count = counts['success'], counts['error'], counts['skip']
+    else:
+        for i, asset in enumerate(assets):
+            asset_id = asset['asset_id']
+            symbol = asset['symbol']
+            name = asset['name'] or symbol
         
-        # Check for existing review
-        if args.skip_existing and check_existing_review(conn, asset_id, target_date):
-            skip_count += 1
-            continue
+            # Check for existing review
+            if args.skip_existing and check_existing_review(conn, asset_id, target_date):
+                skip_count += 1
+                continue
         
-        # Get data
-        ohlcv_data = get_ohlcv_data(conn, asset_id, target_date)
-        if len(ohlcv_data) < 20:
-            logger.warning(f"Insufficient data for {symbol}: {len(ohlcv_data)} bars")
-            error_count += 1
-            continue
+            # Get data
+            ohlcv_data = get_ohlcv_data(conn, asset_id, target_date)
+            if len(ohlcv_data) < 20:
+                logger.warning(f"Insufficient data for {symbol}: {len(ohlcv_data)} bars")
+                error_count += 1
+                continue
         
-        features = get_features(conn, asset_id, target_date)
+            features = get_features(conn, asset_id, target_date)
         
-        # Analyze
-        ai_result = analyze_asset(client, args.model, symbol, name, ohlcv_data, features)
+            # Analyze
+            ai_result = analyze_asset(client, args.model, symbol, name, ohlcv_data, features)
         
-        if ai_result:
-            fingerprint = calculate_fingerprint(ohlcv_data)
-            if save_review(conn, asset_id, target_date, symbol, ai_result, fingerprint, args.model):
-                success_count += 1
-                logger.debug(f"✓ {symbol}: {ai_result.get('primary_signal', 'unknown')}")
+            if ai_result:
+                fingerprint = calculate_fingerprint(ohlcv_data)
+                if save_review(conn, asset_id, target_date, symbol, ai_result, fingerprint, args.model):
+                    success_count += 1
+                    logger.debug(f"✓ {symbol}: {ai_result.get('primary_signal', 'unknown')}")
+                else:
+                    error_count += 1
             else:
                 error_count += 1
-        else:
-            error_count += 1
         
-        # Progress update
-        if (i + 1) % 25 == 0:
-            elapsed = (i + 1) * REQUEST_DELAY
-            remaining = (len(assets) - i - 1) * REQUEST_DELAY / 60
-            logger.info(f"Progress: {i + 1}/{len(assets)} ({(i + 1) / len(assets) * 100:.1f}%) | "
-                       f"Rate: {REQUESTS_PER_MINUTE}/min | ETA: {remaining:.1f}m")
+            # Progress update
+            if (i + 1) % 25 == 0:
+                elapsed = (i + 1) * REQUEST_DELAY
+                remaining = (len(assets) - i - 1) * REQUEST_DELAY / 60
+                logger.info(f"Progress: {i + 1}/{len(assets)} ({(i + 1) / len(assets) * 100:.1f}%) | "
+                           f"Rate: {REQUESTS_PER_MINUTE}/min | ETA: {remaining:.1f}m")
         
-        # Rate limiting
-        time.sleep(REQUEST_DELAY)
+            # Rate limiting
+            time.sleep(REQUEST_DELAY)
     
     # Summary
     logger.info("=" * 60)
@@ -15,7 +15,7 @@ import sys
 import argparse
 import logging
 import time
-from datetime import datetime, timedelta, date
+from datetime import date
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -23,7 +23,12 @@ import threading
 import numpy as np
 import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_values, RealDictCursor
+from psycopg2.extras import RealDictCursor
+
+# Shared COPY-based writer and bar lookback from the engine package (psycopg2/pandas only)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.bulk_writer import bulk_upsert
+from stratos_engine.lookback import recent_bars_by_asset
 
 # Configure logging
 logging.basicConfig(
@@ -35,10 +40,13 @@ logger = logging.getLogger(__name__)
 
 # Constants
 FEATURE_VERSION = "2.0"
-MAX_LOOKBACK = 300
+MAX_LOOKBACK = 300  # Bars per asset: 252-bar windows plus warm-up
 ASSET_TYPE = 'equity'
 ANN_FACTOR = 252  # Equities trade 252 days/year
 
+# Assets per bar lookback query
+BARS_CHUNK = 500
+
 # Thread-local storage for connections
 thread_local = threading.local()
 
@@ -77,28 +85,9 @@ def get_stale_assets(target_date: str) -> list:
         return cur.fetchall()
 
 
-def get_bars_for_asset(asset_id: int, end_date: str, lookback_days: int = 600) -> pd.DataFrame:
-    """Fetch daily bars for an asset directly from PostgreSQL."""
-    conn = get_connection()
-    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
-    
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("""
-            SELECT date, open, high, low, close, volume
-            FROM daily_bars
-            WHERE asset_id = %s AND date >= %s AND date <= %s
-            ORDER BY date ASC
-        """, (asset_id, start_date, end_date))
-        rows = cur.fetchall()
-    
-    if not rows:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    return df
+def get_bars_for_assets(asset_ids: list, end_date: str, bars: int = MAX_LOOKBACK) -> dict:
+    """Last `bars` daily bars per asset ({asset_id: frames with a date column}), in one query."""
+    return recent_bars_by_asset(get_connection(), asset_ids, end_date, bars)
 
 
 def compute_features(bars: pd.DataFrame) -> pd.DataFrame:
@@ -295,44 +284,24 @@ def build_record(row: pd.Series, asset_id: int, target_date: str) -> dict:
 
 
 def write_features_batch(records: list) -> int:
-    """Write a batch of feature records to the database."""
+    """Write a batch of feature records to the database (COPY + one set-based merge)."""
     if not records:
         return 0
     
     conn = get_connection()
     
     # Get column names from first record
-    columns = list(records[0].keys())
-    
-    # Build upsert query
-    cols_str = ', '.join(columns)
-    placeholders = ', '.join(['%s'] * len(columns))
-    update_cols = [c for c in columns if c not in ['asset_id', 'date']]
-    update_str = ', '.join([f"{c} = EXCLUDED.{c}" for c in update_cols])
-    
-    query = f"""
-        INSERT INTO daily_features ({cols_str})
-        VALUES ({placeholders})
-        ON CONFLICT (asset_id, date) DO UPDATE SET {update_str}
-    """
-    
-    with conn.cursor() as cur:
-        for record in records:
-            values = [record.get(c) for c in columns]
-            cur.execute(query, values)
-    
-    return len(records)
+    frame = pd.DataFrame(records, columns=list(records[0].keys()))
+    
+    return bulk_upsert(conn, 'daily_features', frame, ['asset_id', 'date']).rows
 
 
-def process_asset(asset: dict, target_date: str) -> dict:
-    """Process a single asset - fetch bars and compute features."""
+def process_asset(asset: dict, target_date: str, bars_df: pd.DataFrame) -> dict:
+    """Process a single asset - compute features from its prefetched bars."""
     asset_id = asset['asset_id']
     symbol = asset['symbol']
     
     try:
-        # Fetch bars
-        bars_df = get_bars_for_asset(asset_id, target_date)
-        
         if bars_df.empty or len(bars_df) < 20:
             return {'status': 'skipped', 'reason': 'insufficient_bars', 'asset_id': asset_id}
         
@@ -418,8 +387,13 @@ def main():
     batch = []
     
     with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(process_asset, asset, target_date): asset 
-                   for asset in stale_assets}
+        futures = {}
+        for i in range(0, total, BARS_CHUNK):
+            chunk = stale_assets[i:i + BARS_CHUNK]
+            bars = get_bars_for_assets([a['asset_id'] for a in chunk], target_date)
+            for asset in chunk:
+                futures[executor.submit(process_asset, asset, target_date,
+                                        bars.get(asset['asset_id'], pd.DataFrame()))] = asset
         
         for future in as_completed(futures):
             result = future.result()
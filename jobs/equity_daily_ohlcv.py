@@ -11,18 +11,24 @@ Designed to run as a GitHub Actions scheduled workflow.
 Features:
 - Optimized for Alpha Vantage Premium (75 calls/min)
 - FMP support for international stocks
-- Async batch processing with rate limiting
-- Trading day detection (skips weekends)
+- Concurrent fetches through the shared rate-limited client (stratos_engine.http)
+- Bulk mode (default): the whole market's bar from FMP bulk EOD and AlphaVantage
+  bulk quotes in a few calls; per-symbol history only for symbols still missing,
+  with a reconciliation report of what each pass covered
+- Exchange calendars (stratos_engine.calendar): symbols are skipped on days
+  their exchange is closed
 - Upsert to daily_bars table (no duplicates)
 - Comprehensive logging with progress tracking
 
 Usage:
     python -m jobs.equity_daily_ohlcv [--date YYYY-MM-DD] [--limit N]
+                                      [--mode bulk|per-symbol] [--report PATH]
 
 Environment Variables:
     DATABASE_URL: PostgreSQL connection string
     ALPHAVANTAGE_API_KEY: Alpha Vantage API key
     FMP_API_KEY: Financial Modeling Prep API key
+    ALPHAVANTAGE_CALLS_PER_MINUTE / FMP_CALLS_PER_MINUTE: Vendor quotas (default 75 / 300)
 """
 
 import os
@@ -30,15 +36,24 @@ import sys
 import asyncio
 import argparse
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 from typing import Optional
-import time
 
-import aiohttp
 import psycopg2
 from psycopg2.extras import execute_values
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.bulk_eod import (
+    BulkReconciliation,
+    av_bulk_quote_requests,
+    fmp_bulk_eod_request,
+    parse_av_bulk_quotes,
+    parse_fmp_bulk_eod,
+)
+from stratos_engine.calendar import calendar_for, get_calendar
+from stratos_engine.http import HttpClient, HttpError, ThrottledError, default_vendors
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -47,18 +62,12 @@ ALPHAVANTAGE_API_KEY = os.environ.get("ALPHAVANTAGE_API_KEY")
 FMP_API_KEY = os.environ.get("FMP_API_KEY")
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
-# Rate limiting for Alpha Vantage Premium (75 calls/min)
-# We use 60 calls/min to be safe (1 call per second)
-AV_CALLS_PER_MINUTE = 60
-AV_RATE_LIMIT_DELAY = 60.0 / AV_CALLS_PER_MINUTE  # ~1 second between calls
-
-# Rate limiting for FMP (300 calls/min for premium)
-FMP_CALLS_PER_MINUTE = 200
-FMP_RATE_LIMIT_DELAY = 60.0 / FMP_CALLS_PER_MINUTE  # ~0.3 seconds between calls
+# Rate limits are per vendor in stratos_engine.http (ALPHAVANTAGE_CALLS_PER_MINUTE,
+# FMP_CALLS_PER_MINUTE); requests are issued concurrently within them.
 
 # Batch settings
 BATCH_SIZE = 50  # Insert in batches of 50
-REQUEST_TIMEOUT = 30  # Seconds
+FETCH_CHUNK = 50  # Requests in flight per gather (the client paces them)
 
 # Logging setup
 logging.basicConfig(
@@ -72,49 +81,25 @@ logger = logging.getLogger(__name__)
 # Trading Day Detection
 # ============================================================================
 
-# US Market Holidays 2024-2026 (NYSE/NASDAQ)
-US_MARKET_HOLIDAYS = {
-    # 2024
-    "2024-01-01", "2024-01-15", "2024-02-19", "2024-03-29",
-    "2024-05-27", "2024-06-19", "2024-07-04", "2024-09-02",
-    "2024-11-28", "2024-12-25",
-    # 2025
-    "2025-01-01", "2025-01-20", "2025-02-17", "2025-04-18",
-    "2025-05-26", "2025-06-19", "2025-07-04", "2025-09-01",
-    "2025-11-27", "2025-12-25",
-    # 2026
-    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03",
-    "2026-05-25", "2026-06-19", "2026-07-03", "2026-09-07",
-    "2026-11-26", "2026-12-25",
-}
+US_CALENDAR = get_calendar("XNYS")
 
 
 def is_trading_day(date_str: str) -> bool:
     """
     Check if a date is a US stock market trading day.
-    Returns False for weekends and market holidays.
+    Returns False for weekends and market holidays (stratos_engine.calendar).
     """
-    dt = datetime.strptime(date_str, "%Y-%m-%d")
-    
-    # Check weekend (Monday=0, Sunday=6)
-    if dt.weekday() >= 5:
-        return False
-    
-    # Check holidays
-    if date_str in US_MARKET_HOLIDAYS:
-        return False
-    
-    return True
+    return US_CALENDAR.is_session(date_str)
 
 
 def get_last_trading_day(from_date: str) -> str:
     """Get the most recent trading day on or before the given date."""
-    dt = datetime.strptime(from_date, "%Y-%m-%d")
-    
-    while not is_trading_day(dt.strftime("%Y-%m-%d")):
-        dt -= timedelta(days=1)
-    
-    return dt.strftime("%Y-%m-%d")
+    return US_CALENDAR.session_on_or_before(from_date).isoformat()
+
+
+def trading_on(assets: list, target_date: str) -> list:
+    """(asset_id, symbol) pairs whose exchange has a session on target_date."""
+    return [(aid, sym) for aid, sym in assets if calendar_for("equity", sym).is_session(target_date)]
 
 
 # ============================================================================
@@ -211,16 +196,11 @@ def insert_daily_bars(conn, records: list[dict], source: str = "alphavantage") -
 # Alpha Vantage API Functions (for US equities)
 # ============================================================================
 
-async def fetch_daily_adjusted_av(
-    session: aiohttp.ClientSession,
-    symbol: str,
-    semaphore: asyncio.Semaphore
-) -> dict:
+async def fetch_daily_adjusted_av(http: HttpClient, symbol: str) -> dict:
     """
     Fetch daily adjusted OHLCV from Alpha Vantage.
-    Uses semaphore for rate limiting.
+    Pacing and throttle retries are handled by the shared client.
     """
-    url = "https://www.alphavantage.co/query"
     params = {
         "function": "TIME_SERIES_DAILY_ADJUSTED",
         "symbol": symbol,
@@ -228,40 +208,27 @@ async def fetch_daily_adjusted_av(
         "apikey": ALPHAVANTAGE_API_KEY,
         "datatype": "json"
     }
-    # Disable brotli encoding to avoid decoding issues
-    headers = {"Accept-Encoding": "gzip, deflate"}
     
-    async with semaphore:
-        try:
-            async with session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT) as response:
-                data = await response.json()
-                
-                # Check for rate limit
-                if "Note" in data:
-                    logger.warning(f"Rate limit hit for {symbol}")
-                    return {"symbol": symbol, "error": "rate_limit", "data": None}
-                
-                # Check for error
-                if "Error Message" in data:
-                    logger.debug(f"Error for {symbol}: {data['Error Message'][:50]}")
-                    return {"symbol": symbol, "error": "invalid_symbol", "data": None}
-                
-                # Check for valid data
-                if "Time Series (Daily)" not in data:
-                    logger.debug(f"No data for {symbol}")
-                    return {"symbol": symbol, "error": "no_data", "data": None}
-                
-                return {"symbol": symbol, "error": None, "data": data["Time Series (Daily)"]}
-                
-        except asyncio.TimeoutError:
-            logger.warning(f"Timeout for {symbol}")
-            return {"symbol": symbol, "error": "timeout", "data": None}
-        except Exception as e:
-            logger.warning(f"Error fetching {symbol}: {str(e)[:80]}")
-            return {"symbol": symbol, "error": str(e)[:80], "data": None}
-        finally:
-            # Rate limit delay
-            await asyncio.sleep(AV_RATE_LIMIT_DELAY)
+    try:
+        data = await http.get_json("alphavantage", "/query", params)
+    except ThrottledError:
+        logger.warning(f"Rate limit hit for {symbol}")
+        return {"symbol": symbol, "error": "rate_limit", "data": None}
+    except HttpError as e:
+        logger.warning(f"Error fetching {symbol}: {str(e)[:80]}")
+        return {"symbol": symbol, "error": str(e)[:80], "data": None}
+    
+    # Check for error
+    if "Error Message" in data:
+        logger.debug(f"Error for {symbol}: {data['Error Message'][:50]}")
+        return {"symbol": symbol, "error": "invalid_symbol", "data": None}
+    
+    # Check for valid data
+    if "Time Series (Daily)" not in data:
+        logger.debug(f"No data for {symbol}")
+        return {"symbol": symbol, "error": "no_data", "data": None}
+    
+    return {"symbol": symbol, "error": None, "data": data["Time Series (Daily)"]}
 
 
 def parse_daily_data_av(time_series: dict, target_date: str) -> Optional[dict]:
@@ -291,17 +258,11 @@ def parse_daily_data_av(time_series: dict, target_date: str) -> Optional[dict]:
 # FMP API Functions (for international equities)
 # ============================================================================
 
-async def fetch_daily_fmp(
-    session: aiohttp.ClientSession,
-    symbol: str,
-    target_date: str,
-    semaphore: asyncio.Semaphore
-) -> dict:
+async def fetch_daily_fmp(http: HttpClient, symbol: str, target_date: str) -> dict:
     """
     Fetch daily OHLCV from FMP for international stocks.
-    Uses semaphore for rate limiting.
+    Pacing and throttle retries are handled by the shared client.
     """
-    url = f"https://financialmodelingprep.com/stable/historical-price-eod/full"
     params = {
         "symbol": symbol,
         "from": target_date,
@@ -309,30 +270,24 @@ async def fetch_daily_fmp(
         "apikey": FMP_API_KEY
     }
     
-    async with semaphore:
-        try:
-            async with session.get(url, params=params, timeout=REQUEST_TIMEOUT) as response:
-                data = await response.json()
-                
-                # FMP returns a list directly
-                if isinstance(data, list) and len(data) > 0:
-                    return {"symbol": symbol, "error": None, "data": data[0]}
-                elif isinstance(data, dict) and "error" in data:
-                    logger.debug(f"FMP error for {symbol}: {data.get('error', 'unknown')}")
-                    return {"symbol": symbol, "error": "api_error", "data": None}
-                else:
-                    logger.debug(f"No FMP data for {symbol}")
-                    return {"symbol": symbol, "error": "no_data", "data": None}
-                
-        except asyncio.TimeoutError:
-            logger.warning(f"FMP timeout for {symbol}")
-            return {"symbol": symbol, "error": "timeout", "data": None}
-        except Exception as e:
-            logger.warning(f"FMP error fetching {symbol}: {str(e)[:80]}")
-            return {"symbol": symbol, "error": str(e)[:80], "data": None}
-        finally:
-            # Rate limit delay
-            await asyncio.sleep(FMP_RATE_LIMIT_DELAY)
+    try:
+        data = await http.get_json("fmp", "/stable/historical-price-eod/full", params)
+    except ThrottledError:
+        logger.warning(f"FMP rate limit hit for {symbol}")
+        return {"symbol": symbol, "error": "rate_limit", "data": None}
+    except HttpError as e:
+        logger.warning(f"FMP error fetching {symbol}: {str(e)[:80]}")
+        return {"symbol": symbol, "error": str(e)[:80], "data": None}
+    
+    # FMP returns a list directly
+    if isinstance(data, list) and len(data) > 0:
+        return {"symbol": symbol, "error": None, "data": data[0]}
+    elif isinstance(data, dict) and "error" in data:
+        logger.debug(f"FMP error for {symbol}: {data.get('error', 'unknown')}")
+        return {"symbol": symbol, "error": "api_error", "data": None}
+    else:
+        logger.debug(f"No FMP data for {symbol}")
+        return {"symbol": symbol, "error": "no_data", "data": None}
 
 
 def parse_daily_data_fmp(day_data: dict, target_date: str) -> Optional[dict]:
@@ -376,9 +331,11 @@ def parse_daily_data_fmp(day_data: dict, target_date: str) -> Optional[dict]:
 # ============================================================================
 
 async def process_us_assets(
+    http: HttpClient,
     assets: list[tuple],
     target_date: str,
-    conn
+    conn,
+    recon: Optional[BulkReconciliation] = None
 ) -> int:
     """
     Process US assets with Alpha Vantage API.
@@ -388,35 +345,24 @@ async def process_us_assets(
     
     logger.info(f"Processing {len(assets)} US equities via Alpha Vantage...")
     
-    # Semaphore for rate limiting (1 concurrent request)
-    semaphore = asyncio.Semaphore(1)
-    
     total_inserted = 0
     batch_records = []
     rate_limit_count = 0
     success_count = 0
     error_count = 0
     
-    async with aiohttp.ClientSession() as session:
-        for i, (asset_id, symbol) in enumerate(assets):
-            # Progress logging every 100 assets
-            if i % 100 == 0:
-                pct = i * 100 // len(assets) if assets else 0
-                logger.info(f"  US Progress: {i}/{len(assets)} ({pct}%) - Success: {success_count}, Errors: {error_count}")
-            
-            # Fetch data
-            result = await fetch_daily_adjusted_av(session, symbol, semaphore)
-            
-            # Handle rate limit
+    for i in range(0, len(assets), FETCH_CHUNK):
+        chunk = assets[i:i + FETCH_CHUNK]
+        pct = i * 100 // len(assets)
+        logger.info(f"  US Progress: {i}/{len(assets)} ({pct}%) - Success: {success_count}, Errors: {error_count}")
+        
+        # Fetch the chunk concurrently; the client keeps it within the AV quota
+        results = await asyncio.gather(*(fetch_daily_adjusted_av(http, symbol) for _, symbol in chunk))
+        
+        for (asset_id, symbol), result in zip(chunk, results):
+            # Rate limits that outlasted the client's retries
             if result["error"] == "rate_limit":
                 rate_limit_count += 1
-                if rate_limit_count >= 5:
-                    logger.error("Too many rate limits, stopping US ingestion")
-                    break
-                logger.info("Waiting 60s for rate limit cooldown...")
-                await asyncio.sleep(60)
-                # Retry
-                result = await fetch_daily_adjusted_av(session, symbol, semaphore)
             
             # Parse and collect record
             if result["data"]:
@@ -425,17 +371,23 @@ async def process_us_assets(
                     bar_data["asset_id"] = asset_id
                     batch_records.append(bar_data)
                     success_count += 1
+                    if recon:
+                        recon.record("av_history", [symbol])
                 else:
                     error_count += 1
             else:
                 error_count += 1
-            
-            # Insert in batches
-            if len(batch_records) >= BATCH_SIZE:
-                inserted = insert_daily_bars(conn, batch_records, source="alphavantage")
-                total_inserted += inserted
-                logger.info(f"    → Inserted batch of {inserted} US records")
-                batch_records = []
+        
+        # Insert in batches
+        if len(batch_records) >= BATCH_SIZE:
+            inserted = insert_daily_bars(conn, batch_records, source="alphavantage")
+            total_inserted += inserted
+            logger.info(f"    → Inserted batch of {inserted} US records")
+            batch_records = []
+        
+        if rate_limit_count >= 5:
+            logger.error("Too many rate limits, stopping US ingestion")
+            break
     
     # Insert remaining records
     if batch_records:
@@ -448,9 +400,11 @@ async def process_us_assets(
 
 
 async def process_intl_assets(
+    http: HttpClient,
     assets: list[tuple],
     target_date: str,
-    conn
+    conn,
+    recon: Optional[BulkReconciliation] = None
 ) -> int:
     """
     Process international assets with FMP API.
@@ -464,24 +418,19 @@ async def process_intl_assets(
     
     logger.info(f"Processing {len(assets)} international equities via FMP...")
     
-    # Semaphore for rate limiting (allow more concurrent for FMP)
-    semaphore = asyncio.Semaphore(3)
-    
     total_inserted = 0
     batch_records = []
     success_count = 0
     error_count = 0
     
-    async with aiohttp.ClientSession() as session:
-        for i, (asset_id, symbol) in enumerate(assets):
-            # Progress logging every 20 assets
-            if i % 20 == 0:
-                pct = i * 100 // len(assets) if assets else 0
-                logger.info(f"  Intl Progress: {i}/{len(assets)} ({pct}%) - Success: {success_count}, Errors: {error_count}")
-            
-            # Fetch data
-            result = await fetch_daily_fmp(session, symbol, target_date, semaphore)
-            
+    for i in range(0, len(assets), FETCH_CHUNK):
+        chunk = assets[i:i + FETCH_CHUNK]
+        pct = i * 100 // len(assets)
+        logger.info(f"  Intl Progress: {i}/{len(assets)} ({pct}%) - Success: {success_count}, Errors: {error_count}")
+        
+        results = await asyncio.gather(*(fetch_daily_fmp(http, symbol, target_date) for _, symbol in chunk))
+        
+        for (asset_id, symbol), result in zip(chunk, results):
             # Parse and collect record
             if result["data"]:
                 bar_data = parse_daily_data_fmp(result["data"], target_date)
@@ -489,17 +438,19 @@ async def process_intl_assets(
                     bar_data["asset_id"] = asset_id
                     batch_records.append(bar_data)
                     success_count += 1
+                    if recon:
+                        recon.record("fmp_history", [symbol])
                 else:
                     error_count += 1
             else:
                 error_count += 1
-            
-            # Insert in batches
-            if len(batch_records) >= BATCH_SIZE:
-                inserted = insert_daily_bars(conn, batch_records, source="fmp")
-                total_inserted += inserted
-                logger.info(f"    → Inserted batch of {inserted} intl records")
-                batch_records = []
+        
+        # Insert in batches
+        if len(batch_records) >= BATCH_SIZE:
+            inserted = insert_daily_bars(conn, batch_records, source="fmp")
+            total_inserted += inserted
+            logger.info(f"    → Inserted batch of {inserted} intl records")
+            batch_records = []
     
     # Insert remaining records
     if batch_records:
@@ -511,17 +462,73 @@ async def process_intl_assets(
     return total_inserted
 
 
+async def process_bulk(
+    http: HttpClient,
+    assets: list[tuple],
+    target_date: str,
+    conn,
+    recon: BulkReconciliation
+) -> int:
+    """
+    Bulk pass: FMP bulk EOD for every symbol, then AlphaVantage bulk quotes
+    for US symbols it did not cover. Covered symbols are recorded in `recon`.
+    """
+    asset_ids = {symbol: asset_id for asset_id, symbol in assets}
+    total_inserted = 0
+    
+    def insert(bars: dict, symbols: list[str], source: str) -> int:
+        records = []
+        for symbol in symbols:
+            bar_data = parse_daily_data_fmp(bars[symbol], target_date)
+            if bar_data:
+                bar_data["asset_id"] = asset_ids[symbol]
+                records.append(bar_data)
+        return insert_daily_bars(conn, records, source=source)
+    
+    if FMP_API_KEY:
+        logger.info("Fetching FMP bulk EOD...")
+        try:
+            text = await http.get_text(*fmp_bulk_eod_request(target_date, FMP_API_KEY))
+            bars = parse_fmp_bulk_eod(text, target_date)
+        except HttpError as e:
+            logger.warning(f"FMP bulk EOD failed: {str(e)[:120]}")
+            bars = {}
+        covered = recon.record("fmp_bulk", bars, bulk=True)
+        inserted = insert(bars, covered, "fmp")
+        total_inserted += inserted
+        logger.info(f"  FMP bulk EOD: {len(bars)} symbols in file, {inserted} of ours inserted")
+    
+    us_missing = [symbol for symbol in recon.missing() if '.' not in symbol]
+    if ALPHAVANTAGE_API_KEY and us_missing:
+        logger.info(f"Fetching AlphaVantage bulk quotes for {len(us_missing)} US symbols...")
+        responses = await http.gather(av_bulk_quote_requests(us_missing, ALPHAVANTAGE_API_KEY))
+        bars = parse_av_bulk_quotes(responses, target_date)
+        covered = recon.record("av_bulk", bars, bulk=True)
+        inserted = insert(bars, covered, "alphavantage")
+        total_inserted += inserted
+        logger.info(f"  AlphaVantage bulk quotes: {inserted} inserted")
+    
+    return total_inserted
+
+
 # ============================================================================
 # Main Function
 # ============================================================================
 
-async def run_ingestion(target_date: str, limit: Optional[int] = None) -> int:
+async def run_ingestion(
+    target_date: str,
+    limit: Optional[int] = None,
+    mode: str = "bulk",
+    report_path: Optional[str] = None
+) -> int:
     """
     Run the equity OHLCV ingestion for a specific date.
     
     Args:
         target_date: Date string in YYYY-MM-DD format
         limit: Optional limit on number of assets to process
+        mode: "bulk" (bulk endpoints, per-symbol only for gaps) or "per-symbol"
+        report_path: Optional path for the JSON reconciliation report
     
     Returns:
         Number of records inserted
@@ -536,7 +543,7 @@ async def run_ingestion(target_date: str, limit: Optional[int] = None) -> int:
         last_trading = get_last_trading_day(target_date)
         logger.info(f"Note: {target_date} is not a US trading day")
         logger.info(f"      Last US trading day was: {last_trading}")
-        logger.info(f"      Will still fetch international data...")
+        logger.info(f"      Will still fetch international exchanges open that day...")
     
     # Validate environment
     if not ALPHAVANTAGE_API_KEY:
@@ -558,37 +565,68 @@ async def run_ingestion(target_date: str, limit: Optional[int] = None) -> int:
         conn.close()
         return 0
     
-    # Estimate runtime
-    us_minutes = len(us_assets) * AV_RATE_LIMIT_DELAY / 60 if ALPHAVANTAGE_API_KEY else 0
-    intl_minutes = len(intl_assets) * FMP_RATE_LIMIT_DELAY / 60 if FMP_API_KEY else 0
-    logger.info(f"Estimated runtime: ~{us_minutes + intl_minutes:.0f} minutes")
+    # Symbols are skipped on days their exchange is closed
+    if not is_trading_day(target_date):
+        logger.info("Skipping US equities (not a trading day)")
+        us_assets = []
+    open_intl = trading_on(intl_assets, target_date)
+    if len(open_intl) < len(intl_assets):
+        logger.info(f"Skipping {len(intl_assets) - len(open_intl)} international equities "
+                    f"(exchange closed on {target_date})")
+        intl_assets = open_intl
+    if not us_assets and not intl_assets:
+        logger.info("No exchange open on this date, nothing to fetch")
+        conn.close()
+        return 0
+    
+    vendors = default_vendors()
+    if mode == "per-symbol":
+        # Estimate runtime (each vendor runs at its quota)
+        us_minutes = len(us_assets) / vendors["alphavantage"].calls_per_minute if ALPHAVANTAGE_API_KEY else 0
+        intl_minutes = len(intl_assets) / vendors["fmp"].calls_per_minute if FMP_API_KEY else 0
+        logger.info(f"Estimated runtime: ~{us_minutes + intl_minutes:.0f} minutes")
     
     # Process assets
     start_time = datetime.now()
     total_inserted = 0
-    
-    # Process US equities (skip on non-trading days)
-    if is_trading_day(target_date) and ALPHAVANTAGE_API_KEY and us_assets:
-        us_inserted = await process_us_assets(us_assets, target_date, conn)
-        total_inserted += us_inserted
-    elif not is_trading_day(target_date):
-        logger.info("Skipping US equities (not a trading day)")
-    
-    # Process international equities (may trade on different schedules)
-    if FMP_API_KEY and intl_assets:
-        intl_inserted = await process_intl_assets(intl_assets, target_date, conn)
-        total_inserted += intl_inserted
+    recon = BulkReconciliation(target_date, [symbol for _, symbol in us_assets + intl_assets])
+    
+    async with HttpClient(vendors=vendors) as http:
+        if mode == "bulk":
+            total_inserted += await process_bulk(http, us_assets + intl_assets, target_date, conn, recon)
+            # Per-symbol history only for what the bulk pass missed
+            missing = set(recon.missing())
+            us_assets = [(aid, sym) for aid, sym in us_assets if sym in missing]
+            intl_assets = [(aid, sym) for aid, sym in intl_assets if sym in missing]
+            if us_assets or intl_assets:
+                logger.info(f"Falling back to per-symbol fetches for {len(us_assets)} US "
+                            f"and {len(intl_assets)} international equities")
+        
+        # Process US equities
+        if ALPHAVANTAGE_API_KEY and us_assets:
+            us_inserted = await process_us_assets(http, us_assets, target_date, conn, recon)
+            total_inserted += us_inserted
+        
+        # Process international equities (may trade on different schedules)
+        if FMP_API_KEY and intl_assets:
+            intl_inserted = await process_intl_assets(http, intl_assets, target_date, conn, recon)
+            total_inserted += intl_inserted
     
     elapsed = (datetime.now() - start_time).total_seconds()
     
     conn.close()
     
+    recon.log_summary(logger)
+    if report_path:
+        recon.write(report_path)
+        logger.info(f"Reconciliation report written to {report_path}")
+    
     # Summary
-    total_assets = len(us_assets) + len(intl_assets)
+    total_assets = len(recon.expected)
     logger.info("=" * 60)
     logger.info(f"INGESTION COMPLETE")
-    logger.info(f"  US assets: {len(us_assets)}")
-    logger.info(f"  International assets: {len(intl_assets)}")
+    logger.info(f"  Mode: {mode}")
+    logger.info(f"  Assets: {total_assets}")
     logger.info(f"  Total records inserted: {total_inserted}")
     logger.info(f"  Success rate: {total_inserted * 100 / total_assets:.1f}%" if total_assets > 0 else "  Success rate: N/A")
     logger.info(f"  Elapsed time: {elapsed / 60:.1f} minutes")
@@ -612,10 +650,22 @@ def main():
         default=None,
         help="Limit number of assets to process (for testing)"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["bulk", "per-symbol"],
+        default="bulk",
+        help="bulk: bulk EOD endpoints, per-symbol fetches only for gaps (default)"
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Write the JSON reconciliation report to this path"
+    )
     args = parser.parse_args()
     
     try:
-        inserted = asyncio.run(run_ingestion(args.date, args.limit))
+        asyncio.run(run_ingestion(args.date, args.limit, args.mode, args.report))
         # Exit 0 even if no records (could be non-trading day)
         sys.exit(0)
     except Exception as e:
@@ -19,7 +19,7 @@ import sys
 import argparse
 import logging
 import time
-from datetime import datetime, timedelta, date
+from datetime import date
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -29,6 +29,11 @@ import pandas as pd
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# Shared COPY-based writer and bar lookback from the engine package (psycopg2/pandas only)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.bulk_writer import bulk_upsert
+from stratos_engine.lookback import recent_bars_by_asset
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,8 +44,12 @@ logger = logging.getLogger(__name__)
 
 # Constants
 FEATURE_VERSION = "2.0"
+MAX_LOOKBACK = 300  # Bars per asset: 252-bar windows plus warm-up
 ASSET_TYPES = ('etf', 'index', 'commodity')
 
+# Assets per bar lookback query
+BARS_CHUNK = 500
+
 # Thread-local storage for connections
 thread_local = threading.local()
 
@@ -97,29 +106,11 @@ def get_all_assets(target_date: str) -> list:
         return cur.fetchall()
 
 
-def get_bars_for_asset(asset_id: int, end_date: str, lookback_days: int = 300) -> pd.DataFrame:
-    """Fetch daily bars for an asset directly from PostgreSQL."""
-    conn = get_connection()
-    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
-    
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("""
-            SELECT date, open, high, low, close, volume
-            FROM daily_bars
-            WHERE asset_id = %s AND date >= %s AND date <= %s
-            ORDER BY date ASC
-        """, (asset_id, start_date, end_date))
-        rows = cur.fetchall()
-    
-    if not rows:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    return df
+def get_bars_for_assets(asset_ids: list, end_date: str, bars: int = MAX_LOOKBACK) -> dict:
+    """Last `bars` daily bars per asset ({asset_id: frames with a date column}), in one query."""
+    by_asset = recent_bars_by_asset(get_connection(), asset_ids, end_date, bars)
+    return by_asset
+
 
 
 def compute_features(bars: pd.DataFrame) -> pd.DataFrame:
@@ -255,39 +246,21 @@ def build_record(row: pd.Series, asset_id: int, target_date: str) -> dict:
 
 
 def write_features_batch(records: list) -> int:
-    """Write a batch of feature records to the database."""
+    """Write a batch of feature records to the database (COPY + one set-based merge)."""
     if not records:
         return 0
     
     conn = get_connection()
     
     # Get column names from first record
-    columns = list(records[0].keys())
-    
-    # Build upsert query
-    cols_str = ', '.join(columns)
-    placeholders = ', '.join(['%s'] * len(columns))
-    update_cols = [c for c in columns if c not in ['asset_id', 'date']]
-    update_str = ', '.join([f"{c} = EXCLUDED.{c}" for c in update_cols])
-    
-    query = f"""
-        INSERT INTO daily_features ({cols_str})
-        VALUES ({placeholders})
-        ON CONFLICT (asset_id, date) DO UPDATE SET {update_str}
-    """
-    
-    with conn.cursor() as cur:
-        for record in records:
-            values = [record.get(c) for c in columns]
-            cur.execute(query, values)
+    frame = pd.DataFrame(records, columns=list(records[0].keys()))
     
-    return len(records)
+    return bulk_upsert(conn, 'daily_features', frame, ['asset_id', 'date']).rows
 
 
-def process_asset(asset: dict, target_date: str) -> dict:
-    """Process a single asset and return result dict."""
+def process_asset(asset: dict, target_date: str, df: pd.DataFrame) -> dict:
+    """Process a single asset from its prefetched bars and return result dict."""
     try:
-        df = get_bars_for_asset(asset['asset_id'], target_date)
         if len(df) < 50:  # Need at least 50 days for 50MA
             return {'status': 'skipped', 'reason': 'insufficient_data', 'asset_id': asset['asset_id']}
         
@@ -379,8 +352,13 @@ def main():
     batch = []
     
     with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(process_asset, asset, target_date): asset 
-                   for asset in assets}
+        futures = {}
+        for i in range(0, total, BARS_CHUNK):
+            chunk = assets[i:i + BARS_CHUNK]
+            bars = get_bars_for_assets([a['asset_id'] for a in chunk], target_date)
+            for asset in chunk:
+                futures[executor.submit(process_asset, asset, target_date,
+                                        bars.get(asset['asset_id'], pd.DataFrame()))] = asset
         
         for future in as_completed(futures):
             result = future.result()
@@ -392,7 +370,7 @@ def main():
                 
                 # Write batch when full
                 if len(batch) >= args.batch_size:
-                    written = write_features_batch(batch)
+                    write_features_batch(batch)
                     elapsed = time.time() - start_time
                     rate = processed / elapsed if elapsed > 0 else 0
                     logger.info(f"Progress: {processed}/{total} ({100*processed/total:.1f}%) | "
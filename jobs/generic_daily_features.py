@@ -18,8 +18,7 @@ import os
 import sys
 import argparse
 import logging
-import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -27,7 +26,12 @@ import threading
 import numpy as np
 import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_values, RealDictCursor
+from psycopg2.extras import RealDictCursor
+
+# Shared COPY-based writer and bar lookback from the engine package (psycopg2/pandas only)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.bulk_writer import bulk_upsert
+from stratos_engine.lookback import recent_bars_by_asset
 
 # Configure logging
 logging.basicConfig(
@@ -39,7 +43,7 @@ logger = logging.getLogger(__name__)
 
 # Constants
 FEATURE_VERSION = "2.0"
-MAX_LOOKBACK = 300
+MAX_LOOKBACK = 300  # Bars per asset: 252-bar windows plus warm-up
 
 # Annualization factors by asset type
 ANN_FACTORS = {
@@ -50,6 +54,9 @@ ANN_FACTORS = {
     'equity': 252,     # Equities trade 252 days
 }
 
+# Assets per bar lookback query
+BARS_CHUNK = 500
+
 # Thread-local storage for connections
 thread_local = threading.local()
 
@@ -88,29 +95,13 @@ def get_stale_assets(target_date: str, asset_type: str) -> list:
         return cur.fetchall()
 
 
-def get_bars_for_asset(asset_id: int, end_date: str, lookback_days: int = 600) -> pd.DataFrame:
-    """Fetch daily bars for an asset."""
-    conn = get_connection()
-    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
-    
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("""
-            SELECT date, open, high, low, close, volume
-            FROM daily_bars
-            WHERE asset_id = %s AND date >= %s AND date <= %s
-            ORDER BY date ASC
-        """, (asset_id, start_date, end_date))
-        rows = cur.fetchall()
-    
-    if not rows:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    return df.set_index('date').sort_index()
+def get_bars_for_assets(asset_ids: list, end_date: str, bars: int = MAX_LOOKBACK) -> dict:
+    """Last `bars` daily bars per asset ({asset_id: date-indexed frames}), in one query."""
+    by_asset = recent_bars_by_asset(get_connection(), asset_ids, end_date, bars)
+    for asset_id, df in by_asset.items():
+        by_asset[asset_id] = df.set_index('date').sort_index()
+    return by_asset
+
 
 
 def calculate_features(df: pd.DataFrame, ann_factor: int = 252) -> dict:
@@ -228,146 +219,71 @@ def calculate_features(df: pd.DataFrame, ann_factor: int = 252) -> dict:
     return features
 
 
-def save_features(asset_id: int, target_date: str, features: dict) -> bool:
-    """Save calculated features to database."""
-    conn = get_connection()
+# daily_features columns written by this job
+FEATURE_COLUMNS = [
+    'close',
+    'return_1d', 'return_5d', 'return_21d', 'return_63d', 'return_252d',
+    'realized_vol_20', 'realized_vol_60',
+    'sma_20', 'sma_50', 'sma_200',
+    'ma_dist_20', 'ma_dist_50', 'ma_dist_200',
+    'rsi_14', 'macd_line', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_lower', 'bb_middle', 'bb_width', 'bb_pct',
+    'atr_14', 'atr_pct',
+    'volume_sma_20', 'rvol_20',
+    'donchian_high_20', 'donchian_low_20', 'donchian_high_55', 'donchian_low_55',
+    'dist_52w_high', 'dist_52w_low',
+    'roc_5', 'roc_10', 'roc_20', 'roc_63',
+    'bars_available',
+]
+
+
+def build_record(asset_id: int, target_date: str, features: dict) -> dict:
+    """Build a daily_features record from calculated features."""
+    record = {'asset_id': asset_id, 'date': target_date, 'feature_version': FEATURE_VERSION}
     
     # Convert numpy types to Python native types
-    clean_features = {}
-    for k, v in features.items():
-        if v is None:
-            clean_features[k] = None
-        elif isinstance(v, (np.floating, np.integer)):
-            clean_features[k] = float(v)
+    for k in FEATURE_COLUMNS:
+        v = features.get(k)
+        if isinstance(v, (np.floating, np.integer)):
+            v = float(v)
         elif isinstance(v, Decimal):
-            clean_features[k] = float(v)
-        else:
-            clean_features[k] = v
+            v = float(v)
+        record[k] = v
     
-    with conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO daily_features (
-                asset_id, date, feature_version, close,
-                return_1d, return_5d, return_21d, return_63d, return_252d,
-                realized_vol_20, realized_vol_60,
-                sma_20, sma_50, sma_200,
-                ma_dist_20, ma_dist_50, ma_dist_200,
-                rsi_14, macd_line, macd_signal, macd_histogram,
-                bb_upper, bb_lower, bb_middle, bb_width, bb_pct,
-                atr_14, atr_pct,
-                volume_sma_20, rvol_20,
-                donchian_high_20, donchian_low_20, donchian_high_55, donchian_low_55,
-                dist_52w_high, dist_52w_low,
-                roc_5, roc_10, roc_20, roc_63,
-                bars_available
-            ) VALUES (
-                %s, %s, %s, %s,
-                %s, %s, %s, %s, %s,
-                %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s, %s,
-                %s, %s, %s, %s, %s,
-                %s, %s,
-                %s, %s,
-                %s, %s, %s, %s,
-                %s, %s,
-                %s, %s, %s, %s,
-                %s
-            )
-            ON CONFLICT (asset_id, date) DO UPDATE SET
-                feature_version = EXCLUDED.feature_version,
-                close = EXCLUDED.close,
-                return_1d = EXCLUDED.return_1d,
-                return_5d = EXCLUDED.return_5d,
-                return_21d = EXCLUDED.return_21d,
-                return_63d = EXCLUDED.return_63d,
-                return_252d = EXCLUDED.return_252d,
-                realized_vol_20 = EXCLUDED.realized_vol_20,
-                realized_vol_60 = EXCLUDED.realized_vol_60,
-                sma_20 = EXCLUDED.sma_20,
-                sma_50 = EXCLUDED.sma_50,
-                sma_200 = EXCLUDED.sma_200,
-                ma_dist_20 = EXCLUDED.ma_dist_20,
-                ma_dist_50 = EXCLUDED.ma_dist_50,
-                ma_dist_200 = EXCLUDED.ma_dist_200,
-                rsi_14 = EXCLUDED.rsi_14,
-                macd_line = EXCLUDED.macd_line,
-                macd_signal = EXCLUDED.macd_signal,
-                macd_histogram = EXCLUDED.macd_histogram,
-                bb_upper = EXCLUDED.bb_upper,
-                bb_lower = EXCLUDED.bb_lower,
-                bb_middle = EXCLUDED.bb_middle,
-                bb_width = EXCLUDED.bb_width,
-                bb_pct = EXCLUDED.bb_pct,
-                atr_14 = EXCLUDED.atr_14,
-                atr_pct = EXCLUDED.atr_pct,
-                volume_sma_20 = EXCLUDED.volume_sma_20,
-                rvol_20 = EXCLUDED.rvol_20,
-                donchian_high_20 = EXCLUDED.donchian_high_20,
-                donchian_low_20 = EXCLUDED.donchian_low_20,
-                donchian_high_55 = EXCLUDED.donchian_high_55,
-                donchian_low_55 = EXCLUDED.donchian_low_55,
-                dist_52w_high = EXCLUDED.dist_52w_high,
-                dist_52w_low = EXCLUDED.dist_52w_low,
-                roc_5 = EXCLUDED.roc_5,
-                roc_10 = EXCLUDED.roc_10,
-                roc_20 = EXCLUDED.roc_20,
-                roc_63 = EXCLUDED.roc_63,
-                bars_available = EXCLUDED.bars_available,
-                updated_at = NOW()
-        """, (
-            asset_id, target_date, FEATURE_VERSION, clean_features.get('close'),
-            clean_features.get('return_1d'), clean_features.get('return_5d'),
-            clean_features.get('return_21d'), clean_features.get('return_63d'),
-            clean_features.get('return_252d'),
-            clean_features.get('realized_vol_20'), clean_features.get('realized_vol_60'),
-            clean_features.get('sma_20'), clean_features.get('sma_50'), clean_features.get('sma_200'),
-            clean_features.get('ma_dist_20'), clean_features.get('ma_dist_50'),
-            clean_features.get('ma_dist_200'),
-            clean_features.get('rsi_14'), clean_features.get('macd_line'),
-            clean_features.get('macd_signal'), clean_features.get('macd_histogram'),
-            clean_features.get('bb_upper'), clean_features.get('bb_lower'),
-            clean_features.get('bb_middle'), clean_features.get('bb_width'),
-            clean_features.get('bb_pct'),
-            clean_features.get('atr_14'), clean_features.get('atr_pct'),
-            clean_features.get('volume_sma_20'), clean_features.get('rvol_20'),
-            clean_features.get('donchian_high_20'), clean_features.get('donchian_low_20'),
-            clean_features.get('donchian_high_55'), clean_features.get('donchian_low_55'),
-            clean_features.get('dist_52w_high'), clean_features.get('dist_52w_low'),
-            clean_features.get('roc_5'), clean_features.get('roc_10'),
-            clean_features.get('roc_20'), clean_features.get('roc_63'),
-            clean_features.get('bars_available')
-        ))
-    
-    return True
+    return record
+
+
+def save_features_batch(records: list) -> int:
+    """Save feature records to database (COPY + one set-based merge)."""
+    if not records:
+        return 0
+    
+    conn = get_connection()
+    frame = pd.DataFrame(records, columns=['asset_id', 'date', 'feature_version'] + FEATURE_COLUMNS)
+    
+    return bulk_upsert(conn, 'daily_features', frame, ['asset_id', 'date'],
+                       touch_columns=['updated_at']).rows
 
 
-def process_asset(asset: dict, target_date: str, ann_factor: int) -> tuple:
-    """Process a single asset - fetch bars, calculate features, save."""
+def process_asset(asset: dict, target_date: str, ann_factor: int, df: pd.DataFrame) -> tuple:
+    """Process a single asset - calculate features from its prefetched bars, build record."""
     asset_id = asset['asset_id']
     symbol = asset['symbol']
     
     try:
-        # Get historical bars
-        df = get_bars_for_asset(asset_id, target_date)
-        
         if df.empty or len(df) < 20:
-            return (symbol, False, "Insufficient data")
+            return (symbol, False, "Insufficient data", None)
         
         # Calculate features
         features = calculate_features(df, ann_factor)
         
         if features is None:
-            return (symbol, False, "Feature calculation failed")
+            return (symbol, False, "Feature calculation failed", None)
         
-        # Save features
-        save_features(asset_id, target_date, features)
-        
-        return (symbol, True, None)
+        return (symbol, True, None, build_record(asset_id, target_date, features))
         
     except Exception as e:
-        return (symbol, False, str(e))
+        return (symbol, False, str(e), None)
 
 
 def main():
@@ -405,18 +321,23 @@ def main():
     # Process assets in parallel
     success_count = 0
     error_count = 0
+    records = []
     
     with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {
-            executor.submit(process_asset, asset, target_date, ann_factor): asset
-            for asset in assets
-        }
+        futures = {}
+        for i in range(0, len(assets), BARS_CHUNK):
+            chunk = assets[i:i + BARS_CHUNK]
+            bars = get_bars_for_assets([a['asset_id'] for a in chunk], target_date)
+            for asset in chunk:
+                futures[executor.submit(process_asset, asset, target_date, ann_factor,
+                                        bars.get(asset['asset_id'], pd.DataFrame()))] = asset
         
         for i, future in enumerate(as_completed(futures)):
-            symbol, success, error = future.result()
+            symbol, success, error, record = future.result()
             
             if success:
                 success_count += 1
+                records.append(record)
             else:
                 error_count += 1
                 logger.debug(f"{symbol}: {error}")
@@ -424,6 +345,9 @@ def main():
             if (i + 1) % 20 == 0:
                 logger.info(f"Progress: {i + 1}/{len(assets)} ({success_count} success, {error_count} errors)")
     
+    # Save all records in one bulk write
+    save_features_batch(records)
+    
     # Summary
     logger.info("=" * 60)
     logger.info("Summary")
@@ -8,12 +8,19 @@ Designed to run as a GitHub Actions scheduled workflow.
 This script fetches data for assets in the assets table with asset_type in 
 ('index', 'commodity', 'etf') and writes to the daily_bars table.
 
+Bars come from FMP's bulk EOD file first (one call for every symbol); only
+symbols missing from it are fetched one by one, and a reconciliation of both
+passes is logged. Assets are skipped on days their exchange calendar has no
+session (stratos_engine.calendar).
+
 Usage:
     python -m jobs.index_commodity_etf_daily_ohlcv [--date YYYY-MM-DD] [--limit N] [--asset-type TYPE]
     
     --date: The date to fetch/store data for (default: today)
     --limit: Limit number of assets (for testing)
     --asset-type: Filter by asset type (index, commodity, etf, or all)
+    --mode: bulk (default) or per-symbol
+    --report: Write the JSON reconciliation report to this path
 
 Environment Variables:
     DATABASE_URL: PostgreSQL connection string
@@ -24,22 +31,23 @@ import os
 import sys
 import argparse
 import logging
-import time
 from datetime import datetime, timedelta
 from typing import Optional, List, Tuple
 
-import requests
 import psycopg2
 from psycopg2.extras import execute_values
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.bulk_eod import BulkReconciliation, fmp_bulk_eod_request, parse_fmp_bulk_eod
+from stratos_engine.calendar import calendar_for
+from stratos_engine.http import HttpError, get_shared_client
+
 # Configuration
 FMP_API_KEY = os.environ.get('FMP_API_KEY')
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
-# FMP API settings
-FMP_BASE_URL = "https://financialmodelingprep.com/stable"
-RATE_LIMIT_DELAY = 0.2  # 200ms between requests (300 req/min limit)
-REQUEST_TIMEOUT = 30
+# FMP requests go through the shared rate-limited client (FMP_CALLS_PER_MINUTE)
+FETCH_CHUNK = 50  # Per-symbol requests in flight per gather
 
 # Logging setup
 logging.basicConfig(
@@ -77,6 +85,25 @@ def get_assets(conn, asset_types: List[str], limit: Optional[int] = None) -> Lis
         return cur.fetchall()
 
 
+def _daily_bar_request(symbol: str, target_date: str) -> tuple:
+    params = {
+        "symbol": symbol,
+        "from": target_date,
+        "to": target_date,
+        "apikey": FMP_API_KEY
+    }
+    return ("fmp", "/stable/historical-price-eod/full", params)
+
+
+def _first_bar(symbol: str, data) -> Optional[dict]:
+    if isinstance(data, Exception):
+        logger.warning(f"Error fetching {symbol}: {data}")
+        return None
+    if isinstance(data, list) and len(data) > 0:
+        return data[0]
+    return None
+
+
 def fetch_daily_bar(symbol: str, target_date: str) -> Optional[dict]:
     """
     Fetch daily OHLCV data from FMP for a single symbol.
@@ -85,26 +112,37 @@ def fetch_daily_bar(symbol: str, target_date: str) -> Optional[dict]:
     if not FMP_API_KEY:
         raise ValueError("FMP_API_KEY environment variable not set")
     
-    url = f"{FMP_BASE_URL}/historical-price-eod/full"
-    params = {
-        "symbol": symbol,
-        "from": target_date,
-        "to": target_date,
-        "apikey": FMP_API_KEY
-    }
+    try:
+        data = get_shared_client().get_json(*_daily_bar_request(symbol, target_date))
+    except HttpError as e:
+        data = e
+    return _first_bar(symbol, data)
+
+
+def fetch_daily_bars(symbols: List[str], target_date: str) -> dict:
+    """Per-symbol fetches for many symbols, issued concurrently within the FMP quota."""
+    if not FMP_API_KEY:
+        raise ValueError("FMP_API_KEY environment variable not set")
     
+    http = get_shared_client()
+    bars = {}
+    for i in range(0, len(symbols), FETCH_CHUNK):
+        chunk = symbols[i:i + FETCH_CHUNK]
+        responses = http.gather([_daily_bar_request(symbol, target_date) for symbol in chunk])
+        for symbol, data in zip(chunk, responses):
+            bars[symbol] = _first_bar(symbol, data)
+        logger.info(f"Progress: {min(i + FETCH_CHUNK, len(symbols))}/{len(symbols)} per-symbol fetches")
+    return bars
+
+
+def fetch_bulk_bars(target_date: str) -> dict:
+    """Every symbol's bar for target_date from FMP bulk EOD ({} if unavailable)."""
     try:
-        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        data = response.json()
-        
-        if isinstance(data, list) and len(data) > 0:
-            return data[0]
-        return None
-        
-    except requests.exceptions.RequestException as e:
-        logger.warning(f"Error fetching {symbol}: {e}")
-        return None
+        text = get_shared_client().get_text(*fmp_bulk_eod_request(target_date, FMP_API_KEY))
+    except HttpError as e:
+        logger.warning(f"FMP bulk EOD failed: {str(e)[:120]}")
+        return {}
+    return parse_fmp_bulk_eod(text, target_date)
 
 
 def upsert_daily_bars(conn, bars: List[Tuple]) -> int:
@@ -141,8 +179,14 @@ def main():
     parser.add_argument('--asset-type', type=str, default='all', 
                         choices=['index', 'commodity', 'etf', 'all'],
                         help='Asset type to process')
+    parser.add_argument('--mode', type=str, default='bulk', choices=['bulk', 'per-symbol'],
+                        help='bulk: FMP bulk EOD, per-symbol fetches only for gaps (default)')
+    parser.add_argument('--report', type=str, help='Write the JSON reconciliation report to this path')
     args = parser.parse_args()
     
+    if not FMP_API_KEY:
+        raise ValueError("FMP_API_KEY environment variable not set")
+    
     # Determine target date
     if args.date:
         target_date = args.date
@@ -168,14 +212,40 @@ def main():
         assets = get_assets(conn, asset_types, args.limit)
         logger.info(f"Found {len(assets)} assets to process")
         
+        # Skip assets whose exchange is closed on the target date
+        open_assets = [a for a in assets if calendar_for(a[3], a[2]).is_session(target_date)]
+        if len(open_assets) < len(assets):
+            logger.info(f"Skipping {len(assets) - len(open_assets)} assets (no session on {target_date})")
+            assets = open_assets
+        if not assets:
+            logger.info("No market open on this date, nothing to fetch")
+            return
+        
         # Fetch and store data
         bars_to_insert = []
         success_count = 0
         error_count = 0
         
-        for i, (asset_id, symbol, fmp_symbol, asset_type) in enumerate(assets):
-            # Fetch data
-            bar = fetch_daily_bar(fmp_symbol, target_date)
+        fmp_symbols = [fmp_symbol for _, _, fmp_symbol, _ in assets]
+        recon = BulkReconciliation(target_date, list(dict.fromkeys(fmp_symbols)))
+        
+        bars = {}
+        if args.mode == 'bulk':
+            bars = fetch_bulk_bars(target_date)
+            recon.record('fmp_bulk', bars, bulk=True)
+            logger.info(f"FMP bulk EOD: {len(bars)} symbols in file, "
+                        f"{len(recon.passes['fmp_bulk'])} of {len(recon.expected)} ours")
+        
+        missing = recon.missing()
+        if missing:
+            logger.info(f"Fetching {len(missing)} symbols one by one")
+            fetched = fetch_daily_bars(missing, target_date)
+            recon.record('fmp_history', [sym for sym, bar in fetched.items()
+                                         if bar and bar.get('date') == target_date])
+            bars.update({sym: bar for sym, bar in fetched.items() if bar})
+        
+        for asset_id, symbol, fmp_symbol, asset_type in assets:
+            bar = bars.get(fmp_symbol)
             
             if bar and bar.get('date') == target_date:
                 bars_to_insert.append((
@@ -189,9 +259,6 @@ def main():
                     'fmp'
                 ))
                 success_count += 1
-                
-                if (i + 1) % 20 == 0:
-                    logger.info(f"Progress: {i + 1}/{len(assets)} ({success_count} success, {error_count} errors)")
             else:
                 error_count += 1
                 if bar:
@@ -199,9 +266,6 @@ def main():
                 else:
                     logger.debug(f"{symbol}: No data returned")
             
-            # Rate limiting
-            time.sleep(RATE_LIMIT_DELAY)
-            
             # Batch insert every 50 records
             if len(bars_to_insert) >= 50:
                 upsert_daily_bars(conn, bars_to_insert)
@@ -211,6 +275,10 @@ def main():
         if bars_to_insert:
             upsert_daily_bars(conn, bars_to_insert)
         
+        recon.log_summary(logger)
+        if args.report:
+            recon.write(args.report)
+        
         # Summary
         logger.info("=" * 60)
         logger.info("Summary")
@@ -5,10 +5,16 @@ Uses gemini-3-pro-preview model with concurrent API calls for faster execution.
 
 VERSION 3: Improved prompting to decouple direction score from quality score.
 Based on Gemini recommendations for independent scoring.
+
+Usage:
+    python run_all_crypto_v3.py            # live concurrent calls
+    python run_all_crypto_v3.py --batch    # one provider batch job (cheaper, results within hours)
+    python run_all_crypto_v3.py --batch --dry-run  # parsed reviews to a file, nothing saved
 """
 
 import os
 import sys
+import argparse
 import json
 import logging
 import asyncio
@@ -21,6 +27,7 @@ import threading
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from stratos_engine.db import Database
+from stratos_engine.llm_batch import BatchRequest, get_batch_provider, run_batch, write_rows
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +41,11 @@ AI_REVIEW_VERSION = "v3.0"
 MAX_CONCURRENT_REQUESTS = 10  # Number of parallel API calls
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 MODEL_NAME = "gemini-3-pro-preview"
+GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "maxOutputTokens": 8192,
+    "responseMimeType": "application/json"
+}
 
 # Thread-local storage for database connections
 thread_local = threading.local()
@@ -213,11 +225,7 @@ async def call_gemini_api(session: aiohttp.ClientSession, prompt: str) -> dict:
     
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.1,
-            "maxOutputTokens": 8192,
-            "responseMimeType": "application/json"
-        }
+        "generationConfig": GENERATION_CONFIG
     }
     
     try:
@@ -241,10 +249,32 @@ async def call_gemini_api(session: aiohttp.ClientSession, prompt: str) -> dict:
     return None
 
 
-def save_to_database(asset_id: int, as_of_date: str, result: dict) -> bool:
-    """Save analysis result to database."""
-    db = get_db()
-    
+REVIEW_UPSERT = """
+INSERT INTO asset_ai_reviews (
+    asset_id, as_of_date, direction, ai_direction_score, ai_setup_quality_score,
+    setup_type, attention_level, confidence, summary_text, ai_entry, ai_targets,
+    review_json, model, review_version, created_at
+) VALUES %s
+ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
+    direction = EXCLUDED.direction,
+    ai_direction_score = EXCLUDED.ai_direction_score,
+    ai_setup_quality_score = EXCLUDED.ai_setup_quality_score,
+    setup_type = EXCLUDED.setup_type,
+    attention_level = EXCLUDED.attention_level,
+    confidence = EXCLUDED.confidence,
+    summary_text = EXCLUDED.summary_text,
+    ai_entry = EXCLUDED.ai_entry,
+    ai_targets = EXCLUDED.ai_targets,
+    review_json = EXCLUDED.review_json,
+    model = EXCLUDED.model,
+    review_version = EXCLUDED.review_version,
+    created_at = NOW()
+"""
+REVIEW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+
+
+def review_values(asset_id: int, as_of_date: str, result: dict) -> tuple:
+    """asset_ai_reviews values for one result (see REVIEW_UPSERT)."""
     # Extract fields from result
     direction = result.get('direction', 'neutral')
     direction_score = result.get('ai_direction_score', 0)
@@ -262,36 +292,18 @@ def save_to_database(asset_id: int, as_of_date: str, result: dict) -> bool:
     targets = result.get('targets', [])
     ai_targets = ','.join([str(t) for t in targets]) if targets else None
     
-    query = """
-    INSERT INTO asset_ai_reviews (
-        asset_id, as_of_date, direction, ai_direction_score, ai_setup_quality_score,
-        setup_type, attention_level, confidence, summary_text, ai_entry, ai_targets,
-        review_json, model, review_version, created_at
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
+    return (
+        str(asset_id), as_of_date, direction, direction_score, quality_score,
+        setup_type, attention_level, confidence, summary, ai_entry, ai_targets,
+        json.dumps(result), MODEL_NAME, AI_REVIEW_VERSION
     )
-    ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
-        direction = EXCLUDED.direction,
-        ai_direction_score = EXCLUDED.ai_direction_score,
-        ai_setup_quality_score = EXCLUDED.ai_setup_quality_score,
-        setup_type = EXCLUDED.setup_type,
-        attention_level = EXCLUDED.attention_level,
-        confidence = EXCLUDED.confidence,
-        summary_text = EXCLUDED.summary_text,
-        ai_entry = EXCLUDED.ai_entry,
-        ai_targets = EXCLUDED.ai_targets,
-        review_json = EXCLUDED.review_json,
-        model = EXCLUDED.model,
-        review_version = EXCLUDED.review_version,
-        created_at = NOW()
-    """
-    
+
+
+def save_to_database(asset_id: int, as_of_date: str, result: dict) -> bool:
+    """Save analysis result to database."""
     try:
-        db.execute(query, (
-            str(asset_id), as_of_date, direction, direction_score, quality_score,
-            setup_type, attention_level, confidence, summary, ai_entry, ai_targets,
-            json.dumps(result), MODEL_NAME, AI_REVIEW_VERSION
-        ))
+        get_db().execute_values(REVIEW_UPSERT, [review_values(asset_id, as_of_date, result)],
+                                template=REVIEW_TEMPLATE)
         return True
     except Exception as e:
         logger.error(f"Database error for asset {asset_id}: {e}")
@@ -332,14 +344,8 @@ async def process_asset(session: aiohttp.ClientSession, asset: dict, as_of_date:
         return {'asset_id': asset_id, 'symbol': symbol, 'success': False, 'reason': 'api_error'}
 
 
-async def main():
-    """Main async function to process all crypto assets."""
-    # Get target date
-    as_of_date = os.environ.get('AS_OF_DATE', str(date.today()))
-    logger.info(f"Starting AI analysis for {as_of_date} (v3 - improved prompting)")
-    
-    # Get all active crypto assets
-    db = Database()
+def get_crypto_assets() -> list:
+    """All active crypto assets."""
     query = """
     SELECT a.asset_id, a.symbol, a.name
     FROM assets a
@@ -347,7 +353,64 @@ async def main():
     AND a.is_active = true
     ORDER BY a.symbol
     """
-    assets = db.fetch_all(query)
+    return get_db().fetch_all(query)
+
+
+def main_batch(as_of_date: str, dry_run: bool = False):
+    """
+    Batch mode: every prompt in one provider batch job, reviews ingested in one statement.
+    On a dry run (always with LLM_BATCH_PROVIDER=stub) the parsed rows go to a file instead.
+    """
+    provider = get_batch_provider()
+    dry_run = dry_run or provider.dry_run
+    logger.info(f"Starting batch AI analysis for {as_of_date} (v3 - improved prompting)")
+    assets = get_crypto_assets()
+    logger.info(f"Found {len(assets)} active crypto assets")
+    
+    requests = []
+    for asset in assets:
+        asset_id = asset['asset_id']
+        bars = get_ohlcv_data(asset_id, as_of_date)
+        if not bars:
+            logger.warning(f"No OHLCV data for {asset['symbol']}")
+            continue
+        prompt = build_prompt(asset['symbol'], asset['name'], bars,
+                              get_features(asset_id, as_of_date), get_signals(asset_id, as_of_date))
+        requests.append(BatchRequest(key=str(asset_id), prompt=prompt, config=GENERATION_CONFIG, context=dict(asset)))
+    
+    display_name = f"crypto-v3-{as_of_date}"
+    rows = []
+    for result in run_batch(requests, MODEL_NAME, provider=provider, display_name=display_name):
+        asset = result.request.context
+        try:
+            if not result.ok:
+                raise ValueError(result.error)
+            rows.append(review_values(asset['asset_id'], as_of_date, json.loads(result.text)))
+        except Exception as e:
+            logger.warning(f"✗ {asset['symbol']}: {e}")
+    
+    if dry_run:
+        path = write_rows(rows, display_name)
+        logger.info(f"Dry run ({provider.name}): {len(rows)} parsed reviews written to {path}, nothing saved")
+        return
+    
+    try:
+        get_db().execute_values(REVIEW_UPSERT, rows, template=REVIEW_TEMPLATE, page_size=500)
+        saved = len(rows)
+    except Exception as e:
+        logger.error(f"Database error saving {len(rows)} reviews: {e}")
+        saved = 0
+    logger.info(f"Completed: {saved} successful, {len(assets) - saved} failed")
+
+
+async def main():
+    """Main async function to process all crypto assets."""
+    # Get target date
+    as_of_date = os.environ.get('AS_OF_DATE', str(date.today()))
+    logger.info(f"Starting AI analysis for {as_of_date} (v3 - improved prompting)")
+    
+    # Get all active crypto assets
+    assets = get_crypto_assets()
     logger.info(f"Found {len(assets)} active crypto assets")
     
     # Process with rate limiting
@@ -374,6 +437,17 @@ async def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run AI analysis for all crypto assets (v3)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Submit all prompts as one provider batch job (LLM_BATCH_PROVIDER) instead of live calls')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='With --batch: write the parsed reviews to LLM_BATCH_DIR instead of the database')
+    args = parser.parse_args()
+    
+    if args.batch:
+        main_batch(os.environ.get('AS_OF_DATE', str(date.today())), dry_run=args.dry_run)
+        sys.exit(0)
+    
     if not GEMINI_API_KEY:
         print("Error: GEMINI_API_KEY environment variable not set")
         sys.exit(1)
@@ -16,6 +16,8 @@ Usage:
     python run_all_equities.py --date 2026-01-06 --min-market-cap 50000000
     python run_all_equities.py --min-daily-volume 2000000
     python run_all_equities.py  # auto-detects latest date with features data
+    python run_all_equities.py --batch  # one provider batch job (cheaper, results within hours)
+    python run_all_equities.py --batch --dry-run  # parsed reviews to a file, nothing saved
 """
 
 import os
@@ -39,6 +41,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from stratos_engine.db import Database
+from stratos_engine.llm_batch import BatchRequest, get_batch_provider, run_batch, write_rows
 
 # Configure logging
 logging.basicConfig(
@@ -52,6 +55,11 @@ AI_REVIEW_VERSION = "v3.3"
 MAX_CONCURRENT_REQUESTS = 10  # Number of parallel API calls (increased for faster processing)
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 MODEL_NAME = "gemini-3-flash-preview"  # Gemini 3 Flash Preview model
+GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "maxOutputTokens": 8192,
+    "responseMimeType": "application/json"
+}
 
 # Thread-local storage for database connections
 thread_local = threading.local()
@@ -312,11 +320,7 @@ async def call_gemini_api(session: aiohttp.ClientSession, prompt: str, max_retri
     
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.1,
-            "maxOutputTokens": 8192,
-            "responseMimeType": "application/json"
-        }
+        "generationConfig": GENERATION_CONFIG
     }
     
     for attempt in range(max_retries):
@@ -389,21 +393,50 @@ def to_json_safe(value):
     return psycopg2.extras.Json(value)
 
 
-def save_to_database(asset_id: str, as_of_date: str, result) -> bool:
-    """Save analysis result to database."""
-    db = get_db()
-    
+REVIEW_UPSERT = """
+INSERT INTO asset_ai_reviews (
+    asset_id, as_of_date, direction, ai_direction_score, ai_setup_quality_score,
+    setup_type, ai_attention_level, ai_confidence, ai_summary_text, 
+    ai_key_levels, ai_entry, ai_targets, ai_why_now, ai_risks, ai_what_to_watch_next,
+    subscores, review_json, model, prompt_version, input_hash, scope, created_at
+) VALUES %s
+ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
+    direction = EXCLUDED.direction,
+    ai_direction_score = EXCLUDED.ai_direction_score,
+    ai_setup_quality_score = EXCLUDED.ai_setup_quality_score,
+    setup_type = EXCLUDED.setup_type,
+    ai_attention_level = EXCLUDED.ai_attention_level,
+    ai_confidence = EXCLUDED.ai_confidence,
+    ai_summary_text = EXCLUDED.ai_summary_text,
+    ai_key_levels = EXCLUDED.ai_key_levels,
+    ai_entry = EXCLUDED.ai_entry,
+    ai_targets = EXCLUDED.ai_targets,
+    ai_why_now = EXCLUDED.ai_why_now,
+    ai_risks = EXCLUDED.ai_risks,
+    ai_what_to_watch_next = EXCLUDED.ai_what_to_watch_next,
+    subscores = EXCLUDED.subscores,
+    review_json = EXCLUDED.review_json,
+    model = EXCLUDED.model,
+    prompt_version = EXCLUDED.prompt_version,
+    input_hash = EXCLUDED.input_hash,
+    updated_at = NOW()
+"""
+REVIEW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+
+
+def review_values(asset_id: str, as_of_date: str, result):
+    """asset_ai_reviews values for one result (see REVIEW_UPSERT), or None if malformed."""
     # Handle case where result is a list (malformed API response)
     if isinstance(result, list):
         if len(result) > 0 and isinstance(result[0], dict):
             result = result[0]
         else:
             logger.error(f"Invalid result format for {asset_id}: got list with no valid dict")
-            return False
+            return None
     
     if not isinstance(result, dict):
         logger.error(f"Invalid result format for {asset_id}: expected dict, got {type(result).__name__}")
-        return False
+        return None
     
     # Extract fields from result
     direction = result.get('direction', 'neutral')
@@ -443,44 +476,22 @@ def save_to_database(asset_id: str, as_of_date: str, result) -> bool:
     # Generate input_hash
     input_hash = hashlib.md5(f"{asset_id}_{as_of_date}_{json.dumps(result)[:100]}".encode()).hexdigest()
     
-    query = """
-    INSERT INTO asset_ai_reviews (
-        asset_id, as_of_date, direction, ai_direction_score, ai_setup_quality_score,
-        setup_type, ai_attention_level, ai_confidence, ai_summary_text, 
-        ai_key_levels, ai_entry, ai_targets, ai_why_now, ai_risks, ai_what_to_watch_next,
-        subscores, review_json, model, prompt_version, input_hash, scope, created_at
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
+    return (
+        asset_id, as_of_date, direction, direction_score, quality_score,
+        setup_type, attention_level, confidence, summary,
+        ai_key_levels, ai_entry, ai_targets, ai_why_now, ai_risks, ai_what_to_watch,
+        subscores_json, psycopg2.extras.Json(result), MODEL_NAME, AI_REVIEW_VERSION, input_hash, "equity_top500"
     )
-    ON CONFLICT (asset_id, as_of_date) DO UPDATE SET
-        direction = EXCLUDED.direction,
-        ai_direction_score = EXCLUDED.ai_direction_score,
-        ai_setup_quality_score = EXCLUDED.ai_setup_quality_score,
-        setup_type = EXCLUDED.setup_type,
-        ai_attention_level = EXCLUDED.ai_attention_level,
-        ai_confidence = EXCLUDED.ai_confidence,
-        ai_summary_text = EXCLUDED.ai_summary_text,
-        ai_key_levels = EXCLUDED.ai_key_levels,
-        ai_entry = EXCLUDED.ai_entry,
-        ai_targets = EXCLUDED.ai_targets,
-        ai_why_now = EXCLUDED.ai_why_now,
-        ai_risks = EXCLUDED.ai_risks,
-        ai_what_to_watch_next = EXCLUDED.ai_what_to_watch_next,
-        subscores = EXCLUDED.subscores,
-        review_json = EXCLUDED.review_json,
-        model = EXCLUDED.model,
-        prompt_version = EXCLUDED.prompt_version,
-        input_hash = EXCLUDED.input_hash,
-        updated_at = NOW()
-    """
+
+
+def save_to_database(asset_id: str, as_of_date: str, result) -> bool:
+    """Save analysis result to database."""
+    values = review_values(asset_id, as_of_date, result)
+    if values is None:
+        return False
     
     try:
-        db.execute(query, (
-            asset_id, as_of_date, direction, direction_score, quality_score,
-            setup_type, attention_level, confidence, summary,
-            ai_key_levels, ai_entry, ai_targets, ai_why_now, ai_risks, ai_what_to_watch,
-            subscores_json, psycopg2.extras.Json(result), MODEL_NAME, AI_REVIEW_VERSION, input_hash, "equity_top500"
-        ))
+        get_db().execute_values(REVIEW_UPSERT, [values], template=REVIEW_TEMPLATE)
         return True
     except Exception as e:
         logger.error(f"Database error for {asset_id}: {e}")
@@ -617,6 +628,75 @@ async def main_async(as_of_date: str, min_market_cap: float = 100_000_000, min_d
     logger.info("=" * 60)
 
 
+def main_batch(as_of_date: str, min_market_cap: float = 100_000_000, min_daily_volume: float = 1_000_000,
+               dry_run: bool = False):
+    """
+    Batch mode: every prompt in one provider batch job, reviews ingested in one statement.
+    On a dry run (always with LLM_BATCH_PROVIDER=stub) the parsed rows go to a file instead.
+    """
+    provider = get_batch_provider()
+    dry_run = dry_run or provider.dry_run
+    logger.info("=" * 60)
+    logger.info("EQUITY AI ANALYSIS - VERSION 3.3 (BATCH)")
+    logger.info(f"Date: {as_of_date}")
+    logger.info(f"Model: {MODEL_NAME}")
+    logger.info("=" * 60)
+    
+    all_equities = get_operating_companies(as_of_date, min_market_cap=min_market_cap, min_daily_volume=min_daily_volume)
+    already_processed = get_already_processed_assets(as_of_date)
+    equities = [e for e in all_equities if str(e['asset_id']) not in already_processed]
+    logger.info(f"Found {len(all_equities)} operating companies, {len(equities)} not yet processed")
+    
+    requests = []
+    failed = 0
+    for asset in equities:
+        symbol = asset['symbol']
+        bars = get_ohlcv_data(asset['asset_id'], as_of_date)
+        if len(bars) < 20:
+            logger.warning(f"✗ {symbol}: Insufficient data ({len(bars)} bars)")
+            failed += 1
+            continue
+        prompt = build_prompt(symbol, asset.get('name', symbol), bars, get_features(asset['asset_id'], as_of_date))
+        if not prompt:
+            failed += 1
+            continue
+        requests.append(BatchRequest(key=str(asset['asset_id']), prompt=prompt, config=GENERATION_CONFIG, context=asset))
+    
+    display_name = f"equities-{as_of_date}"
+    rows = []
+    for result in run_batch(requests, MODEL_NAME, provider=provider, display_name=display_name):
+        symbol = result.request.context['symbol']
+        try:
+            values = review_values(result.request.key, as_of_date, json.loads(result.text)) if result.ok else None
+        except json.JSONDecodeError as e:
+            logger.warning(f"✗ {symbol}: JSON parse error: {e}")
+            values = None
+        if values is None:
+            logger.warning(f"✗ {symbol}: {result.error or 'invalid response'}")
+            failed += 1
+            continue
+        rows.append(values)
+    
+    if dry_run:
+        path = write_rows(rows, display_name)
+        logger.info(f"Dry run ({provider.name}): {len(rows)} parsed reviews written to {path}, nothing saved")
+        return
+    
+    try:
+        get_db().execute_values(REVIEW_UPSERT, rows, template=REVIEW_TEMPLATE, page_size=500)
+        saved = len(rows)
+    except Exception as e:
+        logger.error(f"Database error saving {len(rows)} reviews: {e}")
+        saved = 0
+    
+    logger.info("=" * 60)
+    logger.info("SUMMARY")
+    logger.info(f"Previously processed (skipped): {len(already_processed)}")
+    logger.info(f"Newly processed: {saved}")
+    logger.info(f"Failed: {failed + len(rows) - saved}")
+    logger.info("=" * 60)
+
+
 def main():
     """Entry point with argument parsing."""
     global MODEL_NAME
@@ -655,6 +735,16 @@ def main():
         default=None,
         help='DEPRECATED: No longer used. Filtering is now based on market cap and volume.'
     )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Submit all prompts as one provider batch job (LLM_BATCH_PROVIDER) instead of live calls'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='With --batch: write the parsed reviews to LLM_BATCH_DIR instead of the database'
+    )
     
     args = parser.parse_args()
     
@@ -678,6 +768,11 @@ def main():
     # Update model if specified
     MODEL_NAME = args.model
     
+    if args.batch:
+        # The batch provider checks its own credentials (none for LLM_BATCH_PROVIDER=stub)
+        main_batch(as_of_date, args.min_market_cap, args.min_daily_volume, dry_run=args.dry_run)
+        return
+    
     if not GEMINI_API_KEY:
         logger.error("GEMINI_API_KEY not set in environment")
         sys.exit(1)
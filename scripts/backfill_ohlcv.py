@@ -3,6 +3,9 @@
 OHLCV Backfill Script for Stratos Brain
 Fetches daily bars from CoinGecko (crypto) and AlphaVantage (equities)
 
+Only refetches from each asset's latest bar; holes in the middle of history are
+not repaired. For gap-aware backfills use `python -m stratos_engine.backfill`.
+
 IMPORTANT - CRYPTO DATE HANDLING:
 ================================
 CoinGecko returns prices at 00:00 UTC timestamps. For crypto markets that trade 24/7,
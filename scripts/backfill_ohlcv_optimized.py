@@ -8,6 +8,9 @@ Improvements:
 4. Rate limit retry with exponential backoff
 5. Chunked submission (500 at a time) to reduce memory overhead
 6. Reduced rate limit (70/min) to avoid boundary throttles
+
+Only refetches from each asset's latest bar; holes in the middle of history are
+not repaired. For gap-aware backfills use `python -m stratos_engine.backfill`.
 """
 
 import os
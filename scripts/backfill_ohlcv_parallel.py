@@ -6,6 +6,9 @@ Optimized Parallelized OHLCV Backfill Script for Stratos Brain
 - Only inserts missing dates (incremental)
 - Uses adjusted close consistently
 
+Only refetches from each asset's latest bar; holes in the middle of history are
+not repaired. For gap-aware backfills use `python -m stratos_engine.backfill`.
+
 IMPORTANT - CRYPTO DATE HANDLING:
 ================================
 CoinGecko returns prices at 00:00 UTC timestamps. For crypto markets that trade 24/7,
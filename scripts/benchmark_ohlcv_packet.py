@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Token benchmark of the OHLCV packet encodings (stratos_engine.ohlcv_packet).
+
+Encodes the same PASS1_BARS daily bars per asset in every format and reports
+characters, tokens and the ratio to the current row format, plus the largest
+relative price error of each lossless-resolution format. A synthetic
+WIDE_RANGE series (0.0005 -> 1.0, like a token that ran 2000x) is always
+included, since a price unit picked from one part of such a series loses
+precision on the other. Tokens come from Gemini's count_tokens with --gemini,
+otherwise from the offline estimate.
+
+Usage:
+    python scripts/benchmark_ohlcv_packet.py --symbols AAPL BTC-USD --date 2026-01-25
+    python scripts/benchmark_ohlcv_packet.py --symbols AAPL --gemini
+    python scripts/benchmark_ohlcv_packet.py --daily-bars 60 90
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.ohlcv_packet import FORMATS, approx_tokens, benchmark  # noqa: E402
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BARS = 365  # Stage5AIReviewV3.PASS1_BARS
+WIDE_RANGE = "WIDE_RANGE"
+
+
+def load_bars(conn, symbol: str, as_of_date: str):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            SELECT db.date, db.open, db.high, db.low, db.close, db.volume
+            FROM daily_bars db
+            JOIN assets a ON a.asset_id = db.asset_id
+            WHERE a.symbol = %s AND db.date <= %s
+            ORDER BY db.date DESC
+            LIMIT %s
+        """, (symbol, as_of_date, BARS))
+        return list(reversed(cur.fetchall()))
+
+
+def wide_range_bars(start_price: float = 0.0005, end_price: float = 1.0, count: int = BARS):
+    """Synthetic daily bars growing geometrically from start_price to end_price."""
+    growth = math.log(end_price / start_price) / (count - 1)
+    bars = []
+    for i in range(count):
+        close = start_price * math.exp(growth * i)
+        bars.append({
+            "date": date(2025, 1, 1) + timedelta(days=i),
+            "open": close * 0.995, "high": close * 1.02, "low": close * 0.98, "close": close,
+            "volume": 1_000_000 + 1_000 * i,
+        })
+    return bars
+
+
+def gemini_counter(model: str):
+    from google import genai
+    client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+    return lambda text: client.models.count_tokens(model=model, contents=text).total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare prompt tokens of the OHLCV packet encodings')
+    parser.add_argument('--symbols', nargs='+', default=['AAPL', 'SPY', 'BTC-USD'])
+    parser.add_argument('--date', type=str, help='As-of date (YYYY-MM-DD). Defaults to yesterday.')
+    parser.add_argument('--daily-bars', type=int, nargs='*', default=[60],
+                        help='Multi-resolution variants (daily bars kept before weekly aggregation)')
+    parser.add_argument('--gemini', action='store_true', help='Count tokens with the Gemini API')
+    parser.add_argument('--model', type=str, default='gemini-3-flash-preview')
+    args = parser.parse_args()
+
+    as_of_date = args.date or (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+    count = gemini_counter(args.model) if args.gemini else approx_tokens
+    variants = [(fmt, None) for fmt in FORMATS] + [("compact", n) for n in args.daily_bars]
+
+    conn = psycopg2.connect(os.environ.get("SUPABASE_DATABASE_URL", os.environ.get("DATABASE_URL")))
+    totals = {}
+    try:
+        print(f"{'symbol':<10} {'format':<10} {'daily':>5} {'bars':>5} {'chars':>8} {'tokens':>8} {'ratio':>6} {'max_err':>9}")
+        for symbol in args.symbols + [WIDE_RANGE]:
+            bars = wide_range_bars() if symbol == WIDE_RANGE else load_bars(conn, symbol, as_of_date)
+            if not bars:
+                logger.warning(f"No bars for {symbol} on or before {as_of_date}")
+                continue
+            for row in benchmark(bars, variants, count):
+                key = (row["format"], row["daily_bars"])
+                totals[key] = totals.get(key, 0) + row["tokens"]
+                error = "-" if row["max_error"] is None else f"{row['max_error']:.1e}"
+                print(f"{symbol:<10} {row['format']:<10} {row['daily_bars'] or '-':>5} {row['bars']:>5} "
+                      f"{row['chars']:>8} {row['tokens']:>8} {row['ratio']:>6.3f} {error:>9}")
+    finally:
+        conn.close()
+
+    if totals:
+        base = totals[variants[0]] or 1
+        print("\nTotal tokens across symbols (counter: %s)" % ("gemini" if args.gemini else "offline estimate"))
+        for (fmt, daily), tokens in totals.items():
+            print(f"  {fmt:<10} {daily or '-':>5} {tokens:>10} {tokens / base:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
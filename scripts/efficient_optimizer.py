@@ -14,10 +14,16 @@ import json
 import argparse
 import warnings
 import itertools
+import os
 import time
 import sys
 warnings.filterwarnings('ignore')
 
+# Streamed, typed reads from the engine package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.lookback import split_by_asset
+from stratos_engine.stream import fetch_frame
+
 # Database connection
 DB_CONFIG = {
     'host': 'db.wfogbaipiqootjrsprde.supabase.co',
@@ -172,51 +178,27 @@ def get_universe(conn, limit: int = 200) -> List[Tuple[int, str]]:
 
 
 def load_all_data(conn, universe: List[Tuple[int, str]]) -> Dict[int, pd.DataFrame]:
-    """Load all data upfront for faster optimization"""
+    """Load all data upfront for faster optimization (one streamed query for the universe)"""
     print("Loading all asset data...")
     sys.stdout.flush()
-    data = {}
+    symbols = dict(universe)
     
-    cur = conn.cursor()
+    panel = fetch_frame(conn, '''
+        SELECT 
+            df.asset_id, df.date, df.close, df.rsi_14, df.ma_dist_20, df.ma_dist_50, df.ma_dist_200,
+            df.ma_slope_20, df.ma_slope_50, df.ma_slope_200, df.above_ma200, df.ma50_above_ma200,
+            df.bb_width_pctile, df.rvol_20, df.gap_pct, df.accel_turn_up, df.rs_breakout,
+            df.breakout_confirmed_up, df.atr_14, df.atr_pct, df.sma_20, df.sma_50, df.sma_200
+        FROM daily_features df
+        WHERE df.asset_id = ANY(%s) AND df.date >= %s AND df.date <= %s
+        ORDER BY df.asset_id, df.date
+    ''', (list(symbols), BACKTEST_START, BACKTEST_END))
     
-    for i, (asset_id, symbol) in enumerate(universe):
-        if i % 50 == 0:
-            print(f"  Loading {i+1}/{len(universe)}")
-            sys.stdout.flush()
-        
-        cur.execute('''
-            SELECT 
-                df.date, df.close, df.rsi_14, df.ma_dist_20, df.ma_dist_50, df.ma_dist_200,
-                df.ma_slope_20, df.ma_slope_50, df.ma_slope_200, df.above_ma200, df.ma50_above_ma200,
-                df.bb_width_pctile, df.rvol_20, df.gap_pct, df.accel_turn_up, df.rs_breakout,
-                df.breakout_confirmed_up, df.atr_14, df.atr_pct, df.sma_20, df.sma_50, df.sma_200
-            FROM daily_features df
-            WHERE df.asset_id = %s AND df.date >= %s AND df.date <= %s
-            ORDER BY df.date
-        ''', (asset_id, BACKTEST_START, BACKTEST_END))
-        
-        rows = cur.fetchall()
-        if len(rows) < 50:
+    data = {}
+    for asset_id, df in split_by_asset(panel).items():
+        if len(df) < 50:
             continue
-        
-        columns = [
-            'date', 'close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200',
-            'ma_slope_20', 'ma_slope_50', 'ma_slope_200', 'above_ma200', 'ma50_above_ma200',
-            'bb_width_pctile', 'rvol_20', 'gap_pct', 'accel_turn_up', 'rs_breakout',
-            'breakout_confirmed_up', 'atr_14', 'atr_pct', 'sma_20', 'sma_50', 'sma_200'
-        ]
-        
-        df = pd.DataFrame(rows, columns=columns)
-        df['date'] = pd.to_datetime(df['date'])
-        
-        numeric_cols = ['close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200',
-                        'ma_slope_20', 'ma_slope_50', 'ma_slope_200', 'bb_width_pctile',
-                        'rvol_20', 'gap_pct', 'atr_14', 'atr_pct', 'sma_20', 'sma_50', 'sma_200']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df['symbol'] = symbol
-        data[asset_id] = df
+        data[asset_id] = df.assign(symbol=symbols[asset_id])
     
     print(f"Loaded data for {len(data)} assets")
     sys.stdout.flush()
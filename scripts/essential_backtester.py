@@ -13,12 +13,15 @@ This backtester:
 
 import psycopg2
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Tuple
 import json
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.backtest import Backtester, Panel
 
 # Database connection
 DB_CONFIG = {
@@ -35,21 +38,6 @@ BACKTEST_START = '2020-01-25'
 BACKTEST_END = '2025-01-20'
 
 
-@dataclass
-class Trade:
-    """Represents a single trade"""
-    asset_id: int
-    symbol: str
-    setup: str
-    entry_date: str
-    entry_price: float
-    exit_date: str = None
-    exit_price: float = None
-    exit_reason: str = None
-    return_pct: float = None
-    hold_days: int = None
-
-
 @dataclass
 class SetupConfig:
     """Configuration for a trading setup"""
@@ -247,126 +235,6 @@ def calculate_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-# =============================================================================
-# ENTRY/EXIT LOGIC
-# =============================================================================
-
-def check_entry_conditions(row: pd.Series, conditions: Dict) -> bool:
-    """Check if entry conditions are met"""
-    for key, condition in conditions.items():
-        if key not in row.index:
-            return False
-            
-        value = row[key]
-        if pd.isna(value):
-            return False
-        
-        if isinstance(condition, bool):
-            if value != condition:
-                return False
-        elif isinstance(condition, tuple):
-            op, *args = condition
-            if op == 'lt' and not (value < args[0]):
-                return False
-            elif op == 'gt' and not (value > args[0]):
-                return False
-            elif op == 'range' and not (args[0] <= value <= args[1]):
-                return False
-    
-    return True
-
-
-def simulate_trade(
-    df: pd.DataFrame,
-    entry_idx: int,
-    exit_config: Dict,
-    category: str
-) -> Tuple[int, float, str]:
-    """
-    Simulate a trade from entry to exit.
-    Returns: (exit_idx, exit_price, exit_reason)
-    """
-    entry_price = df.iloc[entry_idx]['close']
-    entry_atr = df.iloc[entry_idx]['atr_14']
-    
-    if pd.isna(entry_atr):
-        entry_atr = entry_price * 0.02  # Default 2% ATR
-    
-    # Initialize stops and targets
-    stop_loss = None
-    take_profit = None
-    trailing_stop = None
-    trailing_activated = False
-    highest_price = entry_price
-    
-    # Set initial stop loss
-    if 'stop_atr_mult' in exit_config:
-        stop_loss = entry_price - (entry_atr * exit_config['stop_atr_mult'])
-    
-    # Set take profit
-    if 'target_pct' in exit_config:
-        take_profit = entry_price * (1 + exit_config['target_pct'])
-    
-    # Get max hold days
-    max_hold = exit_config.get('max_hold_days', exit_config.get('time_stop_days', 60))
-    
-    # Simulate day by day
-    for i in range(entry_idx + 1, min(entry_idx + max_hold + 1, len(df))):
-        row = df.iloc[i]
-        high = row['high']
-        low = row['low']
-        close = row['close']
-        
-        # Update highest price for trailing stop
-        if high > highest_price:
-            highest_price = high
-        
-        # Check trailing stop activation
-        if 'trailing_activation_pct' in exit_config:
-            gain_pct = (highest_price - entry_price) / entry_price
-            if gain_pct >= exit_config['trailing_activation_pct'] and not trailing_activated:
-                trailing_activated = True
-                trail_atr = exit_config.get('trailing_atr_mult', 3.0) * entry_atr
-                trailing_stop = highest_price - trail_atr
-        
-        # Update trailing stop
-        if trailing_activated:
-            trail_atr = exit_config.get('trailing_atr_mult', 3.0) * entry_atr
-            new_trailing_stop = highest_price - trail_atr
-            if trailing_stop is None or new_trailing_stop > trailing_stop:
-                trailing_stop = new_trailing_stop
-        
-        # Check stop loss
-        if stop_loss and low <= stop_loss:
-            return i, stop_loss, 'stop_loss'
-        
-        # Check trailing stop
-        if trailing_stop and low <= trailing_stop:
-            return i, trailing_stop, 'trailing_stop'
-        
-        # Check take profit
-        if take_profit and high >= take_profit:
-            return i, take_profit, 'take_profit'
-        
-        # Check target MA (for short-term mean reversion)
-        if 'target_ma' in exit_config:
-            ma_col = f"sma_{exit_config['target_ma']}"
-            if ma_col in row.index and not pd.isna(row[ma_col]):
-                if high >= row[ma_col]:
-                    return i, row[ma_col], 'target_ma'
-        
-        # Check breakdown MA (for medium-term trend following)
-        if 'breakdown_ma' in exit_config:
-            ma_col = f"sma_{exit_config['breakdown_ma']}"
-            if ma_col in row.index and not pd.isna(row[ma_col]):
-                if close < row[ma_col]:
-                    return i, close, 'breakdown_ma'
-    
-    # Time stop - exit at close
-    exit_idx = min(entry_idx + max_hold, len(df) - 1)
-    return exit_idx, df.iloc[exit_idx]['close'], 'time_stop'
-
-
 # =============================================================================
 # MARKET REGIME FILTER
 # =============================================================================
@@ -490,7 +358,7 @@ def run_backtest(
     if verbose:
         print(f"Found {len(universe)} assets")
     
-    trades = []
+    frames = {}
     
     for i, (asset_id, symbol) in enumerate(universe):
         if verbose and i % 100 == 0:
@@ -502,106 +370,16 @@ def run_backtest(
             continue
         
         # Calculate features
-        df = calculate_features(df)
-        df = df.reset_index()
-        
-        # Scan for entries
-        in_trade = False
-        for idx in range(250, len(df)):  # Start after warmup period
-            if in_trade:
-                continue
-            
-            row = df.iloc[idx]
-            
-            # Check entry conditions
-            if check_entry_conditions(row, setup.entry_conditions):
-                # Simulate trade
-                exit_idx, exit_price, exit_reason = simulate_trade(
-                    df, idx, setup.exit_config, setup.category
-                )
-                
-                entry_price = row['close']
-                
-                # Apply friction
-                entry_price_adj = entry_price * (1 + FRICTION)
-                exit_price_adj = exit_price * (1 - FRICTION)
-                
-                return_pct = (exit_price_adj / entry_price_adj) - 1
-                hold_days = exit_idx - idx
-                
-                trade = Trade(
-                    asset_id=asset_id,
-                    symbol=symbol,
-                    setup=setup_name,
-                    entry_date=str(row['date'].date()),
-                    entry_price=float(entry_price),
-                    exit_date=str(df.iloc[exit_idx]['date'].date()),
-                    exit_price=float(exit_price),
-                    exit_reason=exit_reason,
-                    return_pct=float(return_pct),
-                    hold_days=int(hold_days)
-                )
-                trades.append(trade)
-                
-                # Skip to after exit
-                in_trade = True
-                # Reset after exit
-                if exit_idx < len(df) - 1:
-                    in_trade = False
+        frames[asset_id] = calculate_features(df).reset_index()
     
     conn.close()
     
-    # Calculate metrics
-    if not trades:
-        return {
-            'setup': setup_name,
-            'category': setup.category,
-            'trades': 0,
-            'win_rate': 0,
-            'profit_factor': 0,
-            'avg_return': 0,
-            'avg_hold_days': 0,
-        }
-    
-    returns = [t.return_pct for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r <= 0]
-    
-    win_rate = len(wins) / len(returns) if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0.0001
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    avg_return = np.mean(returns) if returns else 0
-    avg_hold = np.mean([t.hold_days for t in trades]) if trades else 0
-    
-    # Exit reason breakdown
-    exit_reasons = {}
-    for t in trades:
-        exit_reasons[t.exit_reason] = exit_reasons.get(t.exit_reason, 0) + 1
-    
-    return {
-        'setup': setup_name,
-        'category': setup.category,
-        'trades': len(trades),
-        'win_rate': round(win_rate * 100, 1),
-        'profit_factor': round(profit_factor, 2),
-        'avg_return': round(avg_return * 100, 2),
-        'avg_hold_days': round(avg_hold, 1),
-        'exit_reasons': exit_reasons,
-        'trade_details': [
-            {
-                'symbol': t.symbol,
-                'entry_date': t.entry_date,
-                'exit_date': t.exit_date,
-                'return_pct': round(t.return_pct * 100, 2),
-                'hold_days': t.hold_days,
-                'exit_reason': t.exit_reason
-            }
-            for t in trades[:100]  # First 100 trades for audit
-        ]
-    }
+    # Entries after the 250-bar warmup, one open trade per asset, exits on bar high/low
+    backtester = Backtester(
+        Panel.from_frames(frames, symbols=dict(universe)),
+        warmup=250, min_bars=250, friction=FRICTION, intrabar='ohlc'
+    )
+    return backtester.run(setup).to_dict()
 
 
 def run_all_setups(universe_limit: int = 1000) -> Dict:
@@ -640,7 +418,6 @@ if __name__ == '__main__':
         results = run_all_setups(args.universe)
     
     # Save results
-    import os
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
     with open(args.output, 'w') as f:
         json.dump(results, f, indent=2)
@@ -7,17 +7,21 @@ Backtest period: 2024-01-02 to 2026-01-23 (2 years)
 Universe: Top 1000 equities by dollar volume
 """
 
+import os
+import sys
+import time
 import psycopg2
 import pandas as pd
-import numpy as np
-from datetime import datetime
 from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import json
 import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.backtest import Backtester, Panel
+
 # Database connection
 DB_CONFIG = {
     'host': 'db.wfogbaipiqootjrsprde.supabase.co',
@@ -33,21 +37,6 @@ BACKTEST_START = '2024-01-02'
 BACKTEST_END = '2026-01-20'
 
 
-@dataclass
-class Trade:
-    """Represents a single trade"""
-    asset_id: int
-    symbol: str
-    setup: str
-    entry_date: str
-    entry_price: float
-    exit_date: str = None
-    exit_price: float = None
-    exit_reason: str = None
-    return_pct: float = None
-    hold_days: int = None
-
-
 @dataclass
 class SetupConfig:
     """Configuration for a trading setup"""
@@ -282,263 +271,67 @@ def load_asset_data(conn, asset_id: int) -> pd.DataFrame:
     return df
 
 
-def check_entry_conditions(row: pd.Series, conditions: Dict) -> bool:
-    """Check if entry conditions are met"""
-    for key, condition in conditions.items():
-        if key not in row.index:
-            return False
-            
-        value = row[key]
-        if pd.isna(value):
-            return False
-        
-        if isinstance(condition, tuple):
-            op, *args = condition
-            if op == 'lt' and not (value < args[0]):
-                return False
-            elif op == 'gt' and not (value > args[0]):
-                return False
-            elif op == 'eq' and not (value == args[0]):
-                return False
-            elif op == 'range' and not (args[0] <= value <= args[1]):
-                return False
-    
-    return True
-
-
-def simulate_trade(
-    df: pd.DataFrame,
-    entry_idx: int,
-    exit_config: Dict,
-    category: str
-) -> Tuple[int, float, str]:
-    """Simulate a trade from entry to exit"""
-    entry_row = df.iloc[entry_idx]
-    entry_price = float(entry_row['close'])
-    entry_atr = float(entry_row['atr_14']) if pd.notna(entry_row['atr_14']) else entry_price * 0.02
-    
-    # Initialize
-    stop_loss = None
-    take_profit = None
-    trailing_stop = None
-    trailing_activated = False
-    highest_price = entry_price
-    
-    # Set initial stop loss
-    if 'stop_atr_mult' in exit_config:
-        stop_loss = entry_price - (entry_atr * exit_config['stop_atr_mult'])
-    
-    # Set take profit
-    if 'target_pct' in exit_config:
-        take_profit = entry_price * (1 + exit_config['target_pct'])
-    
-    # Get max hold days
-    max_hold = exit_config.get('max_hold_days', exit_config.get('time_stop_days', 60))
-    
-    # Simulate day by day
-    for i in range(entry_idx + 1, min(entry_idx + max_hold + 1, len(df))):
-        row = df.iloc[i]
-        close = float(row['close'])
-        
-        # Estimate high/low from close and ATR
-        atr = float(row['atr_14']) if pd.notna(row['atr_14']) else entry_atr
-        estimated_high = close + atr * 0.5
-        estimated_low = close - atr * 0.5
-        
-        # Update highest price
-        if estimated_high > highest_price:
-            highest_price = estimated_high
-        
-        # Check trailing stop activation
-        if 'trailing_activation_pct' in exit_config:
-            gain_pct = (highest_price - entry_price) / entry_price
-            if gain_pct >= exit_config['trailing_activation_pct'] and not trailing_activated:
-                trailing_activated = True
-                trail_atr = exit_config.get('trailing_atr_mult', 3.0) * entry_atr
-                trailing_stop = highest_price - trail_atr
-        
-        # Update trailing stop
-        if trailing_activated:
-            trail_atr = exit_config.get('trailing_atr_mult', 3.0) * entry_atr
-            new_trailing_stop = highest_price - trail_atr
-            if trailing_stop is None or new_trailing_stop > trailing_stop:
-                trailing_stop = new_trailing_stop
-        
-        # Check stop loss
-        if stop_loss and estimated_low <= stop_loss:
-            return i, stop_loss, 'stop_loss'
-        
-        # Check trailing stop
-        if trailing_stop and estimated_low <= trailing_stop:
-            return i, trailing_stop, 'trailing_stop'
-        
-        # Check take profit
-        if take_profit and estimated_high >= take_profit:
-            return i, take_profit, 'take_profit'
-        
-        # Check target MA distance (for mean reversion)
-        if 'target_ma_dist' in exit_config:
-            ma_dist = row['ma_dist_20']
-            if pd.notna(ma_dist) and ma_dist >= exit_config['target_ma_dist']:
-                return i, close, 'target_ma'
-        
-        # Check breakdown MA distance
-        for key in ['breakdown_ma_dist_200', 'breakdown_ma_dist_50', 'breakdown_ma_dist_20', 'breakdown_ma_dist']:
-            if key in exit_config:
-                if key == 'breakdown_ma_dist_200':
-                    ma_dist = row['ma_dist_200']
-                elif key == 'breakdown_ma_dist_50':
-                    ma_dist = row['ma_dist_50']
-                else:
-                    ma_dist = row['ma_dist_20']
-                
-                if pd.notna(ma_dist) and ma_dist < exit_config[key]:
-                    return i, close, 'breakdown_ma'
-    
-    # Time stop
-    exit_idx = min(entry_idx + max_hold, len(df) - 1)
-    return exit_idx, float(df.iloc[exit_idx]['close']), 'time_stop'
+def load_panel(conn, universe: List[Tuple[int, str]], verbose: bool = True) -> Panel:
+    """Load every asset's features once into a backtest Panel"""
+    frames = {}
+    for i, (asset_id, symbol) in enumerate(universe):
+        if verbose and i % 100 == 0:
+            print(f"Loading {i+1}/{len(universe)}: {symbol}")
+        frames[asset_id] = load_asset_data(conn, asset_id)
+    return Panel.from_frames(frames, symbols=dict(universe))
 
 
 def run_backtest(
     setup_name: str,
     universe_limit: int = 1000,
-    verbose: bool = True
+    verbose: bool = True,
+    panel: Optional[Panel] = None
 ) -> Dict:
-    """Run backtest for a single setup"""
+    """Run backtest for a single setup (vectorized across the whole universe)"""
     
     if setup_name not in SETUPS:
         raise ValueError(f"Unknown setup: {setup_name}")
     
     setup = SETUPS[setup_name]
     
-    conn = psycopg2.connect(**DB_CONFIG)
-    
-    # Get universe
-    if verbose:
-        print(f"Loading universe (top {universe_limit} by dollar volume)...")
-    universe = get_universe(conn, universe_limit)
-    if verbose:
-        print(f"Found {len(universe)} assets")
-    
-    trades = []
-    
-    for i, (asset_id, symbol) in enumerate(universe):
-        if verbose and i % 100 == 0:
-            print(f"Processing {i+1}/{len(universe)}: {symbol}")
+    if panel is None:
+        conn = psycopg2.connect(**DB_CONFIG)
         
-        # Load data
-        df = load_asset_data(conn, asset_id)
-        if len(df) < 50:  # Need some data
-            continue
+        # Get universe
+        if verbose:
+            print(f"Loading universe (top {universe_limit} by dollar volume)...")
+        universe = get_universe(conn, universe_limit)
+        if verbose:
+            print(f"Found {len(universe)} assets")
         
-        # Scan for entries
-        in_trade = False
-        last_exit_idx = 0
-        
-        for idx in range(20, len(df)):  # Start after warmup
-            if idx <= last_exit_idx:
-                continue
-            
-            row = df.iloc[idx]
-            
-            # Check entry conditions
-            if check_entry_conditions(row, setup.entry_conditions):
-                # Simulate trade
-                exit_idx, exit_price, exit_reason = simulate_trade(
-                    df, idx, setup.exit_config, setup.category
-                )
-                
-                entry_price = float(row['close'])
-                
-                # Apply friction
-                entry_price_adj = entry_price * (1 + FRICTION)
-                exit_price_adj = exit_price * (1 - FRICTION)
-                
-                return_pct = (exit_price_adj / entry_price_adj) - 1
-                hold_days = exit_idx - idx
-                
-                trade = Trade(
-                    asset_id=asset_id,
-                    symbol=symbol,
-                    setup=setup_name,
-                    entry_date=str(row['date'].date()),
-                    entry_price=entry_price,
-                    exit_date=str(df.iloc[exit_idx]['date'].date()),
-                    exit_price=exit_price,
-                    exit_reason=exit_reason,
-                    return_pct=return_pct,
-                    hold_days=hold_days
-                )
-                trades.append(trade)
-                
-                last_exit_idx = exit_idx
-    
-    conn.close()
+        panel = load_panel(conn, universe, verbose)
+        conn.close()
     
-    # Calculate metrics
-    if not trades:
-        return {
-            'setup': setup_name,
-            'category': setup.category,
-            'trades': 0,
-            'win_rate': 0,
-            'profit_factor': 0,
-            'avg_return': 0,
-            'avg_hold_days': 0,
-        }
-    
-    returns = [t.return_pct for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r <= 0]
-    
-    win_rate = len(wins) / len(returns) if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0.0001
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    avg_return = np.mean(returns) if returns else 0
-    avg_hold = np.mean([t.hold_days for t in trades]) if trades else 0
-    
-    # Exit reason breakdown
-    exit_reasons = {}
-    for t in trades:
-        exit_reasons[t.exit_reason] = exit_reasons.get(t.exit_reason, 0) + 1
-    
-    return {
-        'setup': setup_name,
-        'category': setup.category,
-        'trades': len(trades),
-        'win_rate': round(win_rate * 100, 1),
-        'profit_factor': round(profit_factor, 2),
-        'avg_return': round(avg_return * 100, 2),
-        'avg_hold_days': round(avg_hold, 1),
-        'exit_reasons': exit_reasons,
-        'trade_details': [
-            {
-                'symbol': t.symbol,
-                'entry_date': t.entry_date,
-                'exit_date': t.exit_date,
-                'return_pct': round(t.return_pct * 100, 2),
-                'hold_days': t.hold_days,
-                'exit_reason': t.exit_reason
-            }
-            for t in trades[:100]
-        ]
-    }
+    # Entries need 20 bars of warmup; assets need 50 bars of data
+    backtester = Backtester(panel, warmup=20, min_bars=50, friction=FRICTION, intrabar='atr')
+    return backtester.run(setup).to_dict()
 
 
 def run_all_setups(universe_limit: int = 1000) -> Dict:
     """Run backtest for all setups"""
     results = {}
     
+    # Load the universe once; every setup runs over the same panel
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"Loading universe (top {universe_limit} by dollar volume)...")
+    universe = get_universe(conn, universe_limit)
+    print(f"Found {len(universe)} assets")
+    panel = load_panel(conn, universe)
+    conn.close()
+    
     for setup_name in SETUPS:
         print(f"\n{'='*60}")
         print(f"Running backtest for: {setup_name}")
         print('='*60)
         
-        result = run_backtest(setup_name, universe_limit)
+        start = time.time()
+        result = run_backtest(setup_name, universe_limit, panel=panel)
+        print(f"  Backtest time: {time.time() - start:.2f}s")
         results[setup_name] = result
         
         print(f"\nResults for {setup_name}:")
@@ -576,7 +369,6 @@ if __name__ == '__main__':
         results = run_all_setups(args.universe)
     
     # Save results
-    import os
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
     with open(args.output, 'w') as f:
         json.dump(results, f, indent=2)
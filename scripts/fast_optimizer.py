@@ -16,12 +16,17 @@ from datetime import datetime
 from typing import List, Dict, Tuple, Any
 import json
 import os
+import sys
 import itertools
 from multiprocessing import Pool, cpu_count
 import warnings
 import time
 warnings.filterwarnings('ignore')
 
+# Streamed, typed reads from the engine package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.stream import fetch_frame
+
 # Database connection
 DB_CONFIG = {
     'host': 'db.wfogbaipiqootjrsprde.supabase.co',
@@ -189,8 +194,8 @@ def load_all_data() -> Tuple[List[Tuple[int, str]], pd.DataFrame]:
     
     print(f"Loading data for {len(universe)} assets...")
     
-    # Load all features
-    cur.execute('''
+    # Load all features (streamed from a server-side cursor, numbers as float64)
+    df = fetch_frame(conn, '''
         SELECT 
             df.asset_id, df.date, df.close, df.rsi_14, df.ma_dist_20, df.ma_dist_50, 
             df.ma_dist_200, df.ma_slope_50, df.above_ma200, df.ma50_above_ma200,
@@ -202,27 +207,8 @@ def load_all_data() -> Tuple[List[Tuple[int, str]], pd.DataFrame]:
         AND df.date <= %s
         ORDER BY df.asset_id, df.date
     ''', (asset_ids, BACKTEST_START, BACKTEST_END))
-    
-    rows = cur.fetchall()
     conn.close()
     
-    columns = [
-        'asset_id', 'date', 'close', 'rsi_14', 'ma_dist_20', 'ma_dist_50',
-        'ma_dist_200', 'ma_slope_50', 'above_ma200', 'ma50_above_ma200',
-        'bb_width_pctile', 'rvol_20', 'gap_pct', 'accel_turn_up', 'rs_breakout',
-        'breakout_confirmed_up', 'atr_14', 'atr_pct'
-    ]
-    
-    df = pd.DataFrame(rows, columns=columns)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Convert numeric columns
-    numeric_cols = ['close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200',
-                    'ma_slope_50', 'bb_width_pctile', 'rvol_20', 'gap_pct', 
-                    'atr_14', 'atr_pct']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
     print(f"Loaded {len(df)} rows of data")
     
     return universe, df
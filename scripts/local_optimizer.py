@@ -7,6 +7,7 @@ Optimizes entry and exit parameters for all 8 trading setups.
 """
 
 import os
+import sys
 import json
 import itertools
 from datetime import datetime
@@ -19,6 +20,10 @@ import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+# Streamed, typed reads from the engine package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.stream import fetch_frame
+
 OUTPUT_DIR = '/home/ubuntu/stratos_brain/data/optimization_results'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -168,8 +173,8 @@ def load_all_data():
     asset_ids = [a[0] for a in universe]
     print(f"Got {len(universe)} assets in universe")
     
-    # Get all features
-    cur.execute("""
+    # Get all features (streamed from a server-side cursor, numbers as float64)
+    df = fetch_frame(conn, """
         SELECT df.asset_id, df.date, df.close, df.rsi_14, df.ma_dist_20, df.ma_dist_50, 
                df.ma_dist_200, df.ma_slope_50, df.above_ma200, df.ma50_above_ma200,
                df.bb_width_pctile, df.rvol_20, df.gap_pct, df.accel_turn_up, df.rs_breakout,
@@ -180,21 +185,8 @@ def load_all_data():
           AND df.date <= %s
         ORDER BY df.asset_id, df.date
     """, (asset_ids, BACKTEST_START, BACKTEST_END))
-    
-    rows = cur.fetchall()
     conn.close()
-    print(f"Got {len(rows)} feature rows")
-    
-    columns = ['asset_id', 'date', 'close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200', 
-               'ma_slope_50', 'above_ma200', 'ma50_above_ma200', 'bb_width_pctile', 'rvol_20', 
-               'gap_pct', 'accel_turn_up', 'rs_breakout', 'breakout_confirmed_up', 'atr_14']
-    
-    df = pd.DataFrame(rows, columns=columns)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    for col in ['close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200', 'ma_slope_50', 
-                'bb_width_pctile', 'rvol_20', 'gap_pct', 'atr_14']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    print(f"Got {len(df)} feature rows")
     
     return universe, df
 
@@ -12,16 +12,19 @@ import psycopg2
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple
 import json
 import os
 import itertools
 from multiprocessing import Pool, cpu_count, Manager
+import sys
 import warnings
 import time
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.backtest import Backtester, BacktestSetup, Panel
+
 # Database connection
 DB_CONFIG = {
     'host': 'db.wfogbaipiqootjrsprde.supabase.co',
@@ -42,21 +45,6 @@ OUTPUT_DIR = '/home/ubuntu/stratos_brain/data/optimization_results'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-@dataclass
-class Trade:
-    """Represents a single trade"""
-    asset_id: int
-    symbol: str
-    setup: str
-    entry_date: str
-    entry_price: float
-    exit_date: str = None
-    exit_price: float = None
-    exit_reason: str = None
-    return_pct: float = None
-    hold_days: int = None
-
-
 # =============================================================================
 # PARAMETER GRIDS FOR EACH SETUP
 # =============================================================================
@@ -270,190 +258,69 @@ def preload_all_data(conn, universe: List[Tuple[int, str]]) -> Dict[int, pd.Data
 # ENTRY/EXIT LOGIC WITH PARAMETERIZED CONDITIONS
 # =============================================================================
 
-def check_entry_conditions_parameterized(row: pd.Series, setup_name: str, params: Dict) -> bool:
-    """Check entry conditions with parameterized thresholds"""
+def entry_conditions_parameterized(setup_name: str, params: Dict) -> Dict:
+    """Entry conditions for a setup with parameterized thresholds"""
     
     if setup_name == 'oversold_bounce':
-        if pd.isna(row['rsi_14']) or row['rsi_14'] >= params.get('rsi_threshold', 30):
-            return False
-        if pd.isna(row['ma_dist_20']) or row['ma_dist_20'] >= params.get('ma_dist_20_threshold', -0.08):
-            return False
-        if row['above_ma200'] != True:
-            return False
-        return True
+        return {
+            'rsi_14': ('lt', params.get('rsi_threshold', 30)),
+            'ma_dist_20': ('lt', params.get('ma_dist_20_threshold', -0.08)),
+            'above_ma200': ('eq', True),
+        }
     
     elif setup_name == 'vcp_squeeze':
-        if pd.isna(row['bb_width_pctile']) or row['bb_width_pctile'] >= params.get('bb_width_pctile_threshold', 20):
-            return False
-        if pd.isna(row['ma_dist_50']) or row['ma_dist_50'] <= 0:
-            return False
-        if row['above_ma200'] != True:
-            return False
-        rsi = row['rsi_14']
-        if pd.isna(rsi) or rsi < params.get('rsi_min', 40) or rsi > params.get('rsi_max', 70):
-            return False
-        return True
+        return {
+            'bb_width_pctile': ('lt', params.get('bb_width_pctile_threshold', 20)),
+            'ma_dist_50': ('gt', 0),
+            'above_ma200': ('eq', True),
+            'rsi_14': ('range', params.get('rsi_min', 40), params.get('rsi_max', 70)),
+        }
     
     elif setup_name == 'gap_up_momentum':
-        if pd.isna(row['gap_pct']) or row['gap_pct'] <= params.get('gap_pct_threshold', 0.03):
-            return False
-        if pd.isna(row['rvol_20']) or row['rvol_20'] <= params.get('rvol_threshold', 2.0):
-            return False
-        if pd.isna(row['ma_dist_20']) or row['ma_dist_20'] <= 0:
-            return False
-        return True
+        return {
+            'gap_pct': ('gt', params.get('gap_pct_threshold', 0.03)),
+            'rvol_20': ('gt', params.get('rvol_threshold', 2.0)),
+            'ma_dist_20': ('gt', 0),
+        }
     
     elif setup_name == 'acceleration_turn':
-        if row['accel_turn_up'] != True:
-            return False
-        if row['above_ma200'] != True:
-            return False
-        rsi = row['rsi_14']
-        if pd.isna(rsi) or rsi < params.get('rsi_min', 30) or rsi > params.get('rsi_max', 60):
-            return False
-        return True
+        return {
+            'accel_turn_up': ('eq', True),
+            'above_ma200': ('eq', True),
+            'rsi_14': ('range', params.get('rsi_min', 30), params.get('rsi_max', 60)),
+        }
     
     elif setup_name == 'trend_pullback_50ma':
-        ma_dist_50 = row['ma_dist_50']
-        if pd.isna(ma_dist_50):
-            return False
-        if ma_dist_50 < params.get('ma_dist_50_min', -0.03) or ma_dist_50 > params.get('ma_dist_50_max', 0.02):
-            return False
-        if row['above_ma200'] != True:
-            return False
-        if pd.isna(row['rsi_14']) or row['rsi_14'] >= params.get('rsi_threshold', 50):
-            return False
-        if pd.isna(row['ma_slope_50']) or row['ma_slope_50'] <= 0:
-            return False
-        return True
+        return {
+            'ma_dist_50': ('range', params.get('ma_dist_50_min', -0.03), params.get('ma_dist_50_max', 0.02)),
+            'above_ma200': ('eq', True),
+            'rsi_14': ('lt', params.get('rsi_threshold', 50)),
+            'ma_slope_50': ('gt', 0),
+        }
     
     elif setup_name == 'golden_cross':
-        if row['ma50_above_ma200'] != True:
-            return False
-        ma_dist_50 = row['ma_dist_50']
-        if pd.isna(ma_dist_50):
-            return False
-        if ma_dist_50 < params.get('ma_dist_50_min', -0.02) or ma_dist_50 > params.get('ma_dist_50_max', 0.05):
-            return False
-        rsi = row['rsi_14']
-        if pd.isna(rsi) or rsi < params.get('rsi_min', 45) or rsi > params.get('rsi_max', 65):
-            return False
-        if pd.isna(row['ma_slope_50']) or row['ma_slope_50'] <= 0:
-            return False
-        return True
+        return {
+            'ma50_above_ma200': ('eq', True),
+            'ma_dist_50': ('range', params.get('ma_dist_50_min', -0.02), params.get('ma_dist_50_max', 0.05)),
+            'rsi_14': ('range', params.get('rsi_min', 45), params.get('rsi_max', 65)),
+            'ma_slope_50': ('gt', 0),
+        }
     
     elif setup_name == 'rs_breakout':
-        if row['rs_breakout'] != True:
-            return False
-        if row['above_ma200'] != True:
-            return False
-        rsi = row['rsi_14']
-        if pd.isna(rsi) or rsi < params.get('rsi_min', 50) or rsi > params.get('rsi_max', 70):
-            return False
-        return True
+        return {
+            'rs_breakout': ('eq', True),
+            'above_ma200': ('eq', True),
+            'rsi_14': ('range', params.get('rsi_min', 50), params.get('rsi_max', 70)),
+        }
     
     elif setup_name == 'breakout_confirmed':
-        if row['breakout_confirmed_up'] != True:
-            return False
-        if pd.isna(row['rvol_20']) or row['rvol_20'] <= params.get('rvol_threshold', 1.5):
-            return False
-        rsi = row['rsi_14']
-        if pd.isna(rsi) or rsi < params.get('rsi_min', 50) or rsi > params.get('rsi_max', 75):
-            return False
-        return True
-    
-    return False
-
-
-def simulate_trade_parameterized(
-    df: pd.DataFrame,
-    entry_idx: int,
-    setup_name: str,
-    exit_params: Dict
-) -> Tuple[int, float, str]:
-    """Simulate a trade with parameterized exit conditions"""
-    entry_row = df.iloc[entry_idx]
-    entry_price = float(entry_row['close'])
-    entry_atr = float(entry_row['atr_14']) if pd.notna(entry_row['atr_14']) else entry_price * 0.02
-    
-    # Initialize
-    stop_loss = None
-    take_profit = None
-    trailing_stop = None
-    trailing_activated = False
-    highest_price = entry_price
-    
-    # Set initial stop loss
-    if 'stop_atr_mult' in exit_params:
-        stop_loss = entry_price - (entry_atr * exit_params['stop_atr_mult'])
-    
-    # Set take profit
-    if 'target_pct' in exit_params:
-        take_profit = entry_price * (1 + exit_params['target_pct'])
-    
-    # Get max hold days
-    max_hold = exit_params.get('max_hold_days', exit_params.get('time_stop_days', 60))
-    
-    # Simulate day by day
-    for i in range(entry_idx + 1, min(entry_idx + max_hold + 1, len(df))):
-        row = df.iloc[i]
-        close = float(row['close'])
-        
-        # Estimate high/low from close and ATR
-        atr = float(row['atr_14']) if pd.notna(row['atr_14']) else entry_atr
-        estimated_high = close + atr * 0.5
-        estimated_low = close - atr * 0.5
-        
-        # Update highest price
-        if estimated_high > highest_price:
-            highest_price = estimated_high
-        
-        # Check trailing stop activation
-        if 'trailing_activation_pct' in exit_params:
-            gain_pct = (highest_price - entry_price) / entry_price
-            if gain_pct >= exit_params['trailing_activation_pct'] and not trailing_activated:
-                trailing_activated = True
-                trail_atr = exit_params.get('trailing_atr_mult', 3.0) * entry_atr
-                trailing_stop = highest_price - trail_atr
-        
-        # Update trailing stop
-        if trailing_activated:
-            trail_atr = exit_params.get('trailing_atr_mult', 3.0) * entry_atr
-            new_trailing_stop = highest_price - trail_atr
-            if trailing_stop is None or new_trailing_stop > trailing_stop:
-                trailing_stop = new_trailing_stop
-        
-        # Check stop loss
-        if stop_loss and estimated_low <= stop_loss:
-            return i, stop_loss, 'stop_loss'
-        
-        # Check trailing stop
-        if trailing_stop and estimated_low <= trailing_stop:
-            return i, trailing_stop, 'trailing_stop'
-        
-        # Check take profit
-        if take_profit and estimated_high >= take_profit:
-            return i, take_profit, 'take_profit'
-        
-        # Check target MA distance (for mean reversion)
-        if 'target_ma_dist' in exit_params:
-            ma_dist = row['ma_dist_20']
-            if pd.notna(ma_dist) and ma_dist >= exit_params['target_ma_dist']:
-                return i, close, 'target_ma'
-        
-        # Check breakdown MA distance
-        for key, col in [('breakdown_ma_dist_200', 'ma_dist_200'), 
-                         ('breakdown_ma_dist_50', 'ma_dist_50'),
-                         ('breakdown_ma_dist_20', 'ma_dist_20'),
-                         ('breakdown_ma_dist', 'ma_dist_20')]:
-            if key in exit_params:
-                ma_dist = row[col]
-                if pd.notna(ma_dist) and ma_dist < exit_params[key]:
-                    return i, close, 'breakdown_ma'
-    
-    # Time stop
-    exit_idx = min(entry_idx + max_hold, len(df) - 1)
-    return exit_idx, float(df.iloc[exit_idx]['close']), 'time_stop'
+        return {
+            'breakout_confirmed_up': ('eq', True),
+            'rvol_20': ('gt', params.get('rvol_threshold', 1.5)),
+            'rsi_14': ('range', params.get('rsi_min', 50), params.get('rsi_max', 75)),
+        }
+    
+    raise ValueError(f"Unknown setup: {setup_name}")
 
 
 # =============================================================================
@@ -464,52 +331,17 @@ def backtest_params(
     setup_name: str,
     entry_params: Dict,
     exit_params: Dict,
-    universe: List[Tuple[int, str]],
-    data_cache: Dict[int, pd.DataFrame]
+    backtester: Backtester
 ) -> Dict:
-    """Run backtest for a single parameter combination"""
-    trades = []
-    
-    for asset_id, symbol in universe:
-        df = data_cache.get(asset_id)
-        if df is None or len(df) < 50:
-            continue
-        
-        # Scan for entries
-        last_exit_idx = 0
-        
-        for idx in range(20, len(df)):
-            if idx <= last_exit_idx:
-                continue
-            
-            row = df.iloc[idx]
-            
-            # Check entry conditions
-            if check_entry_conditions_parameterized(row, setup_name, entry_params):
-                # Simulate trade
-                exit_idx, exit_price, exit_reason = simulate_trade_parameterized(
-                    df, idx, setup_name, exit_params
-                )
-                
-                entry_price = float(row['close'])
-                
-                # Apply friction
-                entry_price_adj = entry_price * (1 + FRICTION)
-                exit_price_adj = exit_price * (1 - FRICTION)
-                
-                return_pct = (exit_price_adj / entry_price_adj) - 1
-                hold_days = exit_idx - idx
-                
-                trades.append({
-                    'return_pct': return_pct,
-                    'hold_days': hold_days,
-                    'exit_reason': exit_reason
-                })
-                
-                last_exit_idx = exit_idx
-    
-    # Calculate metrics
-    if not trades:
+    """Run backtest for a single parameter combination (vectorized across the universe)"""
+    setup = BacktestSetup(
+        name=setup_name,
+        entry_conditions=entry_conditions_parameterized(setup_name, entry_params),
+        exit_config=exit_params,
+    )
+    metrics = backtester.run(setup).metrics
+    
+    if not metrics['trades']:
         return {
             'trades': 0,
             'win_rate': 0,
@@ -519,31 +351,23 @@ def backtest_params(
             'score': 0,
         }
     
-    returns = [t['return_pct'] for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r <= 0]
-    
-    win_rate = len(wins) / len(returns) if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0.0001
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    avg_return = np.mean(returns) if returns else 0
-    avg_hold = np.mean([t['hold_days'] for t in trades]) if trades else 0
+    n_trades = metrics['trades']
+    profit_factor = metrics['profit_factor']
+    avg_return = metrics['avg_return']
     
     # Calculate composite score
     # Score = PF * sqrt(trades) * (1 + avg_return) - penalize if too few trades
     min_trades = 50
-    trade_factor = min(1.0, len(trades) / min_trades)
-    score = profit_factor * np.sqrt(len(trades)) * (1 + avg_return) * trade_factor
+    trade_factor = min(1.0, n_trades / min_trades)
+    score = profit_factor * np.sqrt(n_trades) * (1 + avg_return) * trade_factor
     
     return {
-        'trades': len(trades),
-        'win_rate': round(win_rate * 100, 1),
+        'trades': n_trades,
+        'win_rate': round(metrics['win_rate'] * 100, 1),
         'profit_factor': round(profit_factor, 3),
         'avg_return': round(avg_return * 100, 3),
-        'avg_hold_days': round(avg_hold, 1),
+        'avg_hold_days': round(metrics['avg_hold_days'], 1),
+        'max_drawdown': round(metrics['max_drawdown'] * 100, 2),
         'score': round(score, 3),
     }
 
@@ -572,6 +396,12 @@ def optimize_setup(args: Tuple) -> Dict:
     
     conn.close()
     
+    # One panel for every combination; entries and exits are resolved across all assets at once
+    backtester = Backtester(
+        Panel.from_frames(data_cache, symbols=dict(universe)),
+        warmup=20, min_bars=50, friction=FRICTION, intrabar='atr'
+    )
+    
     # Get parameter grid
     param_grid = PARAMETER_GRIDS.get(setup_name, {})
     entry_grid = param_grid.get('entry', {})
@@ -600,7 +430,7 @@ def optimize_setup(args: Tuple) -> Dict:
             exit_params = dict(zip(exit_keys, exit_vals)) if exit_keys else {}
             
             # Run backtest
-            result = backtest_params(setup_name, entry_params, exit_params, universe, data_cache)
+            result = backtest_params(setup_name, entry_params, exit_params, backtester)
             result['entry_params'] = entry_params
             result['exit_params'] = exit_params
             
@@ -13,6 +13,7 @@ These are designed for medium-to-long-term position trading (60-180 day holds).
 """
 
 import os
+import sys
 import json
 import itertools
 from datetime import datetime
@@ -25,6 +26,10 @@ import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+# Streamed, typed reads from the engine package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from stratos_engine.stream import fetch_frame
+
 OUTPUT_DIR = '/home/ubuntu/stratos_brain/data/optimization_results'
 LOG_FILE = '/home/ubuntu/stratos_brain/data/position_trading_optimization_log.txt'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -148,7 +153,8 @@ def load_all_data():
     log(f"Got {len(universe)} assets in universe")
     
     # Get all features including new ones for position trading
-    cur.execute("""
+    # (streamed from a server-side cursor, numbers as float64)
+    df = fetch_frame(conn, """
         SELECT df.asset_id, df.date, df.close, df.rsi_14, df.ma_dist_20, df.ma_dist_50, 
                df.ma_dist_200, df.ma_slope_50, df.ma_slope_200, df.above_ma200, df.ma50_above_ma200,
                df.bb_width_pctile, df.rvol_20, df.gap_pct, df.atr_14,
@@ -162,29 +168,8 @@ def load_all_data():
           AND df.date <= %s
         ORDER BY df.asset_id, df.date
     """, (asset_ids, BACKTEST_START, BACKTEST_END))
-    
-    rows = cur.fetchall()
     conn.close()
-    log(f"Got {len(rows)} feature rows")
-    
-    columns = ['asset_id', 'date', 'close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200', 
-               'ma_slope_50', 'ma_slope_200', 'above_ma200', 'ma50_above_ma200', 'bb_width_pctile', 
-               'rvol_20', 'gap_pct', 'atr_14', 'donchian_high_55', 'donchian_low_55', 
-               'donchian_high_20', 'donchian_low_20', 'roc_20', 'roc_63', 'dist_52w_high', 
-               'dist_52w_low', 'realized_vol_20', 'sma_20', 'sma_50', 'sma_200',
-               'cs_rank_return_21d', 'rs_vs_benchmark']
-    
-    df = pd.DataFrame(rows, columns=columns)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Convert numeric columns
-    numeric_cols = ['close', 'rsi_14', 'ma_dist_20', 'ma_dist_50', 'ma_dist_200', 'ma_slope_50', 
-                   'ma_slope_200', 'bb_width_pctile', 'rvol_20', 'gap_pct', 'atr_14',
-                   'donchian_high_55', 'donchian_low_55', 'donchian_high_20', 'donchian_low_20',
-                   'roc_20', 'roc_63', 'dist_52w_high', 'dist_52w_low', 'realized_vol_20',
-                   'sma_20', 'sma_50', 'sma_200', 'cs_rank_return_21d', 'rs_vs_benchmark']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    log(f"Got {len(df)} feature rows")
     
     # Calculate additional indicators needed for position trading setups
     log("Calculating additional indicators...")
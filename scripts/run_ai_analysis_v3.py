@@ -68,26 +68,11 @@ def main():
     
     logger.info(f"Found {len(assets)} assets to process")
     
-    # Process each asset
-    processed = 0
-    errors = 0
+    # Reviews run concurrently within the Gemini quota, setup assets first
+    counts = reviewer.analyze_assets(assets, target_date)
     
-    for asset in assets:
-        try:
-            result = reviewer.analyze_asset(
-                asset_id=asset['asset_id'],
-                symbol=asset['symbol'],
-                as_of_date=target_date
-            )
-            if result:
-                processed += 1
-                if processed % 10 == 0:
-                    logger.info(f"Processed {processed}/{len(assets)} assets")
-        except Exception as e:
-            errors += 1
-            logger.error(f"Error processing {asset['symbol']}: {e}")
-    
-    logger.info(f"Completed: {processed} processed, {errors} errors")
+    logger.info(f"Completed: {counts['processed']} processed, {counts['failed']} errors, "
+                f"{counts['skipped']} skipped")
 
 if __name__ == '__main__':
     main()
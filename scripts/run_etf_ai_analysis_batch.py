@@ -7,6 +7,8 @@ Each sandbox handles a batch of assets.
 
 Usage:
     python run_etf_ai_analysis_batch.py --date 2026-01-27 --offset 0 --batch-size 20
+    python run_etf_ai_analysis_batch.py --date 2026-01-27 --offset 0 --batch-size 500 --provider-batch
+    python run_etf_ai_analysis_batch.py --date 2026-01-27 --offset 0 --batch-size 500 --provider-batch --dry-run
 """
 
 import argparse
@@ -19,7 +21,10 @@ from decimal import Decimal
 from typing import Dict, Any, List, Optional
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+# stratos_engine.llm_batch is imported in batch mode only
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 # Configure logging
 logging.basicConfig(
@@ -502,6 +507,59 @@ def parse_json_with_repair(response_text: str, symbol: str) -> Optional[Dict]:
         return None
 
 
+def build_contents(packet: Dict) -> List[str]:
+    """Prompt parts for one packet: instructions with schema, then the packet JSON."""
+    prompt_with_schema = f"{SYSTEM_PROMPT}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(OUTPUT_SCHEMA, indent=2)}"
+    return [prompt_with_schema, json.dumps(packet, cls=DecimalEncoder)]
+
+
+def build_review(asset: Dict, packet: Dict, ai_result: Dict, as_of_date: str, model: str) -> Dict:
+    """Final review (same structure as equity scanner) from a parsed model result."""
+    # Get primary setup for enrichment
+    primary_setup = packet["quant_setups"]["primary_setup"]
+    
+    return {
+        "asset_id": str(asset['asset_id']),
+        "symbol": asset['symbol'],
+        "as_of_date": as_of_date,
+        "prompt_version": "v3.0.0",
+        "ai_review_version": "v3.0.0",
+        "model": model,
+        
+        # Quant setup fields
+        "active_quant_setups": packet["quant_setups"]["active_setups"],
+        "primary_setup": primary_setup["setup_name"] if primary_setup else None,
+        "historical_profit_factor": primary_setup.get("historical_profit_factor") if primary_setup else None,
+        "quant_entry_price": primary_setup.get("entry_price") if primary_setup else None,
+        "quant_stop_loss": primary_setup.get("stop_loss") if primary_setup else None,
+        "quant_target_price": primary_setup.get("target_price") if primary_setup else None,
+        
+        # AI outputs
+        "setup_purity_score": ai_result.get("setup_purity_score"),
+        "ai_direction_score": ai_result.get("ai_direction_score"),
+        "attention_level": ai_result.get("attention_level"),
+        "direction": ai_result.get("direction"),
+        "setup_type": primary_setup["setup_name"] if primary_setup else ai_result.get("setup_type"),
+        "time_horizon": ai_result.get("time_horizon"),
+        "confidence": ai_result.get("confidence"),
+        "summary_text": ai_result.get("summary_text"),
+        "why_now": ai_result.get("why_now"),
+        "key_levels": ai_result.get("key_levels"),
+        "entry_zone": ai_result.get("entry_zone"),
+        "targets": ai_result.get("targets"),
+        "risks_and_contradictions": ai_result.get("risks_and_contradictions"),
+        "what_to_watch_next": ai_result.get("what_to_watch_next"),
+        
+        # AI price adjustments
+        "ai_adjusted_entry": ai_result.get("ai_adjusted_entry"),
+        "ai_adjusted_stop": ai_result.get("ai_adjusted_stop"),
+        "ai_adjusted_target": ai_result.get("ai_adjusted_target"),
+        
+        # Metadata
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
 def analyze_asset(client, asset: Dict, ohlcv: List[Dict], active_setups: List[Dict], 
                 as_of_date: str, model: str) -> Optional[Dict]:
     """Analyze an asset using Gemini AI (same format as equity scanner)."""
@@ -509,15 +567,12 @@ def analyze_asset(client, asset: Dict, ohlcv: List[Dict], active_setups: List[Di
         # Build the AI packet
         packet = build_ai_packet(asset, ohlcv, active_setups, as_of_date)
         
-        # Build prompt with schema
-        prompt_with_schema = f"{SYSTEM_PROMPT}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(OUTPUT_SCHEMA, indent=2)}"
-        
         # Call Gemini API
         from google.genai import types
         
         response = client.models.generate_content(
             model=model,
-            contents=[prompt_with_schema, json.dumps(packet, cls=DecimalEncoder)],
+            contents=build_contents(packet),
             config=types.GenerateContentConfig(
                 temperature=0.2,
                 max_output_tokens=16000,
@@ -532,160 +587,172 @@ def analyze_asset(client, asset: Dict, ohlcv: List[Dict], active_setups: List[Di
             logger.error(f"Failed to parse AI response for {asset['symbol']}")
             return None
         
-        # Get primary setup for enrichment
-        primary_setup = packet["quant_setups"]["primary_setup"]
-        
-        # Build final result (same structure as equity scanner)
-        result = {
-            "asset_id": str(asset['asset_id']),
-            "symbol": asset['symbol'],
-            "as_of_date": as_of_date,
-            "prompt_version": "v3.0.0",
-            "ai_review_version": "v3.0.0",
-            "model": model,
-            
-            # Quant setup fields
-            "active_quant_setups": packet["quant_setups"]["active_setups"],
-            "primary_setup": primary_setup["setup_name"] if primary_setup else None,
-            "historical_profit_factor": primary_setup.get("historical_profit_factor") if primary_setup else None,
-            "quant_entry_price": primary_setup.get("entry_price") if primary_setup else None,
-            "quant_stop_loss": primary_setup.get("stop_loss") if primary_setup else None,
-            "quant_target_price": primary_setup.get("target_price") if primary_setup else None,
-            
-            # AI outputs
-            "setup_purity_score": ai_result.get("setup_purity_score"),
-            "ai_direction_score": ai_result.get("ai_direction_score"),
-            "attention_level": ai_result.get("attention_level"),
-            "direction": ai_result.get("direction"),
-            "setup_type": primary_setup["setup_name"] if primary_setup else ai_result.get("setup_type"),
-            "time_horizon": ai_result.get("time_horizon"),
-            "confidence": ai_result.get("confidence"),
-            "summary_text": ai_result.get("summary_text"),
-            "why_now": ai_result.get("why_now"),
-            "key_levels": ai_result.get("key_levels"),
-            "entry_zone": ai_result.get("entry_zone"),
-            "targets": ai_result.get("targets"),
-            "risks_and_contradictions": ai_result.get("risks_and_contradictions"),
-            "what_to_watch_next": ai_result.get("what_to_watch_next"),
-            
-            # AI price adjustments
-            "ai_adjusted_entry": ai_result.get("ai_adjusted_entry"),
-            "ai_adjusted_stop": ai_result.get("ai_adjusted_stop"),
-            "ai_adjusted_target": ai_result.get("ai_adjusted_target"),
-            
-            # Metadata
-            "created_at": datetime.utcnow().isoformat(),
-        }
-        
-        return result
+        return build_review(asset, packet, ai_result, as_of_date, model)
         
     except Exception as e:
         logger.error(f"Error analyzing {asset['symbol']}: {e}")
         return None
 
 
-def save_ai_review(db_url: str, review: Dict) -> bool:
-    """Save AI review to database (same structure as equity scanner)."""
+def review_record(review: Dict) -> Dict:
+    """asset_ai_reviews columns for a review."""
+    return {
+        "asset_id": review["asset_id"],
+        "as_of_date": review["as_of_date"],
+        "prompt_version": review["prompt_version"],
+        "ai_review_version": review["ai_review_version"],
+        "model": review["model"],
+        
+        # Quant setup fields
+        "active_quant_setups": json.dumps(review.get("active_quant_setups"), cls=DecimalEncoder),
+        "primary_setup": review.get("primary_setup"),
+        "setup_purity_score": review.get("setup_purity_score"),
+        "historical_profit_factor": review.get("historical_profit_factor"),
+        "quant_entry_price": review.get("quant_entry_price"),
+        "quant_stop_loss": review.get("quant_stop_loss"),
+        "quant_target_price": review.get("quant_target_price"),
+        "ai_adjusted_entry": review.get("ai_adjusted_entry"),
+        "ai_adjusted_stop": review.get("ai_adjusted_stop"),
+        "ai_adjusted_target": review.get("ai_adjusted_target"),
+        
+        # AI analysis fields
+        "ai_direction_score": review.get("ai_direction_score"),
+        "ai_attention_level": review.get("attention_level"),
+        "ai_setup_type": review.get("setup_type"),
+        "ai_time_horizon": review.get("time_horizon"),
+        "ai_confidence": review.get("confidence"),
+        "ai_summary_text": review.get("summary_text"),
+        "ai_key_levels": json.dumps(review.get("key_levels"), cls=DecimalEncoder),
+        "ai_entry": json.dumps(review.get("entry_zone"), cls=DecimalEncoder),
+        "ai_targets": json.dumps(review.get("targets"), cls=DecimalEncoder),
+        "ai_why_now": json.dumps(review.get("why_now"), cls=DecimalEncoder),
+        "ai_risks": json.dumps(review.get("risks_and_contradictions"), cls=DecimalEncoder),
+        "ai_what_to_watch_next": json.dumps(review.get("what_to_watch_next"), cls=DecimalEncoder),
+        
+        # Required fields
+        "scope": "v3_constrained_autonomy",
+        "source_scope": "v3_constrained_autonomy",
+        "input_hash": review.get("input_hash", f"{review['asset_id']}_{review['as_of_date']}"),
+        
+        # Legacy compatibility
+        "attention_level": review.get("attention_level"),
+        "direction": review.get("direction"),
+        "setup_type": review.get("setup_type"),
+        "confidence": review.get("confidence"),
+        "summary_text": review.get("summary_text"),
+        
+        # Review JSON for backward compatibility
+        "review_json": json.dumps({
+            "ai_direction_score": review.get("ai_direction_score"),
+            "setup_purity_score": review.get("setup_purity_score"),
+            "attention_level": review.get("attention_level"),
+            "setup_type": review.get("setup_type"),
+            "time_horizon": review.get("time_horizon"),
+            "confidence": review.get("confidence"),
+            "summary_text": review.get("summary_text"),
+            "key_levels": review.get("key_levels"),
+            "entry_zone": review.get("entry_zone"),
+            "targets": review.get("targets"),
+            "why_now": review.get("why_now"),
+            "risks_and_contradictions": review.get("risks_and_contradictions"),
+            "what_to_watch_next": review.get("what_to_watch_next"),
+            "active_quant_setups": review.get("active_quant_setups"),
+            "primary_setup": review.get("primary_setup"),
+        }, cls=DecimalEncoder),
+    }
+
+
+def save_ai_reviews(db_url: str, reviews: List[Dict]) -> int:
+    """Upsert reviews (same structure as equity scanner) in one statement; returns the number saved."""
+    if not reviews:
+        return 0
+    records = [review_record(review) for review in reviews]
+    
+    # Build INSERT ON CONFLICT statement
+    columns = list(records[0].keys())
+    column_names = ', '.join(columns)
+    update_clause = ', '.join([
+        f"{col} = EXCLUDED.{col}" 
+        for col in columns 
+        if col not in ['asset_id', 'as_of_date', 'prompt_version']
+    ])
+    
+    query = f"""
+    INSERT INTO asset_ai_reviews ({column_names})
+    VALUES %s
+    ON CONFLICT (asset_id, as_of_date, prompt_version)
+    DO UPDATE SET {update_clause}, updated_at = NOW()
+    """
+    
     conn = psycopg2.connect(db_url)
     try:
         with conn.cursor() as cur:
-            # Build the record
-            db_record = {
-                "asset_id": review["asset_id"],
-                "as_of_date": review["as_of_date"],
-                "prompt_version": review["prompt_version"],
-                "ai_review_version": review["ai_review_version"],
-                "model": review["model"],
-                
-                # Quant setup fields
-                "active_quant_setups": json.dumps(review.get("active_quant_setups"), cls=DecimalEncoder),
-                "primary_setup": review.get("primary_setup"),
-                "setup_purity_score": review.get("setup_purity_score"),
-                "historical_profit_factor": review.get("historical_profit_factor"),
-                "quant_entry_price": review.get("quant_entry_price"),
-                "quant_stop_loss": review.get("quant_stop_loss"),
-                "quant_target_price": review.get("quant_target_price"),
-                "ai_adjusted_entry": review.get("ai_adjusted_entry"),
-                "ai_adjusted_stop": review.get("ai_adjusted_stop"),
-                "ai_adjusted_target": review.get("ai_adjusted_target"),
-                
-                # AI analysis fields
-                "ai_direction_score": review.get("ai_direction_score"),
-                "ai_attention_level": review.get("attention_level"),
-                "ai_setup_type": review.get("setup_type"),
-                "ai_time_horizon": review.get("time_horizon"),
-                "ai_confidence": review.get("confidence"),
-                "ai_summary_text": review.get("summary_text"),
-                "ai_key_levels": json.dumps(review.get("key_levels"), cls=DecimalEncoder),
-                "ai_entry": json.dumps(review.get("entry_zone"), cls=DecimalEncoder),
-                "ai_targets": json.dumps(review.get("targets"), cls=DecimalEncoder),
-                "ai_why_now": json.dumps(review.get("why_now"), cls=DecimalEncoder),
-                "ai_risks": json.dumps(review.get("risks_and_contradictions"), cls=DecimalEncoder),
-                "ai_what_to_watch_next": json.dumps(review.get("what_to_watch_next"), cls=DecimalEncoder),
-                
-                # Required fields
-                "scope": "v3_constrained_autonomy",
-                "source_scope": "v3_constrained_autonomy",
-                "input_hash": review.get("input_hash", f"{review['asset_id']}_{review['as_of_date']}"),
-                
-                # Legacy compatibility
-                "attention_level": review.get("attention_level"),
-                "direction": review.get("direction"),
-                "setup_type": review.get("setup_type"),
-                "confidence": review.get("confidence"),
-                "summary_text": review.get("summary_text"),
-                
-                # Review JSON for backward compatibility
-                "review_json": json.dumps({
-                    "ai_direction_score": review.get("ai_direction_score"),
-                    "setup_purity_score": review.get("setup_purity_score"),
-                    "attention_level": review.get("attention_level"),
-                    "setup_type": review.get("setup_type"),
-                    "time_horizon": review.get("time_horizon"),
-                    "confidence": review.get("confidence"),
-                    "summary_text": review.get("summary_text"),
-                    "key_levels": review.get("key_levels"),
-                    "entry_zone": review.get("entry_zone"),
-                    "targets": review.get("targets"),
-                    "why_now": review.get("why_now"),
-                    "risks_and_contradictions": review.get("risks_and_contradictions"),
-                    "what_to_watch_next": review.get("what_to_watch_next"),
-                    "active_quant_setups": review.get("active_quant_setups"),
-                    "primary_setup": review.get("primary_setup"),
-                }, cls=DecimalEncoder),
-            }
-            
-            # Build INSERT ON CONFLICT statement
-            columns = list(db_record.keys())
-            placeholders = ', '.join(['%s'] * len(columns))
-            column_names = ', '.join(columns)
-            update_clause = ', '.join([
-                f"{col} = EXCLUDED.{col}" 
-                for col in columns 
-                if col not in ['asset_id', 'as_of_date', 'prompt_version']
-            ])
-            
-            query = f"""
-            INSERT INTO asset_ai_reviews ({column_names})
-            VALUES ({placeholders})
-            ON CONFLICT (asset_id, as_of_date, prompt_version)
-            DO UPDATE SET {update_clause}, updated_at = NOW()
-            """
-            
-            values = [db_record[col] for col in columns]
-            cur.execute(query, values)
+            execute_values(cur, query, [[record[col] for col in columns] for record in records], page_size=500)
             conn.commit()
-            
-            logger.info(f"Saved AI review for {review['symbol']} with version {review['ai_review_version']}")
-            return True
-            
+        return len(records)
     except Exception as e:
-        logger.error(f"Error saving review for asset {review['asset_id']}: {e}")
-        return False
+        logger.error(f"Error saving {len(records)} AI reviews: {e}")
+        return 0
     finally:
         conn.close()
 
 
+def save_ai_review(db_url: str, review: Dict) -> bool:
+    """Save AI review to database (same structure as equity scanner)."""
+    if not save_ai_reviews(db_url, [review]):
+        return False
+    logger.info(f"Saved AI review for {review['symbol']} with version {review['ai_review_version']}")
+    return True
+
+
+def run_provider_batch(db_url: str, assets: List[Dict], as_of_date: str, model: str,
+                       dry_run: bool = False) -> Dict[str, int]:
+    """
+    Send every packet as one provider batch job, then ingest all reviews in one statement.
+    On a dry run (always with LLM_BATCH_PROVIDER=stub) the parsed reviews go to a file instead.
+    """
+    from stratos_engine.llm_batch import BatchRequest, get_batch_provider, run_batch, write_rows
+    
+    provider = get_batch_provider()
+    dry_run = dry_run or provider.dry_run
+    requests = []
+    errors = 0
+    for asset in assets:
+        try:
+            active_setups = get_active_setups(db_url, asset['asset_id'], as_of_date)
+            ohlcv = get_ohlcv_data(db_url, asset['asset_id'], as_of_date)
+            packet = build_ai_packet(asset, ohlcv, active_setups, as_of_date)
+        except Exception as e:
+            errors += 1
+            logger.error(f"Error processing {asset['symbol']}: {e}")
+            continue
+        requests.append(BatchRequest(
+            key=str(asset['asset_id']),
+            prompt=build_contents(packet),
+            config={"temperature": 0.2, "maxOutputTokens": 16000, "responseMimeType": "application/json"},
+            context=(asset, packet),
+        ))
+    
+    display_name = f"etf-ai-{as_of_date}-{len(requests)}"
+    reviews = []
+    for result in run_batch(requests, model, provider=provider, display_name=display_name):
+        asset, packet = result.request.context
+        ai_result = parse_json_with_repair(result.text, asset['symbol']) if result.ok else None
+        if not ai_result:
+            errors += 1
+            logger.warning(f"✗ No analysis result for {asset['symbol']}: {result.error or 'unparseable response'}")
+            continue
+        reviews.append(build_review(asset, packet, ai_result, as_of_date, model))
+    
+    if dry_run:
+        path = write_rows(reviews, display_name)
+        logger.info(f"Dry run ({provider.name}): {len(reviews)} parsed reviews written to {path}, nothing saved")
+        return {"processed": 0, "errors": errors}
+    
+    processed = save_ai_reviews(db_url, reviews)
+    return {"processed": processed, "errors": errors + len(reviews) - processed}
+
+
 def main():
     parser = argparse.ArgumentParser(description='Run ETF/Index/Commodity AI analysis for a batch')
     parser.add_argument('--date', type=str, required=True, help='Target date (YYYY-MM-DD)')
@@ -693,6 +760,10 @@ def main():
                         help='Gemini model to use')
     parser.add_argument('--offset', type=int, required=True, help='Starting offset (0-indexed)')
     parser.add_argument('--batch-size', type=int, required=True, help='Number of assets to process')
+    parser.add_argument('--provider-batch', action='store_true',
+                        help='Submit all packets as one provider batch job (LLM_BATCH_PROVIDER) instead of live calls')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='With --provider-batch: write the parsed reviews to LLM_BATCH_DIR instead of the database')
     
     args = parser.parse_args()
     
@@ -703,7 +774,7 @@ def main():
     logger.info(f"  Batch Size: {args.batch_size}")
     
     db_url = get_db_url()
-    client = get_gemini_client()
+    client = None if args.provider_batch else get_gemini_client()
     
     # Get batch of assets
     assets = get_asset_batch(db_url, args.date, args.offset, args.batch_size)
@@ -713,6 +784,14 @@ def main():
         logger.info("No assets to process in this batch")
         return
     
+    if args.provider_batch:
+        counts = run_provider_batch(db_url, assets, args.date, args.model, args.dry_run)
+        logger.info(f"Batch complete: {counts['processed']} processed, {counts['errors']} errors")
+        if counts['errors'] > len(assets) * 0.5:
+            logger.error("Too many errors, marking batch as failed")
+            sys.exit(1)
+        return
+    
     # Process each asset
     processed = 0
     errors = 0
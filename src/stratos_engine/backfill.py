@@ -0,0 +1,520 @@
+"""
+Gap-aware OHLCV backfill planner.
+
+Instead of refetching from each asset's max date, the planner finds every
+missing trading session per asset, including holes in the middle of history:
+
+1. plan_gaps: one SQL pass over daily_bars per exchange calendar
+   (stratos_engine.calendar, so weekends and holidays are never gaps). Each
+   bar is joined to its session ordinal in the calendar, and LAG/LEAD over the
+   ordinals yield the runs of missing sessions (plus the tail after the last
+   bar, and the whole range for assets without bars).
+2. plan_requests: gaps become the fewest vendor requests. AlphaVantage returns
+   the whole series per call, so one request per asset, "compact" (last 100
+   sessions) when every gap is recent and "full" otherwise. FMP takes a date
+   range, so nearby gaps are merged into one range. CoinGecko takes a
+   days-back window, so one request per asset. Both "recent" and "days back"
+   count from the actual current date, not the --end of the planned range.
+3. run_backfill: requests run on a bounded thread pool through the shared
+   rate-limited HTTP client. Only bars inside the gaps are written. Finished
+   requests are appended to a JSON-lines progress file, so an interrupted run
+   resumes where it stopped and gaps a vendor cannot fill are not retried on
+   every run.
+
+Usage:
+    python -m stratos_engine.backfill --asset-type equity --start 2024-01-01 \\
+        --workers 8 --progress backfill_progress.jsonl [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+
+from .bar_store import get_shared_store
+from .calendar import SessionCalendar, get_calendar, group_by_calendar
+from .db import Database
+from .http import HttpError, get_shared_client
+
+logger = structlog.get_logger()
+
+ALPHAVANTAGE_API_KEY = os.environ.get("ALPHAVANTAGE_API_KEY")
+FMP_API_KEY = os.environ.get("FMP_API_KEY")
+COINGECKO_API_KEY = os.environ.get("COINGECKO_API_KEY", "")
+
+# AlphaVantage "compact" returns the latest 100 sessions; keep a margin for calendar drift
+AV_COMPACT_SESSIONS = 100
+AV_COMPACT_MARGIN = 5
+# FMP gaps closer than this many sessions share one date-range request
+FMP_MERGE_SESSIONS = 60
+
+DEFAULT_HISTORY_START = date(2015, 1, 1)
+
+
+# ============================================================================
+# Planning
+# ============================================================================
+
+@dataclass(frozen=True)
+class Gap:
+    """A run of consecutive missing sessions for one asset."""
+    asset_id: int
+    start: date
+    end: date
+    sessions: int
+
+
+@dataclass
+class BackfillAsset:
+    asset_id: int
+    symbol: str
+    asset_type: str
+    vendor: str
+    vendor_symbol: str
+
+
+@dataclass
+class BackfillRequest:
+    """One vendor call covering one or more gaps of an asset."""
+    asset: BackfillAsset
+    start: date
+    end: date
+    gaps: List[Gap]
+    outputsize: Optional[str] = None  # AlphaVantage only
+    days: Optional[int] = None        # CoinGecko only
+
+    @property
+    def missing(self) -> int:
+        return sum(g.sessions for g in self.gaps)
+
+    @property
+    def key(self) -> str:
+        """Stable identity for the progress file."""
+        return f"{self.asset.asset_id}:{self.asset.vendor}:{self.start.isoformat()}:{self.end.isoformat()}:{self.missing}"
+
+
+_GAPS_SQL = """
+WITH cal AS (
+    SELECT d::date AS date, (ROW_NUMBER() OVER (ORDER BY d))::int AS n
+    FROM unnest(%s::date[]) AS d
+),
+bars AS (
+    SELECT b.asset_id,
+           c.n,
+           LAG(c.n) OVER w AS prev_n,
+           LEAD(c.n) OVER w AS next_n
+    FROM daily_bars b
+    JOIN cal c ON c.date = b.date
+    WHERE b.asset_id = ANY(%s)
+    WINDOW w AS (PARTITION BY b.asset_id ORDER BY c.n)
+)
+SELECT asset_id, prev_n, n, next_n
+FROM bars
+WHERE prev_n IS NULL OR next_n IS NULL OR n - prev_n > 1
+"""
+
+
+def plan_gaps(
+    db: Database,
+    asset_ids: Sequence[int],
+    sessions: np.ndarray,
+    fill_head: bool = False,
+) -> Dict[int, List[Gap]]:
+    """
+    Missing-session runs per asset within the `sessions` calendar.
+
+    Args:
+        asset_ids: Assets sharing this calendar
+        sessions: Sorted datetime64[D] trading sessions to check
+        fill_head: Also treat sessions before an asset's first bar as missing
+                   (off by default: history starts at listing)
+
+    Returns:
+        {asset_id: [Gap, ...]}; assets without any bar get one gap over all sessions
+    """
+    if len(asset_ids) == 0 or len(sessions) == 0:
+        return {}
+    dates = sessions.astype("datetime64[D]").astype(object)
+    total = len(dates)
+
+    def gap(asset_id: int, first_n: int, last_n: int) -> Gap:
+        # n is 1-based
+        return Gap(asset_id, dates[first_n - 1], dates[last_n - 1], last_n - first_n + 1)
+
+    rows = db.fetch_all(_GAPS_SQL, (list(dates), list(asset_ids)))
+    gaps: Dict[int, List[Gap]] = {}
+    for row in rows:
+        asset_id, prev_n, n, next_n = row["asset_id"], row["prev_n"], row["n"], row["next_n"]
+        found = gaps.setdefault(asset_id, [])
+        if prev_n is None:
+            if fill_head and n > 1:
+                found.append(gap(asset_id, 1, n - 1))
+        elif n - prev_n > 1:
+            found.append(gap(asset_id, prev_n + 1, n - 1))
+        if next_n is None and n < total:
+            found.append(gap(asset_id, n + 1, total))
+
+    for asset_id in asset_ids:
+        if asset_id not in gaps:
+            gaps[asset_id] = [gap(asset_id, 1, total)]
+    for found in gaps.values():
+        found.sort(key=lambda g: g.start)
+    return {asset_id: found for asset_id, found in gaps.items() if found}
+
+
+def plan_requests(
+    asset: BackfillAsset,
+    gaps: List[Gap],
+    sessions: np.ndarray,
+    calendar: SessionCalendar,
+    today: Optional[date] = None,
+) -> List[BackfillRequest]:
+    """
+    Fewest vendor requests covering `gaps` (sorted by start).
+
+    `sessions` are the planned range's sessions (FMP gap merging); the vendor
+    windows (AlphaVantage compact, CoinGecko days) are measured back from
+    `today` (default: the current UTC date) on `calendar`, since that is where
+    the vendors count from, whatever the range's end.
+    """
+    if not gaps:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    start, end = gaps[0].start, max(g.end for g in gaps)
+
+    if asset.vendor == "alphavantage":
+        # The series always ends at the latest session, so one call covers every gap;
+        # compact only when every gap is within its last sessions as of today
+        oldest_compact = calendar.previous_session(today + timedelta(days=1),
+                                                   count=AV_COMPACT_SESSIONS - AV_COMPACT_MARGIN)
+        compact = start >= oldest_compact
+        return [BackfillRequest(asset, start, end, gaps, outputsize="compact" if compact else "full")]
+
+    if asset.vendor == "coingecko":
+        return [BackfillRequest(asset, start, end, gaps, days=(today - start).days + 2)]
+
+    # FMP: date ranges; merge gaps separated by fewer than FMP_MERGE_SESSIONS sessions
+    ordinals = {d: i for i, d in enumerate(sessions.astype("datetime64[D]").astype(object))}
+    requests: List[BackfillRequest] = []
+    group = [gaps[0]]
+    for g in gaps[1:]:
+        between = ordinals[g.start] - ordinals[group[-1].end] - 1
+        if between < FMP_MERGE_SESSIONS:
+            group.append(g)
+        else:
+            requests.append(BackfillRequest(asset, group[0].start, group[-1].end, group))
+            group = [g]
+    requests.append(BackfillRequest(asset, group[0].start, group[-1].end, group))
+    return requests
+
+
+def _vendor_for(asset_type: str, symbol: str) -> str:
+    if asset_type == "crypto":
+        return "coingecko"
+    if asset_type == "equity" and "." not in symbol:
+        return "alphavantage"
+    return "fmp"
+
+
+def load_assets(db: Database, asset_types: Sequence[str], limit: Optional[int] = None) -> List[BackfillAsset]:
+    query = """
+        SELECT asset_id, symbol, asset_type,
+               COALESCE(fmp_symbol, symbol) AS fmp_symbol,
+               coingecko_id
+        FROM assets
+        WHERE is_active = true AND asset_type = ANY(%s)
+        ORDER BY asset_id
+    """
+    params: Tuple = (list(asset_types),)
+    if limit:
+        query += " LIMIT %s"
+        params += (limit,)
+
+    assets = []
+    for row in db.fetch_all(query, params):
+        vendor = _vendor_for(row["asset_type"], row["symbol"])
+        vendor_symbol = {
+            "alphavantage": row["symbol"],
+            "fmp": row["fmp_symbol"],
+            "coingecko": row["coingecko_id"],
+        }[vendor]
+        if vendor_symbol:
+            assets.append(BackfillAsset(row["asset_id"], row["symbol"], row["asset_type"], vendor, vendor_symbol))
+    return assets
+
+
+def plan_backfill(
+    db: Database,
+    assets: Sequence[BackfillAsset],
+    start: date,
+    end: date,
+    fill_head: bool = False,
+) -> List[BackfillRequest]:
+    """Gaps and requests for `assets` between start and end (one gap query per calendar)."""
+    requests: List[BackfillRequest] = []
+    for name, members in group_by_calendar(assets, lambda a: (a.asset_type, a.symbol)).items():
+        calendar = get_calendar(name)
+        sessions = calendar.sessions_between(start, end)
+        gaps = plan_gaps(db, [a.asset_id for a in members], sessions, fill_head)
+        for asset in members:
+            # `end` only bounds the gaps; request windows count from the current date
+            requests.extend(plan_requests(asset, gaps.get(asset.asset_id, []), sessions, calendar))
+    return requests
+
+
+# ============================================================================
+# Fetching
+# ============================================================================
+
+def _fetch_alphavantage(req: BackfillRequest) -> List[Dict[str, Any]]:
+    data = get_shared_client().get_json("alphavantage", "/query", {
+        "function": "TIME_SERIES_DAILY_ADJUSTED",
+        "symbol": req.asset.vendor_symbol,
+        "outputsize": req.outputsize or "compact",
+        "apikey": ALPHAVANTAGE_API_KEY,
+        "datatype": "json",
+    })
+    series = data.get("Time Series (Daily)")
+    if not series:
+        raise ValueError(str(data.get("Error Message") or data.get("Information") or list(data.keys()))[:120])
+    return [
+        {
+            "date": date.fromisoformat(day),
+            "open": float(v["1. open"]),
+            "high": float(v["2. high"]),
+            "low": float(v["3. low"]),
+            "close": float(v.get("5. adjusted close", v["4. close"])),  # Adjusted close, as Stage1Fetch
+            "volume": float(v["6. volume"]),
+        }
+        for day, v in series.items()
+    ]
+
+
+def _fetch_fmp(req: BackfillRequest) -> List[Dict[str, Any]]:
+    data = get_shared_client().get_json("fmp", "/stable/historical-price-eod/full", {
+        "symbol": req.asset.vendor_symbol,
+        "from": req.start.isoformat(),
+        "to": req.end.isoformat(),
+        "apikey": FMP_API_KEY,
+    })
+    if not isinstance(data, list):
+        raise ValueError(str(data)[:120])
+    return [
+        {
+            "date": date.fromisoformat(row["date"]),
+            "open": float(row["open"]),
+            "high": float(row["high"]),
+            "low": float(row["low"]),
+            "close": float(row.get("adjClose") or row["close"]),
+            "volume": float(row.get("volume") or 0),
+        }
+        for row in data
+    ]
+
+
+def _fetch_coingecko(req: BackfillRequest) -> List[Dict[str, Any]]:
+    if COINGECKO_API_KEY.startswith("CG-"):
+        vendor, headers = "coingecko", {"x-cg-pro-api-key": COINGECKO_API_KEY}
+    else:
+        vendor, headers = "coingecko_public", {}
+    data = get_shared_client().get_json(
+        vendor,
+        f"/coins/{req.asset.vendor_symbol}/market_chart",
+        {"vs_currency": "usd", "days": str(req.days), "interval": "daily"},
+        headers,
+    )
+    # The 00:00 UTC point is the previous day's close (see scripts/backfill_ohlcv.py)
+    def close_date(ms: float) -> date:
+        return (datetime.fromtimestamp(ms / 1000, tz=timezone.utc) - timedelta(days=1)).date()
+
+    volumes = {close_date(v[0]): v[1] for v in data.get("total_volumes", [])}
+    bars = []
+    for ms, price in data.get("prices", []):
+        day = close_date(ms)
+        bars.append({"date": day, "open": price, "high": price, "low": price, "close": price,
+                     "volume": float(volumes.get(day) or 0)})
+    return bars
+
+
+_FETCHERS = {
+    "alphavantage": _fetch_alphavantage,
+    "fmp": _fetch_fmp,
+    "coingecko": _fetch_coingecko,
+}
+
+
+def gap_bars(req: BackfillRequest, bars: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Fetched bars that fall inside the request's gaps, as daily_bars rows."""
+    rows = [b for b in bars if any(g.start <= b["date"] <= g.end for g in req.gaps)]
+    df = pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
+    df = df.drop_duplicates("date", keep="last").sort_values("date")
+    df.insert(0, "asset_id", req.asset.asset_id)
+    df["dollar_volume"] = df["close"] * df["volume"]
+    df["source"] = req.asset.vendor
+    df["adjusted_flag"] = True
+    return df
+
+
+# ============================================================================
+# Execution
+# ============================================================================
+
+class BackfillProgress:
+    """Append-only JSON-lines log of finished requests, keyed by BackfillRequest.key."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done: Set[str] = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.done.add(json.loads(line)["key"])
+
+    def mark(self, req: BackfillRequest, status: str, bars: int, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.done.add(req.key)
+            if not self.path:
+                return
+            entry = {
+                "key": req.key,
+                "asset_id": req.asset.asset_id,
+                "symbol": req.asset.symbol,
+                "status": status,
+                "bars": bars,
+                "at": datetime.now(timezone.utc).isoformat(),
+            }
+            if error:
+                entry["error"] = error
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+
+
+@dataclass
+class BackfillSummary:
+    requests: int = 0
+    skipped: int = 0
+    filled: int = 0
+    empty: int = 0
+    failed: int = 0
+    bars: int = 0
+    missing_sessions: int = 0
+    by_vendor: Dict[str, int] = field(default_factory=dict)
+
+
+def execute_request(db: Database, req: BackfillRequest) -> int:
+    """Fetch one request and write the bars inside its gaps; returns rows written."""
+    df = gap_bars(req, _FETCHERS[req.asset.vendor](req))
+    if df.empty:
+        return 0
+    rows = db.bulk_upsert("daily_bars", df, ["asset_id", "date"]).rows
+    store = get_shared_store()
+    if store is not None:
+        try:
+            store.append(df[["asset_id", "date", "open", "high", "low", "close", "volume"]])
+        except Exception as e:
+            logger.warning("bar_store_append_failed", asset_id=req.asset.asset_id, error=str(e))
+    return rows
+
+
+def run_backfill(
+    db: Database,
+    requests: Sequence[BackfillRequest],
+    workers: int = 8,
+    progress: Optional[BackfillProgress] = None,
+) -> BackfillSummary:
+    """Execute requests on a bounded thread pool; vendor pacing is the HTTP client's."""
+    progress = progress or BackfillProgress(None)
+    summary = BackfillSummary()
+    pending = []
+    for req in requests:
+        if req.key in progress.done:
+            summary.skipped += 1
+        else:
+            pending.append(req)
+    summary.requests = len(pending)
+    logger.info("backfill_started", requests=len(pending), skipped=summary.skipped, workers=workers)
+
+    def work(req: BackfillRequest) -> int:
+        try:
+            return execute_request(db, req)
+        finally:
+            db.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, req): req for req in pending}
+        for i, future in enumerate(as_completed(futures), 1):
+            req = futures[future]
+            summary.by_vendor[req.asset.vendor] = summary.by_vendor.get(req.asset.vendor, 0) + 1
+            try:
+                rows = future.result()
+            except (HttpError, ValueError, KeyError, TypeError) as e:
+                summary.failed += 1
+                logger.warning("backfill_request_failed", symbol=req.asset.symbol, vendor=req.asset.vendor,
+                               error=str(e)[:120])
+                # Not marked: retried on the next run
+                continue
+            summary.bars += rows
+            summary.missing_sessions += req.missing
+            if rows:
+                summary.filled += 1
+            else:
+                summary.empty += 1
+            progress.mark(req, "filled" if rows else "empty", rows)
+            if i % 100 == 0:
+                logger.info("backfill_progress", done=i, total=len(pending), bars=summary.bars,
+                            failed=summary.failed)
+
+    logger.info("backfill_complete", **{k: v for k, v in asdict(summary).items()})
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gap-aware OHLCV backfill")
+    parser.add_argument("--asset-type", nargs="+", default=["equity"],
+                        choices=["equity", "crypto", "etf", "index", "commodity"])
+    parser.add_argument("--start", type=date.fromisoformat, default=DEFAULT_HISTORY_START)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Default: yesterday (UTC)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--progress", default="backfill_progress.jsonl",
+                        help="JSON-lines progress file ('' to disable)")
+    parser.add_argument("--fill-head", action="store_true",
+                        help="Also fill sessions before each asset's first bar")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without fetching")
+    args = parser.parse_args(argv)
+
+    end = args.end or datetime.now(timezone.utc).date() - timedelta(days=1)
+    db = Database(max_size=args.workers + 1)
+    db.connect()
+    try:
+        assets = load_assets(db, args.asset_type, args.limit)
+        requests = plan_backfill(db, assets, args.start, end, args.fill_head)
+        gaps = sum(len(r.gaps) for r in requests)
+        sessions = sum(r.missing for r in requests)
+        outputsizes = {size: sum(1 for r in requests if r.outputsize == size) for size in ("compact", "full")}
+        logger.info("backfill_planned", assets=len(assets), requests=len(requests), gaps=gaps,
+                    missing_sessions=sessions, av_outputsize=outputsizes)
+        if args.dry_run:
+            for req in requests:
+                print(f"{req.asset.symbol:<12} {req.asset.vendor:<13} {req.start} .. {req.end} "
+                      f"gaps={len(req.gaps)} missing={req.missing} {req.outputsize or req.days or ''}")
+            return
+        run_backfill(db, requests, args.workers, BackfillProgress(args.progress or None))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Vectorized backtesting over a panel of assets."""
+
+from .panel import Panel
+from .entries import entry_mask
+from .exits import EXIT_REASONS, resolve_exits
+from .engine import Backtester, BacktestResult, BacktestSetup, FRICTION, summarize
+
+__all__ = [
+    "Panel",
+    "Backtester",
+    "BacktestResult",
+    "BacktestSetup",
+    "FRICTION",
+    "EXIT_REASONS",
+    "entry_mask",
+    "resolve_exits",
+    "summarize",
+]
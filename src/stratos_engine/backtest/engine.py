@@ -0,0 +1,237 @@
+"""Event-driven backtest over a whole panel at once.
+
+Entry candidates for a setup are one vectorized mask over every asset. Trades
+are then opened in rounds: each round takes the next candidate of every asset
+that is flat, resolves all of those exits together (see exits.py) and moves
+each asset's cursor past its exit bar. One position per asset and setup, as in
+the backtest scripts, so the number of rounds is the largest trade count of
+any single asset rather than the number of rows.
+
+Usage:
+    panel = Panel.from_frames(data_cache, symbols=dict(universe))
+    bt = Backtester(panel)
+    result = bt.run(BacktestSetup('oversold_bounce', entry_conditions, exit_config))
+    result.metrics['profit_factor'], result.trades  # metrics dict, trade ledger
+    results = bt.run_all(SETUPS.values())
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .entries import entry_mask
+from .exits import EXIT_REASONS, resolve_exits
+from .panel import Panel
+
+FRICTION = 0.0015  # 0.15% per side
+
+LEDGER_COLUMNS = [
+    'asset_id', 'symbol', 'setup', 'entry_date', 'entry_price',
+    'exit_date', 'exit_price', 'exit_reason', 'return_pct', 'hold_days',
+]
+
+
+@dataclass
+class BacktestSetup:
+    """A setup to test: entry conditions and exit rules (scripts' SetupConfig shape)."""
+    name: str
+    entry_conditions: Dict[str, Any]
+    exit_config: Dict[str, Any]
+    category: str = ''
+
+
+@dataclass
+class BacktestResult:
+    """Trade ledger and summary metrics for one setup."""
+    setup: str
+    category: str
+    trades: pd.DataFrame
+    metrics: Dict[str, Any]
+    seconds: float = 0.0
+
+    def to_dict(self, trade_details: int = 100) -> Dict[str, Any]:
+        """Rounded summary in the backtest scripts' JSON layout."""
+        m = self.metrics
+        out = {
+            'setup': self.setup,
+            'category': self.category,
+            'trades': m['trades'],
+            'win_rate': round(m['win_rate'] * 100, 1),
+            'profit_factor': round(m['profit_factor'], 2),
+            'avg_return': round(m['avg_return'] * 100, 2),
+            'avg_hold_days': round(m['avg_hold_days'], 1),
+            'max_drawdown': round(m['max_drawdown'] * 100, 2),
+        }
+        if m['trades']:
+            out['exit_reasons'] = m['exit_reasons']
+            details = self.trades.head(trade_details)
+            out['trade_details'] = [
+                {
+                    'symbol': t.symbol,
+                    'entry_date': t.entry_date,
+                    'exit_date': t.exit_date,
+                    'return_pct': round(t.return_pct * 100, 2),
+                    'hold_days': int(t.hold_days),
+                    'exit_reason': t.exit_reason,
+                }
+                for t in details.itertuples(index=False)
+            ]
+        return out
+
+
+def summarize(trades: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Win rate, profit factor, average return/hold and drawdown of a ledger.
+
+    Profit factor uses the scripts' definition (sum of winning returns over
+    sum of losing returns, losses floored at 0.0001). Drawdown is the largest
+    peak-to-trough fall of the cumulative per-trade return, trades ordered by
+    exit date (equal size per trade, no compounding).
+    """
+    if trades.empty:
+        return {
+            'trades': 0,
+            'win_rate': 0.0,
+            'profit_factor': 0.0,
+            'avg_return': 0.0,
+            'avg_hold_days': 0.0,
+            'max_drawdown': 0.0,
+            'exit_reasons': {},
+        }
+
+    returns = trades['return_pct'].to_numpy()
+    wins = returns[returns > 0]
+    losses = returns[returns <= 0]
+    gross_loss = abs(losses.sum()) if len(losses) else 0.0001
+
+    ordered = trades.sort_values(['exit_date', 'entry_date'], kind='stable')['return_pct'].to_numpy()
+    equity = np.concatenate([[0.0], np.cumsum(ordered)])
+    drawdown = np.maximum.accumulate(equity) - equity
+
+    return {
+        'trades': int(len(returns)),
+        'win_rate': float(len(wins) / len(returns)),
+        'profit_factor': float(wins.sum() / gross_loss) if gross_loss > 0 else 0.0,
+        'avg_return': float(returns.mean()),
+        'avg_hold_days': float(trades['hold_days'].mean()),
+        'max_drawdown': float(drawdown.max()),
+        'exit_reasons': {k: int(v) for k, v in trades['exit_reason'].value_counts().items()},
+    }
+
+
+class Backtester:
+    """Runs setups over a Panel with vectorized entries and batched exits."""
+
+    def __init__(
+        self,
+        panel: Panel,
+        warmup: int = 20,
+        min_bars: int = 50,
+        friction: float = FRICTION,
+        intrabar: Optional[str] = None,
+    ):
+        """
+        Args:
+            panel: All assets' rows
+            warmup: First bar (per asset) that may be an entry
+            min_bars: Assets with fewer rows are skipped
+            friction: Cost per side, applied to entry and exit prices
+            intrabar: "ohlc" (bar high/low) or "atr" (close +/- 0.5 ATR);
+                      defaults to "ohlc" when the panel has high/low columns
+        """
+        self.panel = panel
+        self.warmup = warmup
+        self.min_bars = min_bars
+        self.friction = friction
+        if intrabar is None:
+            intrabar = 'ohlc' if panel.column('high') is not None and panel.column('low') is not None else 'atr'
+        self.intrabar = intrabar
+
+        eligible = panel.asset_lengths() >= min_bars
+        self._tradable = eligible[panel.row_asset] & (panel.row_pos >= warmup)
+
+    def entry_candidates(self, entry_conditions: Dict[str, Any]) -> np.ndarray:
+        """Panel rows where the setup's entry conditions hold (sorted)."""
+        return np.flatnonzero(entry_mask(self.panel, entry_conditions) & self._tradable)
+
+    def simulate(self, entry_conditions: Dict[str, Any], exit_config: Dict[str, Any]):
+        """
+        Non-overlapping trades per asset.
+
+        Returns:
+            (entry_rows, exit_rows, exit_prices, reason codes), ordered by asset then entry
+        """
+        panel = self.panel
+        candidates = self.entry_candidates(entry_conditions)
+        if len(candidates) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0), np.empty(0, dtype=np.int8)
+
+        # Per-asset cursor into `candidates`
+        cursor = np.searchsorted(candidates, panel.offsets[:-1])
+        stop = np.searchsorted(candidates, panel.offsets[1:])
+        open_assets = np.flatnonzero(cursor < stop)
+
+        entries: List[np.ndarray] = []
+        exits: List[np.ndarray] = []
+        prices: List[np.ndarray] = []
+        reasons: List[np.ndarray] = []
+        while len(open_assets):
+            entry_rows = candidates[cursor[open_assets]]
+            exit_rows, exit_prices, exit_reasons = resolve_exits(panel, entry_rows, exit_config, self.intrabar)
+            entries.append(entry_rows)
+            exits.append(exit_rows)
+            prices.append(exit_prices)
+            reasons.append(exit_reasons)
+
+            # Next candidate strictly after the exit bar
+            cursor[open_assets] = np.searchsorted(candidates, exit_rows, side='right')
+            open_assets = open_assets[cursor[open_assets] < stop[open_assets]]
+
+        entry_rows = np.concatenate(entries)
+        order = np.argsort(entry_rows, kind='stable')
+        return (
+            entry_rows[order],
+            np.concatenate(exits)[order],
+            np.concatenate(prices)[order],
+            np.concatenate(reasons)[order],
+        )
+
+    def ledger(self, setup_name: str, entry_rows, exit_rows, exit_prices, reasons) -> pd.DataFrame:
+        """Trade ledger DataFrame (LEDGER_COLUMNS) from simulate() output."""
+        panel = self.panel
+        entry_prices = panel.columns['close'][entry_rows]
+        returns = (exit_prices * (1 - self.friction)) / (entry_prices * (1 + self.friction)) - 1
+        asset_ids = panel.asset_ids[panel.row_asset[entry_rows]]
+        return pd.DataFrame({
+            'asset_id': asset_ids,
+            'symbol': [panel.symbols.get(int(a)) for a in asset_ids],
+            'setup': setup_name,
+            'entry_date': panel.dates[entry_rows].astype(str),
+            'entry_price': entry_prices,
+            'exit_date': panel.dates[exit_rows].astype(str),
+            'exit_price': exit_prices,
+            'exit_reason': np.asarray(EXIT_REASONS, dtype=object)[reasons],
+            'return_pct': returns,
+            'hold_days': exit_rows - entry_rows,
+        }, columns=LEDGER_COLUMNS)
+
+    def run(self, setup: Any) -> BacktestResult:
+        """Backtest one setup (BacktestSetup or any object with name/entry_conditions/exit_config)."""
+        start = time.time()
+        simulated = self.simulate(setup.entry_conditions, setup.exit_config)
+        trades = self.ledger(setup.name, *simulated)
+        return BacktestResult(
+            setup=setup.name,
+            category=getattr(setup, 'category', ''),
+            trades=trades,
+            metrics=summarize(trades),
+            seconds=time.time() - start,
+        )
+
+    def run_all(self, setups: Iterable[Any]) -> Dict[str, BacktestResult]:
+        """Backtest several setups over the same panel."""
+        return {setup.name: self.run(setup) for setup in setups}
@@ -0,0 +1,58 @@
+"""Vectorized entry conditions.
+
+Conditions use the format of the backtest scripts' SETUPS:
+
+    {
+        'rsi_14': ('lt', 30),
+        'ma_dist_50': ('range', -0.03, 0.02),
+        'above_ma200': ('eq', True),      # or just: 'above_ma200': True
+    }
+
+A row qualifies when every condition holds. A missing column or a NaN value
+never qualifies, matching check_entry_conditions in the scripts.
+"""
+
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from .panel import Panel
+
+_OPS: Dict[str, Callable[..., np.ndarray]] = {
+    'lt': lambda v, x: v < x,
+    'le': lambda v, x: v <= x,
+    'gt': lambda v, x: v > x,
+    'ge': lambda v, x: v >= x,
+    'eq': lambda v, x: v == x,
+    'ne': lambda v, x: v != x,
+    'range': lambda v, lo, hi: (v >= lo) & (v <= hi),
+}
+
+
+def condition_mask(values: np.ndarray, condition: Any) -> np.ndarray:
+    """Rows of one float column satisfying one condition (NaN never does)."""
+    with np.errstate(invalid='ignore'):
+        if isinstance(condition, bool):
+            # Bool columns are stored as 0/1
+            matched = values == float(condition)
+        elif isinstance(condition, tuple):
+            op, *args = condition
+            if op not in _OPS:
+                raise ValueError(f"Unknown entry condition operator: {op}")
+            matched = _OPS[op](values, *args)
+        elif callable(condition):
+            matched = np.asarray(condition(values), dtype=bool)
+        else:
+            raise ValueError(f"Unsupported entry condition: {condition!r}")
+    return matched & ~np.isnan(values)
+
+
+def entry_mask(panel: Panel, conditions: Dict[str, Any]) -> np.ndarray:
+    """Boolean mask over all panel rows where every condition holds."""
+    mask = np.ones(len(panel), dtype=bool)
+    for key, condition in conditions.items():
+        values = panel.column(key)
+        if values is None:
+            return np.zeros(len(panel), dtype=bool)
+        mask &= condition_mask(values, condition)
+    return mask
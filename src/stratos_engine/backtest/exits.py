@@ -0,0 +1,169 @@
+"""Vectorized exit resolution.
+
+Resolves the exit of many open trades at once: each trade's holding window is
+gathered into a (trades x max_hold) matrix and every exit rule becomes a
+boolean matrix. The exit is the first bar where any rule fires, with the
+scripts' priority within a bar:
+
+    stop_loss > trailing_stop > take_profit > target_ma > breakdown_ma
+
+and a time stop at max_hold bars (or the last bar of the asset) otherwise.
+
+Supported exit_config keys (same as the backtest scripts):
+    stop_atr_mult              stop at entry - mult * entry ATR
+    target_pct                 take profit at entry * (1 + pct)
+    trailing_activation_pct    trail once the high-water mark gains this much
+    trailing_atr_mult          trail distance in entry ATRs (default 3.0)
+    target_ma_dist             exit at close once ma_dist_20 >= value
+    target_ma                  exit at the MA once the high reaches sma_<N>
+    breakdown_ma_dist[_20|_50|_200]
+                               exit at close once ma_dist_<N> < value (_20 if no suffix)
+    breakdown_ma               exit at close once it is below sma_<N>
+    max_hold_days / time_stop_days (default 60)
+
+Intrabar highs/lows are either the bar's high/low columns ("ohlc") or
+estimated as close +/- 0.5 ATR ("atr"), for feature panels without high/low.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .panel import Panel
+
+EXIT_REASONS = (
+    'stop_loss',
+    'trailing_stop',
+    'take_profit',
+    'target_ma',
+    'breakdown_ma',
+    'time_stop',
+)
+TIME_STOP = EXIT_REASONS.index('time_stop')
+
+DEFAULT_MAX_HOLD = 60
+DEFAULT_TRAILING_ATR_MULT = 3.0
+FALLBACK_ATR_PCT = 0.02
+
+_BREAKDOWN_DIST_COLUMNS = (
+    ('breakdown_ma_dist_200', 'ma_dist_200'),
+    ('breakdown_ma_dist_50', 'ma_dist_50'),
+    ('breakdown_ma_dist_20', 'ma_dist_20'),
+    ('breakdown_ma_dist', 'ma_dist_20'),
+)
+
+# Cells per gathered window matrix; larger batches are split
+_MAX_CELLS = 4_000_000
+
+
+def max_hold(exit_config: Dict) -> int:
+    return int(exit_config.get('max_hold_days', exit_config.get('time_stop_days', DEFAULT_MAX_HOLD)))
+
+
+def _required(panel: Panel, name: str) -> np.ndarray:
+    values = panel.column(name)
+    if values is None:
+        raise KeyError(f"Panel has no '{name}' column")
+    return values
+
+
+def resolve_exits(
+    panel: Panel,
+    entries: np.ndarray,
+    exit_config: Dict,
+    intrabar: str = 'atr',
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Exit bar, price and reason for trades entered at the close of `entries` rows.
+
+    Returns:
+        (exit_rows, exit_prices, reason codes indexing EXIT_REASONS)
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    hold = max_hold(exit_config)
+    if len(entries) == 0:
+        return entries.copy(), np.empty(0), np.empty(0, dtype=np.int8)
+
+    batch = max(1, _MAX_CELLS // max(hold, 1))
+    if len(entries) > batch:
+        parts = [resolve_exits(panel, entries[i:i + batch], exit_config, intrabar)
+                 for i in range(0, len(entries), batch)]
+        return tuple(np.concatenate(p) for p in zip(*parts))
+
+    close = _required(panel, 'close')
+    atr = panel.column('atr_14')
+    if atr is None:
+        atr = np.full(len(panel), np.nan)
+
+    entry_price = close[entries]
+    entry_atr = np.where(np.isnan(atr[entries]), entry_price * FALLBACK_ATR_PCT, atr[entries])
+    ends = panel.row_end[entries]
+
+    # Window matrix: bar k of trade t is row entries[t] + k + 1
+    rows = entries[:, None] + np.arange(1, hold + 1)[None, :]
+    valid = rows < ends[:, None]
+    rows = np.minimum(rows, len(panel) - 1)
+
+    bar_close = close[rows]
+    if intrabar == 'ohlc':
+        bar_high = _required(panel, 'high')[rows]
+        bar_low = _required(panel, 'low')[rows]
+    elif intrabar == 'atr':
+        bar_atr = atr[rows]
+        bar_atr = np.where(np.isnan(bar_atr), entry_atr[:, None], bar_atr)
+        bar_high = bar_close + bar_atr * 0.5
+        bar_low = bar_close - bar_atr * 0.5
+    else:
+        raise ValueError(f"Unknown intrabar mode: {intrabar}")
+
+    n = len(entries)
+    fired = np.zeros((len(EXIT_REASONS) - 1, n, hold), dtype=bool)
+    prices = np.empty((len(EXIT_REASONS) - 1, n, hold))
+
+    with np.errstate(invalid='ignore'):
+        if 'stop_atr_mult' in exit_config:
+            stop = entry_price - entry_atr * exit_config['stop_atr_mult']
+            fired[0] = (bar_low <= stop[:, None]) & (stop != 0)[:, None]
+            prices[0] = stop[:, None]
+
+        if 'trailing_activation_pct' in exit_config:
+            # High-water mark including the entry close; the trail only ratchets up
+            highest = np.fmax.accumulate(np.fmax(bar_high, entry_price[:, None]), axis=1)
+            active = (highest - entry_price[:, None]) / entry_price[:, None] >= exit_config['trailing_activation_pct']
+            trail = highest - (exit_config.get('trailing_atr_mult', DEFAULT_TRAILING_ATR_MULT) * entry_atr)[:, None]
+            fired[1] = active & (trail != 0) & (bar_low <= trail)
+            prices[1] = trail
+
+        if 'target_pct' in exit_config:
+            target = entry_price * (1 + exit_config['target_pct'])
+            fired[2] = (bar_high >= target[:, None]) & (target != 0)[:, None]
+            prices[2] = target[:, None]
+
+        if 'target_ma_dist' in exit_config:
+            fired[3] = _required(panel, 'ma_dist_20')[rows] >= exit_config['target_ma_dist']
+            prices[3] = bar_close
+        elif 'target_ma' in exit_config:
+            ma = _required(panel, f"sma_{exit_config['target_ma']}")[rows]
+            fired[3] = bar_high >= ma
+            prices[3] = ma
+
+        breakdown = np.zeros((n, hold), dtype=bool)
+        for key, column in _BREAKDOWN_DIST_COLUMNS:
+            if key in exit_config:
+                breakdown |= _required(panel, column)[rows] < exit_config[key]
+        if 'breakdown_ma' in exit_config:
+            breakdown |= bar_close < _required(panel, f"sma_{exit_config['breakdown_ma']}")[rows]
+        fired[4] = breakdown
+        prices[4] = bar_close
+
+    fired &= valid[None, :, :]
+    any_fired = fired.any(axis=0)
+    has_exit = any_fired.any(axis=1)
+    first_bar = np.argmax(any_fired, axis=1)
+    trade = np.arange(n)
+    reason = np.argmax(fired[:, trade, first_bar], axis=0)
+
+    exit_rows = np.where(has_exit, entries + first_bar + 1, np.minimum(entries + hold, ends - 1))
+    exit_prices = np.where(has_exit, prices[reason, trade, first_bar], close[exit_rows])
+    reasons = np.where(has_exit, reason, TIME_STOP).astype(np.int8)
+    return exit_rows, exit_prices, reasons
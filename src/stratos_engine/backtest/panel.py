@@ -0,0 +1,116 @@
+"""Columnar panel of per-asset daily rows for vectorized backtests."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(values: pd.Series) -> Optional[np.ndarray]:
+    """Column -> float64 (bool as 0/1, None/unparseable as NaN); None for non-numeric columns."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return None
+    try:
+        # Handles bool, Decimal and None (-> NaN) in object columns
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        converted = pd.to_numeric(values, errors='coerce')
+        if converted.notna().any():
+            return converted.to_numpy(dtype=np.float64)
+        return None
+
+
+@dataclass
+class Panel:
+    """
+    All assets' rows in one set of arrays, sorted by (asset_id, date).
+
+    Rows of asset k are offsets[k]:offsets[k + 1]. Every numeric input column
+    is stored as float64 so entry conditions and exit rules are plain array
+    operations over the whole universe.
+    """
+    asset_ids: np.ndarray
+    offsets: np.ndarray
+    dates: np.ndarray
+    columns: Dict[str, np.ndarray]
+    symbols: Dict[int, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        lengths = np.diff(self.offsets)
+        # Per-row lookups used by the exit resolver
+        self.row_asset = np.repeat(np.arange(len(self.asset_ids)), lengths)
+        self.row_end = np.repeat(self.offsets[1:], lengths)
+        self.row_pos = np.arange(len(self.dates)) - np.repeat(self.offsets[:-1], lengths)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbols: Optional[Mapping[int, str]] = None) -> 'Panel':
+        """Build from a long DataFrame with asset_id, date and feature columns."""
+        df = df.sort_values(['asset_id', 'date'], kind='stable').reset_index(drop=True)
+        asset_col = df['asset_id'].to_numpy(dtype=np.int64)
+        asset_ids, starts = np.unique(asset_col, return_index=True)
+        offsets = np.append(starts, len(df)).astype(np.int64)
+
+        columns = {}
+        for name in df.columns:
+            if name in ('asset_id', 'date'):
+                continue
+            values = _as_float(df[name])
+            if values is not None:
+                columns[name] = values
+
+        return cls(
+            asset_ids=asset_ids,
+            offsets=offsets,
+            dates=pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]'),
+            columns=columns,
+            symbols=dict(symbols or {}),
+        )
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Mapping[int, pd.DataFrame],
+        symbols: Optional[Mapping[int, str]] = None,
+    ) -> 'Panel':
+        """Build from {asset_id: DataFrame} as loaded by the backtest scripts (date column or index)."""
+        parts = []
+        for asset_id, df in frames.items():
+            if df is None or df.empty:
+                continue
+            if 'date' not in df.columns:
+                df = df.reset_index()
+            parts.append(df.assign(asset_id=asset_id))
+        if not parts:
+            return cls(
+                asset_ids=np.empty(0, dtype=np.int64),
+                offsets=np.zeros(1, dtype=np.int64),
+                dates=np.empty(0, dtype='datetime64[D]'),
+                columns={},
+                symbols=dict(symbols or {}),
+            )
+        return cls.from_frame(pd.concat(parts, ignore_index=True), symbols)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, name: str) -> Optional[np.ndarray]:
+        return self.columns.get(name)
+
+    def asset_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def select(self, asset_ids: Iterable[int]) -> 'Panel':
+        """Sub-panel with only the given assets."""
+        keep = np.isin(self.asset_ids, np.fromiter(asset_ids, dtype=np.int64))
+        rows = np.concatenate([
+            np.arange(self.offsets[k], self.offsets[k + 1]) for k in np.flatnonzero(keep)
+        ]) if keep.any() else np.empty(0, dtype=np.int64)
+        lengths = self.asset_lengths()[keep]
+        return Panel(
+            asset_ids=self.asset_ids[keep],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            dates=self.dates[rows],
+            columns={name: values[rows] for name, values in self.columns.items()},
+            symbols=self.symbols,
+        )
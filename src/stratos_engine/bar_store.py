@@ -0,0 +1,539 @@
+"""
+Local columnar cache of daily_bars (Arrow IPC, memory-mapped).
+
+Bars are partitioned into asset_id buckets. Each bucket is a list of Arrow IPC
+segment files sorted by (asset_id, date), so reading one asset is a binary
+search plus a zero-copy slice of a memory-mapped file, and reading a panel is
+a zero-copy concatenation of bucket tables. New bars are appended as small
+delta segments (later segments win on the same asset/date) and a bucket is
+compacted back to one segment once it collects too many.
+
+The store is filled from Postgres with sync(), which re-pulls a short window
+before the last synced date so late corrections are picked up, and can be fed
+directly by ingest code with append().
+
+Only depends on numpy/pandas/psycopg2 plus pyarrow (optional: pip install
+pyarrow) so the standalone jobs/ scripts can use it.
+
+Usage:
+    store = BarStore.from_env()          # None unless BAR_STORE_DIR is set
+    store.sync(conn)                     # incremental pull from daily_bars
+    bars = store.read(asset_id, end='2025-01-10', lookback_days=300)
+    panel = store.read_panel(asset_ids, start='2024-01-01')
+
+    # shared per process, re-synced when behind `end` or older than
+    # BAR_STORE_SYNC_TTL seconds; None -> query Postgres
+    store = get_shared_store(conn, end='2025-01-10')
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+STORE_ENV = 'BAR_STORE_DIR'
+SYNC_TTL_ENV = 'BAR_STORE_SYNC_TTL'
+FORMAT_VERSION = 1
+
+DEFAULT_BUCKETS = 64
+MAX_SEGMENTS_PER_BUCKET = 8
+RESYNC_DAYS = 7
+SYNC_CHUNK_ROWS = 200_000
+# Shared store: re-sync after this many seconds, and at most this often when behind `end`
+DEFAULT_SYNC_TTL = 900
+MIN_RESYNC_SECONDS = 60
+
+DateLike = Union[str, date, datetime, None]
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:
+        raise ImportError("BarStore requires pyarrow. Run: pip install pyarrow") from e
+    return pa
+
+
+def _day_number(value: DateLike) -> Optional[int]:
+    """Date-like -> days since epoch (Arrow date32), None passes through."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d').date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+def _schema():
+    pa = _require_pyarrow()
+    return pa.schema(
+        [('asset_id', pa.int64()), ('date', pa.date32())]
+        + [(col, pa.float64()) for col in BAR_COLUMNS]
+    )
+
+
+def _normalize(df: pd.DataFrame):
+    """Bars frame -> Arrow table sorted by (asset_id, date), last row wins per key."""
+    pa = _require_pyarrow()
+    frame = pd.DataFrame({
+        'asset_id': df['asset_id'].astype('int64').values,
+        'date': pd.to_datetime(df['date']).values.astype('datetime64[D]'),
+    })
+    for col in BAR_COLUMNS:
+        frame[col] = pd.to_numeric(df[col], errors='coerce').astype('float64').values if col in df else np.nan
+    frame = frame.drop_duplicates(subset=['asset_id', 'date'], keep='last')
+    frame = frame.sort_values(['asset_id', 'date'], kind='stable')
+    return pa.Table.from_pandas(frame, schema=_schema(), preserve_index=False)
+
+
+class _Segment:
+    """One memory-mapped segment with its asset_id offsets."""
+
+    def __init__(self, path: str):
+        pa = _require_pyarrow()
+        self.path = path
+        self.table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        asset_ids = self.table.column('asset_id').to_numpy()
+        self.asset_ids, self.starts = np.unique(asset_ids, return_index=True)
+        self.ends = np.append(self.starts[1:], len(asset_ids))
+
+    def rows(self, asset_id: int) -> Optional[Tuple[int, int]]:
+        i = np.searchsorted(self.asset_ids, asset_id)
+        if i == len(self.asset_ids) or self.asset_ids[i] != asset_id:
+            return None
+        return int(self.starts[i]), int(self.ends[i])
+
+    def asset_slice(self, asset_id: int):
+        bounds = self.rows(asset_id)
+        if bounds is None:
+            return None
+        return self.table.slice(bounds[0], bounds[1] - bounds[0])
+
+
+class BarStore:
+    """Partitioned, memory-mapped daily bar cache."""
+
+    def __init__(self, root: str, buckets: int = DEFAULT_BUCKETS):
+        _require_pyarrow()
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._segments: Dict[str, _Segment] = {}
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._manifest = self._load_manifest(default_buckets=buckets)
+        self.buckets = self._manifest['buckets']
+        if self._manifest_mtime is None:
+            with self._writer() as manifest:
+                self._write_manifest(manifest)
+
+    @classmethod
+    def from_env(cls) -> Optional['BarStore']:
+        """Store at $BAR_STORE_DIR, or None when unset (callers fall back to Postgres)."""
+        root = os.environ.get(STORE_ENV)
+        if not root:
+            return None
+        return cls(root)
+
+    # ------------------------------------------------------------------
+    # Manifest and files
+    # ------------------------------------------------------------------
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, 'manifest.json')
+
+    def _load_manifest(self, default_buckets: Optional[int] = None) -> dict:
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            mtime = None
+            manifest = {
+                'format': FORMAT_VERSION,
+                'buckets': default_buckets or self.buckets,
+                'next_segment': 1,
+                'synced_through': None,
+                'segments': {},
+            }
+        if manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported bar store format {manifest.get('format')} at {self.root}")
+        self._manifest_mtime = mtime
+        return manifest
+
+    def _refresh(self) -> None:
+        """Pick up segments written by other processes."""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime:
+            self._manifest = self._load_manifest()
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp = self._manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._manifest_path)
+        self._manifest = manifest
+        self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+
+    @contextmanager
+    def _writer(self):
+        """Exclusive writer lock (threads and processes); yields a fresh manifest copy."""
+        with self._lock, open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield json.loads(json.dumps(self._load_manifest()))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _bucket(self, asset_id: int) -> str:
+        return f"{int(asset_id) % self.buckets:03d}"
+
+    def _segment(self, name: str) -> _Segment:
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = _Segment(os.path.join(self.root, name))
+            self._segments[name] = segment
+        return segment
+
+    def _bucket_segments(self, bucket: str) -> List[_Segment]:
+        return [self._segment(name) for name in self._manifest['segments'].get(bucket, [])]
+
+    def _write_segment(self, manifest: dict, bucket: str, table) -> str:
+        pa = _require_pyarrow()
+        name = os.path.join(f"b{bucket}", f"seg-{manifest['next_segment']:08d}.arrow")
+        manifest['next_segment'] += 1
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        return name
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, bars: pd.DataFrame) -> int:
+        """
+        Add or overwrite bars (asset_id, date, open, high, low, close, volume).
+
+        Writes one delta segment per touched bucket; buckets over
+        MAX_SEGMENTS_PER_BUCKET segments are compacted.
+
+        Returns:
+            Number of distinct (asset_id, date) rows written
+        """
+        if bars is None or bars.empty:
+            return 0
+        pa = _require_pyarrow()
+        table = _normalize(bars)
+        buckets = (table.column('asset_id').to_numpy() % self.buckets)
+
+        with self._writer() as manifest:
+            for b in np.unique(buckets):
+                bucket = f"{int(b):03d}"
+                part = table.filter(pa.array(buckets == b))
+                names = manifest['segments'].setdefault(bucket, [])
+                names.append(self._write_segment(manifest, bucket, part))
+                if len(names) > MAX_SEGMENTS_PER_BUCKET:
+                    self._compact_bucket(manifest, bucket)
+            self._write_manifest(manifest)
+        return table.num_rows
+
+    def _compact_bucket(self, manifest: dict, bucket: str) -> None:
+        """Merge a bucket's segments into one (later segments win)."""
+        pa = _require_pyarrow()
+        old = manifest['segments'].get(bucket, [])
+        if len(old) <= 1:
+            return
+        tables = [_Segment(os.path.join(self.root, name)).table for name in old]
+        merged = pa.concat_tables(tables).to_pandas(date_as_object=False)
+        new_name = self._write_segment(manifest, bucket, _normalize(merged))
+        manifest['segments'][bucket] = [new_name]
+        for name in old:
+            self._segments.pop(name, None)
+            try:
+                # Readers holding an mmap keep their view until they drop it
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def compact(self) -> None:
+        """Compact every bucket to a single segment."""
+        with self._writer() as manifest:
+            for bucket in list(manifest['segments']):
+                self._compact_bucket(manifest, bucket)
+            self._write_manifest(manifest)
+
+    def sync(self, conn, full: bool = False, resync_days: int = RESYNC_DAYS) -> int:
+        """
+        Pull daily_bars rows from Postgres into the store.
+
+        Incremental by default: re-reads every asset from resync_days before
+        the last synced date, so corrections to recent bars are picked up.
+        Streams through a server-side cursor in SYNC_CHUNK_ROWS chunks.
+
+        Returns:
+            Rows pulled
+        """
+        start = time.time()
+        synced_through = None if full else self._manifest.get('synced_through')
+        since = None
+        if synced_through:
+            since = (datetime.strptime(synced_through, '%Y-%m-%d') - timedelta(days=resync_days)).date()
+
+        query = f"SELECT asset_id, date, {', '.join(BAR_COLUMNS)} FROM daily_bars"
+        params: tuple = ()
+        if since is not None:
+            query += " WHERE date >= %s"
+            params = (since,)
+
+        rows = 0
+        max_date = None
+        autocommit = conn.autocommit
+        if autocommit:
+            # Named cursors need a transaction
+            conn.autocommit = False
+        try:
+            with conn.cursor(name='bar_store_sync') as cur:
+                cur.itersize = SYNC_CHUNK_ROWS
+                cur.execute(query, params)
+                while True:
+                    chunk = cur.fetchmany(SYNC_CHUNK_ROWS)
+                    if not chunk:
+                        break
+                    frame = pd.DataFrame(chunk, columns=['asset_id', 'date'] + BAR_COLUMNS)
+                    rows += self.append(frame)
+                    chunk_max = max(frame['date'])
+                    max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+            conn.commit()
+        finally:
+            if autocommit:
+                conn.autocommit = True
+
+        if max_date is not None:
+            with self._writer() as manifest:
+                previous = manifest.get('synced_through')
+                latest = str(max_date)[:10]
+                manifest['synced_through'] = max(previous, latest) if previous else latest
+                self._write_manifest(manifest)
+        if full:
+            self.compact()
+
+        logger.info(f"Bar store sync: {rows} rows in {time.time() - start:.1f}s "
+                    f"(through {self._manifest.get('synced_through')})")
+        return rows
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def read_table(
+        self,
+        asset_id: int,
+        start: DateLike = None,
+        end: DateLike = None,
+        limit: Optional[int] = None,
+    ):
+        """
+        One asset's bars as an Arrow table (date ascending).
+
+        Zero-copy when the asset lives in a single segment (the usual case
+        after compaction); otherwise the overlapping slices are merged.
+
+        Args:
+            start/end: Inclusive date bounds
+            limit: Keep only the last `limit` bars (after the bounds)
+        """
+        pa = _require_pyarrow()
+        with self._lock:
+            self._refresh()
+            segments = self._bucket_segments(self._bucket(asset_id))
+            slices = [s for s in (seg.asset_slice(asset_id) for seg in segments) if s is not None]
+
+        if not slices:
+            table = _schema().empty_table()
+        elif len(slices) == 1:
+            table = slices[0]
+        else:
+            merged = pa.concat_tables(slices).to_pandas(date_as_object=False)
+            table = _normalize(merged)
+
+        days = table.column('date').cast(pa.int32()).to_numpy()
+        lo = 0 if start is None else int(np.searchsorted(days, _day_number(start), side='left'))
+        hi = len(days) if end is None else int(np.searchsorted(days, _day_number(end), side='right'))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return table.slice(lo, max(hi - lo, 0))
+
+    def read(
+        self,
+        asset_id: int,
+        start: DateLike = None,
+        end: DateLike = None,
+        limit: Optional[int] = None,
+        lookback_days: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        One asset's bars as a DataFrame: date (datetime64), open, high, low, close, volume.
+
+        lookback_days is the calendar-day window ending at `end`, matching the
+        get_bars_for_asset(asset_id, end_date, lookback_days) helpers in jobs/.
+        Returns an empty DataFrame when the store has no bars for the asset.
+        """
+        if lookback_days is not None and end is not None and start is None:
+            start = datetime.strptime(str(end)[:10], '%Y-%m-%d') - timedelta(days=lookback_days)
+        table = self.read_table(asset_id, start=start, end=end, limit=limit)
+        if table.num_rows == 0:
+            return pd.DataFrame()
+        df = table.drop(['asset_id']).to_pandas(date_as_object=False)
+        df['date'] = df['date'].astype('datetime64[ns]')
+        return df
+
+    def read_panel_table(
+        self,
+        asset_ids: Optional[Iterable[int]] = None,
+        start: DateLike = None,
+        end: DateLike = None,
+        columns: Optional[Sequence[str]] = None,
+    ):
+        """
+        Bars for many assets as one Arrow table (asset_id, date ascending per asset).
+
+        Without date bounds the result is a zero-copy concatenation of the
+        mapped segments.
+        """
+        pa = _require_pyarrow()
+        import pyarrow.compute as pc
+
+        with self._lock:
+            self._refresh()
+            buckets = sorted(self._manifest['segments'])
+            if asset_ids is not None:
+                asset_ids = sorted({int(a) for a in asset_ids})
+                buckets = sorted({self._bucket(a) for a in asset_ids})
+            single = all(len(self._manifest['segments'].get(b, [])) == 1 for b in buckets)
+
+        if asset_ids is not None and not single:
+            parts = [self.read_table(a, start=start, end=end) for a in asset_ids]
+        else:
+            with self._lock:
+                tables = [seg.table for b in buckets for seg in self._bucket_segments(b)]
+            parts = []
+            if tables:
+                table = pa.concat_tables(tables)
+                if not single:
+                    table = _normalize(table.to_pandas(date_as_object=False))
+                mask = None
+                if asset_ids is not None:
+                    mask = pc.is_in(table.column('asset_id'), value_set=pa.array(asset_ids, pa.int64()))
+                if start is not None:
+                    cond = pc.greater_equal(table.column('date').cast(pa.int32()), _day_number(start))
+                    mask = cond if mask is None else pc.and_(mask, cond)
+                if end is not None:
+                    cond = pc.less_equal(table.column('date').cast(pa.int32()), _day_number(end))
+                    mask = cond if mask is None else pc.and_(mask, cond)
+                parts = [table.filter(mask) if mask is not None else table]
+
+        table = pa.concat_tables(parts) if parts else _schema().empty_table()
+        if columns is not None:
+            table = table.select(['asset_id', 'date'] + [c for c in columns if c not in ('asset_id', 'date')])
+        return table
+
+    def read_panel(
+        self,
+        asset_ids: Optional[Iterable[int]] = None,
+        start: DateLike = None,
+        end: DateLike = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Bars for many assets as a long DataFrame (asset_id, date, OHLCV)."""
+        return self.read_panel_table(asset_ids, start=start, end=end, columns=columns) \
+            .to_pandas(date_as_object=False)
+
+    def last_date(self, asset_id: int) -> Optional[date]:
+        """Latest bar date stored for an asset."""
+        table = self.read_table(asset_id, limit=1)
+        if table.num_rows == 0:
+            return None
+        return table.column('date')[0].as_py()
+
+    @property
+    def synced_through(self) -> Optional[str]:
+        self._refresh()
+        return self._manifest.get('synced_through')
+
+
+_shared_store: Optional[BarStore] = None
+_shared_lock = threading.Lock()
+_shared_loaded = False
+_shared_synced_at: Optional[float] = None
+
+
+def _behind(store: BarStore, end: DateLike) -> bool:
+    """True when the store has not been synced through `end`."""
+    if end is None:
+        return False
+    synced_through = store.synced_through
+    return synced_through is None or str(end)[:10] > synced_through
+
+
+def _needs_sync(store: BarStore, end: DateLike) -> bool:
+    if _shared_synced_at is None:
+        return True
+    age = time.monotonic() - _shared_synced_at
+    if age >= float(os.environ.get(SYNC_TTL_ENV) or DEFAULT_SYNC_TTL):
+        return True
+    return age >= MIN_RESYNC_SECONDS and _behind(store, end)
+
+
+def get_shared_store(conn=None, end: DateLike = None) -> Optional[BarStore]:
+    """
+    Process-wide store from $BAR_STORE_DIR, kept current from `conn`.
+
+    Writers may call it without a connection (append only). Readers pass a
+    connection and the last date they need: the incremental sync runs on
+    first use, again once it is older than BAR_STORE_SYNC_TTL seconds, and
+    again (at most every MIN_RESYNC_SECONDS) while the store is synced only
+    up to a date before `end`. A store still behind `end` after that returns
+    None, as does an unset BAR_STORE_DIR, missing pyarrow or a failed sync,
+    so callers keep their Postgres query as the fallback.
+    """
+    global _shared_store, _shared_loaded, _shared_synced_at
+    if not (_shared_loaded and (conn is None or _shared_store is None or not _needs_sync(_shared_store, end))):
+        with _shared_lock:
+            try:
+                if not _shared_loaded:
+                    _shared_store = BarStore.from_env()
+                # Re-checked under the lock: another thread may have just synced
+                if _shared_store is not None and conn is not None and _needs_sync(_shared_store, end):
+                    _shared_store.sync(conn)
+                    _shared_synced_at = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Bar store disabled, reading bars from Postgres: {e}")
+                _shared_store = None
+            _shared_loaded = True
+    store = _shared_store
+    if conn is not None and store is not None and _behind(store, end):
+        logger.debug(f"Bar store synced through {store.synced_through}, reading {end} from Postgres")
+        return None
+    return store
@@ -0,0 +1,198 @@
+"""
+Whole-market end-of-day bars from vendor bulk endpoints.
+
+The OHLCV jobs fetch the latest bar of every symbol in a few calls instead of
+one history request per symbol:
+
+- FMP bulk EOD (/stable/eod-bulk?date=...): one CSV with every symbol's bar
+  for a date, all exchanges
+- AlphaVantage REALTIME_BULK_QUOTES: up to 100 US symbols per call
+
+Only symbols still missing after the bulk pass are fetched per symbol.
+BulkReconciliation records which symbols each pass covered and which are
+still missing, for the job's log and an optional JSON report.
+
+The helpers build request tuples and parse responses; callers send them
+through stratos_engine.http (HttpClient or the shared SyncHttpClient):
+
+    text = await http.get_text(*fmp_bulk_eod_request(target_date, FMP_API_KEY))
+    bars = parse_fmp_bulk_eod(text, target_date)            # {symbol: bar}
+
+    responses = await http.gather(av_bulk_quote_requests(symbols, AV_API_KEY))
+    bars = parse_av_bulk_quotes(responses, target_date)
+"""
+
+import csv
+import io
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FMP_BULK_EOD_PATH = "/stable/eod-bulk"
+AV_BULK_QUOTES_PER_CALL = 100
+
+# Bar dicts use FMP's field names so parse_daily_data_fmp-style parsers accept them
+BAR_FIELDS = ("open", "high", "low", "close", "adjClose", "volume")
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or value == "" or value == "None":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bar(symbol: str, date: str, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Bar dict from a vendor row, or None if a price field is missing."""
+    bar = {"symbol": symbol, "date": date}
+    for name in BAR_FIELDS:
+        bar[name] = _to_float(row.get(name))
+    if any(bar[name] is None for name in ("open", "high", "low", "close")):
+        return None
+    if bar["adjClose"] is None:
+        bar["adjClose"] = bar["close"]
+    if bar["volume"] is None:
+        bar["volume"] = 0.0
+    return bar
+
+
+# ============================================================================
+# FMP bulk EOD
+# ============================================================================
+
+def fmp_bulk_eod_request(target_date: str, api_key: str) -> Tuple:
+    """(vendor, path, params) for every symbol's EOD bar on target_date (fetch with get_text)."""
+    return ("fmp", FMP_BULK_EOD_PATH, {"date": target_date, "apikey": api_key})
+
+
+def parse_fmp_bulk_eod(text: str, target_date: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Bars by symbol from the bulk EOD CSV (rows for other dates are dropped).
+
+    An error payload (JSON instead of CSV, e.g. plan not entitled) yields an
+    empty dict, so callers fall back to per-symbol fetches.
+    """
+    stripped = text.lstrip()
+    if not stripped or stripped[0] in "{[":
+        logger.warning(f"FMP bulk EOD returned no CSV: {stripped[:120]}")
+        return {}
+
+    bars: Dict[str, Dict[str, Any]] = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        symbol = (row.get("symbol") or "").strip()
+        if not symbol or row.get("date") != target_date:
+            continue
+        bar = _bar(symbol, target_date, row)
+        if bar is not None:
+            bars[symbol] = bar
+    return bars
+
+
+# ============================================================================
+# AlphaVantage bulk quotes
+# ============================================================================
+
+def av_bulk_quote_requests(symbols: Sequence[str], api_key: str) -> List[Tuple]:
+    """(vendor, path, params) tuples covering `symbols`, 100 per call."""
+    return [
+        ("alphavantage", "/query", {
+            "function": "REALTIME_BULK_QUOTES",
+            "symbol": ",".join(symbols[i:i + AV_BULK_QUOTES_PER_CALL]),
+            "apikey": api_key,
+        })
+        for i in range(0, len(symbols), AV_BULK_QUOTES_PER_CALL)
+    ]
+
+
+def parse_av_bulk_quotes(responses: Iterable[Any], target_date: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Bars by symbol from REALTIME_BULK_QUOTES responses.
+
+    Quotes whose timestamp is not on target_date (stale, or fetched before the
+    close was published) are dropped. Failed responses (exceptions from
+    gather, error messages) are skipped.
+    """
+    bars: Dict[str, Dict[str, Any]] = {}
+    for data in responses:
+        if isinstance(data, Exception):
+            logger.warning(f"AV bulk quotes request failed: {data}")
+            continue
+        if not isinstance(data, dict) or not isinstance(data.get("data"), list):
+            message = data.get("Error Message") or data.get("Information") if isinstance(data, dict) else data
+            logger.warning(f"AV bulk quotes returned no data: {str(message)[:120]}")
+            continue
+        for quote in data["data"]:
+            symbol = quote.get("symbol")
+            if not symbol or not str(quote.get("timestamp", "")).startswith(target_date):
+                continue
+            bar = _bar(symbol, target_date, quote)
+            if bar is not None:
+                bars[symbol] = bar
+    return bars
+
+
+# ============================================================================
+# Reconciliation
+# ============================================================================
+
+@dataclass
+class BulkReconciliation:
+    """Which expected symbols each pass covered, and which are still missing."""
+    target_date: str
+    expected: List[str]
+    # pass name -> symbols it supplied, in pass order
+    passes: Dict[str, List[str]] = field(default_factory=dict)
+    bulk_passes: List[str] = field(default_factory=list)
+
+    def covered(self) -> set:
+        return {symbol for symbols in self.passes.values() for symbol in symbols}
+
+    def missing(self) -> List[str]:
+        covered = self.covered()
+        return [symbol for symbol in self.expected if symbol not in covered]
+
+    def record(self, name: str, symbols: Iterable[str], bulk: bool = False) -> List[str]:
+        """Record the expected, not yet covered symbols a pass supplied; returns them."""
+        covered = self.covered()
+        wanted = set(self.expected)
+        new = [s for s in dict.fromkeys(symbols) if s in wanted and s not in covered]
+        self.passes[name] = self.passes.get(name, []) + new
+        if bulk and name not in self.bulk_passes:
+            self.bulk_passes.append(name)
+        return new
+
+    def to_dict(self) -> Dict[str, Any]:
+        bulk_covered = {s for name in self.bulk_passes for s in self.passes[name]}
+        missing_after_bulk = [s for s in self.expected if s not in bulk_covered]
+        missing = self.missing()
+        return {
+            "target_date": self.target_date,
+            "expected": len(self.expected),
+            "covered": len(self.expected) - len(missing),
+            "by_pass": {name: len(symbols) for name, symbols in self.passes.items()},
+            "missing_after_bulk": missing_after_bulk,
+            "recovered_by_fallback": [s for s in missing_after_bulk if s not in missing],
+            "missing": missing,
+        }
+
+    def log_summary(self, log: logging.Logger = logger) -> None:
+        report = self.to_dict()
+        passes = ", ".join(f"{name}={count}" for name, count in report["by_pass"].items()) or "none"
+        log.info(f"Reconciliation {self.target_date}: {report['covered']}/{report['expected']} symbols "
+                 f"({passes}); {len(report['missing_after_bulk'])} missing after bulk, "
+                 f"{len(report['recovered_by_fallback'])} recovered by fallback, "
+                 f"{len(report['missing'])} still missing")
+        if report["missing"]:
+            sample = ", ".join(report["missing"][:20])
+            more = f" (+{len(report['missing']) - 20} more)" if len(report["missing"]) > 20 else ""
+            log.info(f"  Still missing: {sample}{more}")
+
+    def write(self, path: str) -> None:
+        """Write the report as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,322 @@
+"""
+Bulk upsert via COPY for Stratos Engine.
+
+Streams a DataFrame into a temporary staging table with COPY and merges it into
+the target with a single set-based INSERT ... ON CONFLICT. This replaces the
+row-dict upserts (PostgREST batches, per-row cursor.execute) used for
+daily_features and daily_bars.
+
+Only depends on psycopg2/pandas/numpy so the standalone jobs/ scripts can use it
+without the rest of the engine's dependencies.
+
+With isolate_rejects=True a batch the database refuses (a constraint or
+type error in some rows) is not lost: it is split in halves under savepoints
+until the offending rows are found, so the good rows are still written in a
+few batches and each bad row is reported in result.rejects.
+
+Usage:
+    conn = psycopg2.connect(DATABASE_URL)
+    result = bulk_upsert(conn, 'daily_features', features_df, ('asset_id', 'date'))
+    print(result.rows, result.rows_per_sec)
+"""
+
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RejectedRow:
+    """A row that was not written: its index label in the frame and why."""
+    index: Any
+    error: str
+
+
+@dataclass
+class BulkWriteResult:
+    """Outcome of one bulk upsert."""
+    table: str
+    rows: int
+    seconds: float
+    rejects: List[RejectedRow] = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+
+def _table_identifier(table: str) -> sql.Identifier:
+    """'schema.table' or 'table' -> quoted identifier."""
+    return sql.Identifier(*table.split('.'))
+
+
+def _to_csv(df: pd.DataFrame) -> io.StringIO:
+    """
+    Serialize a frame for COPY ... (FORMAT csv, NULL '\\N').
+
+    NaN/None and +-inf become NULL; dict/list cells become JSON text.
+    """
+    out = df.copy()
+    for col in out.columns:
+        series = out[col]
+        if series.dtype == object:
+            if series.map(lambda v: isinstance(v, (dict, list))).any():
+                out[col] = series.map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+        elif pd.api.types.is_float_dtype(series):
+            out[col] = series.replace([np.inf, -np.inf], np.nan)
+
+    buf = io.StringIO()
+    out.to_csv(buf, header=False, index=False, na_rep='\\N')
+    buf.seek(0)
+    return buf
+
+
+def copy_frame(cur, table, df: pd.DataFrame) -> int:
+    """
+    COPY df into `table` (plain append, no conflict handling) on the given cursor.
+
+    Args:
+        cur: psycopg2 cursor
+        table: 'table', 'schema.table' or a psycopg2.sql identifier
+        df: Rows to write; column names must match the table
+
+    Returns:
+        Number of rows copied
+    """
+    if df.empty:
+        return 0
+    if isinstance(table, str):
+        table = _table_identifier(table)
+    cols = sql.SQL(', ').join(map(sql.Identifier, df.columns))
+    cur.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(table, cols),
+        _to_csv(df)
+    )
+    return len(df)
+
+
+def _create_staging(cur, table: str, columns: Sequence[str], row_number: bool = False) -> sql.Identifier:
+    """Empty temp table (dropped on commit) with the target's types for `columns`."""
+    staging = sql.Identifier(f"_bulk_{table.split('.')[-1]}")
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging))
+    cur.execute(
+        sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA")
+        .format(staging, sql.SQL(', ').join(map(sql.Identifier, columns)), _table_identifier(table))
+    )
+    if row_number:
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN _row bigint PRIMARY KEY").format(staging))
+    return staging
+
+
+def _merge_statement(
+    table: str,
+    staging: sql.Identifier,
+    columns: Sequence[str],
+    conflict_columns: Sequence[str],
+    update_columns: Sequence[str],
+    touch_columns: Sequence[str],
+    where: sql.Composable = sql.SQL(''),
+) -> sql.Composed:
+    assignments = [sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in update_columns]
+    assignments += [sql.SQL("{} = NOW()").format(sql.Identifier(c)) for c in touch_columns]
+    if assignments:
+        action = sql.SQL("DO UPDATE SET ") + sql.SQL(', ').join(assignments)
+    else:
+        action = sql.SQL("DO NOTHING")
+
+    cols = sql.SQL(', ').join(map(sql.Identifier, columns))
+    return (
+        sql.SQL("INSERT INTO {target} ({cols}) SELECT {cols} FROM {staging}{where} ON CONFLICT ({keys}) {action}")
+        .format(
+            target=_table_identifier(table),
+            cols=cols,
+            staging=staging,
+            where=where,
+            keys=sql.SQL(', ').join(map(sql.Identifier, conflict_columns)),
+            action=action,
+        )
+    )
+
+
+def copy_upsert(
+    cur,
+    table: str,
+    df: pd.DataFrame,
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    touch_columns: Sequence[str] = (),
+) -> int:
+    """
+    COPY df into a staging table and merge it into `table` on the given cursor.
+
+    Runs inside the caller's transaction; the caller commits.
+
+    Args:
+        cur: psycopg2 cursor
+        table: Target table ('table' or 'schema.table')
+        df: Rows to write; column names must match the target table
+        conflict_columns: Unique key for ON CONFLICT (e.g. asset_id, date)
+        update_columns: Columns overwritten on conflict (default: all non-key
+            columns; empty means DO NOTHING)
+        touch_columns: Columns set to NOW() on conflict (e.g. updated_at)
+
+    Returns:
+        Number of rows sent (after de-duplicating on the conflict key)
+    """
+    if df.empty:
+        return 0
+
+    columns = list(df.columns)
+    # ON CONFLICT can't touch the same target row twice in one statement
+    df = df.drop_duplicates(subset=list(conflict_columns), keep='last')
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in conflict_columns]
+
+    staging = _create_staging(cur, table, columns)
+    copy_frame(cur, staging, df)
+    cur.execute(_merge_statement(table, staging, columns, conflict_columns, update_columns, touch_columns))
+    return len(df)
+
+
+# Errors caused by row values; anything else (missing table, lost
+# connection) is not a row's fault and propagates
+_ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+def _error_line(error: Exception) -> str:
+    return str(error).strip().splitlines()[0]
+
+
+def copy_upsert_isolating(
+    cur,
+    table: str,
+    df: pd.DataFrame,
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    touch_columns: Sequence[str] = (),
+) -> Tuple[int, List[RejectedRow]]:
+    """
+    copy_upsert that isolates the rows the database rejects.
+
+    Rows with a NULL conflict key are rejected up front. The rest is staged
+    once, numbered; a COPY or merge that fails is rolled back to a savepoint
+    and retried as two halves (merges by row-number range of the staging
+    table), recursively, so a few bad rows cost a few extra statements
+    instead of one round trip per row. Must run inside a transaction; the
+    caller commits.
+
+    Returns:
+        (rows written, rejected rows; index = df index label)
+    """
+    rejects: List[RejectedRow] = []
+    if df.empty:
+        return 0, rejects
+
+    columns = list(df.columns)
+    null_key = df[list(conflict_columns)].isna().any(axis=1).to_numpy()
+    for index in df.index[null_key]:
+        rejects.append(RejectedRow(index, f"NULL in conflict key ({', '.join(conflict_columns)})"))
+    df = df[~null_key].drop_duplicates(subset=list(conflict_columns), keep='last')
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in conflict_columns]
+    if df.empty:
+        return 0, rejects
+
+    labels = df.index.tolist()
+    numbered = df.assign(_row=np.arange(len(df)))
+    staged = np.zeros(len(df), dtype=bool)
+    staging = _create_staging(cur, table, columns, row_number=True)
+
+    def load(lo: int, hi: int) -> None:
+        cur.execute("SAVEPOINT bulk_load")
+        try:
+            copy_frame(cur, staging, numbered.iloc[lo:hi])
+        except _ROW_ERRORS as e:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_load")
+            if hi - lo == 1:
+                rejects.append(RejectedRow(labels[lo], _error_line(e)))
+                return
+            mid = (lo + hi) // 2
+            load(lo, mid)
+            load(mid, hi)
+            return
+        cur.execute("RELEASE SAVEPOINT bulk_load")
+        staged[lo:hi] = True
+
+    def merge(lo: int, hi: int) -> int:
+        rows = int(staged[lo:hi].sum())
+        if rows == 0:
+            return 0
+        where = sql.SQL(" WHERE _row >= {} AND _row < {}").format(sql.Literal(lo), sql.Literal(hi))
+        statement = _merge_statement(table, staging, columns, conflict_columns, update_columns,
+                                     touch_columns, where)
+        try:
+            # One round trip when the range merges cleanly
+            cur.execute(sql.SQL("SAVEPOINT bulk_merge; {}; RELEASE SAVEPOINT bulk_merge").format(statement))
+        except _ROW_ERRORS as e:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_merge")
+            if rows == 1:
+                rejects.append(RejectedRow(labels[lo + int(np.argmax(staged[lo:hi]))], _error_line(e)))
+                return 0
+            mid = (lo + hi) // 2
+            return merge(lo, mid) + merge(mid, hi)
+        return rows
+
+    load(0, len(df))
+    return merge(0, len(df)), rejects
+
+
+def bulk_upsert(
+    conn,
+    table: str,
+    df: pd.DataFrame,
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    touch_columns: Sequence[str] = (),
+    isolate_rejects: bool = False,
+) -> BulkWriteResult:
+    """
+    Bulk upsert df into `table` in its own transaction and log rows/sec.
+
+    Works on autocommit connections too (autocommit is suspended for the
+    duration so the staging table lives until the merge). With
+    isolate_rejects, rows the database refuses are reported in
+    result.rejects instead of failing the whole write.
+    """
+    start = time.time()
+    rejects = []
+    autocommit = conn.autocommit
+    if autocommit:
+        conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            if isolate_rejects:
+                rows, rejects = copy_upsert_isolating(cur, table, df, conflict_columns,
+                                                      update_columns, touch_columns)
+            else:
+                rows = copy_upsert(cur, table, df, conflict_columns, update_columns, touch_columns)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if autocommit:
+            conn.autocommit = True
+
+    result = BulkWriteResult(table, rows, time.time() - start, rejects)
+    if rows:
+        logger.info(f"Bulk upsert {table}: {rows} rows in {result.seconds:.2f}s "
+                    f"({result.rows_per_sec:,.0f} rows/s)")
+    if rejects:
+        logger.warning(f"Bulk upsert {table}: {len(rejects)} rows rejected (see result.rejects)")
+    return result
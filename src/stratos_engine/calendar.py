@@ -0,0 +1,334 @@
+"""
+Exchange session calendars.
+
+Each calendar is the sorted array of its trading sessions (datetime64[D])
+between CALENDAR_START and CALENDAR_END. The array is built once per process
+from rule-based holidays (fixed dates, weekend substitutes, nth-weekday and
+Easter-relative holidays, plus one-off closures) and cached, so lookups are
+binary searches over the array and accept scalars or arrays:
+
+    cal = calendar_for('equity', 'VOD.L')          # XLON
+    cal.is_session('2025-12-26')                   # False (Boxing Day)
+    cal.previous_session('2026-01-05')             # date(2026, 1, 2)
+    cal.previous_session(dates, count=300)         # 300 sessions back, vectorized
+    cal.sessions_between('2026-01-01', '2026-01-31')
+
+Calendars:
+    XNYS     NYSE / NASDAQ (unsuffixed equities, ETFs, indices)
+    XLON     London (.L)
+    XETR     Xetra / Frankfurt (.DE, .F)
+    XPAR     Euronext (.PA, .AS, .BR, .LS)
+    XTSE     Toronto (.TO, .V)
+    XASX     Australia (.AX)
+    WEEKDAYS Monday-Friday without holidays (commodities, exchanges without rules)
+    24/7     Every day (crypto)
+"""
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_START = date(1990, 1, 1)
+CALENDAR_END = date(2060, 12, 31)
+
+MON, TUE, WED, THU, FRI, SAT, SUN = range(7)
+
+
+# ============================================================================
+# Holiday rules
+# ============================================================================
+
+def easter(year: int) -> date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday_shift = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday_shift) // 451
+    month, day = divmod(h + weekday_shift - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th `weekday` of the month (n=-1 for the last)."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def nearest_weekday(day: date) -> date:
+    """US-style observance: Saturday -> Friday, Sunday -> Monday."""
+    if day.weekday() == SAT:
+        return day - timedelta(days=1)
+    if day.weekday() == SUN:
+        return day + timedelta(days=1)
+    return day
+
+
+def next_monday(day: date) -> date:
+    """Weekend holidays are observed on the following Monday."""
+    return day + timedelta(days=(7 - day.weekday()) % 7) if day.weekday() >= SAT else day
+
+
+def christmas_and_boxing_day(year: int) -> List[date]:
+    """Dec 25 and 26, each moved to the next free weekday when on a weekend."""
+    days = []
+    for day in (date(year, 12, 25), date(year, 12, 26)):
+        while day.weekday() >= SAT or day in days:
+            day += timedelta(days=1)
+        days.append(day)
+    return days
+
+
+def _nyse(year: int) -> List[date]:
+    days = []
+    new_year = date(year, 1, 1)
+    # No Friday observance when Jan 1 is a Saturday
+    if new_year.weekday() != SAT:
+        days.append(nearest_weekday(new_year))
+    if year >= 1998:
+        days.append(nth_weekday(year, 1, MON, 3))        # Martin Luther King Jr. Day
+    days += [
+        nth_weekday(year, 2, MON, 3),                    # Presidents' Day
+        easter(year) - timedelta(days=2),                # Good Friday
+        nth_weekday(year, 5, MON, -1),                   # Memorial Day
+        nearest_weekday(date(year, 7, 4)),               # Independence Day
+        nth_weekday(year, 9, MON, 1),                    # Labor Day
+        nth_weekday(year, 11, THU, 4),                   # Thanksgiving
+        nearest_weekday(date(year, 12, 25)),             # Christmas
+    ]
+    if year >= 2022:
+        days.append(nearest_weekday(date(year, 6, 19)))  # Juneteenth
+    return days
+
+
+_NYSE_CLOSURES = [
+    "1994-04-27",                                        # Nixon funeral
+    "2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14",
+    "2004-06-11",                                        # Reagan funeral
+    "2007-01-02",                                        # Ford funeral
+    "2012-10-29", "2012-10-30",                          # Hurricane Sandy
+    "2018-12-05",                                        # G.H.W. Bush funeral
+    "2025-01-09",                                        # Carter funeral
+]
+
+
+def _lse(year: int) -> List[date]:
+    good_friday = easter(year) - timedelta(days=2)
+    days = [next_monday(date(year, 1, 1)), good_friday, good_friday + timedelta(days=3)]
+    # Early May and spring bank holidays, with the years they were moved
+    early_may = {1995: date(1995, 5, 8), 2020: date(2020, 5, 8)}
+    spring = {2002: [date(2002, 6, 3), date(2002, 6, 4)],
+              2012: [date(2012, 6, 4), date(2012, 6, 5)],
+              2022: [date(2022, 6, 2), date(2022, 6, 3)]}
+    days.append(early_may.get(year, nth_weekday(year, 5, MON, 1)))
+    days += spring.get(year, [nth_weekday(year, 5, MON, -1)])
+    days.append(nth_weekday(year, 8, MON, -1))           # Summer bank holiday
+    return days + christmas_and_boxing_day(year)
+
+
+_LSE_CLOSURES = ["1999-12-31", "2011-04-29", "2022-09-19", "2023-05-08"]
+
+
+def _xetra(year: int) -> List[date]:
+    good_friday = easter(year) - timedelta(days=2)
+    days = [date(year, 1, 1), good_friday, good_friday + timedelta(days=3), date(year, 5, 1),
+            date(year, 12, 24), date(year, 12, 25), date(year, 12, 26), date(year, 12, 31)]
+    return days
+
+
+def _euronext(year: int) -> List[date]:
+    good_friday = easter(year) - timedelta(days=2)
+    return [date(year, 1, 1), good_friday, good_friday + timedelta(days=3), date(year, 5, 1),
+            date(year, 12, 25), date(year, 12, 26)]
+
+
+def _tsx(year: int) -> List[date]:
+    days = [next_monday(date(year, 1, 1))]
+    if year >= 2008:
+        days.append(nth_weekday(year, 2, MON, 3))        # Family Day
+    victoria = date(year, 5, 24)
+    days += [
+        easter(year) - timedelta(days=2),                # Good Friday
+        victoria - timedelta(days=victoria.weekday()),   # Victoria Day (Monday before May 25)
+        next_monday(date(year, 7, 1)),                   # Canada Day
+        nth_weekday(year, 8, MON, 1),                    # Civic Holiday
+        nth_weekday(year, 9, MON, 1),                    # Labour Day
+        nth_weekday(year, 10, MON, 2),                   # Thanksgiving
+    ]
+    return days + christmas_and_boxing_day(year)
+
+
+def _asx(year: int) -> List[date]:
+    good_friday = easter(year) - timedelta(days=2)
+    days = [
+        next_monday(date(year, 1, 1)),
+        next_monday(date(year, 1, 26)),                  # Australia Day
+        good_friday,
+        good_friday + timedelta(days=3),                 # Easter Monday
+        date(year, 4, 25),                               # Anzac Day (not substituted)
+        nth_weekday(year, 6, MON, 2),                    # King's Birthday
+    ]
+    return days + christmas_and_boxing_day(year)
+
+
+def _no_holidays(year: int) -> List[date]:
+    return []
+
+
+# name -> (holiday rule per year, one-off closures, weekmask)
+EXCHANGES: Dict[str, tuple] = {
+    "XNYS": (_nyse, _NYSE_CLOSURES, "1111100"),
+    "XLON": (_lse, _LSE_CLOSURES, "1111100"),
+    "XETR": (_xetra, [], "1111100"),
+    "XPAR": (_euronext, [], "1111100"),
+    "XTSE": (_tsx, [], "1111100"),
+    "XASX": (_asx, [], "1111100"),
+    "WEEKDAYS": (_no_holidays, [], "1111100"),
+    "24/7": (_no_holidays, [], "1111111"),
+}
+
+# Symbol suffix (after the last '.') -> calendar
+SUFFIX_CALENDARS = {
+    "L": "XLON",
+    "DE": "XETR", "F": "XETR",
+    "PA": "XPAR", "AS": "XPAR", "BR": "XPAR", "LS": "XPAR",
+    "TO": "XTSE", "V": "XTSE",
+    "AX": "XASX",
+}
+
+
+# ============================================================================
+# Calendar
+# ============================================================================
+
+def _as_days(value: Any) -> np.ndarray:
+    """Dates (str, date, datetime, numpy/pandas arrays) as a datetime64[D] array."""
+    if isinstance(value, np.ndarray) and value.dtype.kind == "M":
+        return value.astype("datetime64[D]")
+    if isinstance(value, (str, date, datetime, np.datetime64, pd.Timestamp)):
+        return np.atleast_1d(np.datetime64(pd.Timestamp(value).date(), "D"))
+    return pd.to_datetime(pd.Index(value)).values.astype("datetime64[D]")
+
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (str, date, datetime, np.datetime64, pd.Timestamp))
+
+
+def _out(days: np.ndarray, scalar: bool):
+    """Scalar lookups return datetime.date, array lookups datetime64[D]."""
+    return days[0].astype(object) if scalar else days
+
+
+class SessionCalendar:
+    """Sorted trading sessions of one exchange, with vectorized lookups."""
+
+    def __init__(self, name: str, sessions: np.ndarray):
+        self.name = name
+        self.sessions = sessions.astype("datetime64[D]")
+        self.first = self.sessions[0]
+        self.last = self.sessions[-1]
+
+    def __repr__(self) -> str:
+        return f"SessionCalendar({self.name!r}, {self.first}..{self.last}, {len(self.sessions)} sessions)"
+
+    def _check(self, days: np.ndarray) -> None:
+        if len(days) and (days.min() < self.first - 7 or days.max() > self.last):
+            raise ValueError(f"{self.name} calendar covers {self.first}..{self.last}")
+
+    def is_session(self, dates: Any):
+        """True where the date is a trading session."""
+        days = _as_days(dates)
+        self._check(days)
+        idx = np.searchsorted(self.sessions, days)
+        found = (idx < len(self.sessions)) & (self.sessions[np.minimum(idx, len(self.sessions) - 1)] == days)
+        return bool(found[0]) if _is_scalar(dates) else found
+
+    def session_on_or_before(self, dates: Any):
+        """Latest session on or before each date."""
+        days = _as_days(dates)
+        self._check(days)
+        idx = np.searchsorted(self.sessions, days, side="right") - 1
+        return _out(self.sessions[idx], _is_scalar(dates))
+
+    def previous_session(self, dates: Any, count: int = 1):
+        """The session `count` sessions before each date (the date itself excluded)."""
+        days = _as_days(dates)
+        self._check(days)
+        idx = np.searchsorted(self.sessions, days, side="left") - count
+        if len(idx) and idx.min() < 0:
+            raise ValueError(f"{self.name} calendar starts at {self.first}")
+        return _out(self.sessions[idx], _is_scalar(dates))
+
+    def next_session(self, dates: Any, count: int = 1):
+        """The session `count` sessions after each date (the date itself excluded)."""
+        days = _as_days(dates)
+        self._check(days)
+        idx = np.searchsorted(self.sessions, days, side="right") + count - 1
+        if len(idx) and idx.max() >= len(self.sessions):
+            raise ValueError(f"{self.name} calendar ends at {self.last}")
+        return _out(self.sessions[idx], _is_scalar(dates))
+
+    def sessions_between(self, start: Any, end: Any) -> np.ndarray:
+        """Sessions in [start, end] as datetime64[D]."""
+        lo, hi = _as_days(start)[0], _as_days(end)[0]
+        self._check(np.array([lo, hi]))
+        return self.sessions[np.searchsorted(self.sessions, lo):np.searchsorted(self.sessions, hi, side="right")]
+
+    def session_count(self, start: Any, end: Any):
+        """Number of sessions in (start, end], vectorized over either argument."""
+        lo, hi = _as_days(start), _as_days(end)
+        self._check(np.concatenate([lo, hi]))
+        count = (np.searchsorted(self.sessions, hi, side="right")
+                 - np.searchsorted(self.sessions, lo, side="right"))
+        return int(count[0]) if _is_scalar(start) and _is_scalar(end) else count
+
+
+def _build(name: str) -> np.ndarray:
+    rule, closures, weekmask = EXCHANGES[name]
+    holidays = [d for year in range(CALENDAR_START.year, CALENDAR_END.year + 1) for d in rule(year)]
+    holidays += [date.fromisoformat(d) for d in closures]
+    days = np.arange(np.datetime64(CALENDAR_START, "D"), np.datetime64(CALENDAR_END, "D") + 1)
+    busdays = np.busdaycalendar(weekmask=weekmask, holidays=np.array(holidays, dtype="datetime64[D]"))
+    return days[np.is_busday(days, busdaycal=busdays)]
+
+
+@lru_cache(maxsize=None)
+def get_calendar(name: str) -> SessionCalendar:
+    """Cached calendar by name (see EXCHANGES)."""
+    if name not in EXCHANGES:
+        raise KeyError(f"Unknown calendar {name!r}; known: {', '.join(EXCHANGES)}")
+    return SessionCalendar(name, _build(name))
+
+
+def calendar_name(asset_type: Optional[str], symbol: Optional[str] = None) -> str:
+    """Calendar name for an asset: crypto trades daily, suffixed symbols use their exchange."""
+    if asset_type == "crypto":
+        return "24/7"
+    if asset_type == "commodity":
+        return "WEEKDAYS"
+    if symbol and "." in symbol:
+        return SUFFIX_CALENDARS.get(symbol.rsplit(".", 1)[1].upper(), "WEEKDAYS")
+    return "XNYS"
+
+
+def calendar_for(asset_type: Optional[str], symbol: Optional[str] = None) -> SessionCalendar:
+    """Cached calendar for an asset (see calendar_name)."""
+    return get_calendar(calendar_name(asset_type, symbol))
+
+
+def group_by_calendar(assets: Iterable[Any], key: Callable[[Any], tuple]) -> Dict[str, List[Any]]:
+    """Assets grouped by calendar name; key(asset) -> (asset_type, symbol)."""
+    groups: Dict[str, List[Any]] = {}
+    for asset in assets:
+        groups.setdefault(calendar_name(*key(asset)), []).append(asset)
+    return groups
@@ -2,7 +2,7 @@
 
 import os
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 
@@ -25,6 +25,17 @@ class SupabaseConfig:
     db_user: str = field(default_factory=lambda: os.getenv("SUPABASE_DB_USER", "postgres"))
     db_password: str = field(default_factory=lambda: os.getenv("SUPABASE_DB_PASSWORD", ""))
     
+    # Connection pool (one connection checked out per thread)
+    pool_min_size: int = field(default_factory=lambda: int(os.getenv("DB_POOL_MIN_SIZE", "1")))
+    pool_max_size: int = field(default_factory=lambda: int(os.getenv("DB_POOL_MAX_SIZE", "10")))
+    pool_checkout_timeout: float = field(
+        default_factory=lambda: float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))
+    )
+    # Ping a connection before use if it has been idle this long (seconds, 0 disables)
+    pool_health_check_interval: float = field(
+        default_factory=lambda: float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+    )
+    
     @property
     def connection_string(self) -> str:
         """Get PostgreSQL connection string. DATABASE_URL takes precedence."""
@@ -45,6 +56,20 @@ class OpenAIConfig:
     base_url: Optional[str] = field(default_factory=lambda: os.getenv("OPENAI_BASE_URL"))
 
 
+def parse_concurrency_limits(spec: str) -> Dict[str, int]:
+    """Parse "dimension:value=limit,..." into {"dimension:value": limit}."""
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, limit = item.partition("=")
+        if ":" not in key or not limit.strip().isdigit():
+            raise ValueError(f"Invalid WORKER_CONCURRENCY_LIMITS entry: {item!r}")
+        limits[key.strip()] = int(limit)
+    return limits
+
+
 @dataclass
 class WorkerConfig:
     """Worker process configuration."""
@@ -59,6 +84,22 @@ class WorkerConfig:
         default_factory=lambda: int(os.getenv("WORKER_MAX_RETRIES", "3"))
     )
     queue_name: str = "signal_engine_jobs"
+    
+    # Jobs run concurrently by one worker process
+    max_concurrent_jobs: int = field(
+        default_factory=lambda: int(os.getenv("WORKER_MAX_CONCURRENT_JOBS", "4"))
+    )
+    # Per-dimension caps, e.g. "universe_id:*=1,job_type:daily_run=2"
+    # ("*" applies to every value without its own entry)
+    concurrency_limits: Dict[str, int] = field(
+        default_factory=lambda: parse_concurrency_limits(
+            os.getenv("WORKER_CONCURRENCY_LIMITS", "universe_id:*=1")
+        )
+    )
+    # Seconds between heartbeats / visibility-timeout extensions per running job
+    heartbeat_interval: int = field(
+        default_factory=lambda: int(os.getenv("WORKER_HEARTBEAT_INTERVAL", "60"))
+    )
 
 
 @dataclass
@@ -71,6 +112,10 @@ class EngineConfig:
     ai_budget_per_run: int = field(
         default_factory=lambda: int(os.getenv("AI_BUDGET_PER_RUN", "50"))
     )
+    # Where per-stage profiles go for jobs submitted with "profile": "cprofile" | "pyinstrument"
+    profile_dir: str = field(
+        default_factory=lambda: os.getenv("PIPELINE_PROFILE_DIR", "/tmp/stratos_profiles")
+    )
     template_version: str = "v3.2"
     feature_version: str = "v2"
 
@@ -1,85 +1,268 @@
-"""Database connection utilities for Stratos Engine."""
+"""Database connection utilities for Stratos Engine.
+
+Database wraps a thread-safe psycopg2 connection pool. Each thread checks out
+its own connection on first use and keeps it until release() (or close()), so
+threads such as the worker heartbeat never share a connection with the
+pipeline; connections of threads that exit without release() are reclaimed
+when the pool runs short. Size DB_POOL_MAX_SIZE for the number of threads
+that touch the database. Standalone statements commit individually; statements issued inside
+transaction() on the same thread share a single commit.
+
+Usage:
+    db.execute("UPDATE ...", params)             # own commit
+    with db.transaction() as cur:                # one commit for all
+        cur.execute("UPDATE ...")
+        db.execute_values("INSERT ... VALUES %s", rows)
+    db.copy("staging_table", df)                 # COPY FROM STDIN
+    df = db.fetch_frame(query, params, columns=[...])  # server-side cursor, typed
+"""
 
 from contextlib import contextmanager
-from typing import Any, Dict, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, List, Optional, Sequence
+import threading
 import time
 
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 import structlog
 
+from . import stream, telemetry
+from .bulk_writer import BulkWriteResult, copy_frame, copy_upsert, copy_upsert_isolating
 from .config import config
 
 logger = structlog.get_logger()
 
+# Keepalives for stability on long-lived pooled connections
+CONNECT_KWARGS = dict(
+    connect_timeout=10,
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=5,
+)
+
+_CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class _Checkout:
+    """A pooled connection held by one thread."""
+    
+    def __init__(self, conn, pool, slots: threading.BoundedSemaphore):
+        self.conn = conn
+        self.pool = pool
+        self.slots = slots
+        self.depth = 0  # transaction() nesting
+        self.last_used = time.time()
+    
+    def give_back(self, close: bool) -> None:
+        """Return the connection to its pool (or close it) and free the slot."""
+        conn = self.conn
+        try:
+            if not conn.closed and not close:
+                conn.rollback()
+            if not self.pool.closed:
+                self.pool.putconn(conn, close=close or conn.closed)
+            elif not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        finally:
+            self.slots.release()
+
 
 class Database:
-    """Database connection manager with reconnection support."""
+    """Pooled database access with per-thread checkout and reconnection support."""
     
-    def __init__(self):
-        self._conn = None
+    def __init__(
+        self,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        health_check_interval: Optional[float] = None,
+        checkout_timeout: Optional[float] = None,
+    ):
+        pool_config = config.supabase
+        self.min_size = pool_config.pool_min_size if min_size is None else min_size
+        self.max_size = max(pool_config.pool_max_size if max_size is None else max_size, self.min_size, 1)
+        self.health_check_interval = (
+            pool_config.pool_health_check_interval if health_check_interval is None else health_check_interval
+        )
+        self.checkout_timeout = pool_config.pool_checkout_timeout if checkout_timeout is None else checkout_timeout
+        
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._checkouts: Dict[threading.Thread, _Checkout] = {}
     
     def connect(self) -> None:
-        """Establish database connection with keepalives for stability."""
-        if self._conn is None or self._conn.closed:
-            conn_string = config.supabase.connection_string
-            self._conn = psycopg2.connect(
-                conn_string,
-                connect_timeout=10,
-                keepalives=1,
-                keepalives_idle=30,
-                keepalives_interval=10,
-                keepalives_count=5,
-            )
-            self._conn.autocommit = False
-            logger.info("database_connected")
+        """Create the connection pool (opens min_size connections)."""
+        with self._lock:
+            if self._pool is None or self._pool.closed:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.min_size,
+                    self.max_size,
+                    config.supabase.connection_string,
+                    **CONNECT_KWARGS,
+                )
+                # getconn() raises when the pool is exhausted; block instead
+                self._slots = threading.BoundedSemaphore(self.max_size)
+                logger.info("database_connected", min_size=self.min_size, max_size=self.max_size)
     
     def close(self) -> None:
-        """Close database connection."""
-        if self._conn and not self._conn.closed:
+        """Close every pooled connection. The next call creates a fresh pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._checkouts.clear()
+        self._local.checkout = None
+        if pool is not None and not pool.closed:
             try:
-                self._conn.close()
+                pool.closeall()
                 logger.info("database_disconnected")
             except Exception:
                 pass
-        self._conn = None
     
-    def _safe_rollback(self) -> None:
-        """Safely attempt rollback without raising on dead connections."""
+    # ------------------------------------------------------------------
+    # Per-thread checkout
+    # ------------------------------------------------------------------
+    
+    @property
+    def in_transaction(self) -> bool:
+        """True while the calling thread is inside transaction()."""
+        checkout = getattr(self._local, "checkout", None)
+        return checkout is not None and checkout.depth > 0
+    
+    def _is_healthy(self, conn) -> bool:
+        """Ping a connection; leaves it idle (not in a transaction)."""
         try:
-            if self._conn and not self._conn.closed:
-                self._conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
         except Exception:
-            pass
+            return False
+    
+    def _checkout(self) -> "_Checkout":
+        """Return the calling thread's checkout, taking a connection from the pool if needed."""
+        checkout = getattr(self._local, "checkout", None)
+        
+        if checkout is not None:
+            conn = checkout.conn
+            stale = conn.closed or checkout.pool is not self._pool
+            idle = time.time() - checkout.last_used
+            if not stale and checkout.depth == 0 and self.health_check_interval \
+                    and idle > self.health_check_interval:
+                stale = not self._is_healthy(conn)
+            if not stale:
+                return checkout
+            logger.warning("database_connection_replaced", idle_seconds=round(idle, 1))
+            self._discard()
+        
+        self.connect()
+        pool, slots = self._pool, self._slots
+        if not slots.acquire(blocking=False):
+            self._reap_finished_threads()
+            if not slots.acquire(timeout=self.checkout_timeout):
+                raise psycopg2.pool.PoolError(
+                    f"No database connection available within {self.checkout_timeout}s "
+                    f"(max_size={self.max_size})"
+                )
+        try:
+            conn = pool.getconn()
+            if conn.closed or not self._is_healthy(conn):
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            conn.autocommit = False
+        except Exception:
+            slots.release()
+            raise
+        
+        checkout = _Checkout(conn, pool, slots)
+        self._local.checkout = checkout
+        with self._lock:
+            self._checkouts[threading.current_thread()] = checkout
+        return checkout
+    
+    def _reap_finished_threads(self) -> None:
+        """Return connections held by threads that exited without release()."""
+        with self._lock:
+            finished = [t for t in self._checkouts if not t.is_alive()]
+            reaped = [self._checkouts.pop(t) for t in finished]
+        for checkout in reaped:
+            checkout.give_back(close=False)
+        if reaped:
+            logger.info("database_connections_reclaimed", count=len(reaped))
     
-    def _force_reconnect(self) -> None:
-        """Force close connection so next call reconnects."""
+    def _discard(self) -> None:
+        """Drop the calling thread's connection (closed, not returned for reuse)."""
+        self._give_back(close=True)
+    
+    def release(self) -> None:
+        """Return the calling thread's connection to the pool (call when a thread is done)."""
+        self._give_back(close=False)
+    
+    def _give_back(self, close: bool) -> None:
+        checkout = getattr(self._local, "checkout", None)
+        if checkout is None:
+            return
+        self._local.checkout = None
+        with self._lock:
+            self._checkouts.pop(threading.current_thread(), None)
+        checkout.give_back(close)
+    
+    def _safe_rollback(self, conn) -> None:
+        """Safely attempt rollback without raising on dead connections."""
         try:
-            if self._conn and not self._conn.closed:
-                self._conn.close()
+            if conn and not conn.closed:
+                conn.rollback()
         except Exception:
             pass
-        self._conn = None
+    
+    def pool_status(self) -> Dict[str, int]:
+        """Pool sizing and current usage (for logging/health endpoints)."""
+        pool = self._pool
+        if pool is None or pool.closed:
+            return {"min_size": self.min_size, "max_size": self.max_size, "in_use": 0, "idle": 0}
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "in_use": len(pool._used),
+            "idle": len(pool._pool),
+        }
+    
+    # ------------------------------------------------------------------
+    # Cursors and transactions
+    # ------------------------------------------------------------------
     
     @contextmanager
     def cursor(self, dict_cursor: bool = True) -> Generator:
-        """Get a database cursor with automatic cleanup and reconnection support."""
-        self.connect()
+        """
+        Get a cursor on the calling thread's connection.
+        
+        Commits on exit unless inside transaction(), in which case the
+        enclosing transaction commits or rolls back.
+        """
+        checkout = self._checkout()
+        conn = checkout.conn
+        in_transaction = checkout.depth > 0
         cursor_factory = psycopg2.extras.RealDictCursor if dict_cursor else None
-        cursor = self._conn.cursor(cursor_factory=cursor_factory)
+        cursor = conn.cursor(cursor_factory=cursor_factory)
         try:
-            yield cursor
-            self._conn.commit()
-        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-            # Connection died - don't try rollback on a closed conn
-            self._safe_rollback()
-            # Force reconnect on next use
-            self._force_reconnect()
+            with telemetry.db_call() as call:
+                yield cursor
+                call.status = cursor.statusmessage
+                if not in_transaction:
+                    conn.commit()
+        except _CONNECTION_ERRORS as e:
+            # Connection died - don't reuse it
+            self._safe_rollback(conn)
+            self._discard()
             logger.error("database_disconnected_mid_query", error=str(e))
             raise
         except Exception as e:
             # Normal query error (SQL error etc.)
-            self._safe_rollback()
+            if not in_transaction:
+                self._safe_rollback(conn)
             logger.error("database_error", error=str(e))
             raise
         finally:
@@ -87,58 +270,175 @@ class Database:
                 cursor.close()
             except Exception:
                 pass
+            checkout.last_used = time.time()
     
-    def execute(self, query: str, params: Optional[tuple] = None) -> None:
-        """Execute a query without returning results, with retry logic."""
+    @contextmanager
+    def transaction(self, dict_cursor: bool = True) -> Generator:
+        """
+        Group every statement issued on this thread into one commit.
+        
+        Yields a cursor; Database methods called inside the block (execute,
+        execute_batch, execute_values, copy, bulk_upsert, ...) join the same
+        transaction. Nested transaction() blocks join the outermost one.
+        Statements are not retried inside a transaction.
+        """
+        checkout = self._checkout()
+        checkout.depth += 1
+        try:
+            with self.cursor(dict_cursor) as cur:
+                yield cur
+        except BaseException:
+            checkout.depth = max(checkout.depth - 1, 0)
+            if checkout.depth == 0:
+                self._safe_rollback(checkout.conn)
+            raise
+        checkout.depth -= 1
+        if checkout.depth == 0:
+            try:
+                checkout.conn.commit()
+            except _CONNECTION_ERRORS:
+                self._discard()
+                raise
+    
+    def _with_retry(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run fn, retrying connection failures (never inside a transaction)."""
         for attempt in range(3):
             try:
-                with self.cursor() as cur:
-                    cur.execute(query, params)
-                return
-            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-                if attempt == 2:
+                return fn()
+            except _CONNECTION_ERRORS as e:
+                if attempt == 2 or self.in_transaction:
                     raise
-                logger.warning(f"Database execute retry {attempt + 1}/3", error=str(e))
+                logger.warning(f"Database {name} retry {attempt + 1}/3", error=str(e))
                 time.sleep(1.5 * (attempt + 1))
     
+    # ------------------------------------------------------------------
+    # Statements
+    # ------------------------------------------------------------------
+    
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        """Execute a query without returning results, with retry logic."""
+        def run():
+            with self.cursor() as cur:
+                cur.execute(query, params)
+        self._with_retry("execute", run)
+    
     def fetch_one(self, query: str, params: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
         """Execute a query and return one result, with retry logic."""
-        for attempt in range(3):
-            try:
-                with self.cursor() as cur:
-                    cur.execute(query, params)
-                    return cur.fetchone()
-            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-                if attempt == 2:
-                    raise
-                logger.warning(f"Database fetch_one retry {attempt + 1}/3", error=str(e))
-                time.sleep(1.5 * (attempt + 1))
+        def run():
+            with self.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchone()
+        return self._with_retry("fetch_one", run)
     
     def fetch_all(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         """Execute a query and return all results, with retry logic."""
-        for attempt in range(3):
-            try:
-                with self.cursor() as cur:
-                    cur.execute(query, params)
-                    return cur.fetchall()
-            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-                if attempt == 2:
-                    raise
-                logger.warning(f"Database fetch_all retry {attempt + 1}/3", error=str(e))
-                time.sleep(1.5 * (attempt + 1))
+        def run():
+            with self.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+        return self._with_retry("fetch_all", run)
+    
+    # Large reads: streamed from a server-side cursor into Arrow/NumPy, optionally
+    # projected to `columns`. Not retried (a half-consumed stream can't be replayed).
+    
+    def stream_batches(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        columns: Optional[Sequence[str]] = None,
+        itersize: int = stream.ITERSIZE
+    ) -> Generator:
+        """Yield pyarrow record batches of `itersize` rows (requires pyarrow; see stratos_engine.stream)."""
+        yield from stream.stream_batches(self, query, params, columns=columns, itersize=itersize)
+    
+    def fetch_arrow(self, query: str, params: Optional[tuple] = None,
+                    columns: Optional[Sequence[str]] = None, itersize: int = stream.ITERSIZE):
+        """All rows as a pyarrow Table (requires pyarrow)."""
+        return stream.fetch_arrow(self, query, params, columns=columns, itersize=itersize)
+    
+    def fetch_arrays(self, query: str, params: Optional[tuple] = None,
+                     columns: Optional[Sequence[str]] = None, itersize: int = stream.ITERSIZE):
+        """All rows as {column: np.ndarray} (float64/NaN numbers, datetime64 dates)."""
+        return stream.fetch_arrays(self, query, params, columns=columns, itersize=itersize)
+    
+    def fetch_frame(self, query: str, params: Optional[tuple] = None,
+                    columns: Optional[Sequence[str]] = None, itersize: int = stream.ITERSIZE):
+        """All rows as a DataFrame."""
+        return stream.fetch_frame(self, query, params, columns=columns, itersize=itersize)
+    
+    def fetch_records(self, query: str, params: Optional[tuple] = None,
+                      columns: Optional[Sequence[str]] = None,
+                      itersize: int = stream.ITERSIZE) -> List[Dict[str, Any]]:
+        """All rows as dicts of native values (floats, not Decimal), streamed."""
+        return stream.fetch_records(self, query, params, columns=columns, itersize=itersize)
     
     def execute_batch(self, query: str, params_list: List[tuple]) -> None:
         """Execute a query with multiple parameter sets, with retry logic."""
-        for attempt in range(3):
-            try:
-                with self.cursor() as cur:
-                    psycopg2.extras.execute_batch(cur, query, params_list)
-                return
-            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-                if attempt == 2:
-                    raise
-                logger.warning(f"Database execute_batch retry {attempt + 1}/3", error=str(e))
-                time.sleep(1.5 * (attempt + 1))
+        def run():
+            with self.cursor() as cur:
+                psycopg2.extras.execute_batch(cur, query, params_list)
+        self._with_retry("execute_batch", run)
+    
+    def execute_values(
+        self,
+        query: str,
+        rows: Sequence[Sequence[Any]],
+        template: Optional[str] = None,
+        page_size: int = 1000,
+        fetch: bool = False
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Multi-row VALUES statement (query contains a single ``VALUES %s``), with retry logic.
+        
+        Sends page_size rows per statement instead of one round trip per row.
+        With fetch=True returns the RETURNING rows.
+        """
+        if not rows:
+            return [] if fetch else None
+        
+        def run():
+            with self.cursor() as cur:
+                return psycopg2.extras.execute_values(
+                    cur, query, rows, template=template, page_size=page_size, fetch=fetch
+                )
+        return self._with_retry("execute_values", run)
+    
+    def copy(self, table: str, df) -> int:
+        """COPY a DataFrame into `table` (append only), with retry logic."""
+        def run():
+            with self.cursor(dict_cursor=False) as cur:
+                return copy_frame(cur, table, df)
+        return self._with_retry("copy", run)
+    
+    def bulk_upsert(
+        self,
+        table: str,
+        df,
+        conflict_columns: List[str],
+        update_columns: Optional[List[str]] = None,
+        touch_columns: List[str] = (),
+        isolate_rejects: bool = False
+    ) -> BulkWriteResult:
+        """
+        COPY a DataFrame into a staging table and merge it into `table`, with retry logic.
+        
+        With isolate_rejects, rows the database refuses are bisected out under
+        savepoints and reported in result.rejects (see bulk_writer).
+        """
+        def run():
+            start = time.time()
+            rejects = []
+            with self.cursor(dict_cursor=False) as cur:
+                if isolate_rejects:
+                    rows, rejects = copy_upsert_isolating(cur, table, df, conflict_columns,
+                                                          update_columns, touch_columns)
+                else:
+                    rows = copy_upsert(cur, table, df, conflict_columns, update_columns, touch_columns)
+            result = BulkWriteResult(table, rows, time.time() - start, rejects)
+            logger.info("bulk_upsert", table=table, rows=rows, rejected=len(rejects),
+                        seconds=round(result.seconds, 3), rows_per_sec=round(result.rows_per_sec))
+            return result
+        return self._with_retry("bulk_upsert", run)
 
 
 # Queue operations using pgmq
@@ -167,6 +467,12 @@ class Queue:
         result = self.db.fetch_one(query, (self.queue_name, json.dumps(message)))
         return result["send"] if result else 0
     
+    def set_vt(self, msg_id: int, visibility_timeout: int) -> bool:
+        """Set a message's visibility timeout (extend a lease, or 0 to release it now)."""
+        query = "SELECT msg_id FROM pgmq.set_vt(%s, %s, %s)"
+        result = self.db.fetch_one(query, (self.queue_name, msg_id, visibility_timeout))
+        return result is not None
+    
     def archive(self, msg_id: int) -> bool:
         """Archive (acknowledge) a message."""
         query = f"SELECT pgmq.archive(%s, %s)"
@@ -0,0 +1,340 @@
+"""
+Local fake market-data vendor server for tests and dry runs.
+
+Serves the AlphaVantage, FMP and CoinGecko endpoints used by the ingestion
+code (including the bulk EOD / bulk quote endpoints, which cover only
+`bulk_symbols`) with deterministic synthetic data, and enforces a per-vendor quota the
+way each vendor does: AlphaVantage answers 200 with a "Note", FMP and
+CoinGecko answer 429 with Retry-After. Request counts, throttles and peak
+concurrency are recorded for assertions.
+
+Usage (tests):
+    async with FakeVendorServer(quotas={"fmp": 120}) as server:
+        async with HttpClient(vendors=server.vendors()) as http:
+            rows = await http.get_json("fmp", "/stable/historical-price-eod/full", {...})
+        assert server.throttled["fmp"] == 0
+
+Usage (dry run of a job against the fake):
+    python -m stratos_engine.fake_vendor --port 8765
+    # then export the printed *_BASE_URL variables
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import math
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Mapping, Optional
+
+from aiohttp import web
+
+from .http import VendorLimits, default_vendors, with_limits
+
+DEFAULT_QUOTAS = {"alphavantage": 75, "fmp": 300, "coingecko": 500, "coingecko_public": 30}
+INVALID_SYMBOL = "INVALID"
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:12], 16)
+
+
+def synthetic_bar(symbol: str, day: date) -> Dict[str, float]:
+    """Deterministic OHLCV for a symbol/day (same values on every request)."""
+    base = 20 + _seed(symbol) % 400
+    wave = math.sin(day.toordinal() / 9 + _seed(symbol) % 7)
+    close = round(base * (1 + 0.1 * wave), 4)
+    spread = close * 0.01 * (1 + _seed(symbol, day) % 3)
+    return {
+        "open": round(close - spread / 3, 4),
+        "high": round(close + spread, 4),
+        "low": round(close - spread, 4),
+        "close": close,
+        "volume": float(100_000 + _seed(symbol, day, "v") % 900_000),
+    }
+
+
+def _business_days(end: date, count: int):
+    day = end
+    while count > 0:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day -= timedelta(days=1)
+
+
+class FakeVendorServer:
+    """aiohttp server emulating the vendors' endpoints and quotas."""
+
+    def __init__(
+        self,
+        quotas: Optional[Mapping[str, float]] = None,
+        window: float = 60.0,
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        today: Optional[date] = None,
+        bulk_symbols: Iterable[str] = (),
+    ):
+        """
+        Args:
+            quotas: Calls per `window` seconds for each vendor
+            window: Quota window in seconds (shorten it to test throttling quickly)
+            latency: Seconds each response is delayed
+            port: 0 picks a free port
+            today: Last date served (default: today UTC)
+            bulk_symbols: Symbols listed by the bulk endpoints (others are "missing")
+        """
+        self.quotas = {**DEFAULT_QUOTAS, **(quotas or {})}
+        self.window = window
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.today = today or datetime.now(timezone.utc).date()
+        self.bulk_symbols = list(bulk_symbols)
+
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.throttled: Dict[str, int] = defaultdict(int)
+        self.paths: Dict[str, int] = defaultdict(int)
+        self.max_in_flight: Dict[str, int] = defaultdict(int)
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._calls: Dict[str, deque] = defaultdict(deque)
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/query", self._alphavantage)
+        self.app.router.add_get("/stable/historical-price-eod/full", self._fmp_eod)
+        self.app.router.add_get("/stable/eod-bulk", self._fmp_eod_bulk)
+        self.app.router.add_get("/api/v3/coins/{coin_id}/ohlc", self._coingecko_ohlc)
+        self.app.router.add_get("/api/v3/coins/{coin_id}/market_chart", self._coingecko_market_chart)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> "FakeVendorServer":
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeVendorServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @property
+    def root_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def base_urls(self) -> Dict[str, str]:
+        return {
+            "alphavantage": self.root_url,
+            "fmp": self.root_url,
+            "coingecko": f"{self.root_url}/api/v3",
+            "coingecko_public": f"{self.root_url}/api/v3",
+        }
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables pointing the ingestion code at this server."""
+        urls = self.base_urls()
+        return {
+            "ALPHAVANTAGE_BASE_URL": urls["alphavantage"],
+            "FMP_BASE_URL": urls["fmp"],
+            "COINGECKO_BASE_URL": urls["coingecko"],
+            "COINGECKO_PUBLIC_BASE_URL": urls["coingecko_public"],
+        }
+
+    def vendors(self, calls_per_minute: Optional[Mapping[str, float]] = None) -> Dict[str, VendorLimits]:
+        """Client vendor limits aimed at this server (quota = the server's, unless overridden)."""
+        overrides = {}
+        for name, url in self.base_urls().items():
+            per_minute = (calls_per_minute or {}).get(name, self.quotas[name] * 60.0 / self.window)
+            overrides[name] = {"base_url": url, "calls_per_minute": per_minute, "window_seconds": self.window}
+        return with_limits(default_vendors(), **overrides)
+
+    # ------------------------------------------------------------------
+    # Quota
+    # ------------------------------------------------------------------
+
+    def _admit(self, vendor: str) -> Optional[float]:
+        """Record a call; seconds until the window frees up if over quota, else None."""
+        now = time.monotonic()
+        calls = self._calls[vendor]
+        while calls and now - calls[0] >= self.window:
+            calls.popleft()
+        self.requests[vendor] += 1
+        if len(calls) >= self.quotas[vendor]:
+            self.throttled[vendor] += 1
+            return max(0.0, self.window - (now - calls[0]))
+        calls.append(now)
+        return None
+
+    async def _serve(self, vendor: str, request: web.Request, respond):
+        self.paths[request.path] += 1
+        self._in_flight[vendor] += 1
+        self.max_in_flight[vendor] = max(self.max_in_flight[vendor], self._in_flight[vendor])
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            wait = self._admit(vendor)
+            if wait is not None:
+                if vendor == "alphavantage":
+                    return web.json_response({
+                        "Note": "Thank you for using Alpha Vantage! Our standard API call frequency is exceeded."
+                    })
+                return web.json_response(
+                    {"status": {"error_code": 429, "error_message": "rate limited"}},
+                    status=429,
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+            return respond()
+        finally:
+            self._in_flight[vendor] -= 1
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    async def _alphavantage(self, request: web.Request) -> web.Response:
+        def respond():
+            function = request.query.get("function", "")
+            symbol = request.query.get("symbol", "")
+            if symbol == INVALID_SYMBOL:
+                return web.json_response({"Error Message": "Invalid API call."})
+            if function == "TIME_SERIES_DAILY_ADJUSTED":
+                count = 100 if request.query.get("outputsize", "compact") == "compact" else 1000
+                series = {}
+                for day in _business_days(self.today, count):
+                    bar = synthetic_bar(symbol, day)
+                    series[day.isoformat()] = {
+                        "1. open": str(bar["open"]),
+                        "2. high": str(bar["high"]),
+                        "3. low": str(bar["low"]),
+                        "4. close": str(bar["close"]),
+                        "5. adjusted close": str(bar["close"]),
+                        "6. volume": str(int(bar["volume"])),
+                    }
+                return web.json_response({"Meta Data": {"2. Symbol": symbol}, "Time Series (Daily)": series})
+            if function == "REALTIME_BULK_QUOTES":
+                quotes = []
+                for quoted in symbol.split(","):
+                    if quoted in self.bulk_symbols:
+                        bar = synthetic_bar(quoted, self.today)
+                        quotes.append({
+                            "symbol": quoted,
+                            "timestamp": f"{self.today.isoformat()} 16:00:00.000",
+                            **{k: str(v) for k, v in bar.items()},
+                        })
+                return web.json_response({"endpoint": "Realtime Bulk Quotes", "data": quotes})
+            if function == "OVERVIEW":
+                return web.json_response({"Symbol": symbol, "Name": f"{symbol} Inc", "MarketCapitalization": "1000000000"})
+            if function in ("INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW"):
+                report = {"fiscalDateEnding": f"{self.today.year - 1}-12-31", "reportedCurrency": "USD"}
+                return web.json_response({"symbol": symbol, "annualReports": [report], "quarterlyReports": [report]})
+            if function == "EARNINGS":
+                return web.json_response({"symbol": symbol, "annualEarnings": [], "quarterlyEarnings": []})
+            return web.json_response({"Information": f"Unsupported function {function}"})
+        return await self._serve("alphavantage", request, respond)
+
+    async def _fmp_eod(self, request: web.Request) -> web.Response:
+        def respond():
+            symbol = request.query.get("symbol", "")
+            if symbol == INVALID_SYMBOL:
+                return web.json_response([])
+            start = date.fromisoformat(request.query.get("from", self.today.isoformat()))
+            end = min(date.fromisoformat(request.query.get("to", self.today.isoformat())), self.today)
+            rows = []
+            day = end
+            while day >= start:
+                if day.weekday() < 5:
+                    bar = synthetic_bar(symbol, day)
+                    rows.append({"symbol": symbol, "date": day.isoformat(), **bar, "adjClose": bar["close"]})
+                day -= timedelta(days=1)
+            return web.json_response(rows)
+        return await self._serve("fmp", request, respond)
+
+    async def _fmp_eod_bulk(self, request: web.Request) -> web.Response:
+        def respond():
+            day = date.fromisoformat(request.query.get("date", self.today.isoformat()))
+            out = io.StringIO()
+            writer = csv.writer(out)
+            writer.writerow(["symbol", "date", "open", "low", "high", "close", "adjClose", "volume"])
+            if day <= self.today and day.weekday() < 5:
+                for symbol in self.bulk_symbols:
+                    bar = synthetic_bar(symbol, day)
+                    writer.writerow([symbol, day.isoformat(), bar["open"], bar["low"], bar["high"],
+                                     bar["close"], bar["close"], int(bar["volume"])])
+            return web.Response(text=out.getvalue(), content_type="text/csv")
+        return await self._serve("fmp", request, respond)
+
+    def _coingecko_vendor(self, request: web.Request) -> str:
+        return "coingecko" if request.headers.get("x-cg-pro-api-key") else "coingecko_public"
+
+    async def _coingecko_ohlc(self, request: web.Request) -> web.Response:
+        def respond():
+            coin_id = request.match_info["coin_id"]
+            days = int(request.query.get("days", "7"))
+            end = datetime.combine(self.today, datetime.min.time(), tzinfo=timezone.utc) + timedelta(days=1)
+            candles = []
+            for i in range(days * 6, 0, -1):
+                ts = end - timedelta(hours=4 * i)
+                bar = synthetic_bar(coin_id, ts.date())
+                drift = 1 + 0.002 * ((i % 6) - 3)
+                candles.append([
+                    int(ts.timestamp() * 1000),
+                    round(bar["open"] * drift, 6),
+                    round(bar["high"] * drift, 6),
+                    round(bar["low"] * drift, 6),
+                    round(bar["close"] * drift, 6),
+                ])
+            return web.json_response(candles)
+        return await self._serve(self._coingecko_vendor(request), request, respond)
+
+    async def _coingecko_market_chart(self, request: web.Request) -> web.Response:
+        def respond():
+            coin_id = request.match_info["coin_id"]
+            days = int(request.query.get("days", "7"))
+            prices, volumes = [], []
+            for i in range(days, -1, -1):
+                day = self.today - timedelta(days=i)
+                ts = int(datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc).timestamp() * 1000)
+                bar = synthetic_bar(coin_id, day)
+                prices.append([ts, bar["close"]])
+                volumes.append([ts, bar["volume"] * 1000])
+            return web.json_response({"prices": prices, "market_caps": [], "total_volumes": volumes})
+        return await self._serve(self._coingecko_vendor(request), request, respond)
+
+
+async def _serve_forever(port: int, window: float) -> None:
+    server = await FakeVendorServer(port=port, window=window).start()
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    print("# Ctrl-C to stop", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake market-data vendor server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window", type=float, default=60.0, help="Quota window in seconds")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args.port, args.window))
+    except KeyboardInterrupt:
+        pass
@@ -13,6 +13,15 @@ Usage:
     
     # Run for specific asset type
     python -m stratos_engine.feature_job --incremental --asset-type crypto
+    
+    # Daily update from persisted rolling state (only new bars are read)
+    python -m stratos_engine.feature_job --incremental --streaming
+    
+    # Vectorized panel mode (whole universe per chunk)
+    python -m stratos_engine.feature_job --incremental --panel
+    
+    # Compare panel mode against the per-asset path on a sample of assets
+    python -m stratos_engine.feature_job --panel-parity-check --asset-type equity
 """
 
 import os
@@ -30,11 +39,28 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _get_calculator():
+    """Build a FeatureCalculator from environment credentials."""
+    from .utils.feature_calculator import FeatureCalculator
+    
+    # Get Supabase credentials from environment
+    supabase_url = os.environ.get('SUPABASE_URL')
+    supabase_key = os.environ.get('SUPABASE_SERVICE_KEY') or os.environ.get('SUPABASE_KEY')
+    
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY environment variables")
+    
+    logger.info(f"Initializing feature calculator...")
+    return FeatureCalculator(supabase_url, supabase_key)
+
+
 def run_feature_calculation(
     start_date: date,
     end_date: date,
     asset_type: Optional[str] = None,
-    batch_size: int = 50
+    batch_size: int = 50,
+    panel: bool = False,
+    streaming: bool = False
 ) -> dict:
     """
     Run feature calculation for the specified date range.
@@ -44,37 +70,75 @@ def run_feature_calculation(
         end_date: End date for calculation
         asset_type: Optional filter ('crypto', 'equity')
         batch_size: Number of assets to process before logging progress
+        panel: Use the vectorized panel engine instead of one asset at a time
+        streaming: Advance persisted rolling state up to end_date instead of
+            recomputing the range (falls back to a full recompute per asset)
         
     Returns:
         dict with processing statistics
     """
-    from .utils.feature_calculator import FeatureCalculator
-    
-    # Get Supabase credentials from environment
-    supabase_url = os.environ.get('SUPABASE_URL')
-    supabase_key = os.environ.get('SUPABASE_SERVICE_KEY') or os.environ.get('SUPABASE_KEY')
+    calculator = _get_calculator()
     
-    if not supabase_url or not supabase_key:
-        raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY environment variables")
-    
-    logger.info(f"Initializing feature calculator...")
     logger.info(f"Date range: {start_date} to {end_date}")
     logger.info(f"Asset type filter: {asset_type or 'all'}")
     
-    calculator = FeatureCalculator(supabase_url, supabase_key)
+    if streaming:
+        result = calculator.stream_update(
+            end_date=end_date,
+            asset_type=asset_type,
+            batch_size=batch_size
+        )
+        logger.info(f"Feature calculation complete: {result}")
+        return result
     
     # Run backfill (works for both backfill and incremental)
     result = calculator.backfill(
         start_date=start_date,
         end_date=end_date,
         asset_type=asset_type,
-        batch_size=batch_size
+        batch_size=batch_size,
+        panel=panel
     )
     
     logger.info(f"Feature calculation complete: {result}")
     return result
 
 
+def run_panel_parity_check(
+    end_date: date,
+    asset_type: Optional[str] = None,
+    sample_size: int = 50
+) -> dict:
+    """
+    Compute features for a sample of assets through both the per-asset and the
+    panel path (no writes) and report any column that differs.
+    
+    Returns:
+        dict mapping asset_id -> mismatching columns (empty when in parity)
+    """
+    from .utils.feature_panel import check_parity
+    
+    calculator = _get_calculator()
+    assets = calculator.get_active_assets(asset_type).head(sample_size)
+    
+    bars_by_asset = {}
+    benchmarks = {}
+    asset_types = {}
+    for _, asset in assets.iterrows():
+        asset_id = asset['asset_id']
+        asset_types[asset_id] = asset.get('asset_type', 'equity')
+        bars_by_asset[asset_id] = calculator.get_bars(
+            asset_id, end_date, end_date, asset_type=asset_types[asset_id]
+        )
+        benchmark_id = asset.get('benchmark_asset_id')
+        if benchmark_id is not None and benchmark_id == benchmark_id:  # skip NaN
+            benchmarks[asset_id] = calculator.get_benchmark_bars(
+                int(benchmark_id), end_date, end_date, asset_type=asset_types[asset_id]
+            )
+    
+    return check_parity(calculator, bars_by_asset, asset_types, benchmarks)
+
+
 def main():
     """Main entrypoint for the feature calculation job."""
     parser = argparse.ArgumentParser(
@@ -120,12 +184,37 @@ Examples:
         default=50,
         help='Batch size for progress logging (default: 50)'
     )
+    parser.add_argument(
+        '--panel',
+        action='store_true',
+        help='Compute features for the whole universe in vectorized panel chunks'
+    )
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='With --incremental: update from persisted rolling state, reading only new bars'
+    )
+    parser.add_argument(
+        '--panel-parity-check',
+        action='store_true',
+        help='Compare panel and per-asset features on a sample of assets (no writes)'
+    )
     
     args = parser.parse_args()
     
     # Determine date range
     today = date.today()
     
+    if args.panel_parity_check:
+        end_date = date.fromisoformat(args.end_date) if args.end_date else today
+        mismatches = run_panel_parity_check(end_date, args.asset_type)
+        if mismatches:
+            for asset_id, cols in mismatches.items():
+                logger.error(f"Parity mismatch for asset {asset_id}: {cols}")
+            return 1
+        logger.info("Panel features match the per-asset path")
+        return 0
+    
     if args.incremental:
         # Incremental: process yesterday and today
         start_date = today - timedelta(days=1)
@@ -143,7 +232,9 @@ Examples:
             start_date=start_date,
             end_date=end_date,
             asset_type=args.asset_type,
-            batch_size=args.batch_size
+            batch_size=args.batch_size,
+            panel=args.panel,
+            streaming=args.streaming and args.incremental
         )
         
         # Log summary
@@ -155,6 +246,8 @@ Examples:
         logger.info(f"Skipped: {result.get('skipped', 0)}")
         logger.info(f"Total rows written: {result.get('total_rows', 0)}")
         logger.info(f"Errors: {len(result.get('errors', []))}")
+        if 'streamed' in result:
+            logger.info(f"From rolling state: {result['streamed']}, full recompute: {result['recomputed']}")
         
         if result.get('errors'):
             logger.warning("Errors encountered:")
@@ -0,0 +1,517 @@
+"""
+Shared async HTTP client for market-data vendors.
+
+One aiohttp session (keep-alive connection pool) serves every vendor. Each
+vendor gets:
+- a token bucket at its quota (VENDOR_CALLS_PER_MINUTE env overrides) with a
+  small burst, so requests go out at the real quota instead of fixed sleeps
+- a concurrency cap
+- adaptive backoff: a 429 (or AlphaVantage's 200 + "Note" throttle body)
+  pauses the vendor for Retry-After (exponential backoff without one) and
+  halves the bucket rate; each success restores part of it
+- retries for 429/5xx/timeouts/connection errors
+- request coalescing: identical GETs already in flight share one request
+
+Only depends on aiohttp (and the stdlib-only telemetry module) so the
+standalone jobs/ scripts can use it.
+
+Usage (async):
+    async with HttpClient() as http:
+        data = await http.get_json("alphavantage", "/query", params={...})
+
+Usage (sync code, e.g. pipeline stages):
+    http = get_shared_client()          # background event loop, shared buckets
+    data = http.get_json("coingecko", "/coins/bitcoin/ohlc", params={...})
+    results = http.gather([("fmp", "/stable/profile", {"symbol": "X"}), ...])
+
+Point vendors at a local server (see fake_vendor.py) with
+ALPHAVANTAGE_BASE_URL, FMP_BASE_URL and COINGECKO_BASE_URL.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import aiohttp
+
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+# Share of the quota restored per successful request after a throttle
+RECOVERY_STEP = 0.02
+
+
+def _alphavantage_throttled(data: Any) -> bool:
+    """AlphaVantage answers 200 with a 'Note' (or rate-limit 'Information') when over quota."""
+    if not isinstance(data, dict):
+        return False
+    if "Note" in data:
+        return True
+    info = str(data.get("Information", "")).lower()
+    return "rate limit" in info or "call frequency" in info
+
+
+@dataclass(frozen=True)
+class VendorLimits:
+    """Quota and connection settings for one vendor."""
+    name: str
+    base_url: str
+    calls_per_minute: float
+    burst: int = 1
+    max_concurrency: int = 4
+    # Length of the vendor's quota window in seconds
+    window_seconds: float = 60.0
+    # Floor for the adaptive rate, as a fraction of the quota
+    min_rate_fraction: float = 0.1
+    # Detects throttling signalled in a 200 response body
+    throttled_body: Optional[Callable[[Any], bool]] = None
+
+    @property
+    def rate(self) -> float:
+        """
+        Steady requests per second.
+
+        A full burst plus a window of steady refill must fit in the quota,
+        otherwise a sliding-window limiter throttles the first window.
+        """
+        per_window = self.calls_per_minute * self.window_seconds / 60.0
+        return max(per_window - self.burst, 1.0) / self.window_seconds
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def default_vendors() -> Dict[str, VendorLimits]:
+    """Vendor quotas (read from the environment at call time)."""
+    return {
+        "alphavantage": VendorLimits(
+            name="alphavantage",
+            base_url=os.environ.get("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co"),
+            calls_per_minute=_env_float("ALPHAVANTAGE_CALLS_PER_MINUTE", 75),
+            burst=5,
+            max_concurrency=5,
+            throttled_body=_alphavantage_throttled,
+        ),
+        "fmp": VendorLimits(
+            name="fmp",
+            base_url=os.environ.get("FMP_BASE_URL", "https://financialmodelingprep.com"),
+            calls_per_minute=_env_float("FMP_CALLS_PER_MINUTE", 300),
+            burst=10,
+            max_concurrency=10,
+        ),
+        "coingecko": VendorLimits(
+            name="coingecko",
+            base_url=os.environ.get("COINGECKO_BASE_URL", "https://pro-api.coingecko.com/api/v3"),
+            calls_per_minute=_env_float("COINGECKO_CALLS_PER_MINUTE", 500),
+            burst=10,
+            max_concurrency=10,
+        ),
+        "coingecko_public": VendorLimits(
+            name="coingecko_public",
+            base_url=os.environ.get("COINGECKO_PUBLIC_BASE_URL", "https://api.coingecko.com/api/v3"),
+            calls_per_minute=_env_float("COINGECKO_PUBLIC_CALLS_PER_MINUTE", 30),
+            burst=2,
+            max_concurrency=2,
+        ),
+    }
+
+
+class HttpError(Exception):
+    """Vendor request failed (non-retryable status, or retries exhausted)."""
+
+    def __init__(self, vendor: str, url: str, status: Optional[int], message: str):
+        super().__init__(f"{vendor} {status or 'error'}: {message}")
+        self.vendor = vendor
+        self.url = url
+        self.status = status
+        self.message = message
+
+
+class ThrottledError(HttpError):
+    """Vendor kept throttling after all retries."""
+
+
+class TokenBucket:
+    """
+    Async token bucket with an adaptive rate and a pause window (Retry-After).
+
+    A throttle halves the rate and caps recovery just below the rate that was
+    throttled, so a quota set too high converges on the vendor's real one.
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float, clock: Callable[[], float] = time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.ceiling = rate
+        self.min_rate = max(min_rate, 1e-6)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.paused_until = 0.0
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self, delay: float) -> None:
+        """Vendor said slow down: pause for `delay` and halve the rate."""
+        now = self._clock()
+        self._refill(now)
+        self.paused_until = max(self.paused_until, now + delay)
+        self.ceiling = max(min(self.ceiling, self.rate * 0.9), self.min_rate)
+        self.rate = max(self.rate / 2, self.min_rate)
+        self.tokens = 0.0
+
+    def recover(self) -> None:
+        if self.rate < self.ceiling:
+            self._refill(self._clock())
+            self.rate = min(self.ceiling, self.rate + self.max_rate * RECOVERY_STEP)
+
+
+@dataclass
+class VendorStats:
+    requests: int = 0
+    throttled: int = 0
+    retries: int = 0
+    coalesced: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _VendorState:
+    limits: VendorLimits
+    bucket: TokenBucket
+    semaphore: asyncio.Semaphore
+    stats: VendorStats = field(default_factory=VendorStats)
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """Async vendor client; use as an async context manager (one per event loop)."""
+
+    def __init__(
+        self,
+        vendors: Optional[Mapping[str, VendorLimits]] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        connection_limit: int = 100,
+    ):
+        self.vendors = dict(vendors or default_vendors())
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connection_limit = connection_limit
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._state: Dict[str, _VendorState] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def __aenter__(self) -> "HttpClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                # Brotli responses have caused decoding issues
+                headers={"Accept-Encoding": "gzip, deflate"},
+            )
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        for name, state in self._state.items():
+            s = state.stats
+            if s.requests:
+                logger.info(f"HTTP {name}: {s.requests} requests, {s.throttled} throttled, "
+                            f"{s.retries} retries, {s.coalesced} coalesced, {s.errors} errors")
+
+    def _vendor(self, vendor: str) -> _VendorState:
+        state = self._state.get(vendor)
+        if state is None:
+            if vendor not in self.vendors:
+                raise KeyError(f"Unknown vendor: {vendor}")
+            limits = self.vendors[vendor]
+            state = _VendorState(
+                limits=limits,
+                bucket=TokenBucket(limits.rate, limits.burst, limits.rate * limits.min_rate_fraction),
+                semaphore=asyncio.Semaphore(limits.max_concurrency),
+            )
+            self._state[vendor] = state
+        return state
+
+    def url(self, vendor: str, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return self.vendors[vendor].base_url.rstrip("/") + "/" + path.lstrip("/")
+
+    def stats(self) -> Dict[str, VendorStats]:
+        return {name: state.stats for name, state in self._state.items()}
+
+    def current_rate(self, vendor: str) -> float:
+        """Current adaptive rate in calls/minute."""
+        return self._vendor(vendor).bucket.rate * 60
+
+    async def get_json(
+        self,
+        vendor: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Any:
+        """
+        GET and decode JSON, within the vendor's quota.
+
+        Identical requests in flight are coalesced, so callers must not mutate
+        the returned object.
+
+        Raises:
+            ThrottledError: still throttled after max_retries
+            HttpError: other 4xx, or 5xx/network errors after max_retries
+        """
+        return await self._coalesced(vendor, path, params, headers, as_text=False)
+
+    async def get_text(
+        self,
+        vendor: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> str:
+        """GET the response body as text (e.g. CSV bulk files); same quota, retries and coalescing as get_json."""
+        return await self._coalesced(vendor, path, params, headers, as_text=True)
+
+    async def _coalesced(
+        self,
+        vendor: str,
+        path: str,
+        params: Optional[Mapping[str, Any]],
+        headers: Optional[Mapping[str, str]],
+        as_text: bool,
+    ) -> Any:
+        if self.session is None:
+            await self.open()
+        url = self.url(vendor, path)
+        key = (
+            vendor,
+            url,
+            tuple(sorted((k, str(v)) for k, v in (params or {}).items())),
+            tuple(sorted((headers or {}).items())),
+            as_text,
+        )
+        future = self._inflight.get(key)
+        if future is not None:
+            self._vendor(vendor).stats.coalesced += 1
+        else:
+            future = asyncio.ensure_future(self._get(vendor, url, params, headers, as_text))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(future)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _get(
+        self,
+        vendor: str,
+        url: str,
+        params: Optional[Mapping[str, Any]],
+        headers: Optional[Mapping[str, str]],
+        as_text: bool = False,
+    ) -> Any:
+        state = self._vendor(vendor)
+        last_error: Optional[HttpError] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                state.stats.retries += 1
+            await state.bucket.acquire()
+
+            status: Optional[int] = None
+            retry_after: Optional[float] = None
+            data: Any = None
+            transient: Optional[str] = None
+            async with state.semaphore:
+                state.stats.requests += 1
+                telemetry.record_http()
+                try:
+                    async with self.session.get(url, params=params, headers=headers) as response:
+                        status = response.status
+                        retry_after = _retry_after(response.headers.get("Retry-After"))
+                        if status >= 400:
+                            transient = (await response.text())[:200]
+                        elif as_text:
+                            data = await response.text()
+                        else:
+                            data = await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    transient = f"{type(e).__name__}: {str(e)[:150]}"
+
+            throttled = status == 429 or (
+                status is not None and status < 400 and not as_text
+                and state.limits.throttled_body is not None
+                and state.limits.throttled_body(data)
+            )
+            if throttled:
+                state.stats.throttled += 1
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                state.bucket.throttle(delay)
+                logger.warning(f"{vendor} throttled, pausing {delay:.1f}s "
+                               f"(rate now {state.bucket.rate * 60:.0f}/min)")
+                last_error = ThrottledError(vendor, url, status, "rate limited")
+                continue
+
+            if status is not None and 400 <= status < 500:
+                state.stats.errors += 1
+                raise HttpError(vendor, url, status, transient or "")
+
+            if transient is not None:
+                # 5xx, timeout or connection error
+                last_error = HttpError(vendor, url, status, transient)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            state.bucket.recover()
+            return data
+
+        state.stats.errors += 1
+        raise last_error or HttpError(vendor, url, None, "retries exhausted")
+
+    async def gather(
+        self,
+        requests: Iterable[Tuple],
+        return_exceptions: bool = True,
+    ) -> List[Any]:
+        """
+        Run many get_json calls concurrently (each within its vendor's quota).
+
+        Args:
+            requests: (vendor, path[, params[, headers]]) tuples
+        """
+        return await asyncio.gather(
+            *(self.get_json(*request) for request in requests),
+            return_exceptions=return_exceptions,
+        )
+
+
+class SyncHttpClient:
+    """Blocking facade over HttpClient, running it on a background event loop thread."""
+
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="http-client", daemon=True)
+        self._thread.start()
+        self.client = HttpClient(**kwargs)
+        self._run(self.client.open())
+
+    def _run(self, coro):
+        # carry(): requests count towards the caller's stage metrics, not the loop thread's
+        return asyncio.run_coroutine_threadsafe(telemetry.carry(coro), self._loop).result()
+
+    def get_json(
+        self,
+        vendor: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Any:
+        return self._run(self.client.get_json(vendor, path, params, headers))
+
+    def get_text(
+        self,
+        vendor: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> str:
+        return self._run(self.client.get_text(vendor, path, params, headers))
+
+    def gather(self, requests: Sequence[Tuple], return_exceptions: bool = True) -> List[Any]:
+        return self._run(self.client.gather(requests, return_exceptions))
+
+    def stats(self) -> Dict[str, VendorStats]:
+        return self.client.stats()
+
+    def close(self) -> None:
+        if self._loop.is_running():
+            self._run(self.client.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+_shared_client: Optional[SyncHttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> SyncHttpClient:
+    """Process-wide blocking client, so every caller shares the same quotas and connections."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = SyncHttpClient()
+        return _shared_client
+
+
+def with_limits(vendors: Mapping[str, VendorLimits], **overrides: Mapping[str, Any]) -> Dict[str, VendorLimits]:
+    """Copy of `vendors` with per-vendor field overrides, e.g. with_limits(v, fmp={"base_url": url})."""
+    result = dict(vendors)
+    for name, fields in overrides.items():
+        result[name] = replace(result[name], **fields)
+    return result
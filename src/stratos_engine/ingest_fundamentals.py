@@ -11,10 +11,7 @@ Date: 2026-01-06
 
 import os
 import sys
-import time
-import json
 import logging
-import requests
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
@@ -23,6 +20,12 @@ from dataclasses import dataclass
 import psycopg2
 from psycopg2.extras import execute_values
 
+try:
+    from .http import get_shared_client
+except ImportError:  # run as a script
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from stratos_engine.http import get_shared_client
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,7 +35,6 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY', 'PLZVWIJQFOVHT4WL')
-ALPHA_VANTAGE_BASE_URL = 'https://www.alphavantage.co/query'
 
 # Database configuration
 DB_HOST = os.environ.get('DB_HOST', 'db.wfogbaipiqootjrsprde.supabase.co')
@@ -41,10 +43,9 @@ DB_NAME = os.environ.get('DB_NAME', 'postgres')
 DB_USER = os.environ.get('DB_USER', 'postgres')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'stratosbrainpostgresdbpw')
 
-# Rate limiting: Alpha Vantage free tier allows 25 requests/day, 5 requests/minute
-# Premium tier allows more, but we'll be conservative
-REQUESTS_PER_MINUTE = 5
-REQUEST_DELAY = 60 / REQUESTS_PER_MINUTE  # 12 seconds between requests
+# Rate limiting is done by the shared HTTP client ("alphavantage" vendor,
+# ALPHAVANTAGE_CALLS_PER_MINUTE, default 75 for the premium tier)
+FUNDAMENTAL_FUNCTIONS = ['OVERVIEW', 'INCOME_STATEMENT', 'BALANCE_SHEET', 'CASH_FLOW', 'EARNINGS']
 
 
 @dataclass
@@ -74,6 +75,38 @@ def get_db_connection():
     )
 
 
+def _alpha_vantage_request(function: str, symbol: str) -> tuple:
+    params = {
+        'function': function,
+        'symbol': symbol,
+        'apikey': ALPHA_VANTAGE_API_KEY
+    }
+    return ('alphavantage', '/query', params)
+
+
+def _check_alpha_vantage(function: str, symbol: str, data: Any) -> Optional[Dict[str, Any]]:
+    """Response dict, or None (logged) for failed requests and API error messages."""
+    if isinstance(data, Exception):
+        logger.error(f"Request failed for {symbol}/{function}: {data}")
+        return None
+    if not isinstance(data, dict):
+        logger.error(f"Unexpected response for {symbol}/{function}: {str(data)[:100]}")
+        return None
+    
+    # Check for API error messages
+    if 'Error Message' in data:
+        logger.warning(f"API error for {symbol}/{function}: {data['Error Message']}")
+        return None
+    if 'Note' in data:
+        logger.warning(f"API rate limit note for {symbol}/{function}: {data['Note']}")
+        return None
+    if 'Information' in data:
+        logger.warning(f"API info for {symbol}/{function}: {data['Information']}")
+        return None
+        
+    return data
+
+
 def fetch_alpha_vantage(function: str, symbol: str) -> Optional[Dict[str, Any]]:
     """
     Fetch data from Alpha Vantage API.
@@ -85,35 +118,11 @@ def fetch_alpha_vantage(function: str, symbol: str) -> Optional[Dict[str, Any]]:
     Returns:
         The JSON response as a dictionary, or None if the request failed
     """
-    params = {
-        'function': function,
-        'symbol': symbol,
-        'apikey': ALPHA_VANTAGE_API_KEY
-    }
-    
     try:
-        response = requests.get(ALPHA_VANTAGE_BASE_URL, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check for API error messages
-        if 'Error Message' in data:
-            logger.warning(f"API error for {symbol}/{function}: {data['Error Message']}")
-            return None
-        if 'Note' in data:
-            logger.warning(f"API rate limit note for {symbol}/{function}: {data['Note']}")
-            return None
-        if 'Information' in data:
-            logger.warning(f"API info for {symbol}/{function}: {data['Information']}")
-            return None
-            
-        return data
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed for {symbol}/{function}: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode failed for {symbol}/{function}: {e}")
-        return None
+        data = get_shared_client().get_json(*_alpha_vantage_request(function, symbol))
+    except Exception as e:
+        data = e
+    return _check_alpha_vantage(function, symbol, data)
 
 
 def parse_numeric(value: Any) -> Optional[int]:
@@ -140,6 +149,9 @@ def fetch_all_fundamentals(symbol: str, asset_id: int) -> FundamentalsData:
     """
     Fetch all fundamental data for a single equity from Alpha Vantage.
     
+    The five calls are issued concurrently; the shared client keeps them
+    within the Alpha Vantage quota.
+    
     Args:
         symbol: The stock symbol
         asset_id: The asset_id from the database
@@ -149,42 +161,37 @@ def fetch_all_fundamentals(symbol: str, asset_id: int) -> FundamentalsData:
     """
     data = FundamentalsData(symbol=symbol, asset_id=asset_id)
     
-    # Fetch company overview
-    logger.info(f"Fetching OVERVIEW for {symbol}")
-    data.overview = fetch_alpha_vantage('OVERVIEW', symbol)
-    time.sleep(REQUEST_DELAY)
+    logger.info(f"Fetching {', '.join(FUNDAMENTAL_FUNCTIONS)} for {symbol}")
+    responses = get_shared_client().gather(
+        [_alpha_vantage_request(function, symbol) for function in FUNDAMENTAL_FUNCTIONS]
+    )
+    overview, income_data, balance_data, cash_flow_data, earnings_data = [
+        _check_alpha_vantage(function, symbol, response)
+        for function, response in zip(FUNDAMENTAL_FUNCTIONS, responses)
+    ]
+    
+    # Company overview
+    data.overview = overview
     
-    # Fetch income statements
-    logger.info(f"Fetching INCOME_STATEMENT for {symbol}")
-    income_data = fetch_alpha_vantage('INCOME_STATEMENT', symbol)
+    # Income statements
     if income_data:
         data.income_statements_annual = income_data.get('annualReports', [])
         data.income_statements_quarterly = income_data.get('quarterlyReports', [])
-    time.sleep(REQUEST_DELAY)
     
-    # Fetch balance sheets
-    logger.info(f"Fetching BALANCE_SHEET for {symbol}")
-    balance_data = fetch_alpha_vantage('BALANCE_SHEET', symbol)
+    # Balance sheets
     if balance_data:
         data.balance_sheets_annual = balance_data.get('annualReports', [])
         data.balance_sheets_quarterly = balance_data.get('quarterlyReports', [])
-    time.sleep(REQUEST_DELAY)
     
-    # Fetch cash flows
-    logger.info(f"Fetching CASH_FLOW for {symbol}")
-    cash_flow_data = fetch_alpha_vantage('CASH_FLOW', symbol)
+    # Cash flows
     if cash_flow_data:
         data.cash_flows_annual = cash_flow_data.get('annualReports', [])
         data.cash_flows_quarterly = cash_flow_data.get('quarterlyReports', [])
-    time.sleep(REQUEST_DELAY)
     
-    # Fetch earnings
-    logger.info(f"Fetching EARNINGS for {symbol}")
-    earnings_data = fetch_alpha_vantage('EARNINGS', symbol)
+    # Earnings
     if earnings_data:
         data.earnings_annual = earnings_data.get('annualEarnings', [])
         data.earnings_quarterly = earnings_data.get('quarterlyEarnings', [])
-    time.sleep(REQUEST_DELAY)
     
     return data
 
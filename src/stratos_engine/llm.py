@@ -0,0 +1,422 @@
+"""
+Shared async executor for LLM calls (OpenAI, Gemini).
+
+Stages hand it a batch of LlmRequests instead of calling the provider SDK one
+request at a time. One background event loop serves every caller in the
+process, and each provider gets:
+- a request bucket at its requests-per-minute quota (adaptive: a 429 pauses
+  the provider and halves the rate, like the vendor HTTP client)
+- a tokens-per-minute budget: a request reserves its estimated tokens before
+  it is sent and settles the real usage from the response
+- a concurrency cap
+
+Requests of one batch are dispatched in priority order (lower first, e.g.
+assets with active setups before the rest). Each outcome is handed back to
+the calling thread as soon as it completes, so results are persisted while
+the rest of the batch is still in flight and a 500-asset run is bound by the
+provider quota rather than by serial latency.
+
+Provider SDK calls are blocking; they run on the executor's thread pool.
+A request can fall back to further models, and a response that `parse`
+rejects (returns None or raises) is retried like a failed call.
+
+Quotas: OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE,
+OPENAI_MAX_CONCURRENCY and the GEMINI_* equivalents.
+
+With a cache (llm_cache.LlmCache) passed to run(), requests that carry a
+cache_key are looked up in bulk before the batch is dispatched: hits are
+answered without a model call, identical keys within the batch are sent once,
+and new parsed results are stored as they complete.
+
+Usage:
+    executor = get_shared_executor()
+    requests = [
+        LlmRequest(key=asset_id, provider="gemini", call=lambda model: client.models.generate_content(...),
+                   models=("gemini-3-flash-preview",), parse=parse_json, priority=0, est_tokens=9000),
+        ...
+    ]
+    for outcome in executor.run(requests):      # completion order, on this thread
+        if outcome.ok:
+            save(outcome.request.key, outcome.result)
+"""
+
+import asyncio
+import copy
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from . import telemetry
+from .http import TokenBucket, _env_float
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# Rough prompt size when a request has no better estimate
+CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    """Quota and concurrency for one LLM provider."""
+    name: str
+    requests_per_minute: float
+    tokens_per_minute: float
+    max_concurrency: int = 8
+
+
+def default_providers() -> Dict[str, ProviderLimits]:
+    """Provider quotas (read from the environment at call time)."""
+    return {
+        "openai": ProviderLimits(
+            name="openai",
+            requests_per_minute=_env_float("OPENAI_REQUESTS_PER_MINUTE", 500),
+            tokens_per_minute=_env_float("OPENAI_TOKENS_PER_MINUTE", 200_000),
+            max_concurrency=int(_env_float("OPENAI_MAX_CONCURRENCY", 8)),
+        ),
+        "gemini": ProviderLimits(
+            name="gemini",
+            requests_per_minute=_env_float("GEMINI_REQUESTS_PER_MINUTE", 1000),
+            tokens_per_minute=_env_float("GEMINI_TOKENS_PER_MINUTE", 1_000_000),
+            max_concurrency=int(_env_float("GEMINI_MAX_CONCURRENCY", 16)),
+        ),
+    }
+
+
+def estimate_tokens(*texts: str, max_output: int = 0) -> int:
+    """Token reservation for a request: prompt characters / CHARS_PER_TOKEN plus the output cap."""
+    return sum(len(t) for t in texts) // CHARS_PER_TOKEN + max_output
+
+
+def _rate_limited(error: BaseException) -> bool:
+    """429 from either SDK (openai.RateLimitError.status_code, google.genai ClientError.code)."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "rate limit" in text.lower()
+
+
+class TokenBudget:
+    """
+    Async tokens-per-minute budget. Requests reserve their estimate (capped at
+    one minute's quota) and settle() the real usage once the response reports
+    it, so the budget tracks what the provider actually counted.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = max(per_minute, 1.0)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def reserve(self, tokens: int) -> float:
+        tokens = min(max(tokens, 0), self.capacity)
+        # Waiters queue on the lock, so budget is handed out in FIFO order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return tokens
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+    def settle(self, reserved: float, used: float) -> None:
+        """Return the unused part of a reservation (or charge the overrun)."""
+        self._refill()
+        self.available = min(self.capacity, self.available + reserved - used)
+
+
+@dataclass
+class LlmRequest:
+    """One model call. `call(model)` returns the provider response (blocking SDK call or coroutine)."""
+    key: Hashable
+    provider: str
+    call: Callable[[str], Any]
+    # Primary model first, then fallbacks
+    models: Sequence[str]
+    # response -> result; None (or an exception) means retry
+    parse: Optional[Callable[[Any], Any]] = None
+    # Lower runs first
+    priority: float = 0
+    est_tokens: int = 2000
+    # Attempts per model
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    # Caller data carried to the outcome (packet, asset row, ...)
+    context: Any = None
+    # (input_hash, prompt_version): enables the result cache in run(), keyed
+    # with the primary model (fallback results are stored under it too).
+    # Needs a parse that returns JSON data.
+    cache_key: Optional[Tuple[str, str]] = None
+
+
+@dataclass
+class LlmOutcome:
+    """Result (or final error) of one LlmRequest."""
+    request: LlmRequest
+    result: Any = None
+    response: Any = None
+    model: Optional[str] = None
+    attempts: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    seconds: float = 0.0
+    error: Optional[BaseException] = None
+    # Answered from the cache (or by an identical request of the same batch)
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def tokens_used(self) -> int:
+        return self.tokens_in + self.tokens_out
+
+
+@dataclass
+class LlmStats:
+    requests: int = 0
+    throttled: int = 0
+    retries: int = 0
+    errors: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+
+@dataclass
+class _ProviderState:
+    limits: ProviderLimits
+    requests: TokenBucket
+    tokens: TokenBudget
+    semaphore: asyncio.Semaphore
+    stats: LlmStats = field(default_factory=LlmStats)
+
+
+class LlmExecutor:
+    """Runs batches of LLM requests concurrently within each provider's quota."""
+
+    def __init__(
+        self,
+        providers: Optional[Mapping[str, ProviderLimits]] = None,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+    ):
+        self.providers = dict(providers or default_providers())
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._state: Dict[str, _ProviderState] = {}
+
+        self._loop = asyncio.new_event_loop()
+        threads = sum(p.max_concurrency for p in self.providers.values()) or 1
+        self._loop.set_default_executor(ThreadPoolExecutor(max_workers=threads, thread_name_prefix="llm-call"))
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-executor", daemon=True)
+        self._thread.start()
+
+    def _provider(self, name: str) -> _ProviderState:
+        # Only touched from the event loop thread
+        state = self._state.get(name)
+        if state is None:
+            limits = self.providers.get(name)
+            if limits is None:
+                raise ValueError(f"Unknown LLM provider {name!r} (known: {sorted(self.providers)})")
+            rate = limits.requests_per_minute / 60.0
+            state = _ProviderState(
+                limits=limits,
+                requests=TokenBucket(rate, capacity=limits.max_concurrency, min_rate=rate * 0.1),
+                tokens=TokenBudget(limits.tokens_per_minute),
+                semaphore=asyncio.Semaphore(max(limits.max_concurrency, 1)),
+            )
+            self._state[name] = state
+        return state
+
+    def stats(self) -> Dict[str, LlmStats]:
+        return {name: state.stats for name, state in self._state.items()}
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _invoke(self, call: Callable[[str], Any], model: str) -> Any:
+        if asyncio.iscoroutinefunction(call):
+            return await call(model)
+        # to_thread copies this task's context, so telemetry follows the call
+        return await asyncio.to_thread(call, model)
+
+    async def _execute(self, request: LlmRequest) -> LlmOutcome:
+        state = self._provider(request.provider)
+        outcome = LlmOutcome(request)
+        start = time.monotonic()
+
+        for model in request.models:
+            for attempt in range(request.max_attempts):
+                if outcome.attempts:
+                    state.stats.retries += 1
+                outcome.attempts += 1
+                await state.requests.acquire()
+                reserved = await state.tokens.reserve(request.est_tokens)
+                usage = None
+                try:
+                    async with state.semaphore:
+                        state.stats.requests += 1
+                        response = await self._invoke(request.call, model)
+                    usage = telemetry.usage_tokens(response)
+                    telemetry.record_llm(response)
+                    result = request.parse(response) if request.parse else response
+                    if result is None:
+                        raise ValueError(f"unusable response from {model}")
+                except Exception as e:
+                    outcome.error = e
+                    if _rate_limited(e):
+                        state.stats.throttled += 1
+                        delay = self._backoff(attempt)
+                        state.requests.throttle(delay)
+                        logger.warning(f"{request.provider} throttled, pausing {delay:.1f}s "
+                                       f"(rate now {state.requests.rate * 60:.0f}/min)")
+                    else:
+                        logger.warning(f"{request.provider} {model} failed for {request.key} "
+                                       f"(attempt {attempt + 1}/{request.max_attempts}): {e}")
+                        if attempt < request.max_attempts - 1:
+                            await asyncio.sleep(self._backoff(attempt))
+                    continue
+                finally:
+                    # Unknown usage (failed call, SDK without usage data): keep the reservation
+                    state.tokens.settle(reserved, sum(usage) if usage is not None else reserved)
+                    if usage is not None:
+                        outcome.tokens_in += usage[0]
+                        outcome.tokens_out += usage[1]
+                        state.stats.tokens_in += usage[0]
+                        state.stats.tokens_out += usage[1]
+
+                state.requests.recover()
+                outcome.result, outcome.response, outcome.model, outcome.error = result, response, model, None
+                outcome.seconds = time.monotonic() - start
+                return outcome
+
+        state.stats.errors += 1
+        outcome.seconds = time.monotonic() - start
+        return outcome
+
+    async def _dispatch(self, requests: List[LlmRequest], emit: Callable[[LlmOutcome], None]) -> None:
+        pending = deque(requests)
+        providers = {r.provider for r in requests}
+        workers = min(len(requests), sum(
+            self.providers[p].max_concurrency if p in self.providers else 1 for p in providers
+        ))
+
+        async def worker():
+            while pending:
+                request = pending.popleft()
+                try:
+                    outcome = await self._execute(request)
+                except Exception as e:
+                    # e.g. unknown provider: report it on the request instead of stalling the batch
+                    outcome = LlmOutcome(request, error=e)
+                emit(outcome)
+
+        await asyncio.gather(*(worker() for _ in range(max(workers, 1))))
+
+    def run(self, requests: Iterable[LlmRequest], cache=None) -> Iterator[LlmOutcome]:
+        """
+        Dispatch requests in priority order (stable for equal priorities) and
+        yield each outcome on the calling thread as soon as it completes.
+        With a cache, cached results are yielded first and only one request
+        per cache_key is sent. Closing the generator early cancels requests
+        not yet sent.
+        """
+        requests = sorted(requests, key=lambda r: r.priority)
+        if not requests:
+            return
+
+        cached: List[LlmOutcome] = []
+        # id(leader) -> requests with the same cache_key, answered from the leader's outcome
+        followers: Dict[int, List[LlmRequest]] = {}
+        if cache is not None:
+            keyed = [r for r in requests if r.cache_key is not None and r.parse is not None]
+            keyed_ids = {id(r) for r in keyed}
+            hits = cache.get_many((*r.cache_key, r.models[0]) for r in keyed) if keyed else {}
+            leaders: Dict[Tuple[str, str], LlmRequest] = {}
+            send: List[LlmRequest] = []
+            for request in requests:
+                if id(request) not in keyed_ids:
+                    send.append(request)
+                    continue
+                key = (*request.cache_key, request.models[0])
+                if key in hits:
+                    cached.append(LlmOutcome(request, result=hits[key], model=request.models[0], cached=True))
+                elif request.cache_key in leaders:
+                    followers[id(leaders[request.cache_key])].append(request)
+                else:
+                    leaders[request.cache_key] = request
+                    followers[id(request)] = []
+                    send.append(request)
+            requests = send
+
+        yield from cached
+        if not requests:
+            return
+
+        outcomes: "queue.Queue[LlmOutcome]" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            telemetry.carry(self._dispatch(requests, outcomes.put)), self._loop
+        )
+        remaining = len(requests)
+        try:
+            while remaining:
+                try:
+                    outcome = outcomes.get(timeout=1.0)
+                except queue.Empty:
+                    if future.done():
+                        future.result()  # dispatcher died: raise its error
+                        break
+                    continue
+                remaining -= 1
+                request = outcome.request
+                if outcome.ok and id(request) in followers:
+                    # Stored before the caller can mutate the result
+                    cache.put((*request.cache_key, request.models[0]), outcome.result,
+                              (outcome.tokens_in, outcome.tokens_out))
+                yield outcome
+                for follower in followers.get(id(request), ()):
+                    yield LlmOutcome(follower, result=copy.deepcopy(outcome.result), model=outcome.model,
+                                     error=outcome.error, cached=outcome.ok)
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def complete(self, request: LlmRequest, cache=None) -> LlmOutcome:
+        """Run a single request (still within the shared quotas)."""
+        return next(iter(self.run([request], cache=cache)))
+
+    def close(self) -> None:
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+_shared_executor: Optional[LlmExecutor] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_executor() -> LlmExecutor:
+    """Process-wide executor, so every stage shares the same provider quotas."""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = LlmExecutor()
+        return _shared_executor
@@ -0,0 +1,346 @@
+"""
+Offline batch mode for LLM requests that are not latency sensitive.
+
+The nightly AI reviews (run_all_equities.py, run_all_crypto_v3.py,
+scripts/run_etf_ai_analysis_batch.py, jobs/*_daily_ai_signals.py) can send
+every prompt of a run as one provider batch job instead of hundreds of
+interactive calls. Batch jobs run outside the interactive requests-per-minute
+quota and are billed at a discount; results arrive minutes to hours later.
+
+Flow (run_batch):
+1. write all requests as one JSONL file (Gemini batch format, one
+   GenerateContentRequest per line under a unique key) in LLM_BATCH_DIR
+2. submit it to the provider
+3. poll every LLM_BATCH_POLL_SECONDS until the job ends (LLM_BATCH_TIMEOUT_HOURS)
+4. read the output lines back and join them to the requests by key
+
+Callers then parse the texts and bulk-insert the reviews in one statement.
+On a dry run (--dry-run, or any provider with `dry_run = True`) they write the
+parsed rows to a JSONL file with write_rows() instead of the database.
+
+Providers (LLM_BATCH_PROVIDER):
+- gemini: Files API upload + client.batches (google-genai)
+- stub: local, answers each request with a canned (or caller supplied)
+  response; for dry runs of the parse path without API cost. Always a dry
+  run, so canned reviews never reach asset_ai_reviews
+
+Usage:
+    requests = [BatchRequest(key=str(a["asset_id"]), prompt=build_prompt(a), context=a) for a in assets]
+    for result in run_batch(requests, model="gemini-3-flash-preview", display_name="equity-2026-01-06"):
+        if result.ok:
+            rows.append(review_row(result.request.context, json.loads(result.text)))
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+# Only stdlib + telemetry here (no http/llm, so no aiohttp): the standalone
+# jobs/ scripts import this module with a minimal set of packages
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Stub token counts use the same estimate as llm.CHARS_PER_TOKEN
+CHARS_PER_TOKEN = 4
+
+DEFAULT_POLL_SECONDS = 30.0
+DEFAULT_TIMEOUT_HOURS = 24.0
+
+# Provider job states, normalized
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_GEMINI_STATES = {
+    "JOB_STATE_SUCCEEDED": SUCCEEDED,
+    "JOB_STATE_FAILED": FAILED,
+    "JOB_STATE_CANCELLED": FAILED,
+    "JOB_STATE_EXPIRED": FAILED,
+}
+
+
+@dataclass
+class BatchRequest:
+    """
+    One prompt of a batch job: a text, or a list of texts sent as separate
+    parts. `config` is a Gemini generationConfig (REST field names).
+    """
+    key: str
+    prompt: Union[str, Sequence[str]]
+    config: Dict[str, Any] = field(default_factory=dict)
+    system_instruction: Optional[str] = None
+    # Caller data carried to the result (asset row, packet, ...)
+    context: Any = None
+
+    def to_line(self) -> Dict[str, Any]:
+        texts = [self.prompt] if isinstance(self.prompt, str) else list(self.prompt)
+        request: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": t} for t in texts]}]}
+        if self.config:
+            request["generationConfig"] = self.config
+        if self.system_instruction:
+            request["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        return {"key": self.key, "request": request}
+
+
+@dataclass
+class BatchResult:
+    """Response text (or error) for one BatchRequest."""
+    request: BatchRequest
+    text: Optional[str] = None
+    error: Optional[str] = None
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.text is not None
+
+
+def write_jsonl(requests: Iterable[BatchRequest], path: str) -> int:
+    """Write requests as a batch input file; returns the number of lines."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request.to_line(), default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def _response_text(response: Dict[str, Any]) -> Optional[str]:
+    """Answer text of a GenerateContentResponse (thought parts skipped)."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    texts = [p["text"] for p in parts if p.get("text") and not p.get("thought")]
+    return "".join(texts) if texts else None
+
+
+def _usage(response: Dict[str, Any]) -> tuple:
+    usage = response.get("usageMetadata") or response.get("usage_metadata") or {}
+    prompt = usage.get("promptTokenCount") or usage.get("prompt_token_count") or 0
+    output = (usage.get("candidatesTokenCount") or usage.get("candidates_token_count") or 0) + \
+             (usage.get("thoughtsTokenCount") or usage.get("thoughts_token_count") or 0)
+    return int(prompt), int(output)
+
+
+# =============================================================================
+# PROVIDERS
+# =============================================================================
+
+class GeminiBatchProvider:
+    """Gemini Batch API: upload the JSONL through the Files API, then client.batches."""
+
+    name = "gemini"
+    dry_run = False
+
+    def __init__(self, client=None, api_key: Optional[str] = None):
+        if client is None:
+            from google import genai
+            api_key = api_key or os.environ.get("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not set in environment or provided")
+            client = genai.Client(api_key=api_key)
+        self.client = client
+
+    def submit(self, path: str, model: str, display_name: str) -> str:
+        from google.genai import types
+        uploaded = self.client.files.upload(
+            file=path, config=types.UploadFileConfig(display_name=display_name, mime_type="jsonl")
+        )
+        job = self.client.batches.create(model=model, src=uploaded.name, config={"display_name": display_name})
+        return job.name
+
+    def status(self, job_id: str) -> str:
+        job = self.client.batches.get(name=job_id)
+        state = getattr(job.state, "name", str(job.state))
+        return _GEMINI_STATES.get(state, RUNNING)
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        job = self.client.batches.get(name=job_id)
+        content = self.client.files.download(file=job.dest.file_name)
+        for line in content.decode("utf-8").splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def stub_response(request: Dict[str, Any]) -> str:
+    """Neutral review JSON accepted by every nightly review parser."""
+    return json.dumps({
+        "direction": "neutral",
+        "ai_direction_score": 0,
+        "ai_setup_quality_score": 50,
+        "setup_purity_score": 50,
+        "confidence": 0.5,
+        "subscores": {},
+        "primary_signal": "neutral",
+        "summary_text": "stub batch review",
+        "reasoning": "stub batch review",
+    })
+
+
+class StubBatchProvider:
+    """
+    Local stand-in for a batch API. Jobs complete after `polls` status checks;
+    each line is answered by `responder(request) -> text` (an exception there
+    becomes that line's error).
+    """
+
+    name = "stub"
+    # Canned answers must never be ingested as reviews
+    dry_run = True
+
+    def __init__(self, responder: Callable[[Dict[str, Any]], str] = stub_response, polls: int = 1):
+        self.responder = responder
+        self.polls = polls
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, path: str, model: str, display_name: str) -> str:
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        job_id = f"stub-batches/{uuid.uuid4().hex[:12]}"
+        self._jobs[job_id] = {"lines": lines, "polls": 0}
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job = self._jobs[job_id]
+        job["polls"] += 1
+        return SUCCEEDED if job["polls"] >= self.polls else RUNNING
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        for line in self._jobs[job_id]["lines"]:
+            request = line["request"]
+            try:
+                text = self.responder(request)
+            except Exception as e:
+                yield {"key": line["key"], "error": {"message": str(e)}}
+                continue
+            prompt_chars = sum(len(p.get("text", "")) for c in request["contents"] for p in c["parts"])
+            yield {"key": line["key"], "response": {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_chars // CHARS_PER_TOKEN,
+                    "candidatesTokenCount": len(text) // CHARS_PER_TOKEN,
+                },
+            }}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _workdir(workdir: Optional[str] = None) -> str:
+    return workdir or os.environ.get("LLM_BATCH_DIR") or os.path.join(tempfile.gettempdir(), "stratos_batches")
+
+
+def get_batch_provider(name: Optional[str] = None):
+    """Provider by name (default: $LLM_BATCH_PROVIDER, else gemini)."""
+    name = (name or os.environ.get("LLM_BATCH_PROVIDER") or "gemini").lower()
+    if name == "gemini":
+        return GeminiBatchProvider()
+    if name == "stub":
+        return StubBatchProvider()
+    raise ValueError(f"Unknown batch provider {name!r} (known: gemini, stub)")
+
+
+# =============================================================================
+# RUN
+# =============================================================================
+
+def run_batch(
+    requests: Iterable[BatchRequest],
+    model: str,
+    provider=None,
+    display_name: Optional[str] = None,
+    workdir: Optional[str] = None,
+    poll_seconds: Optional[float] = None,
+    timeout_hours: Optional[float] = None,
+) -> List[BatchResult]:
+    """
+    Submit requests as one batch job, wait for it and return one result per
+    request (requests missing from the output get an error). Raises if the
+    job fails, is cancelled or expires, or the timeout passes.
+    """
+    requests = list(requests)
+    if not requests:
+        return []
+    by_key = {r.key: r for r in requests}
+    if len(by_key) != len(requests):
+        raise ValueError("Batch request keys must be unique")
+
+    provider = provider or get_batch_provider()
+    display_name = display_name or f"stratos-{time.strftime('%Y%m%d-%H%M%S')}"
+    workdir = _workdir(workdir)
+    poll_seconds = poll_seconds if poll_seconds is not None else _env_float("LLM_BATCH_POLL_SECONDS", DEFAULT_POLL_SECONDS)
+    timeout_hours = timeout_hours if timeout_hours is not None else _env_float("LLM_BATCH_TIMEOUT_HOURS", DEFAULT_TIMEOUT_HOURS)
+
+    path = os.path.join(workdir, f"{display_name}.jsonl")
+    count = write_jsonl(requests, path)
+    job_id = provider.submit(path, model, display_name)
+    logger.info(f"Submitted {provider.name} batch {job_id}: {count} requests ({path})")
+
+    start = time.monotonic()
+    deadline = start + timeout_hours * 3600
+    while True:
+        state = provider.status(job_id)
+        if state != RUNNING:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {job_id} still running after {timeout_hours:g}h")
+        time.sleep(poll_seconds)
+    if state != SUCCEEDED:
+        raise RuntimeError(f"Batch {job_id} ended in state {state}")
+    logger.info(f"Batch {job_id} finished after {time.monotonic() - start:.0f}s")
+
+    results: Dict[str, BatchResult] = {}
+    for line in provider.results(job_id):
+        request = by_key.get(str(line.get("key")))
+        if request is None:
+            continue
+        result = BatchResult(request)
+        if line.get("error"):
+            result.error = str(line["error"].get("message") if isinstance(line["error"], dict) else line["error"])
+        else:
+            response = line.get("response") or {}
+            result.text = _response_text(response)
+            result.tokens_in, result.tokens_out = _usage(response)
+            if result.text is None:
+                result.error = "empty response"
+            telemetry.record_llm(tokens_in=result.tokens_in, tokens_out=result.tokens_out)
+        results[request.key] = result
+
+    missing = [k for k in by_key if k not in results]
+    if missing:
+        logger.warning(f"Batch {job_id}: {len(missing)} requests missing from the output")
+    for key in missing:
+        results[key] = BatchResult(by_key[key], error="missing from batch output")
+    return [results[r.key] for r in requests]
+
+
+def _plain(value: Any) -> Any:
+    # psycopg2 Json wrappers carry the wrapped object in .adapted
+    return getattr(value, "adapted", str(value))
+
+
+def write_rows(rows: Iterable[Any], display_name: str, workdir: Optional[str] = None) -> str:
+    """
+    Dry-run sink: write the parsed review rows (tuples or dicts) as JSONL to
+    {LLM_BATCH_DIR}/{display_name}.rows.jsonl instead of the database.
+    Returns the path.
+    """
+    path = os.path.join(_workdir(workdir), f"{display_name}.rows.jsonl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=_plain))
+            f.write("\n")
+    return path
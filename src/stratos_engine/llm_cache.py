@@ -0,0 +1,336 @@
+"""
+Content-addressed cache of LLM results, keyed on (input_hash, prompt_version, model).
+
+The input hash is content_hash() of the packet a stage sends (Stage5AIReview
+Pass A/B, Stage5AIReviewV3, FVS), so any change to the data, and the prompt
+version, produces a new key. With a cache attached, LlmExecutor.run() looks every request of a batch up in bulk before anything
+is dispatched, answers hits without calling the model, sends identical
+requests of one batch only once, and stores each new result as it completes.
+Re-runs and retried jobs then never pay twice for the same model call.
+
+Two tiers:
+- local: an on-disk LRU (SQLite file under LLM_CACHE_DIR, at most
+  LLM_CACHE_MAX_MB, least recently read entries evicted first)
+- shared: the llm_response_cache table, looked up in one query per batch;
+  database hits are copied into the local tier
+
+Cached values are the parsed (JSON-serializable) results, not raw responses.
+
+Usage:
+    cache = LlmCache(db)
+    for outcome in executor.run(requests, cache=cache):   # requests carry cache_key
+        ...
+    cache.stats()   # {'local_hits': ..., 'db_hits': ..., 'misses': ..., 'evictions': ..., ...}
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2.extras
+
+logger = logging.getLogger(__name__)
+
+# (input_hash, prompt_version, model)
+CacheKey = Tuple[str, str, str]
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stratos", "llm")
+DEFAULT_MAX_MB = 512
+# Keys per SQLite lookup (stays under its bound-parameter limit)
+_LOOKUP_CHUNK = 300
+
+
+@dataclass
+class CacheStats:
+    local_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.local_hits + self.db_hits + self.misses
+        return (self.local_hits + self.db_hits) / lookups if lookups else 0.0
+
+
+def content_hash(*parts: Any) -> str:
+    """Digest of exactly what is sent to the model (JSON, key order independent)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _key_id(key: CacheKey) -> str:
+    return "\x1f".join(key)
+
+
+class DiskLru:
+    """Size-bounded SQLite key/value store, evicting the least recently read entries."""
+
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", chunk
+                ).fetchall()
+                if rows:
+                    found.update(rows)
+                    self._conn.execute(
+                        f"UPDATE entries SET accessed_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now, *(key for key, _ in rows)],
+                    )
+        return found
+
+    def put_many(self, items: Dict[str, str]) -> int:
+        """Store items; returns the number of entries evicted to stay under max_bytes."""
+        if not items:
+            return 0
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for key, value in items.items():
+                old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                size = len(key) + len(value)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, size, now),
+                )
+                self._size += size - (old[0] if old else 0)
+            evicted = 0
+            while self._size > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 100"
+                ).fetchall()
+                if not oldest:
+                    break
+                for key, size in oldest:
+                    if self._size <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._size -= size
+                    evicted += 1
+            self._conn.execute("COMMIT")
+        return evicted
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LlmCache:
+    """
+    Local LRU in front of the llm_response_cache table (either tier optional).
+
+    The table is reached through a pooled Database (`db`) or, for the stages
+    that manage their own psycopg2 connections, a `connect` factory.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        connect: Optional[Callable[[], Any]] = None,
+        directory: Optional[str] = None,
+        max_mb: Optional[float] = None,
+        local: bool = True,
+    ):
+        self.db = db
+        self.connect = connect
+        directory = os.path.expanduser(directory or os.environ.get("LLM_CACHE_DIR") or DEFAULT_DIR)
+        max_mb = max_mb if max_mb is not None else float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        self.local: Optional[DiskLru] = None
+        if local:
+            try:
+                self.local = DiskLru(os.path.join(directory, "responses.sqlite"), int(max_mb * 2**20))
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"LLM cache: local tier disabled ({directory}): {e}")
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def _count(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self._stats, name, getattr(self._stats, name) + value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            values = asdict(self._stats)
+            values["hit_rate"] = round(self._stats.hit_rate, 3)
+        if self.local is not None:
+            values["local_bytes"] = self.local.size_bytes
+        return values
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, Any]:
+        """Cached results for the keys found in either tier (one query per tier)."""
+        keys = list(dict.fromkeys(tuple(k) for k in keys))
+        if not keys:
+            return {}
+        found: Dict[CacheKey, Any] = {}
+
+        if self.local is not None:
+            by_id = {_key_id(k): k for k in keys}
+            try:
+                for key_id, value in self.local.get_many(list(by_id)).items():
+                    found[by_id[key_id]] = json.loads(value)
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning(f"LLM cache: local lookup failed: {e}")
+        local_hits = len(found)
+
+        missing = [k for k in keys if k not in found]
+        db_found = self._db_lookup(missing) if missing else {}
+        found.update(db_found)
+        if db_found and self.local is not None:
+            self._put_local(db_found)
+
+        self._count(local_hits=local_hits, db_hits=len(db_found), misses=len(keys) - len(found))
+        return found
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        return self.get_many([key]).get(tuple(key))
+
+    @property
+    def shared(self) -> bool:
+        return self.db is not None or self.connect is not None
+
+    @contextmanager
+    def _cursor(self):
+        if self.db is not None:
+            with self.db.cursor() as cur:
+                yield cur
+            return
+        conn = self.connect()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                yield cur
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _db_lookup(self, keys: List[CacheKey]) -> Dict[CacheKey, Any]:
+        if not self.shared:
+            return {}
+        hashes, versions, models = (list(column) for column in zip(*keys))
+        try:
+            with self._cursor() as cur:
+                cur.execute("""
+                WITH wanted AS (
+                    SELECT * FROM unnest(%s::text[], %s::text[], %s::text[]) AS w(input_hash, prompt_version, model)
+                )
+                UPDATE llm_response_cache c
+                SET hit_count = c.hit_count + 1, last_hit_at = NOW()
+                FROM wanted w
+                WHERE c.input_hash = w.input_hash AND c.prompt_version = w.prompt_version AND c.model = w.model
+                RETURNING c.input_hash, c.prompt_version, c.model, c.result
+                """, (hashes, versions, models))
+                rows = cur.fetchall()
+        except Exception as e:
+            logger.warning(f"LLM cache: database lookup failed: {e}")
+            return {}
+        found = {}
+        for row in rows:
+            result = row["result"]
+            found[(row["input_hash"], row["prompt_version"], row["model"])] = (
+                json.loads(result) if isinstance(result, str) else result
+            )
+        return found
+
+    # ------------------------------------------------------------------
+    # Stores
+    # ------------------------------------------------------------------
+
+    def put_many(self, items: Dict[CacheKey, Any], tokens: Optional[Dict[CacheKey, Tuple[int, int]]] = None) -> None:
+        """Store results in both tiers; `tokens` is (prompt, completion) per key, for accounting."""
+        if not items:
+            return
+        items = {tuple(k): v for k, v in items.items()}
+        if self.local is not None:
+            self._put_local(items)
+        if self.shared:
+            tokens = tokens or {}
+            rows = [
+                (k[0], k[1], k[2], json.dumps(v, default=str), *tokens.get(k, (None, None)))
+                for k, v in items.items()
+            ]
+            try:
+                with self._cursor() as cur:
+                    psycopg2.extras.execute_values(cur, """
+                    INSERT INTO llm_response_cache (input_hash, prompt_version, model, result, tokens_in, tokens_out)
+                    VALUES %s
+                    ON CONFLICT (input_hash, prompt_version, model) DO UPDATE SET
+                        result = EXCLUDED.result,
+                        tokens_in = EXCLUDED.tokens_in,
+                        tokens_out = EXCLUDED.tokens_out,
+                        created_at = NOW()
+                    """, rows, template="(%s, %s, %s, %s::jsonb, %s, %s)")
+            except Exception as e:
+                logger.warning(f"LLM cache: database write failed: {e}")
+        self._count(writes=len(items))
+
+    def put(self, key: CacheKey, result: Any, tokens: Optional[Tuple[int, int]] = None) -> None:
+        self.put_many({tuple(key): result}, {tuple(key): tokens} if tokens else None)
+
+    def _put_local(self, items: Dict[CacheKey, Any]) -> None:
+        try:
+            evicted = self.local.put_many({_key_id(k): json.dumps(v, default=str) for k, v in items.items()})
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"LLM cache: local write failed: {e}")
+            return
+        if evicted:
+            self._count(evictions=evicted)
+
+    def close(self) -> None:
+        if self.local is not None:
+            self.local.close()
+
+
+_shared_cache: Optional[LlmCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(db=None, connect: Optional[Callable[[], Any]] = None) -> LlmCache:
+    """
+    Process-wide cache (one local LRU file handle). The first caller passing
+    a database (or connection factory) enables the shared tier.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LlmCache(db=db, connect=connect)
+        elif not _shared_cache.shared and (db is not None or connect is not None):
+            _shared_cache.db, _shared_cache.connect = db, connect
+        return _shared_cache
@@ -0,0 +1,169 @@
+"""
+Bar-count lookback queries.
+
+Feature and scanner jobs need "the last N bars" per asset, not "the last D
+calendar days": a calendar window over-fetches for equities (600 days is ~410
+sessions) and still comes up short after long holiday closures. recent_bars
+fetches exactly N bars per asset for a whole list of assets in one query:
+
+    SELECT ... FROM unnest(asset_ids) AS x(asset_id)
+    CROSS JOIN LATERAL (
+        SELECT ... FROM daily_bars WHERE asset_id = x.asset_id AND date <= end
+        ORDER BY date DESC LIMIT n
+    ) b
+
+Each lateral subquery is a backwards walk of the (asset_id, date) primary key
+index that stops after n rows, so the cost is proportional to what is returned.
+Rows are streamed with a server-side cursor and prices are cast to float8 on
+the server. With BAR_STORE_DIR set, the local bar store is read instead.
+
+    panel = recent_bars(conn, asset_ids, '2026-01-15', bars=300)   # long frame
+    by_asset = recent_bars_by_asset(conn, asset_ids, '2026-01-15', bars=120)
+
+`conn` is a psycopg2 connection or a stratos_engine Database.
+"""
+
+import uuid
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from . import telemetry
+from .bar_store import get_shared_store
+from .stream import connection
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+ITERSIZE = 50_000
+
+DateLike = Union[str, date]
+
+
+def _sql(columns: Sequence[str], with_range: bool) -> str:
+    selected = ', '.join(f'{c}::float8 AS {c}' for c in columns)
+    # With a start date: n bars before start plus every bar in [start, end]
+    limit = '%(bars)s'
+    if with_range:
+        limit += """ + (SELECT COUNT(*) FROM daily_bars r
+                        WHERE r.asset_id = x.asset_id AND r.date BETWEEN %(start)s AND %(end)s)"""
+    return f"""
+        SELECT x.asset_id, b.date, {', '.join('b.' + c for c in columns)}
+        FROM unnest(%(asset_ids)s::bigint[]) AS x(asset_id)
+        CROSS JOIN LATERAL (
+            SELECT date, {selected}
+            FROM daily_bars
+            WHERE asset_id = x.asset_id AND date <= %(end)s
+            ORDER BY date DESC
+            LIMIT {limit}
+        ) b
+        ORDER BY x.asset_id, b.date
+    """
+
+
+def _from_store(store, asset_ids: List[int], end: DateLike, bars: int,
+                start: Optional[DateLike], columns: Sequence[str]) -> pd.DataFrame:
+    import pyarrow as pa
+
+    parts = []
+    for asset_id in asset_ids:
+        table = store.read_table(asset_id, end=end)
+        if table.num_rows == 0:
+            continue
+        keep = bars
+        if start is not None:
+            days = table.column('date').cast(pa.int32()).to_numpy()
+            first = np.datetime64(str(start)[:10], 'D').astype(np.int64)
+            keep += len(days) - int(np.searchsorted(days, first))
+        parts.append(table.slice(max(table.num_rows - keep, 0)).select(['asset_id', 'date', *columns]))
+    if not parts:
+        return pd.DataFrame(columns=['asset_id', 'date', *columns])
+    df = pa.concat_tables(parts).to_pandas(date_as_object=False)
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df
+
+
+def recent_bars(
+    conn,
+    asset_ids: Iterable[int],
+    end: DateLike,
+    bars: int,
+    start: Optional[DateLike] = None,
+    columns: Sequence[str] = OHLCV_COLUMNS,
+    itersize: int = ITERSIZE,
+) -> pd.DataFrame:
+    """
+    The last `bars` bars on or before `end` for each asset, as one long frame.
+
+    Args:
+        asset_ids: Assets to load (missing assets are simply absent)
+        end: Last date (inclusive)
+        bars: Bars per asset; with `start`, bars before start (the lookback)
+              in addition to every bar in [start, end]
+        columns: daily_bars price/volume columns, returned as float64
+
+    Returns:
+        DataFrame (asset_id, date as datetime64, *columns) sorted by asset_id, date
+    """
+    asset_ids = sorted({int(a) for a in asset_ids})
+    columns = list(columns)
+    if not asset_ids:
+        return pd.DataFrame(columns=['asset_id', 'date', *columns])
+
+    params = {'asset_ids': asset_ids, 'end': str(end)[:10], 'bars': int(bars),
+              'start': str(start)[:10] if start is not None else None}
+    chunks = []
+    with connection(conn) as pg:
+        store = get_shared_store(pg, end)
+        if store is not None:
+            return _from_store(store, asset_ids, end, bars, start, columns)
+
+        cur = pg.cursor(name=f'lookback_{uuid.uuid4().hex[:12]}', withhold=pg.autocommit)
+        try:
+            cur.itersize = itersize
+            cur.execute(_sql(columns, start is not None), params)
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                telemetry.record_rows(read=len(rows))
+                chunks.append(pd.DataFrame.from_records(rows, columns=['asset_id', 'date', *columns]))
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass  # never mask the query's own error (e.g. a failed DECLARE)
+
+    if not chunks:
+        return pd.DataFrame(columns=['asset_id', 'date', *columns])
+    df = pd.concat(chunks, ignore_index=True)
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    df[columns] = df[columns].astype(float)
+    return df
+
+
+def split_by_asset(panel: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+    """Long frame from recent_bars -> {asset_id: frame (date, *columns)}, index reset."""
+    if panel.empty:
+        return {}
+    keys = panel['asset_id'].to_numpy()
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [len(keys)]])
+    body = panel.drop(columns='asset_id')
+    return {
+        int(keys[lo]): body.iloc[lo:hi].reset_index(drop=True)
+        for lo, hi in zip(starts, stops)
+    }
+
+
+def recent_bars_by_asset(
+    conn,
+    asset_ids: Iterable[int],
+    end: DateLike,
+    bars: int,
+    start: Optional[DateLike] = None,
+    columns: Sequence[str] = OHLCV_COLUMNS,
+) -> Dict[int, pd.DataFrame]:
+    """recent_bars split per asset: {asset_id: DataFrame(date, *columns)}."""
+    return split_by_asset(recent_bars(conn, asset_ids, end, bars, start=start, columns=columns))
@@ -0,0 +1,328 @@
+"""Stage DAG for a pipeline run, with per-stage checkpoints.
+
+Each stage declares the job types it runs for and the stages it depends on.
+PipelineScheduler runs the stages selected for a job in dependency order,
+starting independent stages in parallel (e.g. Stage2 AI annotation and Stage5
+AI review), and records each stage's outcome in pipeline_runs.stages.
+
+When a job is retried, stages that succeeded in the job's previous run are not
+executed again: their results are carried into the new run (status
+"resumed") and the DAG continues at the first incomplete stage.
+
+Every executed stage is measured (see telemetry.py): wall/DB time, rows,
+HTTP calls, LLM tokens and peak RSS go into the stage_completed/stage_failed
+log and pipeline_stage_metrics. A job submitted with "profile": "cprofile"
+(or "pyinstrument") also dumps one profile per stage under
+config.engine.profile_dir/<run_id>/.
+
+Usage:
+    scheduler = PipelineScheduler(db)
+    results = scheduler.run(StageContext.from_job(db, job, job_id, run_id))
+"""
+
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+
+from . import telemetry
+from .config import config
+from .db import Database
+from .stages import Stage1Evaluate, Stage1Fetch, Stage2AI, Stage3State
+from .stages.stage4_scoring import Stage4Scoring
+from .stages.stage5_ai_review import Stage5AIReview
+from .utils.freshness import FreshnessCheck
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class StageContext:
+    """Inputs shared by every stage of one pipeline run."""
+    db: Database
+    job: Dict[str, Any]
+    job_id: Optional[str]
+    run_id: str
+    job_type: str
+    as_of_date: str
+    universe_id: str
+    config_id: Optional[str]
+    include_ai: bool
+    # "cprofile" / "pyinstrument" to dump a profile per stage
+    profile: Optional[str] = None
+    results: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_job(cls, db: Database, job: Dict[str, Any], job_id: Optional[str], run_id: str) -> "StageContext":
+        return cls(
+            db=db,
+            job=job,
+            job_id=job_id,
+            run_id=run_id,
+            job_type=job.get("job_type", "daily_run"),
+            as_of_date=job.get("as_of_date", datetime.now().strftime("%Y-%m-%d")),
+            universe_id=job.get("universe_id", "equities_all"),
+            config_id=job.get("config_id"),
+            include_ai=job.get("include_ai", False),
+            profile=_profile_option(job.get("profile")),
+        )
+
+
+def _profile_option(option: Any) -> Optional[str]:
+    """Job "profile" option: a profiler name, or any other truthy value for cProfile."""
+    if not option:
+        return None
+    option = str(option).lower()
+    return option if option in telemetry.PROFILERS else "cprofile"
+
+
+@dataclass(frozen=True)
+class StageSpec:
+    """One node of the pipeline DAG."""
+    name: str
+    run: Callable[[StageContext], Any]
+    job_types: Tuple[str, ...]
+    depends_on: Tuple[str, ...] = ()
+    # Extra condition on top of job_types (feature flags, job options)
+    when: Optional[Callable[[StageContext], bool]] = None
+
+    def selected(self, ctx: StageContext) -> bool:
+        if ctx.job_type not in self.job_types:
+            return False
+        return self.when(ctx) if self.when else True
+
+
+# =============================================================================
+# STAGES
+# =============================================================================
+
+def _run_fetch(ctx: StageContext) -> Any:
+    return Stage1Fetch(ctx.db).run(ctx.as_of_date, ctx.universe_id, ctx.config_id)
+
+
+def _run_freshness(ctx: StageContext) -> Any:
+    # Runs after the fetch so the pipeline can self-heal before checking coverage
+    passed, stats = FreshnessCheck(ctx.db).check_coverage(ctx.as_of_date, ctx.universe_id)
+    if not passed:
+        raise ValueError(f"Insufficient feature coverage: {stats['actual']}/{stats['expected']} ({stats['coverage']:.1%})")
+    return stats
+
+
+def _run_evaluate(ctx: StageContext) -> Any:
+    return Stage1Evaluate(ctx.db).run(ctx.as_of_date, ctx.universe_id, ctx.config_id)
+
+
+def _run_state(ctx: StageContext) -> Any:
+    return Stage3State(ctx.db).run(ctx.as_of_date, ctx.config_id)
+
+
+def _run_scoring(ctx: StageContext) -> Any:
+    return Stage4Scoring(ctx.db).run(ctx.as_of_date, ctx.universe_id, ctx.config_id)
+
+
+def _run_ai_review(ctx: StageContext) -> Any:
+    return Stage5AIReview(ctx.db).run(
+        as_of_date=ctx.as_of_date,
+        universe_id=ctx.universe_id,
+        config_id=ctx.config_id,
+    )
+
+
+def _run_ai(ctx: StageContext) -> Any:
+    return Stage2AI(ctx.db).run(
+        ctx.as_of_date,
+        min_strength=ctx.job.get("ai_min_strength", 60),
+        budget=ctx.job.get("ai_budget", config.engine.ai_budget_per_run),
+        config_id=ctx.config_id,
+    )
+
+
+def _ai_enabled(ctx: StageContext) -> bool:
+    # daily_pipeline only runs the AI stages when the job asks for them
+    if not config.engine.enable_ai_stage:
+        return False
+    return ctx.job_type != "daily_pipeline" or ctx.include_ai
+
+
+PIPELINE_STAGES: List[StageSpec] = [
+    StageSpec("stage1_fetch", _run_fetch, ("daily_run", "stage1_only", "evaluate")),
+    StageSpec("freshness", _run_freshness, ("daily_run", "daily_pipeline", "evaluate"),
+              depends_on=("stage1_fetch",)),
+    StageSpec("stage1", _run_evaluate, ("daily_run", "daily_pipeline", "stage1_only", "evaluate"),
+              depends_on=("stage1_fetch", "freshness")),
+    # Stage 3 before AI so instances exist
+    StageSpec("stage3", _run_state, ("daily_run", "daily_pipeline", "stage3_only", "state"),
+              depends_on=("stage1",)),
+    StageSpec("stage4", _run_scoring, ("daily_run", "daily_pipeline", "stage4_only", "scoring"),
+              depends_on=("stage3",)),
+    # AI review reads daily_asset_scores; AI annotation reads signal_instances
+    StageSpec("stage5", _run_ai_review, ("daily_run", "daily_pipeline", "stage5_only", "ai_review"),
+              depends_on=("stage4",), when=_ai_enabled),
+    StageSpec("stage2", _run_ai, ("daily_run", "daily_pipeline", "stage2_only", "ai"),
+              depends_on=("stage3",), when=_ai_enabled),
+]
+
+
+# =============================================================================
+# CHECKPOINTS
+# =============================================================================
+
+class StageCheckpoint:
+    """Per-stage outcome stored in pipeline_runs.stages ({stage: {...}})."""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def previous_results(self, job_id: Optional[str], run_id: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """(previous run_id, {stage: result}) for stages already completed by this job."""
+        if not job_id:
+            return None, {}
+        row = self.db.fetch_one("""
+        SELECT run_id, stages
+        FROM pipeline_runs
+        WHERE job_id = %s AND run_id <> %s
+        ORDER BY started_at DESC
+        LIMIT 1
+        """, (job_id, run_id))
+        if not row or not row.get("stages"):
+            return None, {}
+        completed = {
+            name: entry.get("result")
+            for name, entry in row["stages"].items()
+            if entry.get("status") in ("success", "resumed")
+        }
+        return str(row["run_id"]), completed
+
+    def record(self, run_id: str, stage: str, entry: Dict[str, Any]) -> None:
+        entry = {**entry, "recorded_at": datetime.utcnow().isoformat()}
+        self.db.execute("""
+        UPDATE pipeline_runs
+        SET stages = COALESCE(stages, '{}'::jsonb) || jsonb_build_object(%s::text, %s::jsonb)
+        WHERE run_id = %s
+        """, (stage, json.dumps(entry, default=str), run_id))
+
+    def mark_resumed(self, run_id: str, previous_run_id: str) -> None:
+        self.db.execute(
+            "UPDATE pipeline_runs SET resumed_from = %s WHERE run_id = %s",
+            (previous_run_id, run_id),
+        )
+
+
+# =============================================================================
+# SCHEDULER
+# =============================================================================
+
+class PipelineScheduler:
+    """Runs the selected stages of a job as a DAG."""
+
+    def __init__(self, db: Database, stages: Sequence[StageSpec] = PIPELINE_STAGES, max_parallel: int = 2):
+        self.db = db
+        self.stages = list(stages)
+        self.max_parallel = max(max_parallel, 1)
+        self.checkpoint = StageCheckpoint(db)
+
+    def plan(self, ctx: StageContext) -> List[StageSpec]:
+        """Stages selected for this job, with dependencies limited to selected stages."""
+        selected = [s for s in self.stages if s.selected(ctx)]
+        names = {s.name for s in selected}
+        return [
+            StageSpec(s.name, s.run, s.job_types, tuple(d for d in s.depends_on if d in names), s.when)
+            for s in selected
+        ]
+
+    def _profiler(self, spec: StageSpec, ctx: StageContext):
+        """Profile of the stage if the job asked for one (yields the file it writes), else a no-op."""
+        if not ctx.profile:
+            return nullcontext()
+        return telemetry.profile(os.path.join(config.engine.profile_dir, ctx.run_id, spec.name), ctx.profile)
+
+    def _run_stage(self, spec: StageSpec, ctx: StageContext) -> Any:
+        """Run one stage on a pool thread, then checkpoint the outcome and record its metrics."""
+        start = time.time()
+        logger.info("stage_started", stage=spec.name, run_id=ctx.run_id)
+        profile_path = None
+        try:
+            with telemetry.measure(spec.name) as metrics, self._profiler(spec, ctx) as profile_path:
+                result = spec.run(ctx)
+        except Exception as e:
+            seconds = round(time.time() - start, 2)
+            logger.error("stage_failed", stage=spec.name, run_id=ctx.run_id, seconds=seconds, error=str(e),
+                         **metrics.as_dict())
+            self.checkpoint.record(ctx.run_id, spec.name, {"status": "failed", "seconds": seconds, "error": str(e)})
+            telemetry.write_stage_metrics(self.db, ctx.run_id, ctx.job_id, metrics, "failed", profile_path)
+            raise
+        else:
+            seconds = round(time.time() - start, 2)
+            logger.info("stage_completed", stage=spec.name, run_id=ctx.run_id, seconds=seconds,
+                        **metrics.as_dict())
+            self.checkpoint.record(ctx.run_id, spec.name, {"status": "success", "seconds": seconds, "result": result})
+            telemetry.write_stage_metrics(self.db, ctx.run_id, ctx.job_id, metrics, "success", profile_path)
+            return result
+        finally:
+            # Stage threads are short-lived; give their pooled connection back
+            self.db.release()
+
+    def run(self, ctx: StageContext) -> Dict[str, Any]:
+        """
+        Run the job's stages, resuming after the stages its previous run completed.
+
+        Returns:
+            {stage name: result} for every selected stage (including resumed ones)
+
+        Raises:
+            The first stage error, after stages already running have finished
+        """
+        pending = self.plan(ctx)
+        done = set()
+
+        previous_run_id, completed = self.checkpoint.previous_results(ctx.job_id, ctx.run_id)
+        resumed = [s.name for s in pending if s.name in completed]
+        if resumed:
+            self.checkpoint.mark_resumed(ctx.run_id, previous_run_id)
+            for name in resumed:
+                ctx.results[name] = completed[name]
+                self.checkpoint.record(ctx.run_id, name, {
+                    "status": "resumed", "from_run": previous_run_id, "result": completed[name],
+                })
+                done.add(name)
+            pending = [s for s in pending if s.name not in done]
+            logger.info("pipeline_resumed", run_id=ctx.run_id, from_run=previous_run_id, skipped=resumed)
+
+        # Stage threads check out their own connections; don't hold this thread's
+        # (used for the checkpoint queries above) while waiting on them
+        self.db.release()
+
+        error: Optional[BaseException] = None
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="stage") as executor:
+            while pending or running:
+                if error is None:
+                    ready = [s for s in pending if all(d in done for d in s.depends_on)]
+                    for spec in ready:
+                        pending.remove(spec)
+                        # Copy of this context so stage metrics also add up into the job's
+                        stage_context = contextvars.copy_context()
+                        running[executor.submit(stage_context.run, self._run_stage, spec, ctx)] = spec
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    spec = running.pop(future)
+                    try:
+                        ctx.results[spec.name] = future.result()
+                        done.add(spec.name)
+                    except Exception as e:
+                        # Let stages already running finish (and checkpoint), start nothing new
+                        error = error or e
+
+        if error is not None:
+            raise error
+        return ctx.results
@@ -0,0 +1,70 @@
+"""
+Column projection for feature reads.
+
+daily_features has well over a hundred columns, but each consumer reads a
+small, known subset. Consumers declare what they read, and loaders build
+their SELECT lists from that declaration instead of `df.*`:
+
+- TemplateEngine.feature_names(): gates, boosters, penalties, global
+  adjustments, evidence fields and direction rules
+- the setup scanners' SETUP_FEATURES: what each check_* function reads
+
+Declared features that are not columns of the table (a template may
+reference a feature that was never materialized) are left out, so the rows
+simply lack them, exactly as with `df.*`.
+
+    cols = select_list(db, "daily_features", engine.feature_names(), alias="df")
+    query = f"SELECT {cols}, a.symbol FROM daily_features df JOIN assets a ..."
+
+`conn` is a psycopg2 connection or a stratos_engine Database.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .stream import connection
+
+logger = logging.getLogger(__name__)
+
+# (dsn, table) -> column names in table order; schema changes need a restart
+_TABLE_COLUMNS: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+
+def table_columns(conn, table: str, refresh: bool = False) -> Tuple[str, ...]:
+    """Column names of `table` in the current schema (cached per database)."""
+    with connection(conn) as pg:
+        key = (pg.dsn, table)
+        if refresh or key not in _TABLE_COLUMNS:
+            with pg.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s
+                    ORDER BY ordinal_position
+                    """,
+                    (table,),
+                )
+                _TABLE_COLUMNS[key] = tuple(row[0] for row in cur.fetchall())
+        return _TABLE_COLUMNS[key]
+
+
+def project_columns(conn, table: str, features: Iterable[str], always: Sequence[str] = ()) -> List[str]:
+    """`always` plus the features that are columns of `table`, in table order."""
+    columns = table_columns(conn, table)
+    wanted = set(features) | set(always)
+    missing = wanted - set(columns)
+    if missing:
+        logger.debug(f"{table}: {len(missing)} requested features are not columns: {sorted(missing)}")
+    return [c for c in columns if c in wanted]
+
+
+def select_list(
+    conn,
+    table: str,
+    features: Iterable[str],
+    alias: Optional[str] = None,
+    always: Sequence[str] = ("asset_id",),
+) -> str:
+    """Comma-separated SELECT list for the projected columns (prefixed with `alias.`)."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f'{prefix}"{c}"' for c in project_columns(conn, table, features, always))
@@ -0,0 +1,906 @@
+"""
+Daily setup scanner engine.
+
+One engine behind jobs/{equity,etf,crypto}_daily_setup_scanner.py; the jobs
+only choose the asset types. A scan is a few whole-universe steps instead of
+11 check functions per asset on a thread pool:
+
+1. load_features: one streamed read of the projected daily_features columns
+   for the universe on the target date.
+2. load_bar_panel: one long frame of the last LOOKBACK_BARS bars per asset
+   (stratos_engine.lookback).
+3. bar_indicators: the bar-derived inputs the setups share (ADX, base range
+   and base high per base length), computed once per asset with grouped,
+   vectorized pandas operations. The exponential smoothing in ADX is a
+   sequential recurrence per asset, so large panels are split into asset
+   chunks and computed on a process pool.
+4. setup_masks: every setup's entry rules as NumPy masks over the universe.
+   Missing values behave as in the old per-row checks: NULL fails a
+   comparison, `x or default` treats NULL and 0 as the default, and NULL is
+   not truthy.
+5. Only the hits are turned into rows (stop, target, risk/reward, strength,
+   context) and written to setup_signals with one COPY and merge
+   (bulk_writer); rows the database refuses are isolated and reported
+   instead of failing the write.
+
+    setups = scan(conn, '2026-01-27', ('equity',), workers=8)
+
+`conn` is a psycopg2 connection or a stratos_engine Database.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from functools import partial
+from itertools import repeat
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from .bulk_writer import BulkWriteResult, RejectedRow, bulk_upsert
+from .lookback import recent_bars
+from .projection import select_list
+from .stream import connection, fetch_frame
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+# Bars per asset: longest base (100 bars) plus ADX warm-up
+LOOKBACK_BARS = 120
+ADX_PERIOD = 14
+
+# Below this many assets per worker the process pool costs more than it saves
+MIN_ASSETS_PER_WORKER = 500
+
+
+# Setup definitions, shared by every asset type
+SETUPS = {
+    # Position Trading Setups (60-252 day holds)
+    'weinstein_stage2': {
+        'description': 'Weinstein Stage 2 Transition - breakout from long base',
+        'style': 'position',
+        'historical_profit_factor': 4.09,
+        'historical_win_rate': 0.61,
+        'historical_avg_return': 0.0845,
+        'entry': {
+            'base_days': 100,
+            'base_range_pct': 0.15,
+            'volume_mult': 1.3  # Lower volume req for ETFs
+        },
+        'exit': {
+            'breakdown_ma_dist_200': -0.03,
+            'trailing_activation_pct': 0.20,
+            'trailing_atr_mult': 3.5,
+            'max_hold_days': 252
+        }
+    },
+    'donchian_55_breakout': {
+        'description': 'Donchian 55-Day Breakout (Turtle Traders)',
+        'style': 'position',
+        'historical_profit_factor': 1.99,
+        'historical_win_rate': 0.508,
+        'historical_avg_return': 0.0532,
+        'entry': {
+            'lookback_days': 55,
+            'ma_slope_threshold': 0
+        },
+        'exit': {
+            'trailing_low_days': 20,
+            'max_hold_days': 120
+        }
+    },
+    'rs_breakout': {
+        'description': 'Relative Strength Breakout',
+        'style': 'position',
+        'historical_profit_factor': 2.03,
+        'historical_win_rate': 0.493,
+        'historical_avg_return': 0.0381,
+        'entry': {
+            'rsi_min': 50,
+            'rsi_max': 75
+        },
+        'exit': {
+            'breakdown_ma_dist_50': -0.04,
+            'trailing_activation_pct': 0.15,
+            'trailing_atr_mult': 3.0,
+            'max_hold_days': 90
+        }
+    },
+    'trend_pullback_50ma': {
+        'description': 'Trend Pullback to 50MA',
+        'style': 'position',
+        'historical_profit_factor': 1.97,
+        'historical_win_rate': 0.509,
+        'historical_avg_return': 0.0444,
+        'entry': {
+            'ma_dist_50_min': -0.04,
+            'ma_dist_50_max': 0.03,
+            'rsi_max': 55
+        },
+        'exit': {
+            'breakdown_ma_dist_200': -0.02,
+            'trailing_activation_pct': 0.12,
+            'trailing_atr_mult': 3.5,
+            'max_hold_days': 120
+        }
+    },
+    'adx_holy_grail': {
+        'description': 'ADX Holy Grail Pullback',
+        'style': 'position',
+        'historical_profit_factor': 1.71,
+        'historical_win_rate': 0.498,
+        'historical_avg_return': 0.0279,
+        'entry': {
+            'adx_threshold': 25,
+            'ma_touch_dist': 0.03
+        },
+        'exit': {
+            'breakdown_ma_dist_50': -0.05,
+            'trailing_activation_pct': 0.10,
+            'trailing_atr_mult': 3.0,
+            'max_hold_days': 90
+        }
+    },
+    'golden_cross': {
+        'description': 'Golden Cross (50MA > 200MA)',
+        'style': 'position',
+        'historical_profit_factor': 1.53,
+        'historical_win_rate': 0.359,
+        'historical_avg_return': 0.0202,
+        'entry': {
+            'ma_dist_50_min': -0.02,
+            'ma_dist_50_max': 0.07,
+            'rsi_min': 45,
+            'rsi_max': 70
+        },
+        'exit': {
+            'breakdown_ma_dist_50': -0.03,
+            'trailing_activation_pct': 0.15,
+            'trailing_atr_mult': 3.5,
+            'max_hold_days': 120
+        }
+    },
+    'breakout_confirmed': {
+        'description': 'Confirmed Breakout',
+        'style': 'position',
+        'historical_profit_factor': 1.45,
+        'historical_win_rate': 0.489,
+        'historical_avg_return': 0.0222,
+        'entry': {
+            'rvol_threshold': 1.2,  # Lower for ETFs
+            'rsi_min': 50,
+            'rsi_max': 75
+        },
+        'exit': {
+            'breakdown_ma_dist_20': -0.04,
+            'trailing_activation_pct': 0.12,
+            'trailing_atr_mult': 2.5,
+            'max_hold_days': 90
+        }
+    },
+
+    # Swing Trading Setups (10-20 day holds)
+    'vcp_squeeze': {
+        'description': 'Volatility Contraction Pattern (VCP)',
+        'style': 'swing',
+        'historical_profit_factor': 1.69,
+        'historical_win_rate': 0.553,
+        'historical_avg_return': 0.0169,
+        'entry': {
+            'bb_width_pctile_max': 25,
+            'rsi_min': 35,
+            'rsi_max': 75
+        },
+        'exit': {
+            'target_pct': 0.12,
+            'stop_atr_mult': 2.0,
+            'max_hold_days': 15
+        }
+    },
+    'gap_up_momentum': {
+        'description': 'Gap Up Momentum',
+        'style': 'swing',
+        'historical_profit_factor': 1.58,
+        'historical_win_rate': 0.516,
+        'historical_avg_return': 0.0187,
+        'entry': {
+            'gap_pct_min': 0.02,
+            'rvol_min': 1.5  # Lower for ETFs
+        },
+        'exit': {
+            'breakdown_ma_dist_20': -0.03,
+            'max_hold_days': 15
+        }
+    },
+    'oversold_bounce': {
+        'description': 'Oversold Bounce',
+        'style': 'swing',
+        'historical_profit_factor': 1.52,
+        'historical_win_rate': 0.656,
+        'historical_avg_return': 0.0183,
+        'entry': {
+            'rsi_max': 35,
+            'ma_dist_20_max': -0.06
+        },
+        'exit': {
+            'target_ma_dist_20': 0.01,
+            'stop_atr_mult': 2.5,
+            'max_hold_days': 20
+        }
+    },
+    'acceleration_turn': {
+        'description': 'Acceleration Turn Up',
+        'style': 'swing',
+        'historical_profit_factor': 1.48,
+        'historical_win_rate': 0.629,
+        'historical_avg_return': 0.0097,
+        'entry': {
+            'rsi_min': 25,
+            'rsi_max': 65
+        },
+        'exit': {
+            'target_pct': 0.06,
+            'stop_atr_mult': 2.5,
+            'max_hold_days': 10
+        }
+    }
+}
+
+# daily_features columns each setup reads (keep in sync with the mask and
+# context functions below); load_features selects only these
+SETUP_FEATURES = {
+    'weinstein_stage2': ('close', 'rvol_20', 'ma_slope_200'),
+    'donchian_55_breakout': ('close', 'donchian_high_55', 'rvol_20', 'rsi_14', 'ma_slope_200'),
+    'rs_breakout': ('rsi_14', 'rs_breakout', 'above_ma200', 'rs_velocity', 'rvol_20'),
+    'trend_pullback_50ma': ('ma_dist_50', 'rsi_14', 'above_ma200', 'ma50_above_ma200', 'ma_slope_50'),
+    'adx_holy_grail': ('ma_dist_20', 'above_ma200', 'rvol_20'),
+    'golden_cross': ('ma50_above_ma200', 'ma_dist_50', 'rsi_14', 'ma_slope_50', 'ma_slope_200'),
+    'breakout_confirmed': ('breakout_confirmed_up', 'rvol_20', 'rsi_14', 'above_ma200'),
+    'vcp_squeeze': ('bb_width_pctile', 'rsi_14', 'squeeze_flag', 'rvol_20'),
+    'gap_up_momentum': ('gap_pct', 'rvol_20', 'rsi_14'),
+    'oversold_bounce': ('rsi_14', 'ma_dist_20', 'rvol_20'),
+    'acceleration_turn': ('accel_turn_up', 'rsi_14', 'accel_z_20', 'rvol_20'),
+}
+
+# Read for every detected setup: stop, target and strength
+COMMON_FEATURES = ('close', 'atr_14', 'rsi_14', 'rvol_20', 'above_ma200', 'ma50_above_ma200', 'ma_dist_50')
+
+
+def feature_names(setup_names=None) -> set:
+    """Features the given setups (default: all) read, for the feature SELECT list."""
+    names = SETUPS if setup_names is None else setup_names
+    features = set(COMMON_FEATURES)
+    for name in names:
+        features.update(SETUP_FEATURES[name])
+    return features
+
+
+def base_lengths(setup_names: Optional[Iterable[str]] = None) -> Tuple[int, ...]:
+    """Base lengths (bars) the setups need a base range / base high for."""
+    names = SETUPS if setup_names is None else setup_names
+    return tuple(sorted({SETUPS[n]['entry']['base_days'] for n in names if 'base_days' in SETUPS[n]['entry']}))
+
+
+# ============================================================================
+# Loading
+# ============================================================================
+
+def load_features(conn, target_date: str, asset_types: Sequence[str],
+                  setup_names: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """The setups' feature columns plus symbol/name/asset_type, one row per active asset."""
+    columns = select_list(conn, 'daily_features', feature_names(setup_names), alias='df')
+    # Streamed from a server-side cursor; numeric features arrive as float64
+    return fetch_frame(conn, f"""
+        SELECT
+            {columns},
+            a.symbol,
+            a.name,
+            a.asset_type
+        FROM daily_features df
+        JOIN assets a ON df.asset_id = a.asset_id
+        WHERE df.date = %s
+          AND a.asset_type = ANY(%s)
+          AND a.is_active = true
+        ORDER BY df.asset_id
+    """, (target_date, list(asset_types)))
+
+
+def load_bar_panel(conn, asset_ids: Iterable[int], target_date: str, bars: int = LOOKBACK_BARS) -> pd.DataFrame:
+    """Last `bars` bars per asset as one long frame sorted by asset_id, date."""
+    return recent_bars(conn, asset_ids, target_date, bars, columns=('high', 'low', 'close'))
+
+
+def latest_feature_date(conn, asset_types: Sequence[str]) -> str:
+    """Latest daily_features date for the asset types (today if there is none)."""
+    with connection(conn) as pg:
+        with pg.cursor() as cur:
+            cur.execute("""
+                SELECT MAX(df.date)
+                FROM daily_features df
+                JOIN assets a ON df.asset_id = a.asset_id
+                WHERE a.asset_type = ANY(%s)
+            """, (list(asset_types),))
+            result = cur.fetchone()
+    return result[0].isoformat() if result and result[0] else date.today().isoformat()
+
+
+# ============================================================================
+# Bar indicators
+# ============================================================================
+
+def bar_indicators(panel: pd.DataFrame, base_days: Sequence[int] = (100,),
+                   adx_period: int = ADX_PERIOD) -> pd.DataFrame:
+    """
+    Indicators of each asset's latest bar, from a panel sorted by asset_id, date.
+
+    Returns:
+        DataFrame indexed by asset_id with `adx` and `base_range_{n}` /
+        `base_high_{n}` per base length; NaN where an asset has too few bars
+        (ADX needs adx_period + 10, a base n bars) or a zero base low
+    """
+    columns = ['adx'] + [f'base_{kind}_{n}' for n in base_days for kind in ('range', 'high')]
+    if panel.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='asset_id'), dtype=float)
+
+    panel = panel.reset_index(drop=True)
+    asset_ids = panel['asset_id']
+    grouped = panel.groupby(asset_ids, sort=False)
+    high, low = panel['high'], panel['low']
+    prev_close = grouped['close'].shift(1)
+    prev_high = grouped['high'].shift(1)
+    prev_low = grouped['low'].shift(1)
+
+    # Wilder's ADX with EMA smoothing, per asset
+    tr = np.maximum(high - low, np.maximum(abs(high - prev_close), abs(low - prev_close)))
+    up = high - prev_high
+    down = prev_low - low
+    plus_dm = pd.Series(np.where(up > down, np.maximum(up, 0), 0), index=panel.index)
+    minus_dm = pd.Series(np.where(down > up, np.maximum(down, 0), 0), index=panel.index)
+
+    def smooth(series: pd.Series) -> pd.Series:
+        ewm = series.groupby(asset_ids, sort=False).ewm(span=adx_period, adjust=False).mean()
+        return ewm.reset_index(level=0, drop=True).sort_index()
+
+    atr = smooth(tr)
+    plus_di = 100 * (smooth(plus_dm) / atr)
+    minus_di = 100 * (smooth(minus_dm) / atr)
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+    adx = smooth(dx)
+
+    counts = grouped.size()
+    last = grouped.tail(1).index
+    out = pd.DataFrame({'adx': adx.loc[last].to_numpy()},
+                       index=pd.Index(asset_ids.loc[last].to_numpy(), name='asset_id'))
+    out['adx'] = out['adx'].where(counts >= adx_period + 10)
+
+    for n in base_days:
+        base = panel.groupby(asset_ids, sort=False).tail(n).groupby('asset_id', sort=False).agg(
+            base_high=('high', 'max'), base_low=('low', 'min'))
+        base_range = (base['base_high'] - base['base_low']) / base['base_low'].replace(0, np.nan)
+        enough = counts >= n
+        out[f'base_range_{n}'] = base_range.where(enough)
+        out[f'base_high_{n}'] = base['base_high'].where(enough)
+    return out
+
+
+def _panel_chunks(panel: pd.DataFrame, chunks: int) -> List[pd.DataFrame]:
+    """Split a panel sorted by asset_id into `chunks` parts on asset boundaries."""
+    keys = panel['asset_id'].to_numpy()
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    cuts = [int(starts[i]) for i in np.linspace(0, len(starts), chunks + 1, dtype=int)[1:-1]]
+    bounds = [0, *cuts, len(keys)]
+    return [panel.iloc[lo:hi] for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+
+def compute_bar_indicators(panel: pd.DataFrame, base_days: Sequence[int] = (100,),
+                           workers: int = 1) -> pd.DataFrame:
+    """bar_indicators, on a process pool over asset chunks when the panel is large."""
+    assets = panel['asset_id'].nunique() if not panel.empty else 0
+    chunks = min(workers, assets // MIN_ASSETS_PER_WORKER)
+    if chunks <= 1:
+        return bar_indicators(panel, base_days)
+    parts = _panel_chunks(panel, chunks)
+    with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+        return pd.concat(pool.map(bar_indicators, parts, repeat(tuple(base_days))))
+
+
+# ============================================================================
+# Setup masks
+# ============================================================================
+
+class ScanFrame:
+    """Feature rows of the universe and their bar indicators as float arrays (NaN for NULL)."""
+
+    def __init__(self, features: pd.DataFrame, indicators: pd.DataFrame):
+        self.features = features.reset_index(drop=True)
+        self.indicators = indicators.reindex(self.features['asset_id'].to_numpy())
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def value(self, name: str) -> np.ndarray:
+        """Feature or indicator as float64; columns that are not there are all NULL."""
+        if name not in self._cache:
+            if name in self.indicators:
+                values = self.indicators[name].to_numpy(dtype=float)
+            elif name in self.features:
+                column = self.features[name]
+                if column.dtype == object:
+                    column = column.map(lambda v: np.nan if v is None else float(v))
+                values = column.to_numpy(dtype=float)
+            else:
+                values = np.full(len(self), np.nan)
+            self._cache[name] = values
+        return self._cache[name]
+
+    def value_or(self, name: str, default: float) -> np.ndarray:
+        """`row.get(name) or default`: NULL and 0 become the default."""
+        values = self.value(name)
+        return np.where(np.isnan(values) | (values == 0), default, values)
+
+    def flag(self, name: str) -> np.ndarray:
+        """Truthiness of a feature (NULL is false)."""
+        values = self.value(name)
+        return ~np.isnan(values) & (values != 0)
+
+    def between(self, name: str, low: float, high: float, scale: float = 1.0) -> np.ndarray:
+        """low <= value * scale <= high (NULL fails)."""
+        values = self.value(name) * scale
+        return (values >= low) & (values <= high)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Row i as a dict of native values (None for NULL)."""
+        row = {}
+        for key, value in self.features.iloc[i].items():
+            if isinstance(value, np.generic):
+                value = value.item()
+            if isinstance(value, float) and np.isnan(value):
+                value = None
+            row[key] = value
+        return row
+
+    def indicator(self, name: str, i: int) -> Optional[float]:
+        value = self.value(name)[i]
+        return None if np.isnan(value) else float(value)
+
+
+def _weinstein_stage2(f: ScanFrame, entry: dict) -> np.ndarray:
+    n = entry['base_days']
+    # NaN base range: fewer than base_days bars or a zero low
+    return ((f.value(f'base_range_{n}') <= entry['base_range_pct'])
+            & (f.value('close') > f.value(f'base_high_{n}'))
+            & (f.value_or('rvol_20', 0) >= entry['volume_mult'])
+            & (f.value_or('ma_slope_200', 0) >= -0.5))
+
+
+def _donchian_55_breakout(f: ScanFrame, entry: dict) -> np.ndarray:
+    return f.value('close') >= f.value('donchian_high_55') * 0.995
+
+
+def _rs_breakout(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.between('rsi_14', entry['rsi_min'], entry['rsi_max'])
+            & f.flag('rs_breakout') & f.flag('above_ma200'))
+
+
+def _trend_pullback_50ma(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.between('ma_dist_50', entry['ma_dist_50_min'], entry['ma_dist_50_max'], scale=1 / 100)
+            & (f.value('rsi_14') <= entry['rsi_max'])
+            & f.flag('above_ma200') & f.flag('ma50_above_ma200'))
+
+
+def _adx_holy_grail(f: ScanFrame, entry: dict) -> np.ndarray:
+    return ((f.value('adx') >= entry['adx_threshold'])
+            & (abs(f.value('ma_dist_20') / 100) <= entry['ma_touch_dist'])
+            & f.flag('above_ma200'))
+
+
+def _golden_cross(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.flag('ma50_above_ma200')
+            & f.between('ma_dist_50', entry['ma_dist_50_min'], entry['ma_dist_50_max'], scale=1 / 100)
+            & f.between('rsi_14', entry['rsi_min'], entry['rsi_max']))
+
+
+def _breakout_confirmed(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.flag('breakout_confirmed_up')
+            & (f.value('rvol_20') >= entry['rvol_threshold'])
+            & f.between('rsi_14', entry['rsi_min'], entry['rsi_max']))
+
+
+def _vcp_squeeze(f: ScanFrame, entry: dict) -> np.ndarray:
+    return ((f.value('bb_width_pctile') <= entry['bb_width_pctile_max'])
+            & f.between('rsi_14', entry['rsi_min'], entry['rsi_max'])
+            & f.flag('squeeze_flag'))
+
+
+def _gap_up_momentum(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.value('gap_pct') >= entry['gap_pct_min']) & (f.value('rvol_20') >= entry['rvol_min'])
+
+
+def _oversold_bounce(f: ScanFrame, entry: dict) -> np.ndarray:
+    return (f.value('rsi_14') <= entry['rsi_max']) & (f.value('ma_dist_20') / 100 <= entry['ma_dist_20_max'])
+
+
+def _acceleration_turn(f: ScanFrame, entry: dict) -> np.ndarray:
+    return f.flag('accel_turn_up') & f.between('rsi_14', entry['rsi_min'], entry['rsi_max'])
+
+
+# Context stored with each hit: (row, frame, row index, entry params) -> dict
+def _weinstein_stage2_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    n = entry['base_days']
+    return {
+        'base_days': n,
+        'base_range_pct': round(f.indicator(f'base_range_{n}', i) * 100, 2),
+        'base_high': round(f.indicator(f'base_high_{n}', i), 2),
+        'rvol': round(row.get('rvol_20', 0) or 0, 2),
+        'ma_slope_200': round(row.get('ma_slope_200', 0) or 0, 2)
+    }
+
+
+def _donchian_55_breakout_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'donchian_high_55': round(row['donchian_high_55'], 2),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2),
+        'rsi': round(row.get('rsi_14', 50) or 50, 1),
+        'ma_slope_200': round(row.get('ma_slope_200', 0) or 0, 2)
+    }
+
+
+def _rs_breakout_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'rsi': round(row['rsi_14'], 1),
+        'rs_velocity': round(row.get('rs_velocity', 0) or 0, 2),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2)
+    }
+
+
+def _trend_pullback_50ma_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'ma_dist_50': round(row['ma_dist_50'], 2),
+        'rsi': round(row['rsi_14'], 1),
+        'ma_slope_50': round(row.get('ma_slope_50', 0) or 0, 2)
+    }
+
+
+def _adx_holy_grail_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'adx': round(f.indicator('adx', i), 1),
+        'ma_dist_20': round(row['ma_dist_20'], 2),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2)
+    }
+
+
+def _golden_cross_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'ma_dist_50': round(row['ma_dist_50'], 2),
+        'rsi': round(row['rsi_14'], 1),
+        'ma_slope_50': round(row.get('ma_slope_50', 0) or 0, 2),
+        'ma_slope_200': round(row.get('ma_slope_200', 0) or 0, 2)
+    }
+
+
+def _breakout_confirmed_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'rvol': round(row['rvol_20'], 2),
+        'rsi': round(row['rsi_14'], 1),
+        'above_ma200': row.get('above_ma200', False)
+    }
+
+
+def _vcp_squeeze_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'bb_width_pctile': round(row['bb_width_pctile'], 1),
+        'rsi': round(row['rsi_14'], 1),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2)
+    }
+
+
+def _gap_up_momentum_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'gap_pct': round(row['gap_pct'] * 100, 2),
+        'rvol': round(row['rvol_20'], 2),
+        'rsi': round(row.get('rsi_14', 50) or 50, 1)
+    }
+
+
+def _oversold_bounce_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'rsi': round(row['rsi_14'], 1),
+        'ma_dist_20': round(row['ma_dist_20'], 2),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2)
+    }
+
+
+def _acceleration_turn_context(row: dict, f: ScanFrame, i: int, entry: dict) -> dict:
+    return {
+        'accel_z_20': round(row.get('accel_z_20', 0) or 0, 2),
+        'rsi': round(row['rsi_14'], 1),
+        'rvol': round(row.get('rvol_20', 1) or 1, 2)
+    }
+
+
+# Setup name -> (entry mask, context)
+SETUP_RULES: Dict[str, Tuple[Callable[[ScanFrame, dict], np.ndarray], Callable[..., dict]]] = {
+    'weinstein_stage2': (_weinstein_stage2, _weinstein_stage2_context),
+    'donchian_55_breakout': (_donchian_55_breakout, _donchian_55_breakout_context),
+    'rs_breakout': (_rs_breakout, _rs_breakout_context),
+    'trend_pullback_50ma': (_trend_pullback_50ma, _trend_pullback_50ma_context),
+    'adx_holy_grail': (_adx_holy_grail, _adx_holy_grail_context),
+    'golden_cross': (_golden_cross, _golden_cross_context),
+    'breakout_confirmed': (_breakout_confirmed, _breakout_confirmed_context),
+    'vcp_squeeze': (_vcp_squeeze, _vcp_squeeze_context),
+    'gap_up_momentum': (_gap_up_momentum, _gap_up_momentum_context),
+    'oversold_bounce': (_oversold_bounce, _oversold_bounce_context),
+    'acceleration_turn': (_acceleration_turn, _acceleration_turn_context),
+}
+
+
+def setup_masks(frame: ScanFrame, setup_names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """{setup_name: boolean mask over the frame's rows}."""
+    names = SETUPS if setup_names is None else setup_names
+    return {name: SETUP_RULES[name][0](frame, SETUPS[name]['entry']) for name in names}
+
+
+# ============================================================================
+# Signals
+# ============================================================================
+
+def calculate_stop_loss(row: dict, setup_params: dict) -> float:
+    """Calculate stop loss price based on setup exit parameters."""
+    close = row.get('close')
+    atr = row.get('atr_14')
+
+    if close is None or atr is None:
+        return None
+
+    exit_params = setup_params['exit']
+
+    if 'stop_atr_mult' in exit_params:
+        return close - (atr * exit_params['stop_atr_mult'])
+    elif 'trailing_atr_mult' in exit_params:
+        return close - (atr * exit_params['trailing_atr_mult'])
+
+    return close - (atr * 2)
+
+
+def calculate_target(row: dict, setup_params: dict) -> float:
+    """Calculate target price based on setup exit parameters."""
+    close = row.get('close')
+
+    if close is None:
+        return None
+
+    exit_params = setup_params['exit']
+
+    if 'target_pct' in exit_params:
+        return close * (1 + exit_params['target_pct'])
+    elif 'trailing_activation_pct' in exit_params:
+        return close * (1 + exit_params['trailing_activation_pct'])
+
+    return close * 1.15
+
+
+def calculate_setup_strength(row: dict, setup_name: str) -> int:
+    """Calculate setup strength score (0-100)."""
+    strength = 50  # Base
+
+    # RSI contribution
+    rsi = row.get('rsi_14')
+    if rsi is not None:
+        if setup_name == 'oversold_bounce':
+            strength += min(30, int(40 - rsi))  # More oversold = stronger
+        elif setup_name in ['weinstein_stage2', 'rs_breakout']:
+            strength += min(15, int((rsi - 50) / 2))  # Higher RSI for breakouts
+        else:
+            strength += min(15, int(15 - abs(rsi - 50) / 5))  # Neutral RSI bonus
+
+    # Volume contribution
+    rvol = row.get('rvol_20')
+    if rvol is not None and rvol > 1.5:
+        strength += min(15, int((rvol - 1) * 10))
+
+    # Trend alignment bonus
+    if row.get('ma50_above_ma200'):
+        strength += 10
+    if row.get('above_ma200'):
+        strength += 5
+
+    # Setup-specific bonuses
+    if setup_name == 'weinstein_stage2':
+        ma_dist_50 = row.get('ma_dist_50', 0) or 0
+        if ma_dist_50 > 0.05:
+            strength += 10
+
+    if setup_name == 'trend_pullback_50ma':
+        ma_dist_50 = row.get('ma_dist_50', 0) or 0
+        if ma_dist_50 < -0.02:
+            strength += 10
+
+    return min(100, max(0, strength))
+
+
+def build_signal(row: dict, setup_name: str, setup_config: dict, context: dict) -> dict:
+    """setup_signals row for one detected setup."""
+    close = row.get('close')
+    stop_loss = calculate_stop_loss(row, setup_config)
+    target = calculate_target(row, setup_config)
+
+    risk_reward = None
+    if close and stop_loss and target:
+        risk = close - stop_loss
+        reward = target - close
+        if risk > 0:
+            risk_reward = reward / risk
+
+    return {
+        'asset_id': row['asset_id'],
+        'setup_name': setup_name,
+        'entry_price': close,
+        'stop_loss': stop_loss,
+        'target_price': target,
+        'risk_reward': risk_reward,
+        'setup_strength': calculate_setup_strength(row, setup_name),
+        'historical_profit_factor': setup_config.get('historical_profit_factor'),
+        'entry_params': setup_config['entry'],
+        'exit_params': setup_config['exit'],
+        'context': context
+    }
+
+
+def evaluate(frame: ScanFrame, target_date: str, setup_names: Optional[Iterable[str]] = None) -> List[dict]:
+    """Signals for every (asset, setup) hit, ordered by asset then setup."""
+    names = list(SETUPS if setup_names is None else setup_names)
+    masks = setup_masks(frame, names)
+    hits = np.column_stack([masks[name] for name in names]) if names else np.zeros((len(frame), 0), bool)
+
+    setups = []
+    for i in np.flatnonzero(hits.any(axis=1)):
+        row = frame.record(i)
+        for j in np.flatnonzero(hits[i]):
+            name = names[j]
+            config = SETUPS[name]
+            context = SETUP_RULES[name][1](row, frame, i, config['entry'])
+            signal = build_signal(row, name, config, context)
+            signal['signal_date'] = target_date
+            setups.append(signal)
+    return setups
+
+
+def scan(conn, target_date: str, asset_types: Sequence[str], workers: int = 1,
+         setup_names: Optional[Iterable[str]] = None) -> List[dict]:
+    """Detected setups for the asset types on target_date."""
+    names = list(SETUPS if setup_names is None else setup_names)
+    features = load_features(conn, target_date, asset_types, names)
+    logger.info(f"Found {len(features)} assets with features")
+    if features.empty:
+        logger.warning("No assets found - run features calculation first")
+        return []
+
+    panel = load_bar_panel(conn, features['asset_id'], target_date)
+    logger.info(f"Loaded {len(panel)} bars for {panel['asset_id'].nunique() if len(panel) else 0} assets")
+    indicators = compute_bar_indicators(panel, base_lengths(names), workers)
+    return evaluate(ScanFrame(features, indicators), target_date, names)
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+
+def clean_for_json(obj):
+    """Clean values for JSON serialization (handle NaN, Inf)."""
+    if isinstance(obj, dict):
+        return {k: clean_for_json(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [clean_for_json(v) for v in obj]
+    elif isinstance(obj, float):
+        if np.isnan(obj) or np.isinf(obj):
+            return None
+        return obj
+    elif isinstance(obj, (np.floating, np.integer)):
+        if np.isnan(obj) or np.isinf(obj):
+            return None
+        return float(obj)
+    return obj
+
+
+SIGNAL_KEY = ('asset_id', 'setup_name', 'signal_date')
+# Overwritten when a signal is re-scanned (created_at keeps the first scan)
+SIGNAL_UPDATE_COLUMNS = ('entry_price', 'stop_loss', 'target_price', 'risk_reward', 'setup_strength',
+                         'historical_profit_factor', 'entry_params', 'exit_params', 'context')
+_JSON_COLUMNS = ('entry_params', 'exit_params', 'context')
+
+
+def signal_frame(setups: List[dict]) -> Tuple[pd.DataFrame, List[RejectedRow]]:
+    """
+    setup_signals rows as a frame indexed by position in `setups`, JSON
+    columns serialized; signals that cannot be serialized are rejected.
+    """
+    created_at = datetime.now(timezone.utc)
+    rows, index, rejects = [], [], []
+    for i, setup in enumerate(setups):
+        try:
+            row = {c: setup[c] for c in SIGNAL_KEY + SIGNAL_UPDATE_COLUMNS if c not in _JSON_COLUMNS}
+            for column in _JSON_COLUMNS:
+                row[column] = json.dumps(clean_for_json(setup[column]))
+        except (KeyError, TypeError, ValueError) as e:
+            rejects.append(RejectedRow(i, f"{type(e).__name__}: {e}"))
+            continue
+        row['created_at'] = created_at
+        rows.append(row)
+        index.append(i)
+    columns = [*SIGNAL_KEY, *SIGNAL_UPDATE_COLUMNS, 'created_at']
+    df = pd.DataFrame(rows, index=index, columns=columns)
+    # Keep integer columns integral in the COPY text even when a value is missing
+    return df.astype({'asset_id': 'Int64', 'setup_strength': 'Int64'}), rejects
+
+
+def write_setups(conn, setups: List[dict]) -> BulkWriteResult:
+    """
+    Upsert signals into setup_signals with one COPY and merge.
+
+    Rows the database refuses are isolated (bulk_writer) and reported, with
+    the serialization rejects, in result.rejects (index = position in setups).
+    """
+    start = time.time()
+    df, rejects = signal_frame(setups)
+    write = conn.bulk_upsert if hasattr(conn, 'bulk_upsert') else partial(bulk_upsert, conn)
+    result = write('setup_signals', df, SIGNAL_KEY, update_columns=SIGNAL_UPDATE_COLUMNS,
+                   isolate_rejects=True)
+    result.rejects = sorted(rejects + result.rejects, key=lambda r: r.index)
+    result.seconds = time.time() - start
+    for reject in result.rejects:
+        setup = setups[reject.index]
+        logger.warning(f"Rejected setup {setup.get('setup_name')} for asset {setup.get('asset_id')}: {reject.error}")
+    return result
+
+
+def main(asset_types: Sequence[str], label: str, argv: Optional[List[str]] = None) -> None:
+    """CLI of the per-asset-type scanner jobs."""
+    parser = argparse.ArgumentParser(description=f'{label} Daily Setup Scanner')
+    parser.add_argument('--date', type=str, help='Target date (YYYY-MM-DD)')
+    parser.add_argument('--workers', type=int, default=8, help='Worker processes for bar indicators')
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    try:
+        # Default to latest date with features
+        target_date = args.date or latest_feature_date(conn, asset_types)
+
+        logger.info("=" * 60)
+        logger.info(f"{label.upper()} DAILY SETUP SCANNER")
+        logger.info(f"Asset Types: {tuple(asset_types)}")
+        logger.info(f"Target Date: {target_date}")
+        logger.info("=" * 60)
+
+        all_setups = scan(conn, target_date, asset_types, args.workers)
+        logger.info(f"Found {len(all_setups)} setups")
+        if not all_setups:
+            logger.info("No setups detected")
+            return
+
+        result = write_setups(conn, all_setups)
+        logger.info("=" * 60)
+        logger.info(f"✅ Inserted/updated {result.rows} {label} setups in {result.seconds:.2f}s")
+        if result.rejects:
+            logger.warning(f"Rejected: {len(result.rejects)}")
+
+        # Summary by setup type
+        setup_counts = {}
+        for setup in all_setups:
+            name = setup['setup_name']
+            setup_counts[name] = setup_counts.get(name, 0) + 1
+
+        logger.info("Setup breakdown:")
+        for name, count in sorted(setup_counts.items()):
+            logger.info(f"  - {name}: {count}")
+        logger.info("=" * 60)
+    finally:
+        conn.close()
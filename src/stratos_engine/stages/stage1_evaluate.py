@@ -4,12 +4,15 @@ import json
 from dataclasses import dataclass, asdict
 from datetime import date
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import structlog
 
+from ..calendar import calendar_for
 from ..db import Database
-from ..templates import TemplateEngine
+from ..projection import select_list
+from ..templates import TemplateEngine, diff_against_rowwise
+from ..utils.universe import parse_universe
 
 logger = structlog.get_logger()
 
@@ -53,14 +56,22 @@ class Stage1Evaluate:
     def __init__(self, db: Database, engine: Optional[TemplateEngine] = None):
         self.db = db
         self.engine = engine or TemplateEngine()
+        self.compiled = self.engine.compile()
     
     def load_features(
         self,
         as_of_date: str,
         universe_id: str = "equities_all",
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        features: Optional[Iterable[str]] = None
     ) -> List[Dict[str, Any]]:
-        """Load features from database for evaluation."""
+        """
+        Load features from database for evaluation.
+        
+        Only the daily_features columns in `features` are selected (default:
+        every feature the templates read). Rows are streamed from a
+        server-side cursor, so numbers arrive as float, not Decimal.
+        """
         
         # Parse universe
         asset_type = "equity"
@@ -81,10 +92,13 @@ class Stage1Evaluate:
                 limit = limit or 500
         
         limit_clause = f"LIMIT {limit}" if limit else ""
+        if features is None:
+            features = self.engine.feature_names()
+        columns = select_list(self.db, "daily_features", features, alias="df")
         
         query = f"""
         SELECT 
-            df.*,
+            {columns},
             a.symbol,
             a.asset_type
         FROM daily_features df
@@ -96,26 +110,38 @@ class Stage1Evaluate:
         {limit_clause}
         """
         
-        features = self.db.fetch_all(query, (as_of_date, asset_type, min_dollar_volume))
-        logger.info("features_loaded", count=len(features), date=as_of_date, universe=universe_id)
-        return features
+        rows = self.db.fetch_records(query, (as_of_date, asset_type, min_dollar_volume))
+        logger.info("features_loaded", count=len(rows), date=as_of_date, universe=universe_id)
+        return rows
     
     def evaluate_all(
         self,
         features: List[Dict[str, Any]],
         as_of_date: str,
-        config_id: Optional[str] = None
+        config_id: Optional[str] = None,
+        verify: bool = False
     ) -> List[SignalFact]:
-        """Evaluate all features and return signal facts."""
+        """
+        Evaluate all features and return signal facts.
+        
+        Templates are evaluated for the whole universe at once with the compiled
+        engine. With verify=True the row-wise engine is run as well and any
+        mismatch is logged and resolved in favour of the row-wise result.
+        """
         facts = []
         
-        for row in features:
-            asset_id = row.get("asset_id")
-            if not asset_id:
-                continue
-            
-            # Evaluate templates
-            signals = self.engine.evaluate(row)
+        rows = [row for row in features if row.get("asset_id")]
+        signals_by_row = self.compiled.evaluate_rows(rows)
+        
+        if verify:
+            mismatches = diff_against_rowwise(self.engine, rows, self.compiled)
+            if mismatches:
+                logger.warning("compiled_templates_mismatch", count=len(mismatches),
+                               asset_ids=[m["asset_id"] for m in mismatches])
+                signals_by_row = [self.engine.evaluate(row) for row in rows]
+        
+        for row, signals in zip(rows, signals_by_row):
+            asset_id = row["asset_id"]
             
             if not signals:
                 continue
@@ -227,6 +253,15 @@ class Stage1Evaluate:
         """Run the full Stage 1 evaluation pipeline."""
         logger.info("stage1_started", date=as_of_date, universe=universe_id, config=config_id)
         
+        if not calendar_for(parse_universe(universe_id)["asset_type"]).is_session(as_of_date):
+            logger.info("stage1_skipped", reason="not_a_session", date=as_of_date, universe=universe_id)
+            return {
+                "status": "skipped",
+                "reason": "not_a_session",
+                "assets_evaluated": 0,
+                "signals_generated": 0,
+            }
+        
         # Load features
         features = self.load_features(as_of_date, universe_id)
         
@@ -1,16 +1,16 @@
 """Stage 1 Fetch: Ingest market data and calculate features."""
 
 import os
-import time
-import logging
-import requests
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, date
-from typing import Dict, Any, List, Optional
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional, Tuple
 import structlog
 
+from ..bar_store import get_shared_store
+from ..calendar import calendar_for
 from ..db import Database
+from ..http import HttpError, get_shared_client
 from ..utils.feature_calculator import FeatureCalculator
 from ..utils.universe import parse_universe
 
@@ -36,9 +36,7 @@ class Stage1Fetch:
                          key_set=bool(supabase_key))
             self.calc = None
     
-    def fetch_alphavantage_bars(self, symbol: str) -> pd.DataFrame:
-        """Fetch daily bars from AlphaVantage."""
-        url = "https://www.alphavantage.co/query"
+    def _alphavantage_request(self, symbol: str) -> Tuple:
         params = {
             "function": "TIME_SERIES_DAILY_ADJUSTED",
             "symbol": symbol,
@@ -46,138 +44,149 @@ class Stage1Fetch:
             "apikey": ALPHAVANTAGE_API_KEY,
             "datatype": "json"
         }
-        
-        try:
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code != 200:
-                logger.warning("av_fetch_failed", symbol=symbol, status=response.status_code)
-                return pd.DataFrame()
-            
-            data = response.json()
-            
-            # Check for rate limit or error messages
-            if "Note" in data or "Information" in data:
-                logger.warning("av_rate_limited", symbol=symbol, message=data.get("Note", data.get("Information", ""))[:100])
-                return pd.DataFrame()
-            
-            ts_data = data.get("Time Series (Daily)")
-            if not ts_data:
-                logger.warning("av_no_data", symbol=symbol, response=str(data)[:100])
-                return pd.DataFrame()
-            
-            records = []
-            for date_str, values in ts_data.items():
-                records.append({
-                    "date": date_str,
-                    "open": float(values.get("1. open", 0)),
-                    "high": float(values.get("2. high", 0)),
-                    "low": float(values.get("3. low", 0)),
-                    "close": float(values.get("5. adjusted close", 0)), # Use adjusted close
-                    "volume": float(values.get("6. volume", 0))
-                })
-                
-            df = pd.DataFrame(records)
-            df['date'] = pd.to_datetime(df['date']).dt.date
-            df = df.sort_values('date')
-            return df
-            
-        except Exception as e:
-            logger.error("av_fetch_error", symbol=symbol, error=str(e))
-            return pd.DataFrame()
+        return ("alphavantage", "/query", params)
 
-    def fetch_coingecko_bars(self, coin_id: str) -> pd.DataFrame:
-        """Fetch daily bars from CoinGecko."""
-        # Use Pro API if available
-        base_url = "https://pro-api.coingecko.com/api/v3" if COINGECKO_API_KEY.startswith("CG-") else "https://api.coingecko.com/api/v3"
+    def _coingecko_requests(self, coin_id: str) -> List[Tuple]:
+        """OHLC and market_chart (volume) requests, Pro API if the key is a Pro key."""
+        if COINGECKO_API_KEY.startswith("CG-"):
+            vendor, headers = "coingecko", {"x-cg-pro-api-key": COINGECKO_API_KEY}
+        else:
+            vendor, headers = "coingecko_public", {}
+        return [
+            (vendor, f"/coins/{coin_id}/ohlc", {"vs_currency": "usd", "days": "30"}, headers),
+            (vendor, f"/coins/{coin_id}/market_chart", {"vs_currency": "usd", "days": "30", "interval": "daily"}, headers),
+        ]
+
+    def parse_alphavantage_bars(self, symbol: str, data: Any) -> pd.DataFrame:
+        """Daily bars from an AlphaVantage TIME_SERIES_DAILY_ADJUSTED response (or the error it failed with)."""
+        if isinstance(data, HttpError):
+            logger.warning("av_fetch_failed", symbol=symbol, status=data.status, error=data.message[:100])
+            return pd.DataFrame()
+        if isinstance(data, Exception):
+            logger.error("av_fetch_error", symbol=symbol, error=str(data))
+            return pd.DataFrame()
         
-        ohlc_url = f"{base_url}/coins/{coin_id}/ohlc"
-        ohlc_params = {
-            "vs_currency": "usd",
-            "days": "30",
-        }
+        # Throttling is retried by the client; anything left is an API message
+        if "Note" in data or "Information" in data:
+            logger.warning("av_rate_limited", symbol=symbol, message=data.get("Note", data.get("Information", ""))[:100])
+            return pd.DataFrame()
         
-        headers = {}
-        if COINGECKO_API_KEY.startswith("CG-"):
-            headers["x-cg-pro-api-key"] = COINGECKO_API_KEY
+        ts_data = data.get("Time Series (Daily)")
+        if not ts_data:
+            logger.warning("av_no_data", symbol=symbol, response=str(data)[:100])
+            return pd.DataFrame()
         
-        try:
-            ohlc_resp = requests.get(ohlc_url, params=ohlc_params, headers=headers, timeout=30)
+        records = []
+        for date_str, values in ts_data.items():
+            records.append({
+                "date": date_str,
+                "open": float(values.get("1. open", 0)),
+                "high": float(values.get("2. high", 0)),
+                "low": float(values.get("3. low", 0)),
+                "close": float(values.get("5. adjusted close", 0)), # Use adjusted close
+                "volume": float(values.get("6. volume", 0))
+            })
             
-            if ohlc_resp.status_code == 429:
+        df = pd.DataFrame(records)
+        df['date'] = pd.to_datetime(df['date']).dt.date
+        df = df.sort_values('date')
+        return df
+
+    def parse_coingecko_bars(self, coin_id: str, ohlc_data: Any, vol_data: Any) -> pd.DataFrame:
+        """Daily bars from CoinGecko OHLC and market_chart responses (or the errors they failed with)."""
+        if isinstance(ohlc_data, HttpError):
+            if ohlc_data.status == 429:
                 logger.warning("cg_rate_limited", coin_id=coin_id)
-                return pd.DataFrame()
-            
-            if ohlc_resp.status_code == 200:
-                ohlc_data = ohlc_resp.json()
-                # [time, open, high, low, close]
-                records = []
-                for row in ohlc_data:
-                    ts = row[0]
-                    dt = datetime.fromtimestamp(ts/1000).date()
-                    records.append({
-                        "date": dt,
-                        "open": row[1],
-                        "high": row[2],
-                        "low": row[3],
-                        "close": row[4],
-                        "volume": 0 # OHLC endpoint doesn't provide volume
-                    })
-                
-                df = pd.DataFrame(records)
-                
-                # Fetch volume separately
-                vol_url = f"{base_url}/coins/{coin_id}/market_chart"
-                vol_params = {"vs_currency": "usd", "days": "30", "interval": "daily"}
-                vol_resp = requests.get(vol_url, params=vol_params, headers=headers, timeout=30)
-                
-                if vol_resp.status_code == 200:
-                    vol_data = vol_resp.json()
-                    volumes = vol_data.get("total_volumes", [])
-                    vol_dict = {}
-                    for v in volumes:
-                        dt = datetime.fromtimestamp(v[0]/1000).date()
-                        vol_dict[dt] = v[1]
-                    df['volume'] = df['date'].map(vol_dict).fillna(0)
-                
-                return df
             else:
-                logger.warning("cg_fetch_failed", coin_id=coin_id, status=ohlc_resp.status_code)
-                return pd.DataFrame()
-
-        except Exception as e:
-            logger.error("cg_fetch_error", coin_id=coin_id, error=str(e))
+                logger.warning("cg_fetch_failed", coin_id=coin_id, status=ohlc_data.status)
             return pd.DataFrame()
-
-    def upsert_bars(self, asset_id: int, df: pd.DataFrame) -> int:
-        """Upsert bars into daily_bars table."""
-        if df.empty or not self.calc:
-            return 0
-            
+        if isinstance(ohlc_data, Exception):
+            logger.error("cg_fetch_error", coin_id=coin_id, error=str(ohlc_data))
+            return pd.DataFrame()
+        
+        # [time, open, high, low, close]
         records = []
-        for _, row in df.iterrows():
+        for row in ohlc_data:
+            ts = row[0]
+            dt = datetime.fromtimestamp(ts/1000).date()
             records.append({
-                'asset_id': asset_id,
-                'date': row['date'].isoformat() if hasattr(row['date'], 'isoformat') else str(row['date']),
-                'open': float(row['open']),
-                'high': float(row['high']),
-                'low': float(row['low']),
-                'close': float(row['close']),
-                'volume': float(row['volume']),
-                'source': 'api'
+                "date": dt,
+                "open": row[1],
+                "high": row[2],
+                "low": row[3],
+                "close": row[4],
+                "volume": 0 # OHLC endpoint doesn't provide volume
             })
-            
-        # Batch insert
-        batch_size = 1000
-        total = 0
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i+batch_size]
+        
+        df = pd.DataFrame(records)
+        
+        # Volume comes from market_chart
+        if isinstance(vol_data, dict) and not df.empty:
+            volumes = vol_data.get("total_volumes", [])
+            vol_dict = {}
+            for v in volumes:
+                dt = datetime.fromtimestamp(v[0]/1000).date()
+                vol_dict[dt] = v[1]
+            df['volume'] = df['date'].map(vol_dict).fillna(0)
+        
+        return df
+
+    def fetch_alphavantage_bars(self, symbol: str) -> pd.DataFrame:
+        """Fetch daily bars from AlphaVantage."""
+        return self.fetch_bars_batch('equity', [symbol])[symbol]
+
+    def fetch_coingecko_bars(self, coin_id: str) -> pd.DataFrame:
+        """Fetch daily bars from CoinGecko."""
+        return self.fetch_bars_batch('crypto', [coin_id])[coin_id]
+
+    def fetch_bars_batch(self, asset_type: str, keys: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch bars for many symbols (equity) or CoinGecko ids (crypto) concurrently.
+
+        Requests go through the shared HTTP client, which paces each vendor at
+        its quota and retries throttled calls.
+        """
+        http = get_shared_client()
+        if asset_type == 'crypto':
+            requests = [r for coin_id in keys for r in self._coingecko_requests(coin_id)]
+            responses = http.gather(requests)
+            return {
+                coin_id: self.parse_coingecko_bars(coin_id, responses[2 * i], responses[2 * i + 1])
+                for i, coin_id in enumerate(keys)
+            }
+        responses = http.gather([self._alphavantage_request(symbol) for symbol in keys])
+        return {symbol: self.parse_alphavantage_bars(symbol, data) for symbol, data in zip(keys, responses)}
+
+    def upsert_bars(self, asset_id: int, df: pd.DataFrame) -> int:
+        """Upsert bars into daily_bars table (COPY + set-based merge)."""
+        if df.empty:
+            return 0
+        
+        bars = pd.DataFrame({
+            'asset_id': asset_id,
+            'date': df['date'].values,
+            'open': df['open'].astype(float).values,
+            'high': df['high'].astype(float).values,
+            'low': df['low'].astype(float).values,
+            'close': df['close'].astype(float).values,
+            'volume': df['volume'].astype(float).values,
+            'source': 'api'
+        })
+        
+        try:
+            rows = self.db.bulk_upsert("daily_bars", bars, ["asset_id", "date"]).rows
+        except Exception as e:
+            logger.error("bars_upsert_failed", asset_id=asset_id, error=str(e))
+            return 0
+
+        # Keep the local bar cache current without waiting for its next sync
+        store = get_shared_store()
+        if store is not None:
             try:
-                self.calc.supabase.table("daily_bars").upsert(batch).execute()
-                total += len(batch)
+                store.append(bars)
             except Exception as e:
-                logger.error("bars_upsert_failed", asset_id=asset_id, error=str(e))
-        
-        return total
+                logger.warning("bar_store_append_failed", asset_id=asset_id, error=str(e))
+        return rows
 
     def get_assets_needing_update(self, as_of_date: str, asset_type: str, limit: int) -> List[Dict]:
         """Get assets that need data updates (missing bars for as_of_date)."""
@@ -225,6 +234,15 @@ class Stage1Fetch:
         asset_type = u_params["asset_type"]
         limit = u_params["limit"]
         
+        if not calendar_for(asset_type).is_session(as_of_date):
+            logger.info("stage1_fetch_skipped", reason="not_a_session", date=as_of_date, universe=universe_id)
+            return {
+                "status": "skipped",
+                "reason": "not_a_session",
+                "assets_processed": 0,
+                "features_written": 0
+            }
+        
         # Get assets that need updates (missing bars for as_of_date)
         assets = self.get_assets_needing_update(as_of_date, asset_type, limit)
         
@@ -248,28 +266,21 @@ class Stage1Fetch:
         max_batch = 100 if asset_type == 'equity' else 1000
         assets = assets[:max_batch]
         
+        # Fetch every asset's bars up front, concurrently within the vendor quota
+        if asset_type == 'crypto':
+            fetch_keys = {a['asset_id']: a.get('coingecko_id') for a in assets if a.get('coingecko_id')}
+        else:
+            fetch_keys = {a['asset_id']: a.get('alpha_vantage_symbol') or a['symbol'] for a in assets}
+        fetched = self.fetch_bars_batch(asset_type, list(dict.fromkeys(fetch_keys.values())))
+        
         for asset in assets:
             asset_id = asset['asset_id']
-            symbol = asset['symbol']
             
-            # Fetch data based on type
             new_bars = pd.DataFrame()
-            
-            if asset_type == 'crypto':
-                cg_id = asset.get('coingecko_id')
-                if cg_id:
-                    new_bars = self.fetch_coingecko_bars(cg_id)
-                    if new_bars.empty:
-                        rate_limited += 1
-                    # Rate limit for CoinGecko Pro
-                    time.sleep(0.15) 
-            else:
-                av_symbol = asset.get('alpha_vantage_symbol') or symbol
-                new_bars = self.fetch_alphavantage_bars(av_symbol)
+            if asset_id in fetch_keys:
+                new_bars = fetched[fetch_keys[asset_id]]
                 if new_bars.empty:
                     rate_limited += 1
-                # Rate limit for AlphaVantage (5 calls/min free tier)
-                time.sleep(12.5) # 5 calls per minute = 12 seconds between calls
             
             if not new_bars.empty:
                 written = self.upsert_bars(asset_id, new_bars)
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta, date
 from typing import Dict, Any, List, Optional
 import structlog
 
+from .. import telemetry
 from ..db import Database
 
 logger = structlog.get_logger()
@@ -52,6 +53,7 @@ class FMPDataFetcher:
         params["apikey"] = self.api_key
         
         try:
+            telemetry.record_http()
             response = requests.get(url, params=params, timeout=30)
             if response.status_code == 200:
                 return response.json()
@@ -244,7 +246,7 @@ class Stage1FMPFetch:
     
     def upsert_bars(self, asset_id: int, df: pd.DataFrame, currency: str = "USD") -> int:
         """Upsert bars into daily_bars table with USD conversion."""
-        if df.empty or not self.supabase:
+        if df.empty:
             return 0
         
         records = []
@@ -277,18 +279,12 @@ class Stage1FMPFetch:
                 'source': 'fmp'
             })
         
-        # Batch upsert
-        batch_size = 500
-        total = 0
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i+batch_size]
-            try:
-                self.supabase.table("daily_bars").upsert(batch).execute()
-                total += len(batch)
-            except Exception as e:
-                logger.error("bars_upsert_failed", asset_id=asset_id, error=str(e))
-        
-        return total
+        # COPY + set-based merge
+        try:
+            return self.db.bulk_upsert("daily_bars", pd.DataFrame(records), ["asset_id", "date"]).rows
+        except Exception as e:
+            logger.error("bars_upsert_failed", asset_id=asset_id, error=str(e))
+            return 0
     
     def run(self, as_of_date: str = None, limit: int = 500) -> Dict[str, Any]:
         """Run the FMP fetch stage for global equities."""
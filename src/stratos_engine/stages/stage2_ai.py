@@ -10,6 +10,7 @@ from openai import OpenAI
 
 from ..config import config
 from ..db import Database
+from ..llm import LlmExecutor, LlmOutcome, LlmRequest, estimate_tokens, get_shared_executor
 
 logger = structlog.get_logger()
 
@@ -29,6 +30,8 @@ class AIAnnotation:
     recommended_action: str
     priority_rank: int
     tokens_used: int
+    tokens_in: int = 0
+    tokens_out: int = 0
 
 
 class Stage2AI:
@@ -36,13 +39,15 @@ class Stage2AI:
     
     ATTENTION_LEVELS = ["ignore", "glance", "focus", "priority"]
     
-    def __init__(self, db: Database, client: Optional[OpenAI] = None):
+    def __init__(self, db: Database, client: Optional[OpenAI] = None, executor: Optional[LlmExecutor] = None):
         self.db = db
         self.client = client or OpenAI(
             api_key=config.openai.api_key,
             base_url=config.openai.base_url,
         )
         self.model = config.openai.model
+        # Shared with Stage 5 so both stay within the provider quotas
+        self.executor = executor or get_shared_executor()
         self._load_prompts()
     
     def _load_prompts(self) -> None:
@@ -152,13 +157,13 @@ Analyze this trading signal:
         prompt += "\nProvide your analysis in the specified JSON format."
         return prompt
     
-    def analyze_signal(self, signal: Dict[str, Any]) -> Optional[AIAnnotation]:
-        """Analyze a single signal with the LLM."""
-        try:
-            user_prompt = self.build_prompt(signal)
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
+    def _request(self, signal: Dict[str, Any]) -> LlmRequest:
+        """LLM request for one signal; stronger signals are sent first."""
+        user_prompt = self.build_prompt(signal)
+        
+        def call(model: str):
+            return self.client.chat.completions.create(
+                model=model,
                 messages=[
                     {"role": "system", "content": self.system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -167,25 +172,46 @@ Analyze this trading signal:
                 temperature=0.3,
                 max_tokens=500,
             )
-            
-            content = response.choices[0].message.content
-            result = json.loads(content)
-            tokens_used = response.usage.total_tokens if response.usage else 0
-            
-            return AIAnnotation(
-                instance_id=signal["instance_id"],
-                attention_level=result.get("attention_level", "glance"),
-                confidence=result.get("confidence", 0.5),
-                thesis=result.get("thesis", ""),
-                supporting_factors=result.get("supporting_factors", []),
-                risk_factors=result.get("risk_factors", []),
-                recommended_action=result.get("recommended_action", "monitor"),
-                priority_rank=result.get("priority_rank", 50),
-                tokens_used=tokens_used,
-            )
+        
+        return LlmRequest(
+            key=signal["instance_id"],
+            provider="openai",
+            call=call,
+            models=(self.model,),
+            parse=lambda response: json.loads(response.choices[0].message.content),
+            priority=-float(signal.get("fact_strength") or signal.get("strength") or 0),
+            est_tokens=estimate_tokens(self.system_prompt, user_prompt, max_output=500),
+            context=signal,
+        )
+    
+    def _annotation(self, outcome: LlmOutcome) -> Optional[AIAnnotation]:
+        signal = outcome.request.context
+        if not outcome.ok:
+            logger.error("ai_analysis_failed", error=str(outcome.error), signal=signal.get("instance_id"))
+            return None
+        result = outcome.result
+        return AIAnnotation(
+            instance_id=signal["instance_id"],
+            attention_level=result.get("attention_level", "glance"),
+            confidence=result.get("confidence", 0.5),
+            thesis=result.get("thesis", ""),
+            supporting_factors=result.get("supporting_factors", []),
+            risk_factors=result.get("risk_factors", []),
+            recommended_action=result.get("recommended_action", "monitor"),
+            priority_rank=result.get("priority_rank", 50),
+            tokens_used=outcome.tokens_used,
+            tokens_in=outcome.tokens_in,
+            tokens_out=outcome.tokens_out,
+        )
+    
+    def analyze_signal(self, signal: Dict[str, Any]) -> Optional[AIAnnotation]:
+        """Analyze a single signal with the LLM."""
+        try:
+            request = self._request(signal)
         except Exception as e:
             logger.error("ai_analysis_failed", error=str(e), signal=signal.get("instance_id"))
             return None
+        return self._annotation(self.executor.complete(request))
     
     def write_annotation(self, annotation: AIAnnotation) -> bool:
         """Write AI annotation to signal_instances table."""
@@ -214,8 +240,8 @@ Analyze this trading signal:
             analysis_json,
             annotation.thesis,
             annotation.confidence,
-            annotation.tokens_used // 2,  # Approximate split
-            annotation.tokens_used // 2,
+            annotation.tokens_in,
+            annotation.tokens_out,
             annotation.instance_id,
         ))
         return True
@@ -243,12 +269,19 @@ Analyze this trading signal:
                 "tokens_used": 0,
             }
         
-        # Analyze each signal
+        # Analyze concurrently; each annotation is written as soon as it arrives
         analyzed = 0
         total_tokens = 0
         
+        requests = []
         for signal in signals:
-            annotation = self.analyze_signal(signal)
+            try:
+                requests.append(self._request(signal))
+            except Exception as e:
+                logger.error("ai_analysis_failed", error=str(e), signal=signal.get("instance_id"))
+        
+        for outcome in self.executor.run(requests):
+            annotation = self._annotation(outcome)
             if annotation:
                 self.write_annotation(annotation)
                 analyzed += 1
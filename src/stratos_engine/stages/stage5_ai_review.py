@@ -3,7 +3,16 @@
 Pass A: Independent Chart Score (OHLCV-only, 365 bars) - `ai_direction_score`, `subscores`
 Pass B: Reconciliation (optional) - Compares Pass A output with engine scores/signals
 
-Uses Gemini 3 Flash as the primary model.
+Uses Gemini 3 Flash as the primary model. Assets are reviewed concurrently
+through the shared LLM executor (llm.py) and each review is saved as it completes.
+Model results are cached on the packet contents (llm_cache.py), so re-running a
+date only calls the model for assets whose inputs changed.
+
+Before anything is dispatched, a skip-unchanged gate compares each asset's
+chart vector and signal set with those stored on its previous review; quiet
+assets (chart similarity above SKIP_SIMILARITY_THRESHOLD, same signals) get
+the previous review carried forward instead of a model call
+(AI_REVIEW_SKIP_UNCHANGED = carry | skip | off).
 """
 
 import json
@@ -19,6 +28,8 @@ from google.genai import types
 import numpy as np
 
 from ..db import Database
+from ..llm import LlmExecutor, LlmOutcome, LlmRequest, estimate_tokens, get_shared_executor
+from ..llm_cache import LlmCache, content_hash, get_shared_cache
 from ..utils.chart_analyzer import ChartAnalyzer, AI_REVIEW_VERSION
 
 logger = logging.getLogger(__name__)
@@ -46,10 +57,24 @@ class Stage5AIReview:
     QUALITY_CLAMP = 10.0
     DIRECTION_CLAMP = 20.0
     
+    # Skip-unchanged gate: chart vector similarity to the previous review, and
+    # days a model review may be carried forward before it is redone
+    SKIP_SIMILARITY_THRESHOLD = 0.999
+    MAX_CARRY_DAYS = 5
+    SKIP_MODES = ("carry", "skip", "off")
+    
     # Safety ceiling per scope
     MAX_ASSETS_PER_SCOPE = 500
     
-    def __init__(self, db: Database, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        db: Database,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        executor: Optional[LlmExecutor] = None,
+        cache: Optional[LlmCache] = None,
+        skip_unchanged: Optional[str] = None
+    ):
         self.db = db
         self.chart_analyzer = ChartAnalyzer(window_size=60) # Use 60 bars for fingerprinting
         
@@ -64,6 +89,15 @@ class Stage5AIReview:
         # Set model
         self.model_name = model or os.environ.get("GEMINI_MODEL") or self.DEFAULT_MODEL
         
+        # Concurrent, quota-bound model calls (shared with Stage 2)
+        self.executor = executor or get_shared_executor()
+        self.cache = cache or get_shared_cache(db)
+        
+        # Unchanged assets: carry the previous review forward, skip them, or review anyway
+        self.skip_unchanged = (skip_unchanged or os.environ.get("AI_REVIEW_SKIP_UNCHANGED") or "carry").lower()
+        if self.skip_unchanged not in self.SKIP_MODES:
+            raise ValueError(f"Unknown skip_unchanged mode {self.skip_unchanged!r} (known: {', '.join(self.SKIP_MODES)})")
+        
         self._load_prompts()
         logger.info(f"Stage5AIReview initialized with model: {self.model_name}, version: {self.PROMPT_VERSION}")
     
@@ -227,15 +261,73 @@ class Stage5AIReview:
         }
         return hashlib.sha256(json.dumps(hash_content, sort_keys=True).encode()).hexdigest()
 
+    def _previous_reviews(self, asset_ids: List[int], as_of_date: str) -> Dict[int, Dict[str, Any]]:
+        """Latest review of each asset on its previous bar date, in one query."""
+        if not asset_ids:
+            return {}
+        rows = self.db.fetch_all("""
+        WITH prev AS (
+            SELECT w.asset_id,
+                   (SELECT MAX(b.date) FROM daily_bars b WHERE b.asset_id = w.asset_id AND b.date < %s) AS prev_date
+            FROM unnest(%s::bigint[]) AS w(asset_id)
+        )
+        SELECT DISTINCT ON (r.asset_id)
+            p.asset_id, r.as_of_date, r.ai_review_version, r.model, r.review_json, r.subscores,
+            r.raw_ai_setup_quality_score, r.smoothed_ai_setup_quality_score,
+            r.raw_ai_direction_score, r.smoothed_ai_direction_score,
+            r.agreement_with_engine, r.engine_notes, r.confidence_adjustment,
+            r.chart_vector, r.signal_set, r.carried_from
+        FROM prev p
+        JOIN asset_ai_reviews r ON r.asset_id = p.asset_id::text AND r.as_of_date = p.prev_date
+        ORDER BY r.asset_id, r.ai_review_version DESC, r.created_at DESC
+        """, (as_of_date, list(asset_ids)))
+        return {row["asset_id"]: dict(row) for row in rows}
+
+    def _signal_set(self, asset: Dict[str, Any]) -> List[str]:
+        """Scope plus the asset's engine signals as sorted type:direction:state entries."""
+        components = asset.get("components") or []
+        if isinstance(components, str):
+            components = json.loads(components)
+        signals = {
+            f"{c.get('signal_type')}:{c.get('direction')}:{c.get('state')}"
+            for c in components if isinstance(c, dict)
+        }
+        signals.add(f"scope:{asset['scope']}")
+        return sorted(signals)
+
+    def _unchanged(self, context: Dict[str, Any], as_of_date: str) -> Optional[float]:
+        """
+        Chart similarity to the previous review if the asset may skip the model:
+        same prompt version and model, same signal set, carry chain no older
+        than MAX_CARRY_DAYS and similarity >= SKIP_SIMILARITY_THRESHOLD. None otherwise.
+        """
+        prev = context["prev_review"]
+        if self.skip_unchanged == "off" or not prev or not prev.get("chart_vector"):
+            return None
+        if prev["ai_review_version"] != self.PROMPT_VERSION or prev["model"] != self.model_name:
+            return None
+        if sorted(prev.get("signal_set") or []) != context["signal_set"]:
+            return None
+        origin = prev.get("carried_from") or prev["as_of_date"]
+        if (datetime.strptime(as_of_date, "%Y-%m-%d").date() - origin).days > self.MAX_CARRY_DAYS:
+            return None
+        similarity = ChartAnalyzer.chart_vector_similarity(context["chart_vector"], prev["chart_vector"])
+        if similarity is None or similarity < self.SKIP_SIMILARITY_THRESHOLD:
+            return None
+        return similarity
+
     def _calculate_scores(
         self, 
-        asset_id: int, 
-        as_of_date: str, 
-        ohlcv_data: List[Dict[str, Any]], 
-        pass_a_result: Dict[str, Any]
+        ohlcv_data: List[Any], 
+        pass_a_result: Dict[str, Any],
+        prev_review: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Calculates the raw setup quality score, chart similarity, and smoothed scores.
+        
+        ohlcv_data holds the last window_size + 1 bars (the previous day's
+        window is the same bars minus the latest one); prev_review is the
+        previous bar date's review from _previous_reviews.
         """
         
         # 1. Calculate raw setup quality score from subscores
@@ -244,42 +336,20 @@ class Stage5AIReview:
         raw_ai_setup_quality_score = total_subscore * 4.0 # 5 subscores * 5 max = 25 max. 25 * 4 = 100 max.
         
         # 2. Calculate fingerprint
-        fingerprint = self.chart_analyzer.calculate_fingerprint(ohlcv_data)
-        
-        # 3. Get previous day's smoothed scores and fingerprint
-        prev_date_query = """
-        SELECT date
-        FROM daily_bars
-        WHERE asset_id = %s AND date < %s
-        ORDER BY date DESC
-        LIMIT 1
-        """
-        prev_date_row = self.db.fetch_one(prev_date_query, (asset_id, as_of_date))
+        window = self.chart_analyzer.window_size
+        fingerprint = self.chart_analyzer.calculate_fingerprint(ohlcv_data[-window:])
         
+        # 3. Previous day's smoothed scores and similarity to its chart
         prev_smoothed_quality = 0.0
         prev_smoothed_direction = 0.0
         similarity_to_prev = 0.0
         
-        if prev_date_row:
-            prev_date = str(prev_date_row["date"])
-            
-            # Get previous day's review
-            prev_review_query = """
-            SELECT smoothed_ai_setup_quality_score, smoothed_ai_direction_score, fingerprint
-            FROM asset_ai_reviews
-            WHERE asset_id = %s::text AND as_of_date = %s
-            ORDER BY ai_review_version DESC, created_at DESC
-            LIMIT 1
-            """
-            prev_review = self.db.fetch_one(prev_review_query, (str(asset_id), prev_date))
-            
-            if prev_review:
-                prev_smoothed_quality = prev_review.get("smoothed_ai_setup_quality_score") or 0.0
-                prev_smoothed_direction = prev_review.get("smoothed_ai_direction_score") or 0.0
-                
-                # Calculate similarity
-                prev_ohlcv_data = self._get_ohlcv_data(asset_id, prev_date, self.chart_analyzer.window_size)
-                similarity_to_prev = self.chart_analyzer.calculate_similarity(ohlcv_data, prev_ohlcv_data) or 0.0
+        if prev_review:
+            prev_smoothed_quality = prev_review.get("smoothed_ai_setup_quality_score") or 0.0
+            prev_smoothed_direction = prev_review.get("smoothed_ai_direction_score") or 0.0
+            similarity_to_prev = self.chart_analyzer.calculate_similarity(
+                ohlcv_data[-window:], ohlcv_data[-window - 1:-1]
+            ) or 0.0
 
         # 4. Apply smoothing rule
         raw_ai_direction_score = pass_a_result.get("ai_direction_score", 0.0)
@@ -309,17 +379,13 @@ class Stage5AIReview:
             "subscores": subscores
         }
 
-    def _run_ai_review(
-        self, 
-        asset: Dict[str, Any], 
-        as_of_date: str, 
-        run_pass_b: bool = False
-    ) -> Optional[Dict[str, Any]]:
-        """Runs the two-pass AI review for a single asset."""
-        asset_id = asset["asset_id"]
-        logger.info(f"Running AI review for asset {asset_id} ({asset['symbol']})")
-
-        # Pass A: Independent Chart Score
+    def _pass_a_request(
+        self,
+        asset: Dict[str, Any],
+        as_of_date: str,
+        prev_review: Optional[Dict[str, Any]] = None
+    ) -> LlmRequest:
+        """Pass A request for one asset; the biggest inflections are reviewed first."""
         pass_a_packet = self._build_pass_a_packet(
             asset_id=asset["asset_id"],
             as_of_date=as_of_date,
@@ -330,76 +396,212 @@ class Stage5AIReview:
             config_id=asset["config_id"],
             scope=asset["scope"]
         )
-        
-        input_hash = self._compute_input_hash(pass_a_packet)
+        # Include schema in the prompt
+        prompt_with_schema = f"{self.pass_a_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.pass_a_schema, indent=2)}"
+        contents = [prompt_with_schema, json.dumps(pass_a_packet)]
+        return LlmRequest(
+            key=asset["asset_id"],
+            provider="gemini",
+            call=self._generate(contents),
+            models=(self.model_name,),
+            parse=lambda response: json.loads(response.text),
+            priority=-abs(float(asset.get("inflection_score") or 0)),
+            est_tokens=estimate_tokens(*contents, max_output=4000),
+            context={
+                "asset": asset,
+                "pass_a_packet": pass_a_packet,
+                "prev_review": prev_review,
+                "chart_vector": self.chart_analyzer.calculate_chart_vector(pass_a_packet["ohlcv"]),
+                "signal_set": self._signal_set(asset),
+            },
+            cache_key=(content_hash(*contents), self.PROMPT_VERSION),
+        )
 
-        try:
-            # Include schema in the prompt
-            prompt_with_schema = f"{self.pass_a_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.pass_a_schema, indent=2)}"
-            
+    def _pass_b_request(self, pass_a: LlmOutcome) -> LlmRequest:
+        """Pass B (reconciliation) request following a successful Pass A."""
+        asset = pass_a.request.context["asset"]
+        pass_b_packet = self._build_pass_b_packet(pass_a.result, asset)
+        # Include schema in the prompt
+        prompt_with_schema = f"{self.pass_b_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.pass_b_schema, indent=2)}"
+        contents = [prompt_with_schema, json.dumps(pass_b_packet)]
+        return LlmRequest(
+            key=asset["asset_id"],
+            provider="gemini",
+            call=self._generate(contents),
+            models=(self.model_name,),
+            parse=lambda response: json.loads(response.text),
+            priority=pass_a.request.priority,
+            est_tokens=estimate_tokens(*contents, max_output=4000),
+            context={**pass_a.request.context, "pass_a_result": pass_a.result, "pass_b_packet": pass_b_packet},
+            cache_key=(content_hash(*contents), self.PROMPT_VERSION),
+        )
+
+    def _generate(self, contents: List[str]):
+        """Gemini call for the executor (model chosen per attempt)."""
+        def call(model: str):
             # Use the new google.genai SDK
-            pass_a_response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[prompt_with_schema, json.dumps(pass_a_packet)],
+            return self.client.models.generate_content(
+                model=model,
+                contents=contents,
                 config=types.GenerateContentConfig(
                     temperature=0.2,
                     max_output_tokens=4000,
                     response_mime_type="application/json",
                 )
             )
-            pass_a_result = json.loads(pass_a_response.text)
-        except Exception as e:
-            logger.error(f"Error in Pass A for asset {asset_id}: {e}")
-            return None
-
-        # Calculate scores (raw quality, smoothed scores, fingerprint, similarity)
-        ohlcv_data_dicts = self._get_ohlcv_data(asset_id, as_of_date, self.chart_analyzer.window_size)
-        score_data = self._calculate_scores(asset_id, as_of_date, ohlcv_data_dicts, pass_a_result)
-
-        # Pass B: Reconciliation (optional)
-        pass_b_result = {}
-        if run_pass_b:
-            pass_b_packet = self._build_pass_b_packet(pass_a_result, asset)
-            try:
-                # Include schema in the prompt
-                prompt_with_schema = f"{self.pass_b_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.pass_b_schema, indent=2)}"
-                
-                # Use the new google.genai SDK
-                pass_b_response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=[prompt_with_schema, json.dumps(pass_b_packet)],
-                    config=types.GenerateContentConfig(
-                        temperature=0.2,
-                        max_output_tokens=4000,
-                        response_mime_type="application/json",
-                    )
-                )
-                pass_b_result = json.loads(pass_b_response.text)
-            except Exception as e:
-                logger.error(f"Error in Pass B for asset {asset_id}: {e}")
+        return call
 
-        # Combine results and save to DB
-        final_result = {
-            **pass_a_result,
-            **pass_b_result,
-            **score_data, # Add calculated scores
-            "asset_id": asset_id,
+    def _review_fields(self, context: Dict[str, Any], as_of_date: str) -> Dict[str, Any]:
+        """Columns shared by fresh and carried-forward reviews."""
+        asset = context["asset"]
+        pass_a_packet = context["pass_a_packet"]
+        pass_b_packet = context.get("pass_b_packet")
+        return {
+            "asset_id": asset["asset_id"],
             "as_of_date": as_of_date,
             "universe_id": asset["universe_id"],
             "config_id": asset["config_id"],
             "scope": asset["scope"],
             "model": self.model_name,
             "ai_review_version": self.PROMPT_VERSION, # Use new version column
-            "input_hash": input_hash,
+            "input_hash": self._compute_input_hash(pass_a_packet),
             "pass_a_packet": json.dumps(pass_a_packet),
-            "pass_b_packet": json.dumps(pass_b_packet) if run_pass_b else None,
+            "pass_b_packet": json.dumps(pass_b_packet) if pass_b_packet is not None else None,
+            "chart_vector": context["chart_vector"],
+            "signal_set": context["signal_set"],
             "created_at": datetime.utcnow().isoformat(),
             "token_usage": None  # Skip usage metadata to avoid serialization issues
         }
+
+    def _finish_review(
+        self,
+        context: Dict[str, Any],
+        as_of_date: str,
+        pass_a_result: Dict[str, Any],
+        pass_b_result: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Score, combine and save a completed review."""
+        # Calculate scores (raw quality, smoothed scores, fingerprint, similarity)
+        # from the packet's bars rather than another query
+        ohlcv_rows = context["pass_a_packet"]["ohlcv"][-(self.chart_analyzer.window_size + 1):]
+        score_data = self._calculate_scores(ohlcv_rows, pass_a_result, context["prev_review"])
+
+        # Combine results and save to DB
+        final_result = {
+            **pass_a_result,
+            **(pass_b_result or {}),
+            **score_data, # Add calculated scores
+            **self._review_fields(context, as_of_date),
+        }
         
         self._save_review(final_result)
         return final_result
 
+    def _carry_forward(self, context: Dict[str, Any], as_of_date: str) -> Dict[str, Any]:
+        """Save the previous review's model output as today's review (chart and signals unchanged)."""
+        prev = context["prev_review"]
+        review_json = prev.get("review_json") or {}
+        if isinstance(review_json, str):
+            review_json = json.loads(review_json)
+        ohlcv_rows = context["pass_a_packet"]["ohlcv"]
+        window = self.chart_analyzer.window_size
+
+        result = {
+            **review_json,
+            "agreement_with_engine": prev.get("agreement_with_engine"),
+            "engine_notes": prev.get("engine_notes"),
+            "confidence_adjustment": prev.get("confidence_adjustment"),
+            "subscores": prev.get("subscores") or review_json.get("subscores"),
+            "raw_ai_setup_quality_score": prev.get("raw_ai_setup_quality_score"),
+            "smoothed_ai_setup_quality_score": prev.get("smoothed_ai_setup_quality_score"),
+            "raw_ai_direction_score": prev.get("raw_ai_direction_score"),
+            "smoothed_ai_direction_score": prev.get("smoothed_ai_direction_score"),
+            "fingerprint": self.chart_analyzer.calculate_fingerprint(ohlcv_rows[-window:]),
+            "similarity_to_prev": self.chart_analyzer.calculate_similarity(
+                ohlcv_rows[-window:], ohlcv_rows[-window - 1:-1]
+            ) or 0.0,
+            **self._review_fields(context, as_of_date),
+            "carried_from": prev.get("carried_from") or prev["as_of_date"],
+        }
+        self._save_review(result)
+        return result
+
+    def _run_ai_reviews(
+        self,
+        assets: List[Dict[str, Any]],
+        as_of_date: str,
+        run_pass_b: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Run the two-pass review for many assets through the shared LLM executor.
+        Reviews are saved as they complete; Pass B requests are dispatched as a
+        second batch once Pass A has finished. Assets that pass the
+        skip-unchanged gate (_unchanged) never reach the executor.
+        """
+        prev_reviews = self._previous_reviews([a["asset_id"] for a in assets], as_of_date)
+        requests = []
+        reviews = []
+        unchanged = 0
+        for asset in assets:
+            try:
+                request = self._pass_a_request(asset, as_of_date, prev_reviews.get(asset["asset_id"]))
+            except Exception as e:
+                logger.error(f"Error building Pass A packet for asset {asset['asset_id']}: {e}")
+                continue
+            similarity = self._unchanged(request.context, as_of_date)
+            if similarity is None:
+                requests.append(request)
+                continue
+            unchanged += 1
+            logger.debug(f"Asset {asset['asset_id']} unchanged since last review (similarity {similarity:.4f})")
+            if self.skip_unchanged == "carry":
+                try:
+                    reviews.append(self._carry_forward(request.context, as_of_date))
+                except Exception as e:
+                    logger.error(f"Error carrying forward AI review for asset {asset['asset_id']}: {e}")
+        if unchanged:
+            verb = "carried forward" if self.skip_unchanged == "carry" else "skipped"
+            logger.info(f"{unchanged} of {unchanged + len(requests)} assets unchanged since their last review ({verb})")
+
+        pass_a_done = []
+        for outcome in self.executor.run(requests, cache=self.cache):
+            asset = outcome.request.context["asset"]
+            if not outcome.ok:
+                logger.error(f"Error in Pass A for asset {asset['asset_id']}: {outcome.error}")
+                continue
+            if run_pass_b:
+                pass_a_done.append(outcome)
+                continue
+            try:
+                reviews.append(self._finish_review(outcome.request.context, as_of_date, outcome.result))
+            except Exception as e:
+                logger.error(f"Error saving AI review for asset {asset['asset_id']}: {e}")
+
+        pass_b_requests = (self._pass_b_request(a) for a in pass_a_done)
+        for outcome in self.executor.run(pass_b_requests, cache=self.cache):
+            context = outcome.request.context
+            if not outcome.ok:
+                logger.error(f"Error in Pass B for asset {context['asset']['asset_id']}: {outcome.error}")
+            try:
+                reviews.append(self._finish_review(
+                    context, as_of_date, context["pass_a_result"], outcome.result if outcome.ok else {}
+                ))
+            except Exception as e:
+                logger.error(f"Error saving AI review for asset {context['asset']['asset_id']}: {e}")
+
+        return reviews
+
+    def _run_ai_review(
+        self, 
+        asset: Dict[str, Any], 
+        as_of_date: str, 
+        run_pass_b: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Runs the two-pass AI review for a single asset."""
+        logger.info(f"Running AI review for asset {asset['asset_id']} ({asset['symbol']})")
+        reviews = self._run_ai_reviews([asset], as_of_date, run_pass_b)
+        return reviews[0] if reviews else None
+
     def _save_review(self, result: Dict[str, Any]) -> None:
         """Saves the AI review to the database."""
         # Map result keys to DB columns
@@ -456,6 +658,11 @@ class Stage5AIReview:
             "agreement_with_engine": result.get("agreement_with_engine"),
             "engine_notes": json.dumps(result.get("engine_notes")),
             "confidence_adjustment": result.get("confidence_adjustment"),
+            
+            # Skip-unchanged gate inputs
+            "chart_vector": result.get("chart_vector"),
+            "signal_set": result.get("signal_set"),
+            "carried_from": result.get("carried_from"),
             # Don't store raw_response to avoid serialization issues with non-JSON objects
         }
         
@@ -492,7 +699,6 @@ class Stage5AIReview:
         
         assets_to_review = self._get_flashed_assets(as_of_date, universe_id, config_id, limit_per_scope)
         
-        for asset in assets_to_review:
-            self._run_ai_review(asset, as_of_date, run_pass_b)
-            
-        logger.info("Stage5AIReview finished.")
+        self._run_ai_reviews(assets_to_review, as_of_date, run_pass_b)
+        
+        logger.info(f"Stage5AIReview finished (LLM cache: {self.cache.stats()}).")
@@ -19,6 +19,7 @@ from google import genai
 from google.genai import types
 import numpy as np
 
+from .. import telemetry
 from ..db import Database
 from ..utils.chart_analyzer import ChartAnalyzer, AI_REVIEW_VERSION
 
@@ -343,6 +344,7 @@ class Stage5AIReviewV2:
                     response_mime_type="application/json",
                 )
             )
+            telemetry.record_llm(response)
             pass_a_result = json.loads(response.text)
         except Exception as e:
             logger.error(f"Error in AI review for {symbol}: {e}")
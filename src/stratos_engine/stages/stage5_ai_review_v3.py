@@ -9,6 +9,12 @@ Key Features:
 - AI provides single setup_purity_score (0-100) instead of dual scoring
 - Auto-elevates attention level for high profit factor setups (PF > 2.0 → minimum FOCUS)
 - AI can adjust entry/stop/target within ±10% of quant levels (soft guardrails)
+- analyze_assets() reviews a whole batch concurrently through the shared LLM
+  executor, assets with active setups first, saving each review as it completes;
+  model results are cached on the packet contents (llm_cache.py)
+- OHLCV bars go into the packet in a compact columnar encoding, optionally
+  weekly before the last N daily bars (ohlcv_packet.py; AI_OHLCV_FORMAT,
+  AI_OHLCV_DAILY_BARS)
 """
 
 import json
@@ -35,6 +41,21 @@ from google.genai import types
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+try:
+    from ..bar_store import get_shared_store
+    from ..llm import LlmRequest, estimate_tokens, get_shared_executor
+    from ..llm_cache import content_hash, get_shared_cache
+    from ..ohlcv_packet import DEFAULT_FORMAT, encode_ohlcv
+    from ..stream import fetch_records
+except ImportError:
+    # Imported as a top-level module (scripts/run_ai_analysis_batch.py):
+    # sequential model calls, no result cache, bars from Postgres as rows
+    get_shared_store = None
+    get_shared_executor = None
+    get_shared_cache = None
+    encode_ohlcv = None
+    fetch_records = None
+
 logger = logging.getLogger(__name__)
 
 # Load prompts
@@ -66,12 +87,22 @@ class Stage5AIReviewV3:
     FALLBACK_MODEL = "gemini-2.0-flash"
     PASS1_BARS = 365
     
-    def __init__(self, model: Optional[str] = None, db_url: Optional[str] = None):
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        db_url: Optional[str] = None,
+        ohlcv_format: Optional[str] = None,
+        daily_bars: Optional[int] = None,
+    ):
         """Initialize the Stage5AIReviewV3.
         
         Args:
             model: Gemini model to use (default: gemini-3-flash-preview)
             db_url: Database connection URL (default: from env)
+            ohlcv_format: Packet OHLCV encoding, rows/columnar/compact
+                (default: AI_OHLCV_FORMAT, else compact)
+            daily_bars: Bars kept daily before older ones are aggregated to
+                weekly (default: AI_OHLCV_DAILY_BARS, else all daily)
         """
         self.model_name = model or os.environ.get("GEMINI_MODEL") or self.DEFAULT_MODEL
         self.db_url = db_url or os.environ.get(
@@ -85,10 +116,26 @@ class Stage5AIReviewV3:
             raise ValueError("GEMINI_API_KEY not set in environment")
         self.client = genai.Client(api_key=self.api_key)
         
+        # Packet OHLCV encoding (rows only when ohlcv_packet can't be imported)
+        self.ohlcv_format = "rows"
+        self.daily_bars = None
+        if encode_ohlcv is not None:
+            self.ohlcv_format = ohlcv_format or os.environ.get("AI_OHLCV_FORMAT") or DEFAULT_FORMAT
+            daily_bars = daily_bars or os.environ.get("AI_OHLCV_DAILY_BARS")
+            self.daily_bars = int(daily_bars) if daily_bars else None
+        
+        # Concurrent, quota-bound model calls (see analyze_assets)
+        self.executor = get_shared_executor() if get_shared_executor else None
+        # Results keyed on the packet contents: unchanged assets skip the model call
+        self.cache = get_shared_cache(connect=self._get_connection) if get_shared_cache else None
+        
         # Load prompts
         self._load_prompts()
         
-        logger.info(f"Stage5AIReviewV3 initialized with model: {self.model_name}, version: {self.PROMPT_VERSION}")
+        logger.info(
+            f"Stage5AIReviewV3 initialized with model: {self.model_name}, version: {self.PROMPT_VERSION}, "
+            f"ohlcv: {self.ohlcv_format}" + (f" ({self.daily_bars} daily)" if self.daily_bars else "")
+        )
     
     def _get_connection(self):
         """Get database connection."""
@@ -224,17 +271,27 @@ class Stage5AIReviewV3:
         """
         conn = self._get_connection()
         try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                SELECT date, open, high, low, close, volume
-                FROM daily_bars
-                WHERE asset_id = %s AND date <= %s
-                ORDER BY date DESC
-                LIMIT %s
-                """
-                cur.execute(query, (asset_id, as_of_date, limit))
-                bars = list(cur.fetchall())
-                return list(reversed(bars))  # Return oldest first
+            # Local bar cache when BAR_STORE_DIR is set and synced through as_of_date
+            store = get_shared_store(conn, as_of_date) if get_shared_store else None
+            if store is not None:
+                bars = store.read_table(asset_id, end=as_of_date, limit=limit)
+                return bars.drop(['asset_id']).to_pylist()
+
+            query = """
+            SELECT date, open, high, low, close, volume
+            FROM daily_bars
+            WHERE asset_id = %s AND date <= %s
+            ORDER BY date DESC
+            LIMIT %s
+            """
+            if fetch_records is not None:
+                # Streamed and typed (floats, not Decimal), like the bar store path
+                bars = fetch_records(conn, query, (asset_id, as_of_date, limit))
+            else:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(query, (asset_id, as_of_date, limit))
+                    bars = list(cur.fetchall())
+            return list(reversed(bars))  # Return oldest first
         finally:
             conn.close()
     
@@ -262,18 +319,11 @@ class Stage5AIReviewV3:
         Returns:
             Data packet dictionary for AI prompt
         """
-        # Format OHLCV as array rows
-        ohlcv_formatted = [
-            [
-                str(b["date"]),
-                float(b["open"]) if b["open"] else None,
-                float(b["high"]) if b["high"] else None,
-                float(b["low"]) if b["low"] else None,
-                float(b["close"]) if b["close"] else None,
-                float(b["volume"]) if b["volume"] else None,
-            ]
-            for b in ohlcv_data
-        ]
+        # Format OHLCV (compact columnar unless configured otherwise)
+        if encode_ohlcv is not None:
+            ohlcv_formatted = encode_ohlcv(ohlcv_data, self.ohlcv_format, self.daily_bars)
+        else:
+            ohlcv_formatted = [self._bar_row(b) for b in ohlcv_data]
         
         # Format active setups for AI context
         setups_context = []
@@ -311,11 +361,20 @@ class Stage5AIReviewV3:
         
         return packet
     
-    def _compute_input_hash(self, packet: Dict[str, Any]) -> str:
+    @staticmethod
+    def _bar_row(bar: Dict[str, Any]) -> List[Any]:
+        """One bar as a [date, open, high, low, close, volume] row (0/NULL -> None)."""
+        return [str(bar["date"])] + [
+            float(bar[f]) if bar[f] else None for f in ("open", "high", "low", "close", "volume")
+        ]
+    
+    def _compute_input_hash(self, packet: Dict[str, Any], ohlcv_data: List[Dict[str, Any]]) -> str:
         """Compute hash of input data for idempotency.
         
         Args:
             packet: AI data packet
+            ohlcv_data: Source bars of the packet (hashed as rows, not as encoded,
+                since the compact encoding rounds prices)
             
         Returns:
             SHA256 hash string
@@ -324,7 +383,8 @@ class Stage5AIReviewV3:
         hash_content = {
             "symbol": packet["asset"]["symbol"],
             "as_of_date": packet["context"]["as_of_date"],
-            "ohlcv_last_10": packet["ohlcv"][-10:] if len(packet["ohlcv"]) >= 10 else packet["ohlcv"],
+            "ohlcv_last_10": [self._bar_row(b) for b in ohlcv_data[-10:]],
+            "ohlcv_encoding": [self.ohlcv_format, self.daily_bars],
             "active_setups": [s["setup_name"] for s in packet["quant_setups"]["active_setups"]],
             "prompt_version": self.PROMPT_VERSION,
             "model": self.model_name,
@@ -490,7 +550,7 @@ class Stage5AIReviewV3:
             logger.debug(f"Response preview: {response_text[:500]}...")
             return None
     
-    def analyze_asset(
+    def _prepare_asset(
         self,
         asset_id: int,
         symbol: str,
@@ -498,20 +558,7 @@ class Stage5AIReviewV3:
         name: str = "",
         asset_type: str = "equity"
     ) -> Optional[Dict[str, Any]]:
-        """Run AI analysis for a single asset.
-        
-        Args:
-            asset_id: Asset ID
-            symbol: Asset symbol
-            as_of_date: Analysis date
-            name: Asset name (optional)
-            asset_type: 'crypto' or 'equity'
-            
-        Returns:
-            Analysis result dictionary or None on error
-        """
-        logger.info(f"Analyzing {symbol} (asset_id={asset_id}) for {as_of_date}")
-        
+        """Load an asset's bars and setups and build its AI packet (None if too little data)."""
         # Get OHLCV data
         ohlcv_data = self._get_ohlcv_data(asset_id, as_of_date, self.PASS1_BARS)
         if len(ohlcv_data) < 30:
@@ -533,35 +580,71 @@ class Stage5AIReviewV3:
             active_setups=active_setups
         )
         
-        input_hash = self._compute_input_hash(packet)
-        
-        # Call Gemini API with retry logic and fallback
-        ai_result = None
-        prompt_with_schema = f"{self.system_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.output_schema, indent=2)}"
-        
-        # Try primary model first, then fallback
-        models_to_try = [self.model_name]
+        return {
+            "asset_id": asset_id,
+            "symbol": symbol,
+            "as_of_date": as_of_date,
+            "packet": packet,
+            "input_hash": self._compute_input_hash(packet, ohlcv_data),
+        }
+    
+    def _prompt_with_schema(self) -> str:
+        return f"{self.system_prompt}\n\nYou MUST respond with valid JSON matching this schema:\n{json.dumps(self.output_schema, indent=2)}"
+    
+    def _generate(self, packet: Dict[str, Any]):
+        """Gemini call for one packet (model chosen per attempt)."""
+        contents = [self._prompt_with_schema(), json.dumps(packet)]
+        
+        def call(model_name: str):
+            return self.client.models.generate_content(
+                model=model_name,
+                contents=contents,
+                config=types.GenerateContentConfig(
+                    temperature=0.2,
+                    max_output_tokens=16000,  # High buffer for thinking models
+                    response_mime_type="application/json",
+                )
+            )
+        return call
+    
+    def _models(self) -> tuple:
+        """Primary model first, then fallback."""
         if self.model_name != self.FALLBACK_MODEL:
-            models_to_try.append(self.FALLBACK_MODEL)
+            return (self.model_name, self.FALLBACK_MODEL)
+        return (self.model_name,)
+    
+    def _llm_request(self, prepared: Dict[str, Any], priority: float = 0) -> "LlmRequest":
+        """Executor request; the response is parsed with JSON repair and retried if unusable."""
+        packet = prepared["packet"]
+        symbol = prepared["symbol"]
+        contents = (self._prompt_with_schema(), json.dumps(packet))
+        return LlmRequest(
+            key=prepared["asset_id"],
+            provider="gemini",
+            call=self._generate(packet),
+            models=self._models(),
+            parse=lambda response: self._parse_json_with_repair(response.text, symbol),
+            priority=priority,
+            est_tokens=estimate_tokens(*contents, max_output=16000),
+            context=prepared,
+            cache_key=(content_hash(*contents), self.PROMPT_VERSION),
+        )
+    
+    def _generate_sequential(self, prepared: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Call Gemini in this thread with retries and fallback (standalone import, no executor)."""
+        symbol = prepared["symbol"]
+        call = self._generate(prepared["packet"])
+        ai_result = None
         
-        for model_name in models_to_try:
+        for model_name in self._models():
             max_retries = 3 if model_name == self.model_name else 2
             
             for attempt in range(max_retries):
                 try:
-                    response = self.client.models.generate_content(
-                        model=model_name,
-                        contents=[prompt_with_schema, json.dumps(packet)],
-                        config=types.GenerateContentConfig(
-                            temperature=0.2,
-                            max_output_tokens=16000,  # High buffer for thinking models
-                            response_mime_type="application/json",
-                        )
-                    )
+                    response = call(model_name)
                     
                     # Try to parse JSON, with repair for truncated responses
-                    response_text = response.text
-                    ai_result = self._parse_json_with_repair(response_text, symbol)
+                    ai_result = self._parse_json_with_repair(response.text, symbol)
                     
                     if ai_result:
                         if model_name != self.model_name:
@@ -582,10 +665,110 @@ class Stage5AIReviewV3:
             if ai_result:
                 break  # Got result, no need to try fallback
         
+        return ai_result
+    
+    def analyze_asset(
+        self,
+        asset_id: int,
+        symbol: str,
+        as_of_date: str,
+        name: str = "",
+        asset_type: str = "equity"
+    ) -> Optional[Dict[str, Any]]:
+        """Run AI analysis for a single asset.
+        
+        Args:
+            asset_id: Asset ID
+            symbol: Asset symbol
+            as_of_date: Analysis date
+            name: Asset name (optional)
+            asset_type: 'crypto' or 'equity'
+            
+        Returns:
+            Analysis result dictionary or None on error
+        """
+        logger.info(f"Analyzing {symbol} (asset_id={asset_id}) for {as_of_date}")
+        
+        prepared = self._prepare_asset(asset_id, symbol, as_of_date, name, asset_type)
+        if prepared is None:
+            return None
+        
+        # Call Gemini API with retry logic and fallback
+        if self.executor is not None:
+            outcome = self.executor.complete(self._llm_request(prepared), cache=self.cache)
+            ai_result = outcome.result if outcome.ok else None
+        else:
+            ai_result = self._generate_sequential(prepared)
+        
         if ai_result is None:
             logger.error(f"All models failed for {symbol}")
             return None
         
+        return self._finish_asset(prepared, ai_result)
+    
+    def analyze_assets(self, assets: List[Dict[str, Any]], as_of_date: str) -> Dict[str, int]:
+        """Run AI analysis for many assets concurrently (within the provider quota).
+        
+        Assets with active quant setups are sent first; each review is saved as
+        soon as its response arrives.
+        
+        Args:
+            assets: Rows from get_assets_to_process (asset_id, symbol, name,
+                asset_type, has_active_setup)
+            as_of_date: Analysis date
+            
+        Returns:
+            Counts of processed, skipped (too little data) and failed assets
+        """
+        if self.executor is None:
+            raise RuntimeError("analyze_assets needs the stratos_engine package (LLM executor)")
+        
+        counts = {"processed": 0, "skipped": 0, "failed": 0}
+        requests = []
+        for asset in assets:
+            try:
+                prepared = self._prepare_asset(
+                    asset["asset_id"], asset["symbol"], as_of_date,
+                    asset.get("name") or "", asset.get("asset_type") or "equity"
+                )
+            except Exception as e:
+                logger.error(f"Error preparing {asset['symbol']}: {e}")
+                counts["failed"] += 1
+                continue
+            if prepared is None:
+                counts["skipped"] += 1
+                continue
+            requests.append(self._llm_request(prepared, priority=0 if asset.get("has_active_setup") else 1))
+        
+        logger.info(f"Dispatching {len(requests)} AI reviews for {as_of_date}")
+        for outcome in self.executor.run(requests, cache=self.cache):
+            symbol = outcome.request.context["symbol"]
+            if not outcome.ok:
+                logger.error(f"All models failed for {symbol}: {outcome.error}")
+                counts["failed"] += 1
+                continue
+            if outcome.model != self.model_name and not outcome.cached:
+                logger.info(f"Successfully used fallback model {outcome.model} for {symbol}")
+            try:
+                self._finish_asset(outcome.request.context, outcome.result)
+                counts["processed"] += 1
+            except Exception as e:
+                logger.error(f"Error saving review for {symbol}: {e}")
+                counts["failed"] += 1
+            if counts["processed"] and counts["processed"] % 25 == 0:
+                logger.info(f"Processed {counts['processed']}/{len(requests)} assets")
+        
+        logger.info(f"AI reviews for {as_of_date}: {counts} (LLM cache: {self.cache.stats()})")
+        return counts
+    
+    def _finish_asset(self, prepared: Dict[str, Any], ai_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply guardrails to a model result, then build and save the review."""
+        packet = prepared["packet"]
+        asset_id = prepared["asset_id"]
+        symbol = prepared["symbol"]
+        as_of_date = prepared["as_of_date"]
+        input_hash = prepared["input_hash"]
+        
         # Get primary setup for post-processing
         primary_setup = packet["quant_setups"]["primary_setup"]
         
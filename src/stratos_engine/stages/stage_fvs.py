@@ -32,6 +32,9 @@ from decimal import Decimal
 from google import genai
 from google.genai import types
 
+from ..llm import LlmExecutor, LlmRequest, estimate_tokens, get_shared_executor
+from ..llm_cache import LlmCache, content_hash, get_shared_cache
+
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -572,13 +575,25 @@ class FundamentalVigorScoreEngine:
     Fundamental Vigor Score Engine using Gemini LLM.
     
     This is completely separate from the technical analysis signal workflow.
+    run_batch() checks stored scores for the whole batch in one query and sends
+    only the remaining assets to Gemini, concurrently through the shared LLM
+    executor; model results are cached on the packet contents (llm_cache.py).
     """
     
     PROMPT_VERSION = "1.0"
     DEFAULT_MODEL = "gemini-3-pro-preview"
     
-    def __init__(self, db, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        db,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        executor: Optional[LlmExecutor] = None,
+        cache: Optional[LlmCache] = None
+    ):
         self.db = db
+        self.executor = executor or get_shared_executor()
+        self.cache = cache or get_shared_cache(db)
         
         # Configure Gemini API
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
@@ -658,19 +673,28 @@ class FundamentalVigorScoreEngine:
         }
         return hashlib.sha256(json.dumps(hash_content, sort_keys=True).encode()).hexdigest()
     
-    def _check_existing_score(self, asset_id: int, as_of_date: str, input_hash: str) -> Optional[Dict]:
-        """Check if we already have a score for this input."""
+    def _existing_scores(self, as_of_date: str, input_hashes: Dict[int, str]) -> Dict[int, Dict]:
+        """Stored scores matching each asset's input hash (one query for the batch)."""
+        if not input_hashes:
+            return {}
         query = """
-        SELECT * FROM fundamental_vigor_scores
-        WHERE asset_id = %s AND as_of_date = %s AND input_hash = %s
-        ORDER BY created_at DESC LIMIT 1
+        SELECT DISTINCT ON (fvs.asset_id) fvs.*
+        FROM fundamental_vigor_scores fvs
+        JOIN unnest(%s::bigint[], %s::text[]) AS w(asset_id, input_hash)
+          ON fvs.asset_id = w.asset_id AND fvs.input_hash = w.input_hash
+        WHERE fvs.as_of_date = %s
+        ORDER BY fvs.asset_id, fvs.created_at DESC
         """
-        result = self.db.fetch_one(query, (asset_id, as_of_date, input_hash))
-        return dict(result) if result else None
+        asset_ids = list(input_hashes)
+        rows = self.db.fetch_all(query, (asset_ids, [input_hashes[a] for a in asset_ids], as_of_date))
+        return {row['asset_id']: dict(row) for row in rows}
+    
+    def _check_existing_score(self, asset_id: int, as_of_date: str, input_hash: str) -> Optional[Dict]:
+        """Check if we already have a score for this input."""
+        return self._existing_scores(as_of_date, {asset_id: input_hash}).get(asset_id)
     
-    def _call_gemini(self, packet: Dict[str, Any]) -> Dict[str, Any]:
-        """Call Gemini API with the context packet."""
-        user_message = f"""
+    def _user_message(self, packet: Dict[str, Any]) -> str:
+        return f"""
 Analyze the following company's fundamental data and provide a Fundamental Vigor Score assessment.
 
 INPUT DATA:
@@ -681,10 +705,12 @@ INPUT DATA:
 Provide your analysis following the scoring methodology in your instructions.
 Return JSON only.
 """
-        
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
+    
+    def _generate(self, user_message: str):
+        """Gemini call for the executor (model chosen per attempt)."""
+        def call(model: str):
+            return self.client.models.generate_content(
+                model=model,
                 contents=user_message,
                 config=types.GenerateContentConfig(
                     system_instruction=self.system_prompt,
@@ -693,12 +719,22 @@ Return JSON only.
                     response_schema=self.output_schema
                 )
             )
-            
-            return json.loads(response.text)
-        
-        except Exception as e:
-            logger.error(f"Gemini API call failed: {e}")
-            raise
+        return call
+    
+    def _llm_request(self, prepared: Dict[str, Any]) -> LlmRequest:
+        """Executor request for a prepared asset; the largest companies are scored first."""
+        user_message = self._user_message(prepared['packet'])
+        return LlmRequest(
+            key=prepared['asset_id'],
+            provider="gemini",
+            call=self._generate(user_message),
+            models=(self.model_name,),
+            parse=lambda response: json.loads(response.text),
+            priority=prepared.get('rank', 0),
+            est_tokens=estimate_tokens(self.system_prompt, user_message, max_output=8000),
+            context=prepared,
+            cache_key=(content_hash(self.system_prompt, user_message), self.PROMPT_VERSION),
+        )
     
     def _calculate_final_score(self, sub_scores: Dict[str, int]) -> float:
         """Calculate weighted final score from sub-scores."""
@@ -813,34 +849,16 @@ Return JSON only.
             json.dumps(metrics.quarterly_revenue)
         ))
     
-    def score_asset(
+    def _prepare_asset(
         self,
         asset_id: int,
         symbol: str,
         name: str,
-        sector: Optional[str] = None,
-        industry: Optional[str] = None,
-        as_of_date: Optional[str] = None,
-        force_refresh: bool = False
-    ) -> Optional[FVSResult]:
-        """
-        Calculate Fundamental Vigor Score for a single asset.
-        
-        Args:
-            asset_id: Database asset ID
-            symbol: Stock ticker symbol
-            name: Company name
-            sector: Company sector
-            industry: Company industry
-            as_of_date: Date for the score (defaults to today)
-            force_refresh: If True, recalculate even if cached
-        
-        Returns:
-            FVSResult or None if scoring failed
-        """
-        as_of_date = as_of_date or date.today().isoformat()
-        logger.info(f"Scoring {symbol} ({asset_id}) for {as_of_date}")
-        
+        sector: Optional[str],
+        industry: Optional[str],
+        as_of_date: str
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch an asset's fundamentals and build its packet (None if FMP has no data)."""
         # 1. Fetch fundamental data from FMP
         logger.info(f"Fetching fundamental data for {symbol}")
         metrics = fetch_fundamental_data(symbol)
@@ -854,42 +872,43 @@ Return JSON only.
             symbol, name, sector, industry, as_of_date, metrics
         )
         
-        # 3. Check for existing score (idempotency)
-        input_hash = self._compute_input_hash(packet)
-        
-        if not force_refresh:
-            existing = self._check_existing_score(asset_id, as_of_date, input_hash)
-            if existing:
-                logger.info(f"Using cached FVS for {symbol}")
-                return FVSResult(
-                    asset_id=asset_id,
-                    symbol=symbol,
-                    as_of_date=as_of_date,
-                    profitability_score=existing['profitability_score'],
-                    solvency_score=existing['solvency_score'],
-                    growth_score=existing['growth_score'],
-                    moat_score=existing['moat_score'],
-                    final_score=existing['final_score'],
-                    confidence_level=existing['confidence_level'],
-                    data_quality_score=existing['data_quality_score'],
-                    piotroski_f_score=existing['piotroski_f_score'],
-                    altman_z_score=existing['altman_z_score'],
-                    reasoning_scratchpad=existing['reasoning_scratchpad'],
-                    final_reasoning_paragraph=existing['final_reasoning_paragraph'],
-                    score_breakdown=existing['score_breakdown'],
-                    quantitative_metrics=existing['quantitative_metrics'],
-                    model_name=existing['model_name'],
-                    prompt_version=existing['prompt_version'],
-                    input_hash=input_hash
-                )
-        
-        # 4. Call Gemini for qualitative analysis
-        logger.info(f"Calling Gemini for FVS analysis of {symbol}")
-        try:
-            llm_result = self._call_gemini(packet)
-        except Exception as e:
-            logger.error(f"LLM call failed for {symbol}: {e}")
-            return None
+        return {
+            'asset_id': asset_id,
+            'symbol': symbol,
+            'as_of_date': as_of_date,
+            'metrics': metrics,
+            'packet': packet,
+            'input_hash': self._compute_input_hash(packet),
+        }
+    
+    def _result_from_existing(self, prepared: Dict[str, Any], existing: Dict) -> FVSResult:
+        """FVSResult for a score already stored for the same input hash."""
+        logger.info(f"Using cached FVS for {prepared['symbol']}")
+        return FVSResult(
+            asset_id=prepared['asset_id'],
+            symbol=prepared['symbol'],
+            as_of_date=prepared['as_of_date'],
+            profitability_score=existing['profitability_score'],
+            solvency_score=existing['solvency_score'],
+            growth_score=existing['growth_score'],
+            moat_score=existing['moat_score'],
+            final_score=existing['final_score'],
+            confidence_level=existing['confidence_level'],
+            data_quality_score=existing['data_quality_score'],
+            piotroski_f_score=existing['piotroski_f_score'],
+            altman_z_score=existing['altman_z_score'],
+            reasoning_scratchpad=existing['reasoning_scratchpad'],
+            final_reasoning_paragraph=existing['final_reasoning_paragraph'],
+            score_breakdown=existing['score_breakdown'],
+            quantitative_metrics=existing['quantitative_metrics'],
+            model_name=existing['model_name'],
+            prompt_version=existing['prompt_version'],
+            input_hash=prepared['input_hash']
+        )
+    
+    def _finish_asset(self, prepared: Dict[str, Any], llm_result: Dict[str, Any]) -> FVSResult:
+        """Score the LLM assessment and save it with its inputs."""
+        metrics = prepared['metrics']
         
         # 5. Extract scores and calculate final
         sub_scores = llm_result['sub_scores']
@@ -897,9 +916,9 @@ Return JSON only.
         
         # 6. Build result
         result = FVSResult(
-            asset_id=asset_id,
-            symbol=symbol,
-            as_of_date=as_of_date,
+            asset_id=prepared['asset_id'],
+            symbol=prepared['symbol'],
+            as_of_date=prepared['as_of_date'],
             profitability_score=sub_scores['profitability'],
             solvency_score=sub_scores['solvency'],
             growth_score=sub_scores['growth'],
@@ -915,16 +934,65 @@ Return JSON only.
             quantitative_metrics=asdict(metrics),
             model_name=self.model_name,
             prompt_version=self.PROMPT_VERSION,
-            input_hash=input_hash
+            input_hash=prepared['input_hash']
         )
         
         # 7. Save to database
-        logger.info(f"Saving FVS for {symbol}: {final_score:.1f}")
-        self._save_inputs(asset_id, as_of_date, metrics)
+        logger.info(f"Saving FVS for {prepared['symbol']}: {final_score:.1f}")
+        self._save_inputs(prepared['asset_id'], prepared['as_of_date'], metrics)
         self._save_result(result)
         
         return result
     
+    def score_asset(
+        self,
+        asset_id: int,
+        symbol: str,
+        name: str,
+        sector: Optional[str] = None,
+        industry: Optional[str] = None,
+        as_of_date: Optional[str] = None,
+        force_refresh: bool = False
+    ) -> Optional[FVSResult]:
+        """
+        Calculate Fundamental Vigor Score for a single asset.
+        
+        Args:
+            asset_id: Database asset ID
+            symbol: Stock ticker symbol
+            name: Company name
+            sector: Company sector
+            industry: Company industry
+            as_of_date: Date for the score (defaults to today)
+            force_refresh: If True, recalculate even if cached
+        
+        Returns:
+            FVSResult or None if scoring failed
+        """
+        as_of_date = as_of_date or date.today().isoformat()
+        logger.info(f"Scoring {symbol} ({asset_id}) for {as_of_date}")
+        
+        prepared = self._prepare_asset(asset_id, symbol, name, sector, industry, as_of_date)
+        if prepared is None:
+            return None
+        
+        # 3. Check for existing score (idempotency)
+        if not force_refresh:
+            existing = self._check_existing_score(asset_id, as_of_date, prepared['input_hash'])
+            if existing:
+                return self._result_from_existing(prepared, existing)
+        
+        # 4. Call Gemini for qualitative analysis
+        logger.info(f"Calling Gemini for FVS analysis of {symbol}")
+        outcome = self.executor.complete(
+            self._llm_request(prepared), cache=None if force_refresh else self.cache
+        )
+        if not outcome.ok:
+            logger.error(f"LLM call failed for {symbol}: {outcome.error}")
+            return None
+        
+        return self._finish_asset(prepared, outcome.result)
+    
     def run_batch(
         self,
         limit: Optional[int] = None,
@@ -934,6 +1002,10 @@ Return JSON only.
         """
         Run FVS scoring for a batch of equities.
         
+        Fundamentals are fetched for every asset first, stored scores are
+        matched in one query, and the remaining assets are scored concurrently
+        (largest market cap first), each saved as its response arrives.
+        
         Args:
             limit: Maximum number of assets to process
             as_of_date: Date for scoring
@@ -968,31 +1040,53 @@ Return JSON only.
             'scores': []
         }
         
-        for asset in assets:
+        def record(result: FVSResult) -> None:
+            results['success'] += 1
+            results['scores'].append({
+                'symbol': result.symbol,
+                'final_score': result.final_score,
+                'confidence': result.confidence_level
+            })
+        
+        prepared_assets = []
+        for rank, asset in enumerate(assets):
             try:
-                result = self.score_asset(
-                    asset_id=asset['asset_id'],
-                    symbol=asset['symbol'],
-                    name=asset['name'],
-                    sector=asset.get('sector'),
-                    industry=asset.get('industry'),
-                    as_of_date=as_of_date,
-                    force_refresh=force_refresh
+                prepared = self._prepare_asset(
+                    asset['asset_id'], asset['symbol'], asset['name'],
+                    asset.get('sector'), asset.get('industry'), as_of_date
                 )
-                
-                if result:
-                    results['success'] += 1
-                    results['scores'].append({
-                        'symbol': result.symbol,
-                        'final_score': result.final_score,
-                        'confidence': result.confidence_level
-                    })
-                else:
-                    results['failed'] += 1
-                    
             except Exception as e:
                 logger.error(f"Error scoring {asset['symbol']}: {e}")
+                prepared = None
+            if prepared is None:
+                results['failed'] += 1
+                continue
+            prepared['rank'] = rank
+            prepared_assets.append(prepared)
+        
+        existing = {} if force_refresh else self._existing_scores(
+            as_of_date, {p['asset_id']: p['input_hash'] for p in prepared_assets}
+        )
+        requests = []
+        for prepared in prepared_assets:
+            if prepared['asset_id'] in existing:
+                record(self._result_from_existing(prepared, existing[prepared['asset_id']]))
+            else:
+                requests.append(self._llm_request(prepared))
+        
+        logger.info(f"FVS: {len(existing)} stored scores reused, {len(requests)} assets sent to Gemini")
+        for outcome in self.executor.run(requests, cache=None if force_refresh else self.cache):
+            prepared = outcome.request.context
+            if not outcome.ok:
+                logger.error(f"LLM call failed for {prepared['symbol']}: {outcome.error}")
+                results['failed'] += 1
+                continue
+            try:
+                record(self._finish_asset(prepared, outcome.result))
+            except Exception as e:
+                logger.error(f"Error scoring {prepared['symbol']}: {e}")
                 results['failed'] += 1
         
-        logger.info(f"FVS batch complete: {results['success']}/{results['total']} successful")
+        logger.info(f"FVS batch complete: {results['success']}/{results['total']} successful "
+                    f"(LLM cache: {self.cache.stats()})")
         return results
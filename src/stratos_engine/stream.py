@@ -0,0 +1,321 @@
+"""
+Server-side cursor streaming into Arrow / NumPy.
+
+Wide reads (every feature column for the whole universe, multi-year backtest
+panels) used to go through RealDictCursor.fetchall(): every row becomes a
+Python dict of Decimal/date objects before anything typed is built, and the
+whole result is held twice. Here rows are streamed from a named (server-side)
+cursor `itersize` rows at a time and each chunk is converted to typed
+columns, so at most one chunk of Python objects is alive at any time.
+
+- Types come from the cursor description: numeric and float columns become
+  float64 (NUMERIC is parsed straight to float, never Decimal), integers
+  int64, dates date32, timestamps timestamp[us], json/jsonb stay text
+  (fetch_records parses them)
+- `columns` projects the query on the server
+  (SELECT "a", "b" FROM (<query>) q), so only the columns a consumer uses
+  are sent and converted
+
+    for batch in stream_batches(conn, query, params, itersize=20_000):
+        ...                                          # pyarrow.RecordBatch
+    table = fetch_arrow(conn, query, params)         # pyarrow.Table
+    arrays = fetch_arrays(conn, query, params)       # {column: np.ndarray}
+    df = fetch_frame(conn, query, params, columns=['asset_id', 'date', 'close'])
+    rows = fetch_records(conn, query, params)        # [dict], native Python values
+
+`conn` is a psycopg2 connection or a stratos_engine Database (which exposes
+the same functions as methods).
+
+Only stream_batches/fetch_arrow need pyarrow (optional: pip install pyarrow);
+fetch_arrays, fetch_frame and fetch_records build NumPy/Python values directly.
+"""
+
+import json
+import uuid
+from contextlib import contextmanager
+from datetime import timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
+import psycopg2.extras
+
+from . import telemetry
+
+ITERSIZE = 20_000
+
+# Postgres type OIDs
+_BOOL_TYPES = {16}
+_INT_TYPES = {20, 21, 23}                  # int8, int2, int4
+_FLOAT_TYPES = {700, 701, 1700}            # float4, float8, numeric
+_DATE_TYPE = 1082
+_TIMESTAMP_TYPE = 1114
+_TIMESTAMPTZ_TYPE = 1184
+_STRING_TYPES = {18, 19, 25, 1042, 1043}   # char, name, text, bpchar, varchar
+_JSON_TYPES = {114, 3802}                  # json, jsonb (unparsed)
+_JSON_FIELD = {b'pg_type': b'json'}  # field metadata: fetch_records parses these
+
+_NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'STREAM_NUMERIC',
+    lambda value, cur: float(value) if value is not None else None,
+)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def project(query: str, columns: Optional[Sequence[str]]) -> str:
+    """`query` restricted to `columns` (the planner prunes the rest), or unchanged."""
+    if not columns:
+        return query
+    return f"SELECT {', '.join(map(_quote, columns))} FROM ({query}) AS _projected"
+
+
+@contextmanager
+def connection(conn) -> Iterator:
+    """A psycopg2 connection for a raw connection or a Database (pooled checkout)."""
+    if hasattr(conn, 'transaction'):
+        with conn.transaction(dict_cursor=False) as cur:
+            yield cur.connection
+    else:
+        yield conn
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Arrow streaming requires pyarrow. Run: pip install pyarrow") from e
+    return pa
+
+
+def _arrow_type(pa, type_code: int):
+    """Arrow type for a Postgres type OID (None: inferred per chunk)."""
+    if type_code in _BOOL_TYPES:
+        return pa.bool_()
+    if type_code in _INT_TYPES:
+        return pa.int64()
+    if type_code in _FLOAT_TYPES:
+        return pa.float64()
+    if type_code == _DATE_TYPE:
+        return pa.date32()
+    if type_code == _TIMESTAMP_TYPE:
+        return pa.timestamp('us')
+    if type_code == _TIMESTAMPTZ_TYPE:
+        return pa.timestamp('us', tz='UTC')
+    if type_code in _STRING_TYPES or type_code in _JSON_TYPES:
+        return pa.string()
+    return None
+
+
+def _column(pa, values: Sequence[Any], arrow_type) -> Any:
+    if arrow_type is not None:
+        return pa.array(values, type=arrow_type)
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Arrays, ranges, mixed values: keep their text form
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _batch(pa, rows: List[tuple], description) -> Any:
+    columns = list(zip(*rows)) if rows else [()] * len(description)
+    arrays, fields = [], []
+    for values, d in zip(columns, description):
+        array = _column(pa, values, _arrow_type(pa, d.type_code))
+        arrays.append(array)
+        fields.append(pa.field(d.name, array.type,
+                               metadata=_JSON_FIELD if d.type_code in _JSON_TYPES else None))
+    return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _stream_rows(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> Iterator[tuple]:
+    """
+    Run `query` on a named server-side cursor and yield (rows, description)
+    per `itersize` rows. A query returning no rows yields one empty chunk (so
+    the column names are still known).
+    """
+    with connection(conn) as pg:
+        cur = pg.cursor(name=f'stream_{uuid.uuid4().hex[:12]}', withhold=pg.autocommit)
+        try:
+            psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT, cur)
+            psycopg2.extras.register_default_json(cur, loads=lambda s: s)
+            psycopg2.extras.register_default_jsonb(cur, loads=lambda s: s)
+            cur.itersize = itersize
+            cur.execute(project(query, columns), params)
+            first = True
+            while True:
+                # Named cursors only have a description after the first fetch
+                rows = cur.fetchmany(itersize)
+                telemetry.record_rows(read=len(rows))
+                if rows or first:
+                    yield rows, cur.description
+                if not rows:
+                    break
+                first = False
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass  # never mask the query's own error (e.g. a failed DECLARE)
+
+
+def stream_batches(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> Iterator[Any]:
+    """
+    Yield one pyarrow record batch per `itersize` rows. A query returning no
+    rows yields one empty batch (so the column names are still known).
+    """
+    pa = _require_pyarrow()
+    for rows, description in _stream_rows(conn, query, params, columns=columns, itersize=itersize):
+        yield _batch(pa, rows, description)
+
+
+def fetch_arrow(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> Any:
+    """All rows as a pyarrow Table (no rows: an empty table that still has the columns)."""
+    pa = _require_pyarrow()
+    batches = list(stream_batches(conn, query, params, columns=columns, itersize=itersize))
+    if any(b.schema != batches[0].schema for b in batches[1:]):
+        # Inferred columns can differ between chunks (e.g. all-null in one)
+        return pa.concat_tables([pa.Table.from_batches([b]) for b in batches],
+                                promote_options='permissive')
+    return pa.Table.from_batches(batches)
+
+
+def _numpy_column(values: Sequence[Any], type_code: int) -> np.ndarray:
+    """Typed column for one Postgres type (same dtypes as Arrow's to_numpy)."""
+    has_null = any(v is None for v in values)
+    if type_code in _FLOAT_TYPES or (type_code in _INT_TYPES and has_null):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if type_code in _INT_TYPES:
+        return np.array(values, dtype=np.int64)
+    if type_code in _BOOL_TYPES and not has_null:
+        return np.array(values, dtype=bool)
+    if type_code == _DATE_TYPE:
+        return np.array([np.datetime64('NaT') if v is None else v for v in values], dtype='datetime64[D]')
+    if type_code in (_TIMESTAMP_TYPE, _TIMESTAMPTZ_TYPE):
+        if type_code == _TIMESTAMPTZ_TYPE:
+            # Stored as UTC wall time, like Arrow's timestamp[us, tz=UTC]
+            values = [None if v is None else v.astimezone(timezone.utc).replace(tzinfo=None) for v in values]
+        return np.array([np.datetime64('NaT') if v is None else v for v in values], dtype='datetime64[us]')
+    column = np.empty(len(values), dtype=object)
+    column[:] = list(values)
+    return column
+
+
+def _column_arrays(chunks: Iterator[tuple]) -> tuple:
+    """({column: ndarray}, description) from streamed (rows, description) chunks."""
+    values: Dict[str, List[Any]] = {}
+    description = None
+    for rows, description in chunks:
+        names = [d.name for d in description]
+        if not values:
+            values = {name: [] for name in names}
+        for name, column in zip(names, zip(*rows)):
+            values[name].extend(column)
+    arrays = {d.name: _numpy_column(values[d.name], d.type_code) for d in description or ()}
+    return arrays, description
+
+
+def to_arrays(table) -> Dict[str, np.ndarray]:
+    """
+    {column: ndarray} of a pyarrow Table: float64 with NaN for numbers
+    (integers with nulls included), datetime64 for dates and timestamps,
+    object otherwise.
+    """
+    pa = _require_pyarrow()
+    arrays = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_date(column.type):
+            column = column.cast(pa.date32())
+        arrays[name] = column.to_numpy()
+    return arrays
+
+
+def fetch_arrays(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> Dict[str, np.ndarray]:
+    """
+    All rows as typed NumPy columns: float64 with NaN for numbers (integers
+    with nulls included), datetime64 for dates and timestamps, object otherwise.
+    """
+    arrays, _ = _column_arrays(_stream_rows(conn, query, params, columns=columns, itersize=itersize))
+    return arrays
+
+
+def to_frame(table) -> pd.DataFrame:
+    """DataFrame from a pyarrow Table; date columns become datetime64[ns]."""
+    pa = _require_pyarrow()
+    df = table.to_pandas(date_as_object=False)
+    for name, arrow_type in zip(table.column_names, table.schema.types):
+        if pa.types.is_date(arrow_type):
+            df[name] = df[name].astype('datetime64[ns]')
+    return df
+
+
+def fetch_frame(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> pd.DataFrame:
+    """All rows as a DataFrame (float64 numbers, datetime64[ns] dates)."""
+    arrays, description = _column_arrays(_stream_rows(conn, query, params, columns=columns, itersize=itersize))
+    df = pd.DataFrame(arrays)
+    for d in description or ():
+        if d.type_code == _DATE_TYPE:
+            df[d.name] = df[d.name].astype('datetime64[ns]')
+        elif d.type_code == _TIMESTAMPTZ_TYPE:
+            df[d.name] = df[d.name].dt.tz_localize('UTC')
+    return df
+
+
+def fetch_records(
+    conn,
+    query: str,
+    params: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    itersize: int = ITERSIZE,
+) -> List[Dict[str, Any]]:
+    """
+    All rows as dicts of native values (float for numbers, None for NULL,
+    datetime.date for dates, parsed json), for code written against
+    RealDictCursor rows.
+    """
+    records = []
+    for rows, description in _stream_rows(conn, query, params, columns=columns, itersize=itersize):
+        names = [d.name for d in description]
+        json_columns = [i for i, d in enumerate(description) if d.type_code in _JSON_TYPES]
+        for row in rows:
+            if json_columns:
+                row = list(row)
+                for i in json_columns:
+                    if row[i] is not None:
+                        row[i] = json.loads(row[i])
+            records.append(dict(zip(names, row)))
+    return records
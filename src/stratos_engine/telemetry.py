@@ -0,0 +1,379 @@
+"""
+Per-stage run telemetry: wall time, DB time, rows, HTTP calls, LLM tokens, peak RSS.
+
+A Metrics collector is bound to the current context while a job or a stage
+runs (measure()). The layers that do the work report into whatever collector
+is bound, and every enclosing collector receives the same counts, so a stage's
+numbers also add up into its job's:
+
+- Database.cursor(): DB time and statements; rows from the statement's status
+  ("SELECT 120", "INSERT 0 50", "COPY 900", ...)
+- stream / lookback server-side reads: rows read
+- HttpClient: every request sent to a vendor (retries included)
+- LLM stages: calls and prompt/completion tokens (record_llm)
+
+Collectors live in a contextvar, so threads started for a stage must run in a
+copy of the caller's context (contextvars.copy_context().run) to be counted;
+coroutines handed to another event loop are wrapped with carry().
+
+Peak RSS is sampled from the process every RSS_SAMPLE_INTERVAL seconds while a
+collector is open; it is process-wide, so stages that overlap see each other's
+memory.
+
+Only depends on the standard library so the standalone jobs/ scripts can use it.
+
+Usage:
+    with telemetry.measure("stage4") as metrics:
+        Stage4Scoring(db).run(...)
+    logger.info("stage_completed", **metrics.as_dict())
+
+    with telemetry.profile("/tmp/profiles/run/stage4", "cprofile"):
+        ...
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RSS_SAMPLE_INTERVAL = 0.5
+
+# Statement status tags whose row count is rows written
+_WRITE_TAGS = {"INSERT", "UPDATE", "DELETE", "MERGE", "COPY"}
+
+_current: ContextVar[Optional["Metrics"]] = ContextVar("stratos_metrics", default=None)
+# True while an outer database call is already being timed on this context
+_in_db: ContextVar[bool] = ContextVar("stratos_metrics_in_db", default=False)
+
+
+@dataclass
+class Metrics:
+    """Counters for one measured block (a job or a stage)."""
+    name: str
+    parent: Optional["Metrics"] = field(default=None, repr=False)
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    wall_seconds: float = 0.0
+    db_seconds: float = 0.0
+    db_statements: int = 0
+    rows_read: int = 0
+    rows_written: int = 0
+    http_calls: int = 0
+    llm_calls: int = 0
+    llm_tokens_in: int = 0
+    llm_tokens_out: int = 0
+    peak_rss_mb: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    COUNTERS = ("wall_seconds", "db_seconds", "db_statements", "rows_read", "rows_written",
+                "http_calls", "llm_calls", "llm_tokens_in", "llm_tokens_out", "peak_rss_mb")
+
+    def add(self, **counts: float) -> None:
+        """Add to counters here and in every enclosing collector."""
+        metrics = self
+        while metrics is not None:
+            with metrics._lock:
+                for name, value in counts.items():
+                    setattr(metrics, name, getattr(metrics, name) + value)
+            metrics = metrics.parent
+
+    def observe_rss(self, rss_mb: float) -> None:
+        with self._lock:
+            if rss_mb > self.peak_rss_mb:
+                self.peak_rss_mb = rss_mb
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Counters, rounded for logs and the pipeline_stage_metrics table."""
+        with self._lock:
+            values = {name: getattr(self, name) for name in self.COUNTERS}
+        for name in ("wall_seconds", "db_seconds"):
+            values[name] = round(values[name], 3)
+        values["peak_rss_mb"] = round(values["peak_rss_mb"], 1)
+        return values
+
+
+def current() -> Optional[Metrics]:
+    """The collector bound to this context, if any."""
+    return _current.get()
+
+
+# =============================================================================
+# RSS SAMPLING
+# =============================================================================
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (the peak so far where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+_open: Dict[int, Metrics] = {}
+_sampler_lock = threading.Lock()
+_sampler: Optional[threading.Thread] = None
+
+
+def _sample_loop() -> None:
+    global _sampler
+    while True:
+        with _sampler_lock:
+            if not _open:
+                _sampler = None
+                return
+            collectors = list(_open.values())
+        rss = current_rss_mb()
+        for metrics in collectors:
+            metrics.observe_rss(rss)
+        time.sleep(RSS_SAMPLE_INTERVAL)
+
+
+def _track(metrics: Metrics) -> None:
+    global _sampler
+    metrics.observe_rss(current_rss_mb())
+    with _sampler_lock:
+        _open[id(metrics)] = metrics
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="rss-sampler", daemon=True)
+            _sampler.start()
+
+
+def _untrack(metrics: Metrics) -> None:
+    with _sampler_lock:
+        _open.pop(id(metrics), None)
+    metrics.observe_rss(current_rss_mb())
+
+
+# =============================================================================
+# MEASURING
+# =============================================================================
+
+@contextmanager
+def measure(name: str, parent: Optional[Metrics] = None) -> Iterator[Metrics]:
+    """
+    Bind a new collector for the block; counts also go to `parent` (default:
+    the collector already bound). wall_seconds is set when the block exits,
+    also when it raises.
+    """
+    metrics = Metrics(name, parent if parent is not None else _current.get())
+    token = _current.set(metrics)
+    _track(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.wall_seconds = time.perf_counter() - start
+        _untrack(metrics)
+        _current.reset(token)
+
+
+class DbCall:
+    """One database call being timed; set `status` to the cursor's statusmessage."""
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[str] = None
+
+
+def _status_rows(status: Optional[str]) -> Dict[str, int]:
+    """{"rows_read" | "rows_written": n} from a status like 'INSERT 0 50'."""
+    if not status:
+        return {}
+    parts = status.split()
+    if len(parts) < 2 or not parts[-1].isdigit():
+        return {}
+    tag, rows = parts[0].upper(), int(parts[-1])
+    if tag in _WRITE_TAGS:
+        return {"rows_written": rows}
+    if tag in ("SELECT", "FETCH"):
+        return {"rows_read": rows}
+    return {}
+
+
+@contextmanager
+def db_call() -> Iterator[DbCall]:
+    """
+    Time a database call into the bound collector. Calls nested inside an
+    outer one (statements issued within transaction()) count their rows and
+    statements but not their time, which the outer call already covers.
+    """
+    call = DbCall()
+    metrics = _current.get()
+    if metrics is None:
+        yield call
+        return
+    outer = not _in_db.get()
+    token = _in_db.set(True)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        _in_db.reset(token)
+        counts = _status_rows(call.status)
+        if call.status:
+            counts["db_statements"] = 1
+        if outer:
+            counts["db_seconds"] = time.perf_counter() - start
+        if counts:
+            metrics.add(**counts)
+
+
+def record_rows(read: int = 0, written: int = 0) -> None:
+    """Rows moved outside Database.cursor() (server-side streams, raw connections)."""
+    metrics = _current.get()
+    if metrics is not None and (read or written):
+        metrics.add(rows_read=read, rows_written=written)
+
+
+def record_http(calls: int = 1) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(http_calls=calls)
+
+
+def usage_tokens(response: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of an OpenAI (`usage`) or Gemini (`usage_metadata`) response."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return (getattr(usage, "prompt_tokens", None) or 0,
+                getattr(usage, "completion_tokens", None) or 0)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return (getattr(usage, "prompt_token_count", None) or 0,
+                (getattr(usage, "candidates_token_count", None) or 0)
+                + (getattr(usage, "thoughts_token_count", None) or 0))
+    return None
+
+
+def record_llm(response: Any = None, tokens_in: int = 0, tokens_out: int = 0) -> None:
+    """
+    Count one LLM call. Token counts are read from the response (see
+    usage_tokens) when it reports them, else taken as passed.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return
+    usage = usage_tokens(response)
+    if usage is not None:
+        tokens_in, tokens_out = usage
+    metrics.add(llm_calls=1, llm_tokens_in=int(tokens_in), llm_tokens_out=int(tokens_out))
+
+
+def carry(coro):
+    """Wrap a coroutine so it reports into the calling context's collector on any loop."""
+    metrics = _current.get()
+
+    async def bound():
+        _current.set(metrics)
+        return await coro
+    return bound()
+
+
+# =============================================================================
+# PROFILING
+# =============================================================================
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+@contextmanager
+def profile(path: str, kind: str = "cprofile") -> Iterator[Optional[str]]:
+    """
+    Profile the calling thread for the block and dump to `path` plus an
+    extension (.prof for cProfile, .html for pyinstrument). Yields the file
+    written on exit. pyinstrument is optional; without it cProfile is used.
+    """
+    kind = (kind or "cprofile").lower()
+    if kind not in PROFILERS:
+        raise ValueError(f"Unknown profiler {kind!r} (expected one of {PROFILERS})")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument not installed, profiling with cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield f"{path}.html"
+            finally:
+                profiler.stop()
+                with open(f"{path}.html", "w") as f:
+                    f.write(profiler.output_html())
+            return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield f"{path}.prof"
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{path}.prof")
+
+
+# =============================================================================
+# PERSISTENCE
+# =============================================================================
+
+def write_stage_metrics(
+    db,
+    run_id: str,
+    job_id: Optional[str],
+    metrics: Metrics,
+    status: str,
+    profile_path: Optional[str] = None,
+) -> None:
+    """Upsert one row of pipeline_stage_metrics (never raises: telemetry must not fail a run)."""
+    values = metrics.as_dict()
+    try:
+        db.execute("""
+        INSERT INTO pipeline_stage_metrics
+            (run_id, job_id, stage, status, started_at, wall_seconds, db_seconds, db_statements,
+             rows_read, rows_written, http_calls, llm_calls, llm_tokens_in, llm_tokens_out,
+             peak_rss_mb, profile_path)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (run_id, stage) DO UPDATE SET
+            status = EXCLUDED.status,
+            started_at = EXCLUDED.started_at,
+            wall_seconds = EXCLUDED.wall_seconds,
+            db_seconds = EXCLUDED.db_seconds,
+            db_statements = EXCLUDED.db_statements,
+            rows_read = EXCLUDED.rows_read,
+            rows_written = EXCLUDED.rows_written,
+            http_calls = EXCLUDED.http_calls,
+            llm_calls = EXCLUDED.llm_calls,
+            llm_tokens_in = EXCLUDED.llm_tokens_in,
+            llm_tokens_out = EXCLUDED.llm_tokens_out,
+            peak_rss_mb = EXCLUDED.peak_rss_mb,
+            profile_path = EXCLUDED.profile_path,
+            recorded_at = NOW()
+        """, (
+            run_id, job_id, metrics.name, status, metrics.started_at,
+            values["wall_seconds"], values["db_seconds"], values["db_statements"],
+            values["rows_read"], values["rows_written"], values["http_calls"],
+            values["llm_calls"], values["llm_tokens_in"], values["llm_tokens_out"],
+            values["peak_rss_mb"], profile_path,
+        ))
+    except Exception as e:
+        logger.warning(f"Could not record metrics for {metrics.name} of run {run_id}: {e}")
@@ -1,6 +1,15 @@
 """Signal template definitions and evaluation engine."""
 
 from .engine import TemplateEngine
-from .direction import get_direction, DIRECTION_RULES
+from .direction import get_direction, direction_features, DIRECTION_RULES, DIRECTION_FEATURES
+from .compiled import CompiledTemplateEngine, diff_against_rowwise
 
-__all__ = ["TemplateEngine", "get_direction", "DIRECTION_RULES"]
+__all__ = [
+    "TemplateEngine",
+    "CompiledTemplateEngine",
+    "diff_against_rowwise",
+    "get_direction",
+    "direction_features",
+    "DIRECTION_RULES",
+    "DIRECTION_FEATURES",
+]
@@ -0,0 +1,359 @@
+"""Compiled, vectorized template evaluation.
+
+Compiles a TemplateEngine's gates, boosters, penalties and
+global_strength_adjustments into functions over whole columns, so a universe of
+feature rows is evaluated with a handful of NumPy operations per condition
+instead of walking the gate tree once per row and template.
+
+Results are identical to TemplateEngine.evaluate row by row. The row-wise
+engine's value handling is reproduced per element: NaN/None never match,
+numeric strings compare as floats, `abs` only applies to int/float values
+(not Decimal), `==` against a bool literal uses truthiness and other `==`/`in`
+comparisons use Python equality. Direction and evidence are only computed for
+rows whose gate fired, using the row-wise helpers.
+
+Usage:
+    compiled = engine.compile()
+    signals_per_row = compiled.evaluate_rows(rows)   # == [engine.evaluate(r) for r in rows]
+
+    mismatches = diff_against_rowwise(engine, rows)  # differential check
+"""
+
+import operator
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .direction import get_direction
+
+_TRUE_STRINGS = ("true", "1", "yes", "t")
+_FAST_NUMERIC_TYPES = {float, int, bool, np.float64, Decimal, type(None)}
+
+Rows = Union[Sequence[Dict[str, Any]], pd.DataFrame]
+MaskFn = Callable[["_Batch"], np.ndarray]
+
+
+def _safe_compare(fn: Callable[[Any, Any], Any]) -> Callable[[Any, Any], bool]:
+    """Wrap a comparison so TypeError/ValueError count as no match (as the row-wise engine does)."""
+    def safe(a, b):
+        try:
+            return bool(fn(a, b))
+        except (TypeError, ValueError):
+            return False
+    return safe
+
+
+_OBJECT_OPS = {
+    "==": _safe_compare(operator.eq),
+    "!=": _safe_compare(operator.ne),
+    "in": _safe_compare(lambda a, b: a in b),
+    "not_in": _safe_compare(lambda a, b: a not in b),
+}
+_NUMERIC_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+
+class _Column:
+    """
+    One feature column, normalized the way TemplateEngine.evaluate_condition
+    sees each value (after _safe_get and numeric-string conversion).
+    """
+    __slots__ = ("present", "num", "absable", "truthy", "obj")
+
+    def __init__(self, values: List[Any]):
+        n = len(values)
+        types = set(map(type, values))
+        self.obj = np.empty(n, dtype=object)
+        self.obj[:] = values
+
+        # Numeric columns (the common case) skip the per-value loop
+        if types <= _FAST_NUMERIC_TYPES:
+            try:
+                num = np.array(values, dtype=float)
+            except (OverflowError, ValueError, TypeError, ArithmeticError):
+                num = None
+            if num is not None:
+                self.present = ~np.isnan(num)
+                self.num = num
+                self.truthy = self.present & (num != 0)
+                self.absable = self.present.copy()
+                if Decimal in types:
+                    # abs() is only applied to int/float values, never Decimal
+                    self.absable &= np.fromiter((type(v) is not Decimal for v in values), dtype=bool, count=n)
+                return
+
+        present = np.zeros(n, dtype=bool)
+        num = np.full(n, np.nan)
+        absable = np.zeros(n, dtype=bool)
+        truthy = np.zeros(n, dtype=bool)
+        obj = self.obj.copy()
+        for i, val in enumerate(values):
+            if val is None:
+                continue
+            try:
+                if val != val:  # NaN check
+                    continue
+            except (TypeError, ValueError):
+                pass
+            if isinstance(val, str):
+                try:
+                    val = float(val)
+                except (ValueError, TypeError):
+                    pass
+            present[i] = True
+            obj[i] = val
+            absable[i] = isinstance(val, (int, float))
+            if isinstance(val, str):
+                truthy[i] = val.lower() in _TRUE_STRINGS
+            else:
+                truthy[i] = bool(val)
+            try:
+                num[i] = float(val)
+            except (TypeError, ValueError):
+                pass
+        self.present, self.num, self.absable, self.truthy, self.obj = present, num, absable, truthy, obj
+
+    def numeric(self, use_abs: bool) -> np.ndarray:
+        if not use_abs:
+            return self.num
+        return np.where(self.absable, np.abs(self.num), self.num)
+
+    def objects(self, use_abs: bool) -> np.ndarray:
+        if not use_abs or not self.absable.any():
+            return self.obj
+        out = self.obj.copy()
+        out[self.absable] = [abs(v) for v in out[self.absable]]
+        return out
+
+
+class _Batch:
+    """Rows being evaluated, with normalized columns built on first use."""
+
+    def __init__(self, rows: Sequence[Dict[str, Any]]):
+        self.rows = rows
+        self.n = len(rows)
+        self._columns: Dict[str, _Column] = {}
+
+    def column(self, name: str) -> _Column:
+        col = self._columns.get(name)
+        if col is None:
+            col = _Column([row.get(name) for row in self.rows])
+            self._columns[name] = col
+        return col
+
+    def const(self, value: bool) -> np.ndarray:
+        return np.full(self.n, value, dtype=bool)
+
+
+def _compile_condition(cond: Dict[str, Any]) -> MaskFn:
+    """Compile a leaf condition (mirrors TemplateEngine.evaluate_condition)."""
+    feature = cond.get("feature")
+    op = cond.get("op")
+    value = cond.get("value")
+    value_feature = cond.get("value_feature")
+    use_abs = cond.get("abs", False)
+
+    if feature is None or (op not in _OBJECT_OPS and op not in _NUMERIC_OPS):
+        return lambda batch: batch.const(False)
+
+    if value_feature:
+        def by_feature(batch: _Batch) -> np.ndarray:
+            feat = batch.column(feature)
+            comp = batch.column(value_feature)
+            ok = feat.present & comp.present
+            if op in _NUMERIC_OPS:
+                return ok & _NUMERIC_OPS[op](feat.numeric(use_abs), comp.num)
+            compare = _OBJECT_OPS[op]
+            out = batch.const(False)
+            for i, (left, right) in enumerate(zip(feat.objects(use_abs), comp.obj)):
+                if not ok[i]:
+                    continue
+                if op == "==" and isinstance(right, bool):
+                    out[i] = feat.truthy[i] == right
+                else:
+                    out[i] = compare(left, right)
+            return out
+        return by_feature
+
+    if op in _NUMERIC_OPS:
+        try:
+            comp_num = float(value)
+        except (TypeError, ValueError):
+            return lambda batch: batch.const(False)
+        compare = _NUMERIC_OPS[op]
+        return lambda batch: batch.column(feature).present & compare(
+            batch.column(feature).numeric(use_abs), comp_num
+        )
+
+    if op == "==" and isinstance(value, bool):
+        return lambda batch: batch.column(feature).present & (batch.column(feature).truthy == value)
+
+    compare = _OBJECT_OPS[op]
+
+    def by_value(batch: _Batch) -> np.ndarray:
+        feat = batch.column(feature)
+        out = batch.const(False)
+        idx = np.flatnonzero(feat.present)
+        objs = feat.objects(use_abs)[idx]
+        if op in ("==", "!=") and isinstance(value, (str, int, float)):
+            # Scalar literal: NumPy applies Python ==/!= elementwise over object arrays
+            out[idx] = np.asarray(objs == value if op == "==" else objs != value, dtype=bool)
+        else:
+            out[idx] = [compare(v, value) for v in objs]
+        return out
+    return by_value
+
+
+def _compile_gate(gate: Dict[str, Any]) -> MaskFn:
+    """Compile an all/any/not gate (mirrors TemplateEngine.evaluate_gate)."""
+    if "all" in gate:
+        parts = [_compile_item(item) for item in gate["all"]]
+
+        def all_of(batch: _Batch) -> np.ndarray:
+            mask = batch.const(True)
+            for part in parts:
+                mask &= part(batch)
+            return mask
+        return all_of
+    elif "any" in gate:
+        parts = [_compile_item(item) for item in gate["any"]]
+
+        def any_of(batch: _Batch) -> np.ndarray:
+            mask = batch.const(False)
+            for part in parts:
+                mask |= part(batch)
+            return mask
+        return any_of
+    elif "not" in gate:
+        inner = _compile_item(gate["not"])
+        return lambda batch: ~inner(batch)
+    else:
+        return _compile_condition(gate)
+
+
+def _compile_item(item: Dict[str, Any]) -> MaskFn:
+    if "all" in item or "any" in item or "not" in item:
+        return _compile_gate(item)
+    return _compile_condition(item)
+
+
+def _compile_when(when: Dict[str, Any]) -> MaskFn:
+    """Booster/penalty condition (mirrors TemplateEngine._evaluate_booster_condition)."""
+    if "all" in when or "any" in when:
+        return _compile_gate(when)
+    return _compile_condition(when)
+
+
+class _CompiledTemplate:
+    """Gate mask and strength adjustments for one template."""
+
+    def __init__(self, name: str, template: Dict[str, Any], global_config: Dict[str, Any]):
+        self.name = name
+        self.template = template
+        self.gate = _compile_gate(template.get("gate", {}))
+        self.base_weight = template.get("base_weight", 10)
+
+        strength_config = template.get("strength", {})
+        self.base = strength_config.get("base", 50)
+        global_adj = global_config.get("global_strength_adjustments", {})
+
+        # (component name, mask, signed points) in row-wise application order
+        self.adjustments = (
+            [(b["name"], _compile_when(b["when"]), b["points"]) for b in strength_config.get("add", [])]
+            + [(p["name"], _compile_when(p["when"]), -p["points"]) for p in strength_config.get("subtract", [])]
+            + [(f"global:{a['name']}", _compile_when(a["when"]), a["points"]) for a in global_adj.get("add", [])]
+            + [(f"global:{a['name']}", _compile_when(a["when"]), -a["points"]) for a in global_adj.get("subtract", [])]
+        )
+        self.evidence_fields = template.get("evidence_fields", [])
+
+
+class CompiledTemplateEngine:
+    """Vectorized evaluator built from a TemplateEngine's configuration."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.version = engine.version
+        self.templates = [
+            _CompiledTemplate(name, template, engine.global_config)
+            for name, template in engine.templates.items()
+        ]
+
+    @staticmethod
+    def _rows(rows: Rows) -> Sequence[Dict[str, Any]]:
+        if isinstance(rows, pd.DataFrame):
+            return rows.to_dict("records")
+        return rows
+
+    def gate_masks(self, rows: Rows) -> Dict[str, np.ndarray]:
+        """Template name -> boolean mask of rows whose gate fires."""
+        batch = _Batch(self._rows(rows))
+        return {t.name: t.gate(batch) for t in self.templates}
+
+    def strength_scores(self, rows: Rows) -> Dict[str, np.ndarray]:
+        """Template name -> clamped strength for every row (fired or not)."""
+        batch = _Batch(self._rows(rows))
+        return {t.name: self._scores(t, batch)[0] for t in self.templates}
+
+    @staticmethod
+    def _scores(template: _CompiledTemplate, batch: _Batch):
+        masks = [mask(batch) for _, mask, _ in template.adjustments]
+        points = [template.base] + [p for _, _, p in template.adjustments]
+        dtype = float if any(isinstance(p, float) for p in points) else np.int64
+        score = np.full(batch.n, template.base, dtype=dtype)
+        for m, (_, _, p) in zip(masks, template.adjustments):
+            score[m] += p
+        return np.clip(score, 0, 100), score, masks
+
+    def evaluate_rows(self, rows: Rows) -> List[List[Dict[str, Any]]]:
+        """
+        Evaluate all templates against all rows.
+
+        Returns:
+            One list of signal results per row, exactly as TemplateEngine.evaluate
+        """
+        rows = self._rows(rows)
+        batch = _Batch(rows)
+        results: List[List[Dict[str, Any]]] = [[] for _ in range(batch.n)]
+
+        for template in self.templates:
+            fired = np.flatnonzero(template.gate(batch))
+            if len(fired) == 0:
+                continue
+            _, raw, masks = self._scores(template, batch)
+
+            for i in fired:
+                row = rows[i]
+                components = {"base": template.base}
+                for (name, _, points), mask in zip(template.adjustments, masks):
+                    if mask[i]:
+                        components[name] = points
+                score = raw[i].item()
+                results[i].append({
+                    "template_name": template.name,
+                    "direction": get_direction(template.name, row),
+                    "strength": max(0, min(100, score)),
+                    "strength_components": components,
+                    "evidence": self.engine.extract_evidence(template.template, row),
+                    "base_weight": template.base_weight,
+                })
+
+        return results
+
+
+def diff_against_rowwise(engine, rows: Rows, compiled: Optional[CompiledTemplateEngine] = None,
+                         limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Differential check: evaluate rows with both engines and return up to
+    `limit` rows whose results differ (empty list when identical).
+    """
+    compiled = compiled or CompiledTemplateEngine(engine)
+    rows = CompiledTemplateEngine._rows(rows)
+    mismatches = []
+    for i, (fast, row) in enumerate(zip(compiled.evaluate_rows(rows), rows)):
+        slow = engine.evaluate(row)
+        if fast != slow:
+            mismatches.append({"index": i, "asset_id": row.get("asset_id"), "compiled": fast, "rowwise": slow})
+            if len(mismatches) >= limit:
+                break
+    return mismatches
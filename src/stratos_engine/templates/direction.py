@@ -4,7 +4,7 @@ Direction is computed from features at evaluation time, not hardcoded in templat
 This allows the same template to fire as bullish or bearish depending on market conditions.
 """
 
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, FrozenSet
 
 
 def _safe_get(row: Dict[str, Any], key: str, default: Any = None) -> Any:
@@ -160,6 +160,26 @@ DIRECTION_RULES: Dict[str, Callable[[Dict[str, Any]], str]] = {
 }
 
 
+# Features each direction rule reads (keep in sync with the functions above);
+# loaders use these to build their SELECT lists
+DIRECTION_FEATURES: Dict[str, FrozenSet[str]] = {
+    "momentum_inflection": frozenset({"accel_turn_up", "accel_turn_down", "droc_20"}),
+    "breakout_participation": frozenset({"breakout_up_20", "breakout_down_20", "return_1d"}),
+    "trend_ignition": frozenset({"trend_regime", "ma_slope_20", "roc_20"}),
+    "squeeze_release": frozenset({"roc_5", "macd_histogram", "return_1d"}),
+    "rs_breakout": frozenset(),
+    "volatility_shock": frozenset({"return_1d", "gap_up", "gap_down"}),
+    "exhaustion": frozenset({"rsi_14"}),
+    "trend_breakdown": frozenset(),
+    "trend_leadership": frozenset(),
+}
+
+
+def direction_features(template_name: str) -> FrozenSet[str]:
+    """Features read by the direction rule of a template (empty if it has none)."""
+    return DIRECTION_FEATURES.get(template_name, frozenset())
+
+
 def get_direction(template_name: str, row: Dict[str, Any]) -> str:
     """Get direction for a template given feature row."""
     rule_fn = DIRECTION_RULES.get(template_name)
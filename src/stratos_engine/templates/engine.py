@@ -1,12 +1,15 @@
 """Template evaluation engine for signal detection."""
 
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import yaml
 import structlog
 
-from .direction import get_direction
+from .direction import direction_features, get_direction
+
+if TYPE_CHECKING:
+    from .compiled import CompiledTemplateEngine
 
 logger = structlog.get_logger()
 
@@ -14,6 +17,18 @@ logger = structlog.get_logger()
 DEFAULT_TEMPLATE_PATH = Path(__file__).parent / "v32.yaml"
 
 
+def condition_features(node: Dict[str, Any]) -> Set[str]:
+    """Features referenced by a condition or an all/any/not gate (feature and value_feature)."""
+    if not isinstance(node, dict):
+        return set()
+    if "all" in node or "any" in node:
+        items = node.get("all", node.get("any")) or []
+        return set().union(*(condition_features(item) for item in items))
+    if "not" in node:
+        return condition_features(node["not"])
+    return {name for name in (node.get("feature"), node.get("value_feature")) if name}
+
+
 class TemplateEngine:
     """Evaluates signal templates against feature data."""
     
@@ -241,6 +256,39 @@ class TemplateEngine:
         
         return results
     
+    def feature_names(self, template_names: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Every feature evaluate() can read for the given templates (default: all):
+        gates, boosters, penalties, global adjustments, evidence fields and
+        direction rules. Loaders select only these columns.
+        """
+        names = set(self.templates) if template_names is None else set(template_names)
+        
+        features: Set[str] = set()
+        global_adj = self.global_config.get("global_strength_adjustments", {})
+        for adj in global_adj.get("add", []) + global_adj.get("subtract", []):
+            features |= condition_features(adj["when"])
+        
+        for name in names:
+            template = self.templates[name]
+            features |= condition_features(template.get("gate", {}))
+            strength_config = template.get("strength", {})
+            for item in strength_config.get("add", []) + strength_config.get("subtract", []):
+                features |= condition_features(item["when"])
+            features.update(template.get("evidence_fields", []))
+            features |= direction_features(name)
+        return features
+    
+    def compile(self) -> "CompiledTemplateEngine":
+        """
+        Compile templates into a vectorized evaluator.
+
+        The result evaluates many rows at once with the same output as calling
+        evaluate() on each row.
+        """
+        from .compiled import CompiledTemplateEngine
+        return CompiledTemplateEngine(self)
+    
     def compute_attention_score(self, signals: List[Dict[str, Any]]) -> float:
         """
         Compute attention score from fired signals.
@@ -12,8 +12,8 @@ class ChartAnalyzer:
     def __init__(self, window_size: int = 60):
         self.window_size = window_size
 
-    def _prepare_data(self, ohlcv_data: List[Any]) -> Optional[pd.DataFrame]:
-        """Converts OHLCV list to DataFrame and calculates log returns and volume changes.
+    def _window(self, ohlcv_data: List[Any]) -> Optional[pd.DataFrame]:
+        """Last window_size bars as a numeric DataFrame (None if there are fewer).
         
         Handles both formats:
         - List of dicts: [{"date": ..., "open": ..., ...}]
@@ -33,7 +33,13 @@ class ChartAnalyzer:
         for col in ['open', 'high', 'low', 'close', 'volume']:
             df[col] = pd.to_numeric(df[col], errors='coerce')
         
-        df = df.sort_values(by='date').tail(self.window_size)
+        return df.sort_values(by='date').tail(self.window_size)
+
+    def _prepare_data(self, ohlcv_data: List[Any]) -> Optional[pd.DataFrame]:
+        """Converts OHLCV list to DataFrame and calculates log returns and volume changes."""
+        df = self._window(ohlcv_data)
+        if df is None:
+            return None
         
         # 1. Calculate log returns
         df['log_return'] = np.log(df['close'].astype(float) / df['close'].shift(1).astype(float))
@@ -118,5 +124,55 @@ class ChartAnalyzer:
         # Clamp to [-1, 1] due to potential floating point errors
         return np.clip(similarity, -1.0, 1.0).item()
 
+    def calculate_chart_vector(self, ohlcv_data: List[Any]) -> Optional[List[float]]:
+        """
+        Price/volume path of the window, stored with each review for the
+        skip-unchanged gate: log(close / latest close) per bar, then
+        log(volume / median volume) per bar (missing volume = median).
+        """
+        df = self._window(ohlcv_data)
+        if df is None:
+            return None
+        closes = df['close'].to_numpy(dtype=float)
+        if np.isnan(closes).any() or (closes <= 0).any():
+            return None
+        volumes = df['volume'].to_numpy(dtype=float)
+        volumes = np.where(volumes > 0, volumes, np.nan)
+        median_volume = np.nanmedian(volumes) if not np.isnan(volumes).all() else 1.0
+        volume_path = np.nan_to_num(np.log(volumes / median_volume), nan=0.0)
+        vector = np.concatenate([np.log(closes / closes[-1]), volume_path])
+        return np.round(vector, 5).tolist()
+
+    @staticmethod
+    def chart_vector_similarity(vec_today: Optional[List[float]], vec_prev: Optional[List[float]]) -> Optional[float]:
+        """
+        Cosine similarity between today's chart vector and the previous one
+        carried forward one bar unchanged (flat close, median volume).
+
+        Consecutive windows overlap in all but one bar, so comparing them
+        position by position measures the one-bar shift rather than the day;
+        against the flat projection only today's bar (its move and volume
+        relative to the window) lowers the similarity.
+        """
+        if not vec_today or not vec_prev or len(vec_today) != len(vec_prev) or len(vec_today) % 2:
+            return None
+        n = len(vec_today) // 2
+        prev = np.asarray(vec_prev, dtype=float)
+        projected = np.concatenate([prev[1:n], [0.0], prev[n + 1:], [0.0]])
+        today = np.asarray(vec_today, dtype=float)
+
+        def zscore(halves: np.ndarray) -> np.ndarray:
+            parts = []
+            for part in (halves[:n], halves[n:]):
+                std = part.std()
+                parts.append((part - part.mean()) / (std if std > 0 else 1.0))
+            return np.concatenate(parts)
+
+        a, b = zscore(today), zscore(projected)
+        norm = np.linalg.norm(a) * np.linalg.norm(b)
+        if norm == 0:
+            return 1.0 if np.allclose(a, b) else 0.0
+        return np.clip(np.dot(a, b) / norm, -1.0, 1.0).item()
+
 # Set the AI review version
 AI_REVIEW_VERSION = "v2.0"
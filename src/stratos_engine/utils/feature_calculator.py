@@ -23,6 +23,9 @@ Usage:
     # Daily incremental update
     python feature_calculator_v2.py --incremental
     
+    # Daily incremental update from persisted rolling state
+    python feature_calculator_v2.py --incremental --streaming
+    
     # Single asset for testing
     python feature_calculator_v2.py --asset-id 123 --start-date 2024-01-01
 
@@ -32,6 +35,8 @@ Requirements:
 Environment Variables:
     SUPABASE_URL - Your Supabase project URL
     SUPABASE_KEY - Your Supabase service role key (not anon key)
+    DATABASE_URL - Optional Postgres connection string; when set, features are
+                   written with COPY + a set-based merge instead of REST upserts
 """
 
 import os
@@ -43,6 +48,9 @@ import numpy as np
 import pandas as pd
 from supabase import create_client, Client
 
+from ..calendar import calendar_for
+from ..lookback import recent_bars, recent_bars_by_asset
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -57,17 +65,30 @@ CALC_VERSION = "2.0.0"
 # Lookback requirements
 MAX_LOOKBACK = 300      # Need 252 for yearly returns + buffer
 MIN_LOOKBACK = 60       # Minimum for basic features (tiered approach)
-EQUITY_CALENDAR_MULTIPLIER = 2.0  # Equities: 300 bars ≈ 600 calendar days
-CRYPTO_CALENDAR_MULTIPLIER = 1.2  # Crypto trades 7 days/week
+LOOKBACK_BUFFER_SESSIONS = 20  # Extra sessions fetched to cover missing bars
+
+# Streaming mode: rolling state older than this is treated as stale
+MAX_STATE_AGE_DAYS = 10
 
 
 class FeatureCalculator:
     """Computes technical features for assets."""
     
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize with Supabase credentials."""
+    def __init__(self, supabase_url: str, supabase_key: str, database_url: Optional[str] = None):
+        """Initialize with Supabase credentials (and optionally a direct Postgres URL for bulk writes)."""
         self.supabase: Client = create_client(supabase_url, supabase_key)
         self.benchmark_cache: Dict[int, pd.DataFrame] = {}
+        self.database_url = database_url or os.environ.get('DATABASE_URL')
+        self._pg_conn = None
+        self._state_store = None
+    
+    @property
+    def state_store(self):
+        """Rolling feature state store (streaming mode)."""
+        if self._state_store is None:
+            from .feature_state import FeatureStateStore
+            self._state_store = FeatureStateStore(self.supabase)
+        return self._state_store
     
     # =========================================================================
     # P0.1 FIX: Paginated Supabase fetch (handles >1000 rows)
@@ -92,6 +113,8 @@ class FeatureCalculator:
                     query = query.lte(key[:-5], value)
                 elif key.endswith('__eq'):
                     query = query.eq(key[:-4], value)
+                elif key.endswith('__in'):
+                    query = query.in_(key[:-4], value)
                 else:
                     query = query.eq(key, value)
             
@@ -135,18 +158,21 @@ class FeatureCalculator:
         Fetch OHLCV bars for an asset with proper pagination.
         
         P0.1 FIX: Uses paginated fetch to handle >1000 rows.
-        P2.2 FIX: Uses asset-type-aware calendar multiplier.
+        P2.2 FIX: Sizes the lookback in sessions of the asset's exchange calendar.
+        
+        With DATABASE_URL set, the lookback is exactly MAX_LOOKBACK +
+        LOOKBACK_BUFFER_SESSIONS bars before start_date (stratos_engine.lookback).
         """
-        # Determine calendar multiplier based on asset type
-        if asset_type == 'crypto':
-            multiplier = CRYPTO_CALENDAR_MULTIPLIER
-        else:
-            multiplier = EQUITY_CALENDAR_MULTIPLIER
+        if self.database_url:
+            lookback = MAX_LOOKBACK + LOOKBACK_BUFFER_SESSIONS if include_lookback else 0
+            return self._frame_from_lookback(
+                recent_bars(self._bulk_conn(), [asset_id], end_date, lookback, start=start_date)
+            )
         
         # Extend start date for lookback period
         if include_lookback:
-            lookback_days = int(MAX_LOOKBACK * multiplier) + 50
-            fetch_start = start_date - timedelta(days=lookback_days)
+            calendar = calendar_for(asset_type)
+            fetch_start = calendar.previous_session(start_date, MAX_LOOKBACK + LOOKBACK_BUFFER_SESSIONS)
         else:
             fetch_start = start_date
         
@@ -176,6 +202,28 @@ class FeatureCalculator:
             
         return df
     
+    @staticmethod
+    def _frame_from_lookback(bars: pd.DataFrame) -> pd.DataFrame:
+        """recent_bars output in get_bars' layout (date as datetime.date, no asset_id)."""
+        if bars.empty:
+            return pd.DataFrame()
+        df = bars.drop(columns='asset_id').reset_index(drop=True)
+        df['date'] = df['date'].dt.date
+        return df
+    
+    def get_bars_many(self, asset_ids: List[int], start_date: date, end_date: date) -> Dict[int, pd.DataFrame]:
+        """
+        get_bars for many assets in one lookback query (requires DATABASE_URL).
+        
+        Returns:
+            {asset_id: bars}; assets without bars are absent
+        """
+        lookback = MAX_LOOKBACK + LOOKBACK_BUFFER_SESSIONS
+        by_asset = recent_bars_by_asset(self._bulk_conn(), asset_ids, end_date, lookback, start=start_date)
+        for bars in by_asset.values():
+            bars['date'] = bars['date'].dt.date
+        return by_asset
+    
     def get_benchmark_bars(self, benchmark_asset_id: int, start_date: date, 
                            end_date: date, asset_type: str = 'equity') -> pd.DataFrame:
         """Get benchmark bars with caching."""
@@ -577,11 +625,59 @@ class FeatureCalculator:
         
         return features
     
+    def _bulk_conn(self):
+        """Direct Postgres connection used by the COPY write path and lookback queries."""
+        if self._pg_conn is None or self._pg_conn.closed:
+            import psycopg2
+            self._pg_conn = psycopg2.connect(self.database_url)
+        return self._pg_conn
+    
+    def _bulk_write_features(self, features: pd.DataFrame, data_vendor: str = 'computed',
+                             asset_id: Optional[int] = None) -> int:
+        """
+        Write features via COPY into a staging table and one
+        INSERT ... ON CONFLICT (asset_id, date) merge.
+        
+        features must carry an asset_id column unless asset_id is given.
+        """
+        from ..bulk_writer import bulk_upsert
+        
+        frame = features.drop(columns=['attention_score_components'], errors='ignore').copy()
+        if asset_id is not None:
+            frame['asset_id'] = asset_id
+        frame['feature_version'] = FEATURE_VERSION
+        frame['calc_version'] = CALC_VERSION
+        frame['data_vendor'] = data_vendor
+        key_cols = ['asset_id', 'date', 'feature_version', 'calc_version', 'data_vendor']
+        frame = frame[key_cols + [c for c in frame.columns if c not in key_cols]]
+        
+        try:
+            return bulk_upsert(self._bulk_conn(), 'daily_features', frame, ['asset_id', 'date']).rows
+        except Exception as e:
+            logger.error(f"Error bulk writing {len(frame)} feature rows: {e}")
+            raise
+    
+    def write_features_many(self, features_by_asset: Dict[int, pd.DataFrame],
+                            data_vendor: str = 'computed') -> Dict[int, int]:
+        """Write features for several assets (one COPY when DATABASE_URL is set)."""
+        frames = {a: f for a, f in features_by_asset.items() if not f.empty}
+        if not frames:
+            return {}
+        if self.database_url:
+            combined = pd.concat(list(frames.values()), ignore_index=True).copy()  # consolidate blocks
+            combined['asset_id'] = np.repeat(list(frames), [len(f) for f in frames.values()])
+            self._bulk_write_features(combined, data_vendor)
+            return {a: len(f) for a, f in frames.items()}
+        return {a: self.write_features(a, f, data_vendor) for a, f in frames.items()}
+    
     def write_features(self, asset_id: int, features: pd.DataFrame, data_vendor: str = 'computed') -> int:
         """Write computed features to daily_features table."""
         if features.empty:
             return 0
         
+        if self.database_url:
+            return self._bulk_write_features(features, data_vendor, asset_id=asset_id)
+        
         # Get list of valid columns from the features DataFrame
         # Exclude columns that aren't in the database schema
         exclude_cols = {'date', 'attention_score_components'}  # JSONB handled separately
@@ -644,9 +740,14 @@ class FeatureCalculator:
         start_date: date,
         end_date: date,
         asset_type: str = 'equity',
-        data_vendor: str = 'computed'
+        data_vendor: str = 'computed',
+        save_state: bool = False
     ) -> int:
-        """Process a single asset: fetch bars, compute features, write to DB."""
+        """
+        Process a single asset: fetch bars, compute features, write to DB.
+        
+        With save_state, also seeds the rolling state used by streaming mode.
+        """
         # Get bars
         bars = self.get_bars(asset_id, start_date, end_date, asset_type=asset_type)
         if bars.empty:
@@ -664,6 +765,10 @@ class FeatureCalculator:
         features = self.compute_features(bars, benchmark_bars, asset_type=asset_type)
         if features.empty:
             return 0
+        
+        if save_state:
+            from .feature_state import seed_state
+            state = seed_state(asset_id, bars, features, asset_type, benchmark_bars, benchmark_asset_id)
             
         # Filter to requested date range (remove lookback period)
         features = features[features['date'] >= start_date]
@@ -671,15 +776,80 @@ class FeatureCalculator:
         
         # Write to database
         written = self.write_features(asset_id, features, data_vendor)
+        
+        # Save state only once its rows are written
+        if save_state and state is not None:
+            self.state_store.save([state])
         return written
     
+    def process_assets_panel(
+        self,
+        assets: List[Dict[str, Any]],
+        start_date: date,
+        end_date: date,
+        data_vendor: str = 'computed'
+    ) -> Dict[int, int]:
+        """
+        Process a chunk of assets in panel mode: fetch bars, compute features for
+        all of them in one vectorized pass, write to DB.
+        
+        Args:
+            assets: Dicts with asset_id, asset_type and benchmark_asset_id
+            
+        Returns:
+            Mapping of asset_id -> rows written
+        """
+        from .feature_panel import build_panel, compute_panel_features, split_by_asset
+        
+        bars_by_asset: Dict[int, pd.DataFrame] = {}
+        benchmarks: Dict[int, pd.DataFrame] = {}
+        asset_types: Dict[int, str] = {}
+        
+        prefetched: Dict[int, pd.DataFrame] = {}
+        if self.database_url:
+            # One lookback query for the chunk and its benchmarks
+            benchmark_ids = {a['benchmark_asset_id'] for a in assets if a.get('benchmark_asset_id')}
+            benchmark_ids -= set(self.benchmark_cache)
+            prefetched = self.get_bars_many(sorted({a['asset_id'] for a in assets} | benchmark_ids),
+                                            start_date, end_date)
+            for benchmark_id in benchmark_ids:
+                self.benchmark_cache[benchmark_id] = prefetched.get(benchmark_id, pd.DataFrame())
+        
+        for asset in assets:
+            asset_id = asset['asset_id']
+            asset_types[asset_id] = asset.get('asset_type') or 'equity'
+            if self.database_url:
+                bars = prefetched.get(asset_id, pd.DataFrame())
+            else:
+                bars = self.get_bars(asset_id, start_date, end_date, asset_type=asset_types[asset_id])
+            if bars.empty:
+                logger.warning(f"No bars for asset {asset_id}")
+                continue
+            bars_by_asset[asset_id] = bars
+            if asset.get('benchmark_asset_id'):
+                benchmarks[asset_id] = self.get_benchmark_bars(
+                    asset['benchmark_asset_id'], start_date, end_date,
+                    asset_type=asset_types[asset_id]
+                )
+        
+        features = compute_panel_features(build_panel(bars_by_asset), asset_types, benchmarks)
+        if features.empty:
+            return {}
+        
+        # Filter to requested date range (remove lookback period)
+        features = features[(features['date'] >= start_date) & (features['date'] <= end_date)]
+        
+        return self.write_features_many(split_by_asset(features), data_vendor)
+    
     def backfill(
         self,
         start_date: date,
         end_date: Optional[date] = None,
         asset_type: Optional[str] = None,
         asset_ids: Optional[List[int]] = None,
-        batch_size: int = 100
+        batch_size: int = 100,
+        panel: bool = False,
+        panel_size: int = 500
     ) -> Dict[str, Any]:
         """
         Backfill features for multiple assets.
@@ -690,6 +860,9 @@ class FeatureCalculator:
             asset_type: Filter by asset type ('crypto', 'equity')
             asset_ids: Specific asset IDs to process (overrides asset_type)
             batch_size: Number of assets to process before logging progress
+            panel: Compute features for `panel_size` assets at a time in one
+                vectorized pass instead of one asset at a time
+            panel_size: Assets per panel chunk (bounds peak memory)
             
         Returns:
             Summary statistics
@@ -710,7 +883,11 @@ class FeatureCalculator:
             assets = self.get_active_assets(asset_type)
             
         total_assets = len(assets)
-        logger.info(f"Starting backfill for {total_assets} assets from {start_date} to {end_date}")
+        logger.info(f"Starting backfill for {total_assets} assets from {start_date} to {end_date}"
+                    f"{' (panel mode)' if panel else ''}")
+        
+        if panel:
+            return self._backfill_panel(assets, start_date, end_date, panel_size)
         
         # Process assets
         processed = 0
@@ -762,6 +939,250 @@ class FeatureCalculator:
             'total_rows': total_rows,
             'errors': errors
         }
+    
+    def _backfill_panel(
+        self,
+        assets: pd.DataFrame,
+        start_date: date,
+        end_date: date,
+        panel_size: int
+    ) -> Dict[str, Any]:
+        """Panel-mode backfill: same summary as backfill(), computed chunk by chunk."""
+        records = self._asset_records(assets)
+        
+        total_assets = len(records)
+        processed = 0
+        total_rows = 0
+        errors = []
+        skipped = 0
+        
+        for i in range(0, total_assets, panel_size):
+            chunk = records[i:i + panel_size]
+            try:
+                written = self.process_assets_panel(chunk, start_date, end_date)
+            except Exception as e:
+                logger.error(f"Error processing panel chunk {i // panel_size}: {e}")
+                errors.extend(
+                    {'asset_id': a['asset_id'], 'symbol': a['symbol'], 'error': str(e)} for a in chunk
+                )
+                continue
+            
+            for asset in chunk:
+                rows = written.get(asset['asset_id'], 0)
+                if rows > 0:
+                    total_rows += rows
+                    processed += 1
+                else:
+                    skipped += 1
+            
+            logger.info(f"Progress: {processed + skipped + len(errors)}/{total_assets} assets, "
+                       f"{processed} processed, {skipped} skipped, {total_rows} rows written")
+        
+        logger.info(f"Backfill complete: {processed}/{total_assets} processed, "
+                   f"{skipped} skipped, {total_rows} rows, {len(errors)} errors")
+        
+        return {
+            'total_assets': total_assets,
+            'processed': processed,
+            'skipped': skipped,
+            'total_rows': total_rows,
+            'errors': errors
+        }
+
+    
+    @staticmethod
+    def _asset_records(assets: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Asset rows as dicts with a clean integer (or None) benchmark_asset_id."""
+        records = []
+        for _, asset in assets.iterrows():
+            benchmark_id = asset.get('benchmark_asset_id')
+            if benchmark_id is not None and not (isinstance(benchmark_id, float) and np.isnan(benchmark_id)):
+                benchmark_id = int(benchmark_id)
+            else:
+                benchmark_id = None
+            records.append({
+                'asset_id': asset['asset_id'],
+                'asset_type': asset.get('asset_type', 'equity'),
+                'symbol': asset.get('symbol', 'unknown'),
+                'benchmark_asset_id': benchmark_id,
+            })
+        return records
+    
+    # =========================================================================
+    # Streaming mode: update from persisted rolling state
+    # =========================================================================
+    def stream_update(
+        self,
+        end_date: Optional[date] = None,
+        asset_type: Optional[str] = None,
+        batch_size: int = 100,
+        data_vendor: str = 'computed',
+        chunk_size: int = 50
+    ) -> Dict[str, Any]:
+        """
+        Daily update that reads only the bars after each asset's saved rolling
+        state and advances the state bar by bar (see feature_state).
+        
+        Assets whose state is missing, stale (older than MAX_STATE_AGE_DAYS, other
+        calc_version, changed asset type/benchmark) or that hit a bar the state
+        can't absorb fall back to a full recompute, which re-seeds their state.
+        
+        Returns:
+            Summary statistics (as backfill(), plus streamed/recomputed counts)
+        """
+        if end_date is None:
+            end_date = date.today()
+        
+        records = self._asset_records(self.get_active_assets(asset_type))
+        states = self.state_store.load([a['asset_id'] for a in records])
+        
+        streaming: List[Tuple[Dict[str, Any], Any]] = []
+        recompute: List[Dict[str, Any]] = []
+        resume_from: Dict[int, date] = {}  # last date with features, for recomputes
+        skipped = 0
+        for asset in records:
+            state = states.get(asset['asset_id'])
+            if state is not None:
+                resume_from[asset['asset_id']] = state.as_of_date
+            if state is not None and state.as_of_date >= end_date:
+                skipped += 1
+            elif (state is None
+                  or (end_date - state.as_of_date).days > MAX_STATE_AGE_DAYS
+                  or state.asset_type != asset['asset_type']
+                  or state.benchmark_asset_id != asset['benchmark_asset_id']):
+                recompute.append(asset)
+            else:
+                streaming.append((asset, state))
+        
+        total_assets = len(records)
+        logger.info(f"Streaming update to {end_date}: {len(streaming)} assets from state, "
+                    f"{len(recompute)} need a full recompute, {skipped} already current")
+        
+        processed = 0
+        total_rows = 0
+        errors = []
+        streamed = 0
+        updated_states = []
+        
+        # Benchmark closes since the oldest state (plus slack for the forward fill)
+        benchmark_closes: Dict[int, pd.DataFrame] = {}
+        if streaming:
+            oldest = min(state.as_of_date for _, state in streaming)
+            for benchmark_id in {a['benchmark_asset_id'] for a, _ in streaming if a['benchmark_asset_id']}:
+                benchmark_closes[benchmark_id] = self.get_bars(
+                    benchmark_id, oldest - timedelta(days=MAX_STATE_AGE_DAYS), end_date,
+                    include_lookback=False
+                )
+        
+        for i in range(0, len(streaming), chunk_size):
+            chunk = streaming[i:i + chunk_size]
+            since = min(state.as_of_date for _, state in chunk) + timedelta(days=1)
+            data = self._paged_select(
+                'daily_bars',
+                'asset_id, date, open, high, low, close, volume',
+                {
+                    'asset_id__in': [a['asset_id'] for a, _ in chunk],
+                    'date__gte': since.isoformat(),
+                    'date__lte': end_date.isoformat()
+                },
+                order_by='date'
+            )
+            new_bars: Dict[int, List[Dict]] = {}
+            for bar in data:
+                new_bars.setdefault(bar['asset_id'], []).append(
+                    dict(bar, date=date.fromisoformat(str(bar['date'])[:10]))
+                )
+            
+            chunk_rows: Dict[int, pd.DataFrame] = {}
+            chunk_states = []
+            for asset, state in chunk:
+                asset_id = asset['asset_id']
+                bars = sorted((b for b in new_bars.get(asset_id, []) if b['date'] > state.as_of_date),
+                              key=lambda b: b['date'])
+                if not bars:
+                    skipped += 1
+                    continue
+                
+                bench = benchmark_closes.get(asset['benchmark_asset_id'])
+                rows = []
+                for bar in bars:
+                    benchmark_close = None
+                    if bench is not None and not bench.empty:
+                        known = bench[bench['date'] <= bar['date']]
+                        if not known.empty:
+                            benchmark_close = float(known['close'].iloc[-1])
+                    row = state.update(bar, benchmark_close)
+                    if row is None:
+                        break
+                    rows.append(row)
+                
+                if len(rows) < len(bars):
+                    logger.info(f"Asset {asset_id}: bar on {bars[len(rows)]['date']} can't be applied "
+                                f"from state, recomputing")
+                    recompute.append(asset)
+                    continue
+                
+                chunk_rows[asset_id] = pd.DataFrame(rows)
+                chunk_states.append((asset, state))
+            
+            try:
+                total_rows += sum(self.write_features_many(chunk_rows, data_vendor).values())
+                processed += len(chunk_states)
+                streamed += len(chunk_states)
+                updated_states.extend(state for _, state in chunk_states)
+            except Exception as e:
+                logger.error(f"Error writing streamed features for chunk {i // chunk_size}: {e}")
+                errors.extend(
+                    {'asset_id': a['asset_id'], 'symbol': a['symbol'], 'error': str(e)} for a, _ in chunk_states
+                )
+            
+            logger.info(f"Progress: {min(i + chunk_size, len(streaming))}/{len(streaming)} streamed assets, "
+                        f"{total_rows} rows written")
+        
+        self.state_store.save(updated_states)
+        
+        recomputed = 0
+        for n, asset in enumerate(recompute, 1):
+            asset_id = asset['asset_id']
+            start_date = end_date - timedelta(days=1)
+            if asset_id in resume_from:
+                start_date = min(start_date, resume_from[asset_id] + timedelta(days=1))
+            try:
+                rows = self.process_asset(
+                    asset_id=asset_id,
+                    benchmark_asset_id=asset['benchmark_asset_id'],
+                    start_date=start_date,
+                    end_date=end_date,
+                    asset_type=asset['asset_type'],
+                    data_vendor=data_vendor,
+                    save_state=True
+                )
+                if rows > 0:
+                    total_rows += rows
+                    processed += 1
+                    recomputed += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                logger.error(f"Error processing asset {asset_id} ({asset['symbol']}): {e}")
+                errors.append({'asset_id': asset_id, 'symbol': asset['symbol'], 'error': str(e)})
+            
+            if n % batch_size == 0:
+                logger.info(f"Progress: {n}/{len(recompute)} recomputed assets, {total_rows} rows written")
+        
+        logger.info(f"Streaming update complete: {processed}/{total_assets} processed "
+                    f"({streamed} from state, {recomputed} recomputed), {skipped} skipped, "
+                    f"{total_rows} rows, {len(errors)} errors")
+        
+        return {
+            'total_assets': total_assets,
+            'processed': processed,
+            'skipped': skipped,
+            'total_rows': total_rows,
+            'errors': errors,
+            'streamed': streamed,
+            'recomputed': recomputed
+        }
 
 
 def main():
@@ -775,6 +1196,9 @@ def main():
                        help='Filter by asset type')
     parser.add_argument('--asset-id', type=int, help='Process single asset')
     parser.add_argument('--batch-size', type=int, default=100, help='Batch size for progress logging')
+    parser.add_argument('--panel', action='store_true', help='Vectorized panel mode (all assets per chunk in one pass)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='With --incremental: update from persisted rolling state (full recompute fallback)')
     
     args = parser.parse_args()
     
@@ -816,6 +1240,15 @@ def main():
         )
         logger.info(f"Wrote {rows} feature rows")
         
+    elif args.incremental and args.streaming:
+        # Streaming mode - only bars newer than each asset's rolling state
+        result = calculator.stream_update(
+            end_date=end_date,
+            asset_type=args.asset_type,
+            batch_size=args.batch_size
+        )
+        logger.info(f"Streaming update complete: {result}")
+        
     elif args.incremental:
         # Incremental mode - just yesterday
         start_date = date.today() - timedelta(days=1)
@@ -824,7 +1257,8 @@ def main():
             start_date=start_date,
             end_date=end_date,
             asset_type=args.asset_type,
-            batch_size=args.batch_size
+            batch_size=args.batch_size,
+            panel=args.panel
         )
         logger.info(f"Incremental update complete: {result}")
         
@@ -834,7 +1268,8 @@ def main():
             start_date=start_date,
             end_date=end_date,
             asset_type=args.asset_type,
-            batch_size=args.batch_size
+            batch_size=args.batch_size,
+            panel=args.panel
         )
         logger.info(f"Backfill complete: {result}")
         
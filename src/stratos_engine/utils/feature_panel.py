@@ -0,0 +1,523 @@
+"""
+Stratos Signal Engine - Panel Feature Engine
+============================================
+
+Computes the same feature set as FeatureCalculator.compute_features, but for a
+whole universe in one pass. Bars for every asset are loaded into (bar x asset)
+blocks and each rolling window runs column-wise across all assets at once, so
+the heavy pandas work happens in a handful of vectorized calls instead of one
+Python-level pass per asset.
+
+Bars are right-aligned by bar position rather than by calendar date: row T-1 is
+each asset's latest bar, row T-2 the one before it, and so on. Assets with
+shorter histories are padded with NaN at the top. This keeps the per-asset
+window semantics exact even when assets trade on different calendars (crypto
+vs equities) or have holes in their history.
+
+Usage:
+    panel = build_panel(bars_by_asset)
+    features = compute_panel_features(panel, asset_types, benchmark_bars)
+
+    # Compare against the per-asset path
+    mismatches = check_parity(calculator, bars_by_asset, asset_types, benchmark_bars)
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .feature_calculator import MAX_LOOKBACK, MIN_LOOKBACK
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+@dataclass
+class BarPanel:
+    """Right-aligned OHLCV block for a set of assets."""
+    asset_ids: List[int]
+    dates: np.ndarray          # (T x N) object array of bar dates, None where padded
+    open: pd.DataFrame         # (T x N) float, columns = asset_ids
+    high: pd.DataFrame
+    low: pd.DataFrame
+    close: pd.DataFrame
+    volume: pd.DataFrame
+    bars_available: pd.Series  # bars per asset, indexed by asset_id
+
+    @property
+    def valid(self) -> np.ndarray:
+        """(T x N) mask of positions that hold a real bar."""
+        positions = np.arange(len(self.close))[:, None]
+        return positions >= (len(self.close) - self.bars_available.to_numpy())[None, :]
+
+
+def build_panel(bars_by_asset: Mapping[int, pd.DataFrame]) -> BarPanel:
+    """
+    Stack per-asset bar frames (as returned by FeatureCalculator.get_bars) into
+    a right-aligned panel. Assets with fewer than MIN_LOOKBACK bars are dropped,
+    matching compute_features which returns nothing for them.
+    """
+    usable = {}
+    for asset_id, bars in bars_by_asset.items():
+        if bars is None or len(bars) < MIN_LOOKBACK:
+            if bars is not None and len(bars) > 0:
+                logger.warning(f"Insufficient data: {len(bars)} bars, need at least {MIN_LOOKBACK}")
+            continue
+        usable[asset_id] = bars
+
+    asset_ids = list(usable.keys())
+    n_assets = len(asset_ids)
+    depth = max((len(b) for b in usable.values()), default=0)
+
+    dates = np.full((depth, n_assets), None, dtype=object)
+    blocks = {col: np.full((depth, n_assets), np.nan) for col in OHLCV_COLUMNS}
+    lengths = np.zeros(n_assets, dtype=np.int64)
+
+    for j, asset_id in enumerate(asset_ids):
+        bars = usable[asset_id]
+        n = len(bars)
+        lengths[j] = n
+        dates[depth - n:, j] = bars['date'].to_numpy()
+        for col in OHLCV_COLUMNS:
+            blocks[col][depth - n:, j] = bars[col].to_numpy(dtype=float)
+
+    frames = {col: pd.DataFrame(blocks[col], columns=asset_ids) for col in OHLCV_COLUMNS}
+    return BarPanel(
+        asset_ids=asset_ids,
+        dates=dates,
+        bars_available=pd.Series(lengths, index=asset_ids),
+        **frames,
+    )
+
+
+def _align_benchmarks(panel: BarPanel, benchmark_bars: Mapping[int, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Forward-fill each asset's benchmark close onto that asset's own bar dates.
+
+    Equivalent to `bench.reindex(asset_dates, method='ffill')` per asset, done
+    with one searchsorted per distinct benchmark frame.
+    """
+    out = np.full(panel.dates.shape, np.nan)
+    by_benchmark: Dict[int, List[int]] = {}
+    frames: Dict[int, pd.DataFrame] = {}
+    for j, asset_id in enumerate(panel.asset_ids):
+        bench = benchmark_bars.get(asset_id)
+        if bench is None or len(bench) == 0:
+            continue
+        by_benchmark.setdefault(id(bench), []).append(j)
+        frames[id(bench)] = bench
+
+    valid = panel.valid
+    for key, cols in by_benchmark.items():
+        bench = frames[key]
+        bench_dates = pd.to_datetime(bench['date']).to_numpy(dtype='datetime64[ns]')
+        bench_close = bench['close'].to_numpy(dtype=float)
+        sub_dates = panel.dates[:, cols]
+        sub_valid = valid[:, cols]
+        lookup = np.full(sub_dates.shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+        lookup[sub_valid] = pd.to_datetime(sub_dates[sub_valid]).to_numpy(dtype='datetime64[ns]')
+        idx = np.searchsorted(bench_dates, lookup, side='right') - 1
+        aligned = np.where(idx >= 0, bench_close[np.clip(idx, 0, None)], np.nan)
+        aligned[~sub_valid] = np.nan
+        out[:, cols] = aligned
+
+    return pd.DataFrame(out, columns=panel.asset_ids)
+
+
+def compute_panel_features(
+    panel: BarPanel,
+    asset_types: Union[str, Mapping[int, str]] = 'equity',
+    benchmark_bars: Optional[Mapping[int, pd.DataFrame]] = None,
+) -> pd.DataFrame:
+    """
+    Compute all 102 technical features for every asset in the panel.
+
+    Args:
+        panel: Right-aligned bars from build_panel
+        asset_types: One asset type for the whole panel, or a mapping of
+            asset_id -> 'crypto'/'equity' for the annualization factor
+        benchmark_bars: Optional mapping of asset_id -> that asset's benchmark
+            bars (assets sharing a benchmark may share the same frame)
+
+    Returns:
+        Long DataFrame with asset_id, date and the same feature columns (in the
+        same order) as FeatureCalculator.compute_features
+    """
+    if not panel.asset_ids:
+        return pd.DataFrame()
+
+    ids = panel.asset_ids
+    n_bars = panel.bars_available
+    full = (n_bars >= MAX_LOOKBACK).to_numpy()
+
+    if isinstance(asset_types, str):
+        ann_factor = pd.Series(365 if asset_types == 'crypto' else 252, index=ids)
+    else:
+        ann_factor = pd.Series(
+            [365 if asset_types.get(a, 'equity') == 'crypto' else 252 for a in ids], index=ids
+        )
+    sqrt_ann = np.sqrt(ann_factor.astype(float))
+
+    def by_asset(mask: np.ndarray) -> np.ndarray:
+        """Broadcast a per-asset mask over every bar position."""
+        return np.broadcast_to(mask[None, :], panel.close.shape)
+
+    def per_full(full_frame: pd.DataFrame, short_frame: Union[pd.DataFrame, float]) -> pd.DataFrame:
+        """Pick full-history values for assets with >= MAX_LOOKBACK bars."""
+        return full_frame.where(by_asset(full), short_frame)
+
+    close = panel.close
+    high = panel.high
+    low = panel.low
+    open_price = panel.open
+    valid = panel.valid
+    # fillna(0) only inside each asset's history; padding must stay NaN so it
+    # never counts towards a rolling window
+    volume = panel.volume.fillna(0).where(valid)
+
+    f: Dict[str, Union[pd.DataFrame, pd.Series]] = {}
+    f['close'] = close
+
+    # P2.1: Coverage fields (per-asset scalars)
+    f['bars_available'] = n_bars
+    f['coverage_252'] = n_bars / MAX_LOOKBACK
+
+    # ============================================================
+    # LOG RETURNS
+    # ============================================================
+    log_return = np.log(close / close.shift(1))
+    f['log_return'] = log_return
+
+    return_std_20 = log_return.rolling(20).std()
+    f['return_std_20'] = return_std_20
+    f['return_z'] = log_return / return_std_20
+
+    # ============================================================
+    # PRICE RETURNS
+    # ============================================================
+    f['return_1d'] = close.pct_change(1)
+    f['return_5d'] = close.pct_change(5)
+    f['return_21d'] = close.pct_change(21)
+    f['return_63d'] = close.pct_change(63)
+    f['return_252d'] = per_full(close.pct_change(252), np.nan)
+
+    prev_close = close.shift(1)
+    f['gap_pct'] = (open_price - prev_close) / prev_close
+    f['gap_up'] = f['gap_pct'] > 0
+    f['gap_down'] = f['gap_pct'] < 0
+
+    return_1d_std = f['return_1d'].rolling(20).std()
+    return_1d_mean = f['return_1d'].rolling(20).mean()
+    f['return_1d_z'] = (f['return_1d'] - return_1d_mean) / return_1d_std
+
+    # ============================================================
+    # MOVING AVERAGES
+    # ============================================================
+    f['sma_20'] = close.rolling(20).mean()
+    f['sma_50'] = close.rolling(50).mean()
+    f['sma_200'] = per_full(close.rolling(200).mean(), np.nan)
+
+    f['ma_dist_20'] = (close - f['sma_20']) / f['sma_20']
+    f['ma_dist_50'] = (close - f['sma_50']) / f['sma_50']
+    f['ma_dist_200'] = (close - f['sma_200']) / f['sma_200']
+
+    f['ma_slope_20'] = f['sma_20'].pct_change(5)
+    f['ma_slope_50'] = f['sma_50'].pct_change(10)
+    f['ma_slope_200'] = f['sma_200'].pct_change(20)
+
+    f['above_ma200'] = close > f['sma_200']
+    f['ma50_above_ma200'] = f['sma_50'] > f['sma_200']
+
+    bullish = (close > f['sma_20']) & (f['sma_20'] > f['sma_50']) & (f['sma_50'] > f['sma_200'])
+    bearish = (close < f['sma_20']) & (f['sma_20'] < f['sma_50']) & (f['sma_50'] < f['sma_200'])
+    f['trend_regime'] = pd.DataFrame(
+        np.where(bullish, 'bullish', np.where(bearish, 'bearish', 'neutral')).astype(object),
+        columns=ids,
+    )
+
+    # ============================================================
+    # MOMENTUM (ROC)
+    # ============================================================
+    f['roc_5'] = close.pct_change(5)
+    f['roc_10'] = close.pct_change(10)
+    f['roc_20'] = close.pct_change(20)
+    f['roc_63'] = close.pct_change(63)
+
+    roc_20_std = f['roc_20'].rolling(63).std()
+    roc_20_mean = f['roc_20'].rolling(63).mean()
+    f['roc_z_20'] = (f['roc_20'] - roc_20_mean) / roc_20_std
+
+    roc_5_std = f['roc_5'].rolling(20).std()
+    roc_5_mean = f['roc_5'].rolling(20).mean()
+    f['roc_z_5'] = (f['roc_5'] - roc_5_mean) / roc_5_std
+
+    f['roc_20_p90_63d'] = f['roc_20'].rolling(63).quantile(0.9)
+
+    f['droc_20'] = f['roc_20'] - f['roc_20'].shift(1)
+    f['droc_63'] = f['roc_63'] - f['roc_63'].shift(1)
+    f['droc_5'] = f['roc_5'] - f['roc_5'].shift(1)
+    f['droc_10'] = f['roc_10'] - f['roc_10'].shift(1)
+    f['droc_20_5d'] = f['roc_20'] - f['roc_20'].shift(5)
+
+    # ============================================================
+    # VELOCITY & ACCELERATION
+    # ============================================================
+    f['vel_ema_5'] = log_return.ewm(span=5, adjust=False).mean()
+    f['vel_ema_10'] = log_return.ewm(span=10, adjust=False).mean()
+    f['accel_ema_5'] = f['vel_ema_5'].diff()
+    f['accel_ema_10'] = f['vel_ema_10'].diff()
+    f['accel_z_20'] = f['accel_ema_5'] / return_std_20
+    f['accel_z_20_prev'] = f['accel_z_20'].shift(1)
+    f['accel_turn_up'] = (f['accel_z_20'] > 0.3) & (f['accel_z_20_prev'] < -0.3)
+    f['accel_turn_down'] = (f['accel_z_20'] < -0.3) & (f['accel_z_20_prev'] > 0.3)
+    f['accel_zero_cross_up'] = (f['accel_z_20'] > 0) & (f['accel_z_20_prev'] <= 0)
+    f['accel_zero_cross_down'] = (f['accel_z_20'] < 0) & (f['accel_z_20_prev'] >= 0)
+
+    # ============================================================
+    # RSI
+    # ============================================================
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).where(valid).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).where(valid).rolling(14).mean()
+    rs = gain / loss
+    f['rsi_14'] = 100 - (100 / (1 + rs))
+
+    # ============================================================
+    # MACD
+    # ============================================================
+    ema_12 = close.ewm(span=12, adjust=False).mean()
+    ema_26 = close.ewm(span=26, adjust=False).mean()
+    macd_line = ema_12 - ema_26
+    macd_signal = macd_line.ewm(span=9, adjust=False).mean()
+    macd_hist = macd_line - macd_signal
+    f['macd_line'] = macd_line
+    f['macd_signal'] = macd_signal
+    f['macd_histogram'] = macd_hist
+    f['macd_hist_slope'] = macd_hist.diff()
+
+    # ============================================================
+    # VOLATILITY
+    # ============================================================
+    prev = close.shift(1)
+    tr = np.fmax(np.fmax(high - low, (high - prev).abs()), (low - prev).abs())
+
+    f['atr_14'] = tr.rolling(14).mean()
+    f['atr_pct'] = f['atr_14'] / close
+    f['atr_pctile'] = per_full(
+        f['atr_pct'].rolling(252).rank(pct=True) * 100,
+        f['atr_pct'].rolling(63).rank(pct=True) * 100,
+    )
+
+    f['realized_vol_10'] = log_return.rolling(10).std() * sqrt_ann
+    f['realized_vol_20'] = log_return.rolling(20).std() * sqrt_ann
+    f['realized_vol_60'] = log_return.rolling(60).std() * sqrt_ann
+    f['vol_of_vol'] = f['realized_vol_20'].rolling(20).std()
+
+    # ============================================================
+    # BOLLINGER BANDS + KELTNER SQUEEZE
+    # ============================================================
+    bb_std = close.rolling(20).std()
+    f['bb_middle'] = f['sma_20']
+    f['bb_upper'] = f['bb_middle'] + 2 * bb_std
+    f['bb_lower'] = f['bb_middle'] - 2 * bb_std
+    f['bb_width'] = (f['bb_upper'] - f['bb_lower']) / f['bb_middle']
+    f['bb_pct'] = (close - f['bb_lower']) / (f['bb_upper'] - f['bb_lower'])
+
+    f['bb_width_pctile'] = per_full(
+        f['bb_width'].rolling(252).rank(pct=True) * 100,
+        f['bb_width'].rolling(126).rank(pct=True) * 100,
+    )
+    f['bb_width_pctile_prev'] = f['bb_width_pctile'].shift(1)
+    f['bb_width_pctile_expanding'] = f['bb_width_pctile'] > f['bb_width_pctile_prev']
+
+    atr_10 = tr.rolling(10).mean()
+    kc_middle = close.ewm(span=20, adjust=False).mean()
+    kc_upper = kc_middle + 1.5 * atr_10
+    kc_lower = kc_middle - 1.5 * atr_10
+    f['kc_upper'] = kc_upper
+    f['kc_lower'] = kc_lower
+
+    f['squeeze_keltner'] = (f['bb_upper'] < kc_upper) & (f['bb_lower'] > kc_lower)
+    f['squeeze_pctile'] = f['bb_width_pctile']
+    squeeze_by_pctile = f['bb_width_pctile'] < 10
+    f['squeeze_flag'] = f['squeeze_keltner'] | squeeze_by_pctile
+    f['squeeze_release'] = f['squeeze_flag'].shift(1) & (~f['squeeze_flag'])
+
+    # ============================================================
+    # VOLUME
+    # ============================================================
+    f['volume_sma_20'] = volume.rolling(20).mean()
+    f['dollar_volume'] = close * volume
+    f['dollar_volume_sma_20'] = f['dollar_volume'].rolling(20).mean()
+    f['rvol_20'] = volume / f['volume_sma_20']
+    f['rvol_declining_3d'] = (
+        (f['rvol_20'] < f['rvol_20'].shift(1)) &
+        (f['rvol_20'].shift(1) < f['rvol_20'].shift(2)) &
+        (f['rvol_20'].shift(2) < f['rvol_20'].shift(3))
+    )
+
+    vol_std_60 = volume.rolling(60).std()
+    vol_mean_60 = volume.rolling(60).mean()
+    f['volume_z_60'] = (volume - vol_mean_60) / vol_std_60
+
+    obv = (np.sign(close.diff()) * volume).cumsum()
+    f['obv_slope_20'] = obv.diff(20) / obv.shift(20).abs().replace(0, np.nan)
+
+    dv = f['dollar_volume'].replace(0, np.nan)
+    f['illiquidity'] = log_return.abs() / dv
+
+    # ============================================================
+    # DONCHIAN CHANNELS & BREAKOUTS
+    # ============================================================
+    f['donchian_high_20'] = high.rolling(20).max()
+    f['donchian_low_20'] = low.rolling(20).min()
+    f['donchian_high_55'] = high.rolling(55).max()
+    f['donchian_low_55'] = low.rolling(55).min()
+    f['donchian_high_20_prev'] = f['donchian_high_20'].shift(1)
+
+    f['breakout_up_20'] = close > f['donchian_high_20'].shift(1)
+    f['breakout_down_20'] = close < f['donchian_low_20'].shift(1)
+    f['breakout_confirmed_up'] = f['breakout_up_20'] & ((f['rvol_20'] > 1.5) | f['squeeze_release'])
+    f['breakout_confirmed_down'] = f['breakout_down_20'] & ((f['rvol_20'] > 1.5) | f['squeeze_release'])
+
+    f['low_5d_min'] = low.rolling(5).min()
+    f['no_new_5d_lows'] = f['low_5d_min'] >= f['low_5d_min'].shift(5)
+
+    # ============================================================
+    # 52-WEEK HIGH/LOW & DRAWDOWNS
+    # ============================================================
+    high_252 = high.rolling(252).max()
+    low_252 = low.rolling(252).min()
+    f['dist_52w_high'] = per_full((close - high_252) / high_252, np.nan)
+    f['dist_52w_low'] = per_full((close - low_252) / low_252, np.nan)
+
+    for n in [20, 63, 252]:
+        roll_max = close.rolling(n).max()
+        f[f'drawdown_{n}d'] = ((close / roll_max) - 1.0).where(by_asset((n_bars >= n).to_numpy()), np.nan)
+
+    # ============================================================
+    # RELATIVE STRENGTH
+    # ============================================================
+    bench = _align_benchmarks(panel, benchmark_bars or {})
+    f['rs_vs_benchmark'] = close / bench
+    f['rs_roc_20'] = f['rs_vs_benchmark'].pct_change(20)
+    f['rs_velocity'] = np.log(f['rs_vs_benchmark']).ewm(span=5, adjust=False).mean()
+    f['rs_acceleration'] = f['rs_velocity'].diff()
+    f['rs_breakout'] = (
+        (f['rs_roc_20'] > 0.05) &
+        (f['rs_acceleration'] > 0) &
+        (f['roc_20'] > 0)
+    )
+
+    # ============================================================
+    # CROSS-SECTIONAL RANKS (placeholder - computed separately in batch)
+    # ============================================================
+    for col in ['cs_rank_return_21d', 'cs_rank_roc_20', 'cs_rank_droc_20', 'cs_rank_rvol_20',
+                'cs_rank_bb_width_pctile', 'cs_rank_attention_score', 'cs_unusualness']:
+        f[col] = np.nan
+
+    f['attention_score'] = 0.0
+    f['attention_score_components'] = np.nan
+
+    return _to_long(panel, f)
+
+
+def _to_long(panel: BarPanel, features: Dict[str, object]) -> pd.DataFrame:
+    """Flatten (T x N) feature blocks into one long frame, asset-major, dropping padding."""
+    valid = panel.valid.T
+    counts = panel.bars_available.to_numpy()
+    out = {
+        'asset_id': np.repeat(np.asarray(panel.asset_ids), counts),
+        'date': panel.dates.T[valid],
+    }
+    for name, value in features.items():
+        if isinstance(value, pd.DataFrame):
+            out[name] = value.to_numpy().T[valid]
+        elif isinstance(value, pd.Series):
+            out[name] = np.repeat(value.to_numpy(), counts)
+        else:
+            out[name] = np.full(int(counts.sum()), value)
+    return pd.DataFrame(out)
+
+
+def split_by_asset(features: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+    """Split long panel output into per-asset frames shaped like compute_features output."""
+    if features.empty:
+        return {}
+    return {
+        asset_id: group.drop(columns='asset_id').reset_index(drop=True)
+        for asset_id, group in features.groupby('asset_id', sort=False)
+    }
+
+
+def check_parity(
+    calculator,
+    bars_by_asset: Mapping[int, pd.DataFrame],
+    asset_types: Union[str, Mapping[int, str]] = 'equity',
+    benchmark_bars: Optional[Mapping[int, pd.DataFrame]] = None,
+    rtol: float = 1e-9,
+    atol: float = 1e-12,
+) -> Dict[int, List[str]]:
+    """
+    Run the per-asset and panel paths over the same bars and report differences.
+
+    Returns:
+        Mapping of asset_id -> list of mismatching columns (empty when every
+        asset matches). Missing outputs are reported as '<missing>'.
+    """
+    panel_out = split_by_asset(
+        compute_panel_features(build_panel(bars_by_asset), asset_types, benchmark_bars)
+    )
+    mismatches: Dict[int, List[str]] = {}
+
+    for asset_id, bars in bars_by_asset.items():
+        a_type = asset_types if isinstance(asset_types, str) else asset_types.get(asset_id, 'equity')
+        bench = (benchmark_bars or {}).get(asset_id)
+        expected = calculator.compute_features(bars, bench, asset_type=a_type)
+        actual = panel_out.get(asset_id, pd.DataFrame())
+
+        if expected.empty or actual.empty:
+            if expected.empty != actual.empty:
+                mismatches[asset_id] = ['<missing>']
+            continue
+
+        bad = []
+        for col in expected.columns:
+            if col not in actual.columns or len(actual) != len(expected):
+                bad.append(col)
+                continue
+            left = expected[col].to_numpy()
+            right = actual[col].to_numpy()
+            if not _columns_match(left, right, rtol, atol):
+                bad.append(col)
+        if list(actual.columns) != list(expected.columns):
+            bad.append('<column_order>')
+        if bad:
+            mismatches[asset_id] = bad
+
+    logger.info(f"Panel parity check: {len(bars_by_asset)} assets, {len(mismatches)} with mismatches")
+    return mismatches
+
+
+def _columns_match(left: np.ndarray, right: np.ndarray, rtol: float, atol: float) -> bool:
+    """Compare two feature columns, treating NaN/None as equal and booleans by truthiness."""
+    left_na = pd.isna(left)
+    right_na = pd.isna(right)
+    if left.dtype.kind == 'f' or right.dtype.kind == 'f':
+        try:
+            lf = left.astype(float)
+            rf = right.astype(float)
+        except (TypeError, ValueError):
+            return False
+        return bool(np.array_equal(left_na, right_na) and
+                    np.allclose(lf[~left_na], rf[~right_na], rtol=rtol, atol=atol))
+    if left.dtype.kind == 'b' or right.dtype.kind == 'b':
+        lb = np.array([bool(v) if not na else False for v, na in zip(left, left_na)])
+        rb = np.array([bool(v) if not na else False for v, na in zip(right, right_na)])
+        return bool(np.array_equal(lb, rb))
+    return bool(np.array_equal(left_na, right_na) and
+                all(lv == rv for lv, rv, na in zip(left, right, left_na) if not na))
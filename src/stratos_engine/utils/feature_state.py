@@ -0,0 +1,540 @@
+"""
+Stratos Signal Engine - Incremental Feature State
+=================================================
+
+Keeps the small amount of per-asset state that FeatureCalculator.compute_features
+actually needs to produce the next row: the tail of each rolling window (closes,
+highs/lows, log returns, volumes, ...), the running EMA values (velocity, MACD,
+Keltner middle, RS velocity), the RSI gain/loss and true-range windows, and the
+handful of "previous value" fields used by the *_prev / *_slope / breakout
+features. With that state a daily update reads one new bar per asset instead of
+~300 and does O(window) arithmetic instead of re-running every rolling window.
+
+Window tails are kept as fixed-length buffers and each statistic is re-derived
+from its buffer on every step rather than carried as running sums, so there is
+no floating-point drift to reconcile against a full recompute.
+
+State is only seeded for assets with full history (>= MAX_LOOKBACK bars) and a
+clean price tail; anything else keeps going through the full recompute. Two
+features are continued rather than re-derived: the EMA family and OBV carry
+their value forward from the seed, whereas a full recompute restarts them at
+the start of its fetch window. EMA differences are negligible after a few
+hundred bars; obv_slope_20 is normalised by the OBV level, so it can differ
+from a fresh recompute by the OBV offset accumulated before the fetch window.
+bars_available / coverage_252 keep the value from the seeding run.
+
+Usage:
+    state = seed_state(asset_id, bars, features, asset_type, benchmark_bars)
+    row = state.update(new_bar, benchmark_close)   # None -> fall back to full recompute
+
+    store = FeatureStateStore(supabase)
+    states = store.load([asset_id, ...])
+    store.save(states.values())
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from .feature_calculator import CALC_VERSION, MAX_LOOKBACK
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = 'feature_rolling_state'
+
+# Buffer length per window (including the current bar)
+WINDOW_LENGTHS: Dict[str, int] = {
+    'close': 253,            # pct_change(252), sma_200, rolling max 252
+    'high': 252,
+    'low': 252,
+    'volume': 60,
+    'log_return': 60,
+    'return_1d': 20,
+    'gain': 14,
+    'loss': 14,
+    'tr': 14,
+    'sma_20': 6,             # ma_slope_20 = pct_change(5)
+    'sma_50': 11,
+    'sma_200': 21,
+    'roc_5': 20,
+    'roc_20': 63,
+    'atr_pct': 252,
+    'bb_width': 252,
+    'realized_vol_20': 20,
+    'dollar_volume': 20,
+    'rvol_20': 4,
+    'obv': 21,
+    'low_5d_min': 6,
+    'rs_vs_benchmark': 21,
+}
+
+# Windows seeded straight from the compute_features output
+_FEATURE_WINDOWS = [
+    'log_return', 'return_1d', 'sma_20', 'sma_50', 'sma_200', 'roc_5', 'roc_20',
+    'atr_pct', 'bb_width', 'realized_vol_20', 'dollar_volume', 'rvol_20',
+    'low_5d_min', 'rs_vs_benchmark',
+]
+
+# Last-row values carried between updates
+_FEATURE_SCALARS = [
+    'vel_ema_5', 'vel_ema_10', 'accel_z_20', 'macd_signal', 'macd_histogram',
+    'bb_width_pctile', 'squeeze_flag', 'donchian_high_20', 'donchian_low_20',
+    'rs_velocity', 'roc_10', 'roc_63',
+]
+
+
+def _ewm_step(prev: float, value: float, alpha: float) -> float:
+    """One step of ewm(adjust=False).mean(), matching pandas' update order."""
+    if prev != value:
+        old_wt = 1. - alpha
+        prev = (old_wt * prev + alpha * value) / (old_wt + alpha)
+    return prev
+
+
+def _std(window: np.ndarray) -> float:
+    return float(np.std(window, ddof=1))
+
+
+def _rank_pct(window: np.ndarray) -> float:
+    """rolling(n).rank(pct=True) * 100 for the last element of a full window."""
+    if np.isnan(window).any():
+        return np.nan
+    current = window[-1]
+    rank = (window < current).sum() + ((window == current).sum() + 1) / 2
+    return float(rank / len(window) * 100)
+
+
+def _ratio(num: float, den: float) -> float:
+    """num / den with pandas semantics (x/0 -> +-inf, 0/0 -> NaN)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(num) / np.float64(den))
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@dataclass
+class RollingFeatureState:
+    """Compact rolling state for one asset, as of its last processed bar."""
+    asset_id: int
+    as_of_date: date
+    asset_type: str
+    benchmark_asset_id: Optional[int]
+    bars_available: int
+    windows: Dict[str, np.ndarray] = field(default_factory=dict)
+    scalars: Dict[str, float] = field(default_factory=dict)
+    calc_version: str = CALC_VERSION
+
+    @property
+    def has_benchmark(self) -> bool:
+        return not np.isnan(self.scalars.get('benchmark_close', np.nan))
+
+    def _push(self, name: str, value: float) -> np.ndarray:
+        window = np.append(self.windows[name], value)[-WINDOW_LENGTHS[name]:]
+        self.windows[name] = window
+        return window
+
+    def update(self, bar: Mapping[str, Any], benchmark_close: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Advance the state by one bar and return its feature row.
+
+        Args:
+            bar: Mapping with date, open, high, low, close, volume
+            benchmark_close: Benchmark close forward-filled onto bar['date']
+                (None keeps the last known benchmark close)
+
+        Returns:
+            Feature row with the same columns as compute_features, or None if
+            the bar cannot be applied incrementally (state is left untouched)
+        """
+        o, h, lo, c = (_to_float(bar.get(k)) for k in ('open', 'high', 'low', 'close'))
+        if np.isnan([o, h, lo, c]).any():
+            return None
+        v = _to_float(bar.get('volume'))
+        v = 0.0 if np.isnan(v) else v
+
+        # Work on a copy so a failed update leaves the stored state intact
+        nxt = RollingFeatureState(
+            self.asset_id, self.as_of_date, self.asset_type, self.benchmark_asset_id,
+            self.bars_available, dict(self.windows), dict(self.scalars), self.calc_version
+        )
+        row = nxt._advance(bar['date'], o, h, lo, c, v, benchmark_close)
+        self.as_of_date = bar['date']
+        self.windows, self.scalars = nxt.windows, nxt.scalars
+        return row
+
+    def _advance(self, bar_date: date, o: float, h: float, lo: float, c: float, v: float,
+                 benchmark_close: Optional[float]) -> Dict[str, Any]:
+        s = self.scalars
+        ann_factor = 365 if self.asset_type == 'crypto' else 252
+        prev_close = float(self.windows['close'][-1])
+
+        f: Dict[str, Any] = {'date': bar_date, 'close': c}
+        f['bars_available'] = self.bars_available
+        f['coverage_252'] = self.bars_available / MAX_LOOKBACK
+
+        closes = self._push('close', c)
+        log_return = np.log(_ratio(c, prev_close))
+        lr = self._push('log_return', log_return)
+        return_std_20 = _std(lr[-20:])
+        f['log_return'] = log_return
+        f['return_std_20'] = return_std_20
+        f['return_z'] = _ratio(log_return, return_std_20)
+
+        # Price returns
+        f['return_1d'] = _ratio(c, prev_close) - 1
+        f['return_5d'] = _ratio(c, closes[-6]) - 1
+        f['return_21d'] = _ratio(c, closes[-22]) - 1
+        f['return_63d'] = _ratio(c, closes[-64]) - 1
+        f['return_252d'] = _ratio(c, closes[-253]) - 1
+
+        f['gap_pct'] = _ratio(o - prev_close, prev_close)
+        f['gap_up'] = f['gap_pct'] > 0
+        f['gap_down'] = f['gap_pct'] < 0
+
+        r1 = self._push('return_1d', f['return_1d'])
+        f['return_1d_z'] = _ratio(f['return_1d'] - np.mean(r1), _std(r1))
+
+        # Moving averages
+        sma_20 = float(np.mean(closes[-20:]))
+        sma_50 = float(np.mean(closes[-50:]))
+        sma_200 = float(np.mean(closes[-200:]))
+        f['sma_20'], f['sma_50'], f['sma_200'] = sma_20, sma_50, sma_200
+        f['ma_dist_20'] = _ratio(c - sma_20, sma_20)
+        f['ma_dist_50'] = _ratio(c - sma_50, sma_50)
+        f['ma_dist_200'] = _ratio(c - sma_200, sma_200)
+        f['ma_slope_20'] = _ratio(sma_20, self._push('sma_20', sma_20)[0]) - 1
+        f['ma_slope_50'] = _ratio(sma_50, self._push('sma_50', sma_50)[0]) - 1
+        f['ma_slope_200'] = _ratio(sma_200, self._push('sma_200', sma_200)[0]) - 1
+        f['above_ma200'] = c > sma_200
+        f['ma50_above_ma200'] = sma_50 > sma_200
+        if c > sma_20 and sma_20 > sma_50 and sma_50 > sma_200:
+            f['trend_regime'] = 'bullish'
+        elif c < sma_20 and sma_20 < sma_50 and sma_50 < sma_200:
+            f['trend_regime'] = 'bearish'
+        else:
+            f['trend_regime'] = 'neutral'
+
+        # Momentum
+        roc_5 = f['return_5d']
+        roc_10 = _ratio(c, closes[-11]) - 1
+        roc_20 = _ratio(c, closes[-21]) - 1
+        roc_63 = f['return_63d']
+        f['roc_5'], f['roc_10'], f['roc_20'], f['roc_63'] = roc_5, roc_10, roc_20, roc_63
+        roc20 = self._push('roc_20', roc_20)
+        roc5 = self._push('roc_5', roc_5)
+        f['roc_z_20'] = _ratio(roc_20 - np.mean(roc20), _std(roc20))
+        f['roc_z_5'] = _ratio(roc_5 - np.mean(roc5), _std(roc5))
+        f['roc_20_p90_63d'] = float(np.quantile(roc20, 0.9))
+        f['droc_20'] = roc_20 - roc20[-2]
+        f['droc_63'] = roc_63 - s['roc_63']
+        f['droc_5'] = roc_5 - roc5[-2]
+        f['droc_10'] = roc_10 - s['roc_10']
+        f['droc_20_5d'] = roc_20 - roc20[-6]
+        s['roc_10'], s['roc_63'] = roc_10, roc_63
+
+        # Velocity & acceleration
+        vel_5 = _ewm_step(s['vel_ema_5'], log_return, 2 / 6)
+        vel_10 = _ewm_step(s['vel_ema_10'], log_return, 2 / 11)
+        f['vel_ema_5'], f['vel_ema_10'] = vel_5, vel_10
+        f['accel_ema_5'] = vel_5 - s['vel_ema_5']
+        f['accel_ema_10'] = vel_10 - s['vel_ema_10']
+        accel_z = _ratio(f['accel_ema_5'], return_std_20)
+        accel_z_prev = s['accel_z_20']
+        f['accel_z_20'] = accel_z
+        f['accel_z_20_prev'] = accel_z_prev
+        f['accel_turn_up'] = accel_z > 0.3 and accel_z_prev < -0.3
+        f['accel_turn_down'] = accel_z < -0.3 and accel_z_prev > 0.3
+        f['accel_zero_cross_up'] = accel_z > 0 and accel_z_prev <= 0
+        f['accel_zero_cross_down'] = accel_z < 0 and accel_z_prev >= 0
+        s['vel_ema_5'], s['vel_ema_10'], s['accel_z_20'] = vel_5, vel_10, accel_z
+
+        # RSI
+        delta = c - prev_close
+        gain = float(np.mean(self._push('gain', delta if delta > 0 else 0.0)))
+        loss = float(np.mean(self._push('loss', -delta if delta < 0 else 0.0)))
+        f['rsi_14'] = 100 - _ratio(100, 1 + _ratio(gain, loss))
+
+        # MACD
+        s['ema_12'] = _ewm_step(s['ema_12'], c, 2 / 13)
+        s['ema_26'] = _ewm_step(s['ema_26'], c, 2 / 27)
+        macd_line = s['ema_12'] - s['ema_26']
+        macd_signal = _ewm_step(s['macd_signal'], macd_line, 2 / 10)
+        macd_hist = macd_line - macd_signal
+        f['macd_line'] = macd_line
+        f['macd_signal'] = macd_signal
+        f['macd_histogram'] = macd_hist
+        f['macd_hist_slope'] = macd_hist - s['macd_histogram']
+        s['macd_signal'], s['macd_histogram'] = macd_signal, macd_hist
+
+        # Volatility
+        tr = self._push('tr', max(h - lo, abs(h - prev_close), abs(lo - prev_close)))
+        atr_14 = float(np.mean(tr))
+        f['atr_14'] = atr_14
+        f['atr_pct'] = _ratio(atr_14, c)
+        f['atr_pctile'] = _rank_pct(self._push('atr_pct', f['atr_pct']))
+        f['realized_vol_10'] = _std(lr[-10:]) * np.sqrt(ann_factor)
+        f['realized_vol_20'] = return_std_20 * np.sqrt(ann_factor)
+        f['realized_vol_60'] = _std(lr) * np.sqrt(ann_factor)
+        f['vol_of_vol'] = _std(self._push('realized_vol_20', f['realized_vol_20']))
+
+        # Bollinger bands + Keltner squeeze
+        bb_std = _std(closes[-20:])
+        bb_upper = sma_20 + 2 * bb_std
+        bb_lower = sma_20 - 2 * bb_std
+        f['bb_middle'] = sma_20
+        f['bb_upper'] = bb_upper
+        f['bb_lower'] = bb_lower
+        f['bb_width'] = _ratio(bb_upper - bb_lower, sma_20)
+        f['bb_pct'] = _ratio(c - bb_lower, bb_upper - bb_lower)
+        bb_pctile = _rank_pct(self._push('bb_width', f['bb_width']))
+        f['bb_width_pctile'] = bb_pctile
+        f['bb_width_pctile_prev'] = s['bb_width_pctile']
+        f['bb_width_pctile_expanding'] = bb_pctile > s['bb_width_pctile']
+        s['bb_width_pctile'] = bb_pctile
+
+        atr_10 = float(np.mean(tr[-10:]))
+        s['kc_middle'] = _ewm_step(s['kc_middle'], c, 2 / 21)
+        kc_upper = s['kc_middle'] + 1.5 * atr_10
+        kc_lower = s['kc_middle'] - 1.5 * atr_10
+        f['kc_upper'] = kc_upper
+        f['kc_lower'] = kc_lower
+        f['squeeze_keltner'] = bb_upper < kc_upper and bb_lower > kc_lower
+        f['squeeze_pctile'] = bb_pctile
+        f['squeeze_flag'] = f['squeeze_keltner'] or bb_pctile < 10
+        f['squeeze_release'] = bool(s['squeeze_flag']) and not f['squeeze_flag']
+        s['squeeze_flag'] = f['squeeze_flag']
+
+        # Volume
+        volume = self._push('volume', v)
+        volume_sma_20 = float(np.mean(volume[-20:]))
+        f['volume_sma_20'] = volume_sma_20
+        f['dollar_volume'] = c * v
+        f['dollar_volume_sma_20'] = float(np.mean(self._push('dollar_volume', f['dollar_volume'])))
+        f['rvol_20'] = _ratio(v, volume_sma_20)
+        rvol = self._push('rvol_20', f['rvol_20'])
+        f['rvol_declining_3d'] = bool(rvol[3] < rvol[2] and rvol[2] < rvol[1] and rvol[1] < rvol[0])
+        f['volume_z_60'] = _ratio(v - np.mean(volume), _std(volume))
+        obv = self._push('obv', self.windows['obv'][-1] + np.sign(delta) * v)
+        f['obv_slope_20'] = _ratio(obv[-1] - obv[0], abs(obv[0])) if obv[0] != 0 else np.nan
+        f['illiquidity'] = _ratio(abs(log_return), f['dollar_volume']) if f['dollar_volume'] != 0 else np.nan
+
+        # Donchian channels & breakouts
+        highs = self._push('high', h)
+        lows = self._push('low', lo)
+        f['donchian_high_20'] = float(highs[-20:].max())
+        f['donchian_low_20'] = float(lows[-20:].min())
+        f['donchian_high_55'] = float(highs[-55:].max())
+        f['donchian_low_55'] = float(lows[-55:].min())
+        f['donchian_high_20_prev'] = s['donchian_high_20']
+        f['breakout_up_20'] = c > s['donchian_high_20']
+        f['breakout_down_20'] = c < s['donchian_low_20']
+        confirm = f['rvol_20'] > 1.5 or f['squeeze_release']
+        f['breakout_confirmed_up'] = f['breakout_up_20'] and confirm
+        f['breakout_confirmed_down'] = f['breakout_down_20'] and confirm
+        s['donchian_high_20'], s['donchian_low_20'] = f['donchian_high_20'], f['donchian_low_20']
+        f['low_5d_min'] = float(lows[-5:].min())
+        f['no_new_5d_lows'] = f['low_5d_min'] >= self._push('low_5d_min', f['low_5d_min'])[0]
+
+        # 52-week high/low & drawdowns
+        high_252, low_252 = float(highs.max()), float(lows.min())
+        f['dist_52w_high'] = _ratio(c - high_252, high_252)
+        f['dist_52w_low'] = _ratio(c - low_252, low_252)
+        for n in [20, 63, 252]:
+            f[f'drawdown_{n}d'] = _ratio(c, closes[-n:].max()) - 1.0
+
+        # Relative strength
+        if self.has_benchmark:
+            if benchmark_close is not None and not np.isnan(benchmark_close):
+                s['benchmark_close'] = float(benchmark_close)
+            rs = _ratio(c, s['benchmark_close'])
+            rs_window = self._push('rs_vs_benchmark', rs)
+            rs_velocity = _ewm_step(s['rs_velocity'], np.log(rs), 2 / 6)
+            f['rs_vs_benchmark'] = rs
+            f['rs_roc_20'] = _ratio(rs, rs_window[0]) - 1
+            f['rs_velocity'] = rs_velocity
+            f['rs_acceleration'] = rs_velocity - s['rs_velocity']
+            f['rs_breakout'] = f['rs_roc_20'] > 0.05 and f['rs_acceleration'] > 0 and roc_20 > 0
+            s['rs_velocity'] = rs_velocity
+        else:
+            f['rs_vs_benchmark'] = np.nan
+            f['rs_roc_20'] = np.nan
+            f['rs_velocity'] = np.nan
+            f['rs_acceleration'] = np.nan
+            f['rs_breakout'] = False
+
+        # Cross-sectional ranks and attention are filled in elsewhere
+        for col in ['cs_rank_return_21d', 'cs_rank_roc_20', 'cs_rank_droc_20', 'cs_rank_rvol_20',
+                    'cs_rank_bb_width_pctile', 'cs_rank_attention_score', 'cs_unusualness']:
+            f[col] = np.nan
+        f['attention_score'] = 0.0
+        f['attention_score_components'] = {}
+
+        return f
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def to_record(self) -> Dict[str, Any]:
+        """Row for the feature_rolling_state table (NaN stored as null)."""
+        def clean(value):
+            if isinstance(value, (bool, np.bool_)):
+                return bool(value)
+            value = float(value)
+            return None if np.isnan(value) else value
+
+        return {
+            'asset_id': int(self.asset_id),
+            'as_of_date': self.as_of_date.isoformat(),
+            'calc_version': self.calc_version,
+            'state': {
+                'asset_type': self.asset_type,
+                'benchmark_asset_id': self.benchmark_asset_id,
+                'bars_available': int(self.bars_available),
+                'windows': {k: [clean(x) for x in w] for k, w in self.windows.items()},
+                'scalars': {k: clean(x) for k, x in self.scalars.items()},
+            },
+        }
+
+    @classmethod
+    def from_record(cls, record: Mapping[str, Any]) -> 'RollingFeatureState':
+        state = record['state']
+        return cls(
+            asset_id=record['asset_id'],
+            as_of_date=date.fromisoformat(str(record['as_of_date'])[:10]),
+            asset_type=state['asset_type'],
+            benchmark_asset_id=state.get('benchmark_asset_id'),
+            bars_available=state['bars_available'],
+            windows={k: np.array([np.nan if x is None else x for x in w], dtype=float)
+                     for k, w in state['windows'].items()},
+            scalars={k: (x if isinstance(x, bool) else np.nan if x is None else float(x))
+                     for k, x in state['scalars'].items()},
+            calc_version=record['calc_version'],
+        )
+
+
+def seed_state(
+    asset_id: int,
+    bars: pd.DataFrame,
+    features: pd.DataFrame,
+    asset_type: str = 'equity',
+    benchmark_bars: Optional[pd.DataFrame] = None,
+    benchmark_asset_id: Optional[int] = None
+) -> Optional[RollingFeatureState]:
+    """
+    Build rolling state from a full compute_features run.
+
+    Args:
+        bars: The bars passed to compute_features
+        features: Its unfiltered output (last row = last bar)
+
+    Returns:
+        The state as of the last bar, or None if the asset can't be updated
+        incrementally (short history, or NaN prices inside the windows)
+    """
+    if len(bars) < MAX_LOOKBACK or len(features) != len(bars):
+        return None
+
+    close = bars['close'].astype(float).reset_index(drop=True)
+    high = bars['high'].astype(float).reset_index(drop=True)
+    low = bars['low'].astype(float).reset_index(drop=True)
+    volume = bars['volume'].astype(float).fillna(0).reset_index(drop=True)
+    tail = WINDOW_LENGTHS['close']
+    if close.tail(tail).isna().any() or high.tail(tail).isna().any() or low.tail(tail).isna().any():
+        return None
+
+    delta = close.diff()
+    prev_close = close.shift(1)
+    tr = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+    raw = {
+        'close': close,
+        'high': high,
+        'low': low,
+        'volume': volume,
+        'gain': delta.where(delta > 0, 0),
+        'loss': -delta.where(delta < 0, 0),
+        'tr': tr,
+        'obv': (np.sign(delta) * volume).cumsum(),
+    }
+
+    windows = {name: series.tail(WINDOW_LENGTHS[name]).to_numpy(dtype=float) for name, series in raw.items()}
+    for name in _FEATURE_WINDOWS:
+        windows[name] = features[name].tail(WINDOW_LENGTHS[name]).to_numpy(dtype=float)
+
+    last = features.iloc[-1]
+    scalars: Dict[str, float] = {name: last[name] for name in _FEATURE_SCALARS}
+    scalars['squeeze_flag'] = bool(last['squeeze_flag'])
+    scalars['ema_12'] = close.ewm(span=12, adjust=False).mean().iloc[-1]
+    scalars['ema_26'] = close.ewm(span=26, adjust=False).mean().iloc[-1]
+    scalars['kc_middle'] = close.ewm(span=20, adjust=False).mean().iloc[-1]
+    scalars['benchmark_close'] = np.nan
+
+    last_date = features['date'].iloc[-1]
+    if benchmark_bars is not None and len(benchmark_bars) > 0:
+        bench = benchmark_bars[benchmark_bars['date'] <= last_date]
+        if bench.empty or np.isnan(windows['rs_vs_benchmark']).any():
+            return None
+        scalars['benchmark_close'] = float(bench['close'].iloc[-1])
+
+    state = RollingFeatureState(
+        asset_id=asset_id,
+        as_of_date=last_date,
+        asset_type=asset_type,
+        benchmark_asset_id=benchmark_asset_id,
+        bars_available=int(last['bars_available']),
+        windows=windows,
+        scalars={k: (v if isinstance(v, bool) else float(v)) for k, v in scalars.items()},
+    )
+    if any(np.isnan(state.scalars[k]) for k in ('vel_ema_5', 'vel_ema_10', 'macd_signal', 'ema_12')):
+        return None
+    return state
+
+
+class FeatureStateStore:
+    """Loads and saves RollingFeatureState rows in the feature_rolling_state table."""
+
+    def __init__(self, supabase, chunk_size: int = 200):
+        self.supabase = supabase
+        self.chunk_size = chunk_size
+
+    def load(self, asset_ids: Iterable[int]) -> Dict[int, RollingFeatureState]:
+        """Load state for the given assets; rows from another calc_version are ignored."""
+        asset_ids = [int(a) for a in asset_ids]
+        states: Dict[int, RollingFeatureState] = {}
+        for i in range(0, len(asset_ids), self.chunk_size):
+            chunk = asset_ids[i:i + self.chunk_size]
+            resp = self.supabase.table(STATE_TABLE)\
+                .select('asset_id, as_of_date, calc_version, state')\
+                .in_('asset_id', chunk)\
+                .execute()
+            for record in resp.data or []:
+                if record['calc_version'] != CALC_VERSION:
+                    continue
+                try:
+                    states[record['asset_id']] = RollingFeatureState.from_record(record)
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Discarding unreadable feature state for asset {record['asset_id']}: {e}")
+        return states
+
+    def save(self, states: Iterable[RollingFeatureState]) -> int:
+        """Upsert state rows; returns the number saved."""
+        records = [s.to_record() for s in states]
+        for i in range(0, len(records), self.chunk_size):
+            self.supabase.table(STATE_TABLE).upsert(
+                records[i:i + self.chunk_size],
+                on_conflict='asset_id'
+            ).execute()
+        return len(records)
+
+    def delete(self, asset_ids: List[int]) -> None:
+        """Drop state so the next run falls back to a full recompute."""
+        for i in range(0, len(asset_ids), self.chunk_size):
+            self.supabase.table(STATE_TABLE).delete().in_('asset_id', asset_ids[i:i + self.chunk_size]).execute()
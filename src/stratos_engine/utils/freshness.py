@@ -2,6 +2,7 @@
 
 from typing import Dict, Tuple
 import structlog
+from ..calendar import calendar_for
 from .universe import parse_universe
 
 logger = structlog.get_logger()
@@ -14,6 +15,9 @@ class FreshnessCheck:
         """
         Check if we have enough feature data for the given date and universe.
         
+        On a day without a session (weekend, exchange holiday) the latest
+        session before it is checked instead.
+        
         Returns:
             Tuple[bool, Dict]: (passed, stats)
         """
@@ -23,6 +27,10 @@ class FreshnessCheck:
         limit = u_params["limit"]
         min_volume = u_params["min_volume"]
         
+        session = calendar_for(asset_type).session_on_or_before(as_of_date).isoformat()
+        if session != as_of_date:
+            logger.info("freshness_check_not_a_session", date=as_of_date, checking=session)
+        
         # Expected count is simply the limit (e.g. 100 or 500)
         # Or we could query the previous day's count for this specific universe logic
         # But the user suggested: expected = limit (100/500)
@@ -43,12 +51,13 @@ class FreshnessCheck:
         ) sub
         """
         
-        curr_count_res = self.db.fetch_one(query_curr, (as_of_date, asset_type, min_volume, limit))
+        curr_count_res = self.db.fetch_one(query_curr, (session, asset_type, min_volume, limit))
         curr_count = curr_count_res['count'] if curr_count_res else 0
         
         coverage = curr_count / expected if expected > 0 else 0.0
         
         stats = {
+            "date": session,
             "expected": expected,
             "actual": curr_count,
             "coverage": coverage
@@ -1,61 +1,114 @@
-"""Worker process that consumes jobs from pgmq queue."""
+"""Worker process that consumes jobs from pgmq queue.
+
+Each job runs as a stage DAG (see pipeline.py) that checkpoints per-stage
+completion in pipeline_runs, so a retried job resumes at the first incomplete
+stage. Up to WORKER_MAX_CONCURRENT_JOBS jobs run at once on a thread pool (stages are
+I/O bound and each thread gets its own pooled DB connection; a job thread hands
+its connection back while its stage threads run, and concurrency is clamped to
+what DB_POOL_MAX_SIZE can serve). Admission is
+capped per universe_id / job_type (WORKER_CONCURRENCY_LIMITS); messages that
+would exceed a cap are handed back to the queue. A lease thread heartbeats
+every running job in engine_jobs and extends its pgmq visibility timeout.
+SIGTERM/SIGINT stop polling and wait for in-flight jobs to finish.
+
+Each job is measured as a whole (row "job" in pipeline_stage_metrics, next
+to its stages' rows; see telemetry.py).
+"""
 
 import json
 import signal
 import sys
 import time
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 from uuid import uuid4
 
 import structlog
 
+from . import telemetry
 from .config import config
 from .db import db, queue
-from .stages import Stage1Evaluate, Stage2AI, Stage3State, Stage1Fetch
-from .stages.stage4_scoring import Stage4Scoring
-from .stages.stage5_ai_review import Stage5AIReview
+from .pipeline import PipelineScheduler, StageContext
 from .utils.logging import setup_logging
-from .utils.freshness import FreshnessCheck
 
 logger = structlog.get_logger()
 
 
+@dataclass
+class RunningJob:
+    """A job in flight on this worker."""
+    msg_id: int
+    job: Dict[str, Any]
+    job_id: Optional[str]
+    started_at: float = field(default_factory=time.time)
+    future: Optional[Future] = None
+    
+    @property
+    def universe_id(self) -> str:
+        return self.job.get("universe_id", "equities_all")
+    
+    @property
+    def job_type(self) -> str:
+        return self.job.get("job_type", "daily_run")
+
+
 class Worker:
     """Signal engine worker that processes jobs from pgmq."""
     
+    # Seconds a message refused by a concurrency cap stays hidden before retry
+    DEFER_SECONDS = 15
+    
     def __init__(self):
         self.running = True
-        self.current_job_id = None
-        self.heartbeat_thread = None
-        self.freshness = FreshnessCheck(db)
+        self.max_jobs = max(config.worker.max_concurrent_jobs, 1)
+        self.limits = config.worker.concurrency_limits
+        self.scheduler = PipelineScheduler(db)
+        
+        self.in_flight: Dict[int, RunningJob] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._lease_stop = threading.Event()
+        self._lease_thread: Optional[threading.Thread] = None
         
         # Set up signal handlers
         signal.signal(signal.SIGINT, self._handle_shutdown)
         signal.signal(signal.SIGTERM, self._handle_shutdown)
     
     def _handle_shutdown(self, signum, frame):
-        """Handle shutdown signals gracefully."""
-        logger.info("shutdown_requested", signal=signum)
+        """Stop taking new jobs; run() drains the in-flight ones."""
+        logger.info("shutdown_requested", signal=signum, in_flight=len(self.in_flight))
         self.running = False
+        self._wake.set()
     
-    def _heartbeat_loop(self, job_id: str):
-        """Background thread to update job heartbeat."""
-        logger.info("heartbeat_started", job_id=job_id)
-        while self.running and self.current_job_id == job_id:
-            try:
+    def _lease_loop(self):
+        """Background thread: heartbeat each running job and extend its queue visibility."""
+        logger.info("lease_keeper_started", interval=config.worker.heartbeat_interval)
+        while not self._lease_stop.wait(config.worker.heartbeat_interval):
+            with self._lock:
+                running = list(self.in_flight.values())
+            for running_job in running:
+                self._heartbeat(running_job)
+        # Hand this thread's pooled connection back
+        db.release()
+    
+    def _heartbeat(self, running_job: RunningJob) -> None:
+        """Renew one job's lease in engine_jobs and pgmq."""
+        try:
+            if running_job.job_id:
                 query = """
                 UPDATE engine_jobs
                 SET last_heartbeat_at = NOW(),
                     lease_expires_at = NOW() + INTERVAL '5 minutes'
                 WHERE job_id = %s
                 """
-                db.execute(query, (job_id,))
-                time.sleep(60)  # Heartbeat every minute
-            except Exception as e:
-                logger.error("heartbeat_failed", job_id=job_id, error=str(e))
-                time.sleep(10)
+                db.execute(query, (running_job.job_id,))
+            queue.set_vt(running_job.msg_id, config.worker.visibility_timeout)
+        except Exception as e:
+            logger.error("heartbeat_failed", job_id=running_job.job_id,
+                         msg_id=running_job.msg_id, error=str(e))
     
     def start_pipeline_run(self, job: Dict[str, Any]) -> str:
         """Record pipeline run start in database."""
@@ -122,124 +175,71 @@ class Worker:
             return False
 
     def process_job(self, job: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
-        """Process a single job from the queue."""
+        """Process a single job from the queue by running its stage DAG (measured as "job")."""
         job_type = job.get("job_type", "daily_run")
         as_of_date = job.get("as_of_date", datetime.now().strftime("%Y-%m-%d"))
         universe_id = job.get("universe_id", "equities_all")
-        config_id = job.get("config_id")
-        include_ai = job.get("include_ai", False)
         
         logger.info("job_started", job_type=job_type, date=as_of_date, universe=universe_id)
         
-        # Start heartbeat if we have a job_id (from engine_jobs table)
-        if job_id:
-            self.current_job_id = job_id
-            self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, args=(job_id,))
-            self.heartbeat_thread.daemon = True
-            self.heartbeat_thread.start()
-        
         # Start pipeline run record
         run_id = self.start_pipeline_run(job)
         
         try:
-            results = {}
-            
-            # Stage 1: Fetch & Evaluate
-            # daily_run: Full pipeline with data fetch
-            # daily_pipeline: Skip fetch, just evaluate existing data
-            # stage1_only/evaluate: Only Stage1
-            if job_type in ("daily_run", "stage1_only", "evaluate"):
-                # Fetch data first (only for daily_run)
-                stage1_fetch = Stage1Fetch(db)
-                results["stage1_fetch"] = stage1_fetch.run(as_of_date, universe_id, config_id)
-            
-            # Freshness Check AFTER data fetch (for self-healing)
-            # This allows the pipeline to fetch data first, then check if we have enough coverage
-            if job_type in ("daily_run", "daily_pipeline", "evaluate"):
-                passed, stats = self.freshness.check_coverage(as_of_date, universe_id)
-                results["freshness"] = stats
-                
-                if not passed:
-                    raise ValueError(f"Insufficient feature coverage: {stats['actual']}/{stats['expected']} ({stats['coverage']:.1%})")
-            
-            # Stage 1 Evaluate: Run signal template evaluation
-            if job_type in ("daily_run", "stage1_only", "evaluate"):
-                stage1 = Stage1Evaluate(db)
-                results["stage1"] = stage1.run(as_of_date, universe_id, config_id)
-            
-            # daily_pipeline: Evaluate existing data without fetching
-            if job_type == "daily_pipeline":
-                stage1 = Stage1Evaluate(db)
-                results["stage1"] = stage1.run(as_of_date, universe_id, config_id)
-            
-            # Stage 3: State Machine (before AI to create instances)
-            if job_type in ("daily_run", "daily_pipeline", "stage3_only", "state"):
-                stage3 = Stage3State(db)
-                results["stage3"] = stage3.run(as_of_date, config_id)
-
-            # Stage 4: Scoring (after signals are generated)
-            if job_type in ("daily_run", "daily_pipeline", "stage4_only", "scoring"):
-                stage4 = Stage4Scoring(db)
-                results["stage4"] = stage4.run(as_of_date, universe_id, config_id)
-
-            # Stage 5: AI Review (for top assets) - only if enabled and requested
-            if job_type in ("daily_run", "stage5_only", "ai_review") and config.engine.enable_ai_stage:
-                stage5 = Stage5AIReview(db)
-                results["stage5"] = stage5.run(as_of_date, config_id)
-            
-            # For daily_pipeline, only run AI if include_ai is True
-            if job_type == "daily_pipeline" and include_ai and config.engine.enable_ai_stage:
-                stage5 = Stage5AIReview(db)
-                results["stage5"] = stage5.run(as_of_date, config_id)
-            
-            # Stage 2: AI Analysis (optional)
-            if job_type in ("daily_run", "stage2_only", "ai") and config.engine.enable_ai_stage:
-                stage2 = Stage2AI(db)
-                results["stage2"] = stage2.run(
-                    as_of_date,
-                    min_strength=job.get("ai_min_strength", 60),
-                    budget=job.get("ai_budget", config.engine.ai_budget_per_run),
-                    config_id=config_id,
-                )
-            
-            # For daily_pipeline with include_ai, also run Stage 2
-            if job_type == "daily_pipeline" and include_ai and config.engine.enable_ai_stage:
-                stage2 = Stage2AI(db)
-                results["stage2"] = stage2.run(
-                    as_of_date,
-                    min_strength=job.get("ai_min_strength", 60),
-                    budget=job.get("ai_budget", config.engine.ai_budget_per_run),
-                    config_id=config_id,
-                )
+            with telemetry.measure("job") as metrics:
+                # Stages completed by this job's previous run are skipped
+                ctx = StageContext.from_job(db, {**job, "as_of_date": as_of_date}, job_id, run_id)
+                # Releases this thread's connection while the stage threads run
+                results = self.scheduler.run(ctx)
             
             # Complete pipeline run
             self.complete_pipeline_run(run_id, "success", results)
+            telemetry.write_stage_metrics(db, run_id, job_id, metrics, "success")
             
-            logger.info("job_completed", run_id=run_id, results=results)
+            logger.info("job_completed", run_id=run_id, results=results, **metrics.as_dict())
             return {"status": "success", "run_id": run_id, "results": results}
             
         except Exception as e:
             logger.error("job_failed", run_id=run_id, error=str(e))
             self.complete_pipeline_run(run_id, "failed", {}, str(e))
+            telemetry.write_stage_metrics(db, run_id, job_id, metrics, "failed")
             raise
-        finally:
-            # Stop heartbeat
-            self.current_job_id = None
-            if self.heartbeat_thread:
-                self.heartbeat_thread.join(timeout=1.0)
     
-    def poll_and_process(self) -> bool:
-        """Poll queue for a job and process it."""
+    def _limit_for(self, dimension: str, value: str) -> Optional[int]:
+        return self.limits.get(f"{dimension}:{value}", self.limits.get(f"{dimension}:*"))
+    
+    def _admissible(self, job: Dict[str, Any]) -> bool:
+        """True if starting this job stays within the per-universe/job_type caps."""
+        candidate = {
+            "universe_id": job.get("universe_id", "equities_all"),
+            "job_type": job.get("job_type", "daily_run"),
+        }
+        for dimension, value in candidate.items():
+            limit = self._limit_for(dimension, value)
+            if limit is None:
+                continue
+            running = sum(1 for r in self.in_flight.values() if getattr(r, dimension) == value)
+            if running >= limit:
+                return False
+        return True
+    
+    def poll_and_dispatch(self, executor: ThreadPoolExecutor) -> int:
+        """Read up to the free capacity from the queue and start admissible jobs."""
+        free = self.max_jobs - len(self.in_flight)
+        if free <= 0:
+            return 0
+        
         try:
             messages = queue.read(
                 visibility_timeout=config.worker.visibility_timeout,
-                limit=1
+                limit=free
             )
-            
-            if not messages:
-                return False
-            
-            msg = messages[0]
+        except Exception as e:
+            logger.error("poll_error", error=str(e))
+            return 0
+        
+        started = 0
+        for msg in messages:
             msg_id = msg.get("msg_id")
             job = msg.get("message", {})
             
@@ -249,8 +249,40 @@ class Worker:
             # Extract job_id if it exists in the payload (it should be injected by enqueue_engine_job)
             job_id = job.get("job_id")
             
+            if not self.running or not self._admissible(job):
+                # Hand it back; it becomes visible again shortly
+                logger.info("job_deferred", msg_id=msg_id, job_id=job_id,
+                            universe=job.get("universe_id"), job_type=job.get("job_type"))
+                try:
+                    queue.set_vt(msg_id, self.DEFER_SECONDS)
+                except Exception as e:
+                    logger.error("defer_failed", msg_id=msg_id, error=str(e))
+                continue
+            
             logger.info("job_received", msg_id=msg_id, job_id=job_id)
             
+            running_job = RunningJob(msg_id=msg_id, job=job, job_id=job_id)
+            with self._lock:
+                self.in_flight[msg_id] = running_job
+            running_job.future = executor.submit(self._run_message, running_job)
+            running_job.future.add_done_callback(lambda _f, m=msg_id: self._finished(m))
+            started += 1
+        
+        return started
+    
+    def _finished(self, msg_id: int) -> None:
+        with self._lock:
+            running_job = self.in_flight.pop(msg_id, None)
+        if running_job:
+            logger.info("job_slot_freed", msg_id=msg_id,
+                        seconds=round(time.time() - running_job.started_at, 1),
+                        in_flight=len(self.in_flight))
+        self._wake.set()
+    
+    def _run_message(self, running_job: RunningJob) -> bool:
+        """Claim, process and acknowledge one queue message (runs on a pool thread)."""
+        msg_id, job, job_id = running_job.msg_id, running_job.job, running_job.job_id
+        try:
             # If we have a job_id, try to claim it in engine_jobs
             if job_id:
                 if not self.claim_job(job_id):
@@ -306,22 +338,48 @@ class Worker:
             return True
             
         except Exception as e:
-            logger.error("poll_error", error=str(e))
+            logger.error("job_error", msg_id=msg_id, error=str(e))
             return False
+        finally:
+            # Job threads are pooled and may idle between jobs; don't keep a connection
+            db.release()
     
     def run(self) -> None:
-        """Main worker loop."""
+        """Main worker loop: keep up to max_jobs running, then drain on shutdown."""
         logger.info("worker_started", 
                    poll_interval=config.worker.poll_interval,
-                   queue=config.worker.queue_name)
+                   queue=config.worker.queue_name,
+                   max_jobs=self.max_jobs,
+                   limits=self.limits)
+        
+        # Connections at peak: each job's stage threads (its job thread releases
+        # while they run) plus the lease keeper and this loop
+        per_job = self.scheduler.max_parallel
+        if db.max_size < self.max_jobs * per_job + 2:
+            max_jobs = max((db.max_size - 2) // per_job, 1)
+            logger.warning("db_pool_smaller_than_concurrency",
+                           pool_max_size=db.max_size, needed=self.max_jobs * per_job + 2,
+                           max_jobs=self.max_jobs, clamped_to=max_jobs)
+            self.max_jobs = max_jobs
         
-        while self.running:
-            processed = self.poll_and_process()
+        self._lease_thread = threading.Thread(target=self._lease_loop, name="lease-keeper", daemon=True)
+        self._lease_thread.start()
+        
+        with ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="job") as executor:
+            while self.running:
+                self._wake.clear()
+                started = self.poll_and_dispatch(executor)
+                
+                if not started or len(self.in_flight) >= self.max_jobs:
+                    # Nothing new (or full): wait for a slot to free up or the poll interval
+                    self._wake.wait(config.worker.poll_interval)
             
-            if not processed:
-                # No job found, sleep before next poll
-                time.sleep(config.worker.poll_interval)
+            if self.in_flight:
+                logger.info("worker_draining", in_flight=len(self.in_flight),
+                            jobs=[r.job_id or r.msg_id for r in self.in_flight.values()])
         
+        self._lease_stop.set()
+        self._lease_thread.join(timeout=5.0)
         logger.info("worker_stopped")
         db.close()
 
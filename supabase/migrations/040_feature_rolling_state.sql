@@ -0,0 +1,38 @@
+-- Migration: 040_feature_rolling_state.sql
+-- Description: Per-asset rolling window state for streaming daily feature updates
+-- (see src/stratos_engine/utils/feature_state.py)
+
+CREATE TABLE IF NOT EXISTS feature_rolling_state (
+    asset_id BIGINT PRIMARY KEY REFERENCES assets(asset_id) ON DELETE CASCADE,
+
+    -- Last bar folded into the state
+    as_of_date DATE NOT NULL,
+
+    -- State is discarded when the feature calculation version changes
+    calc_version TEXT NOT NULL,
+
+    -- Window tails, EMA values and previous-bar fields
+    state JSONB NOT NULL,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_feature_rolling_state_as_of_date
+ON feature_rolling_state (as_of_date);
+
+-- Keep updated_at current on upsert
+CREATE OR REPLACE FUNCTION update_feature_rolling_state_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_feature_rolling_state_updated_at ON feature_rolling_state;
+CREATE TRIGGER trigger_feature_rolling_state_updated_at
+    BEFORE UPDATE ON feature_rolling_state
+    FOR EACH ROW
+    EXECUTE FUNCTION update_feature_rolling_state_updated_at();
+
+COMMENT ON TABLE feature_rolling_state IS 'Rolling feature state per asset; missing or stale rows trigger a full recompute';
@@ -0,0 +1,18 @@
+-- Migration: 041_pipeline_run_stages.sql
+-- Description: Per-stage checkpoints for pipeline runs so retried jobs resume
+-- at the first incomplete stage (see src/stratos_engine/pipeline.py)
+
+-- {stage_name: {status, seconds, result | error, from_run, recorded_at}}
+ALTER TABLE public.pipeline_runs
+  ADD COLUMN IF NOT EXISTS stages JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Run whose completed stages this run carried forward
+ALTER TABLE public.pipeline_runs
+  ADD COLUMN IF NOT EXISTS resumed_from UUID REFERENCES public.pipeline_runs(run_id);
+
+-- Latest run per job is looked up on every retry
+CREATE INDEX IF NOT EXISTS idx_pipeline_runs_job_started
+  ON public.pipeline_runs(job_id, started_at DESC);
+
+COMMENT ON COLUMN public.pipeline_runs.stages IS 'Per-stage status/result; stages with status success or resumed are skipped when the job is retried';
+COMMENT ON COLUMN public.pipeline_runs.resumed_from IS 'Previous run of the same job whose completed stages were reused';
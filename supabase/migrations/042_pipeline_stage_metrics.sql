@@ -0,0 +1,41 @@
+-- Migration: 042_pipeline_stage_metrics.sql
+-- Description: Per-stage timing and resource telemetry for pipeline runs
+-- (see src/stratos_engine/telemetry.py)
+
+-- One row per executed stage of a run, plus stage = 'job' for the whole job
+CREATE TABLE IF NOT EXISTS public.pipeline_stage_metrics (
+    run_id UUID NOT NULL REFERENCES public.pipeline_runs(run_id) ON DELETE CASCADE,
+    job_id UUID,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+
+    wall_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    -- Time spent inside database calls (overlaps wall_seconds)
+    db_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    db_statements INTEGER NOT NULL DEFAULT 0,
+    rows_read BIGINT NOT NULL DEFAULT 0,
+    rows_written BIGINT NOT NULL DEFAULT 0,
+
+    -- Vendor requests sent, retries included
+    http_calls INTEGER NOT NULL DEFAULT 0,
+    llm_calls INTEGER NOT NULL DEFAULT 0,
+    llm_tokens_in BIGINT NOT NULL DEFAULT 0,
+    llm_tokens_out BIGINT NOT NULL DEFAULT 0,
+
+    -- Process-wide, so stages running in parallel see each other's memory
+    peak_rss_mb DOUBLE PRECISION,
+
+    -- cProfile/pyinstrument dump on the worker, for jobs submitted with "profile"
+    profile_path TEXT,
+
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (run_id, stage)
+);
+
+-- Stage timings over time (regression tracking)
+CREATE INDEX IF NOT EXISTS idx_pipeline_stage_metrics_stage_started
+  ON public.pipeline_stage_metrics(stage, started_at DESC);
+
+COMMENT ON TABLE public.pipeline_stage_metrics IS 'Wall/DB time, rows, HTTP calls, LLM tokens and peak RSS per pipeline stage; stage ''job'' is the whole job';
@@ -0,0 +1,28 @@
+-- Migration: 043_llm_response_cache.sql
+-- Description: Shared tier of the LLM result cache
+-- (see src/stratos_engine/llm_cache.py)
+
+-- Parsed model results keyed on what produced them; a row is reused whenever
+-- the same input hash is sent with the same prompt version to the same model
+CREATE TABLE IF NOT EXISTS public.llm_response_cache (
+    input_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+
+    result JSONB NOT NULL,
+    -- Tokens the original call spent (what each hit saves)
+    tokens_in INTEGER,
+    tokens_out INTEGER,
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_hit_at TIMESTAMPTZ,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (input_hash, prompt_version, model)
+);
+
+-- Pruning entries nobody has read recently
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used
+  ON public.llm_response_cache(COALESCE(last_hit_at, created_at));
+
+COMMENT ON TABLE public.llm_response_cache IS 'Parsed LLM results keyed on (input_hash, prompt_version, model), shared by all workers';
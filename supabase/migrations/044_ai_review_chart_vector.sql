@@ -0,0 +1,14 @@
+-- Migration: 044_ai_review_chart_vector.sql
+-- Description: Inputs of the Stage 5 skip-unchanged gate
+-- (see Stage5AIReview._unchanged in src/stratos_engine/stages/stage5_ai_review.py)
+
+-- chart_vector: normalized close/volume path of the 60-bar window the review saw
+-- signal_set: scope and active engine signals (type:direction:state) at review time
+-- carried_from: date of the model review this row was carried forward from
+--               (NULL when the model ran for this date)
+ALTER TABLE asset_ai_reviews
+  ADD COLUMN IF NOT EXISTS chart_vector REAL[],
+  ADD COLUMN IF NOT EXISTS signal_set TEXT[],
+  ADD COLUMN IF NOT EXISTS carried_from DATE;
+
+COMMENT ON COLUMN asset_ai_reviews.carried_from IS 'Model review date this review was carried forward from (unchanged chart and signals); NULL for fresh reviews';
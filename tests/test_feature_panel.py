@@ -0,0 +1,53 @@
+"""Panel feature computation must match FeatureCalculator.compute_features per asset."""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from stratos_engine.utils.feature_calculator import MAX_LOOKBACK, MIN_LOOKBACK, FeatureCalculator
+from stratos_engine.utils.feature_panel import check_parity
+
+
+def _bars(n: int, seed: int, end: date = date(2025, 6, 30)) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+    spread = np.abs(rng.normal(0.0, 0.01, n)) * close
+    open_ = close * (1.0 + rng.normal(0.0, 0.005, n))
+    volume = rng.integers(10_000, 1_000_000, n).astype(float)
+    volume[rng.integers(0, n)] = 0.0
+    return pd.DataFrame({
+        'date': [end - timedelta(days=n - 1 - i) for i in range(n)],
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': volume,
+    })
+
+
+def _calculator() -> FeatureCalculator:
+    # compute_features needs no database; skip the Supabase client
+    return FeatureCalculator.__new__(FeatureCalculator)
+
+
+def test_panel_matches_per_asset():
+    bars = {
+        1: _bars(MIN_LOOKBACK, 1),
+        2: _bars(150, 2),
+        3: _bars(MAX_LOOKBACK + 20, 3),
+        4: _bars(200, 4, end=date(2025, 5, 15)),
+        5: _bars(MIN_LOOKBACK - 10, 5),
+    }
+    types = {1: 'equity', 2: 'crypto', 3: 'equity', 4: 'crypto', 5: 'equity'}
+    spy = _bars(MAX_LOOKBACK + 40, 99)
+    btc = _bars(250, 98)
+    benchmarks = {1: spy, 2: btc, 3: spy, 4: btc}
+
+    assert check_parity(_calculator(), bars, types, benchmarks) == {}
+
+
+def test_panel_matches_per_asset_without_benchmarks():
+    bars = {asset_id: _bars(n, asset_id) for asset_id, n in enumerate((80, 120, 310), start=10)}
+
+    assert check_parity(_calculator(), bars, 'equity') == {}
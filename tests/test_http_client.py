@@ -0,0 +1,82 @@
+"""HttpClient against the fake vendor server: data, throttling and coalescing."""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from stratos_engine.fake_vendor import FakeVendorServer, synthetic_bar
+from stratos_engine.http import HttpClient, HttpError
+
+TODAY = date(2025, 6, 13)
+EOD_PATH = "/stable/historical-price-eod/full"
+
+
+def _eod(symbol: str, start: date = date(2025, 6, 9)):
+    return EOD_PATH, {"symbol": symbol, "from": start.isoformat(), "to": TODAY.isoformat()}
+
+
+def test_fetches_vendor_bars():
+    async def run():
+        async with FakeVendorServer(today=TODAY) as server:
+            async with HttpClient(server.vendors()) as client:
+                return await client.get_json("fmp", *_eod("AAPL"))
+
+    rows = asyncio.run(run())
+
+    assert [row["date"] for row in rows] == ["2025-06-13", "2025-06-12", "2025-06-11", "2025-06-10", "2025-06-09"]
+    for row in rows:
+        bar = synthetic_bar("AAPL", date.fromisoformat(row["date"]))
+        assert {key: row[key] for key in bar} == bar
+
+
+def test_throttled_requests_are_retried():
+    symbols = [f"SYM{i}" for i in range(6)]
+
+    async def run():
+        async with FakeVendorServer(quotas={"fmp": 3, "alphavantage": 2}, window=1.0, today=TODAY) as server:
+            # Client quota well above the server's so the server has to push back;
+            # the backoff (AlphaVantage sends no Retry-After) must outlast the window
+            vendors = server.vendors(calls_per_minute={"fmp": 6000, "alphavantage": 6000})
+            async with HttpClient(vendors, backoff_base=0.5, backoff_max=2.0) as client:
+                fmp = await client.gather([("fmp", *_eod(symbol)) for symbol in symbols])
+                av = await client.gather([
+                    ("alphavantage", "/query", {"function": "OVERVIEW", "symbol": symbol})
+                    for symbol in symbols[:4]
+                ])
+                return server, client.stats(), fmp, av
+
+    server, stats, fmp, av = asyncio.run(run())
+
+    assert [rows[0]["symbol"] for rows in fmp] == symbols
+    assert [body["Symbol"] for body in av] == symbols[:4]
+    assert server.throttled["fmp"] > 0 and stats["fmp"].throttled == server.throttled["fmp"]
+    assert server.throttled["alphavantage"] > 0 and stats["alphavantage"].throttled == server.throttled["alphavantage"]
+
+
+def test_identical_requests_are_coalesced():
+    async def run():
+        async with FakeVendorServer(latency=0.05, today=TODAY) as server:
+            async with HttpClient(server.vendors()) as client:
+                results = await asyncio.gather(*(client.get_json("fmp", *_eod("MSFT")) for _ in range(5)))
+                return server, client.stats(), results
+
+    server, stats, results = asyncio.run(run())
+
+    assert server.requests["fmp"] == 1
+    assert stats["fmp"].coalesced == 4
+    assert all(result == results[0] for result in results)
+
+
+def test_client_errors_are_not_retried():
+    async def run():
+        async with FakeVendorServer(today=TODAY) as server:
+            async with HttpClient(server.vendors()) as client:
+                with pytest.raises(HttpError) as excinfo:
+                    await client.get_json("fmp", "/stable/unknown")
+                return client.stats(), excinfo.value
+
+    stats, error = asyncio.run(run())
+
+    assert error.status == 404
+    assert stats["fmp"].requests == 1 and stats["fmp"].retries == 0
@@ -0,0 +1,82 @@
+"""run_batch with the local StubBatchProvider."""
+
+import json
+
+import pytest
+
+from stratos_engine.llm_batch import (
+    BatchRequest,
+    StubBatchProvider,
+    get_batch_provider,
+    run_batch,
+    stub_response,
+    write_rows,
+)
+
+
+def _requests(count: int = 4):
+    return [
+        BatchRequest(key=f"asset-{i}", prompt=[f"packet {i}", "instructions"], config={"temperature": 0}, context=i)
+        for i in range(count)
+    ]
+
+
+def _echo(request):
+    text = request["contents"][0]["parts"][0]["text"]
+    if text == "packet 2":
+        raise RuntimeError("model refused")
+    if text == "packet 3":
+        return ""
+    return text.upper()
+
+
+class _DroppingProvider(StubBatchProvider):
+    """Stub whose output loses one line."""
+
+    def results(self, job_id):
+        return (line for line in super().results(job_id) if line["key"] != "asset-1")
+
+
+def test_results_follow_request_order(tmp_path):
+    requests = _requests()
+    provider = StubBatchProvider(_echo, polls=3)
+
+    results = run_batch(
+        list(reversed(requests)), "test-model", provider=provider,
+        display_name="order", workdir=str(tmp_path), poll_seconds=0,
+    )
+
+    assert [r.request.key for r in results] == [r.key for r in reversed(requests)]
+    by_key = {r.request.key: r for r in results}
+    assert by_key["asset-0"].ok and by_key["asset-0"].text == "PACKET 0"
+    assert by_key["asset-0"].request.context == 0
+    assert by_key["asset-0"].tokens_in > 0 and by_key["asset-0"].tokens_out > 0
+    assert by_key["asset-2"].error == "model refused"
+    assert by_key["asset-3"].error == "empty response"
+    assert (tmp_path / "order.jsonl").read_text().count("\n") == len(requests)
+
+
+def test_missing_output_lines_become_errors(tmp_path):
+    results = run_batch(
+        _requests(), "test-model", provider=_DroppingProvider(), workdir=str(tmp_path), poll_seconds=0,
+    )
+
+    assert [r.error for r in results] == [None, "missing from batch output", None, None]
+    assert json.loads(results[0].text) == json.loads(stub_response({}))
+
+
+def test_duplicate_keys_rejected(tmp_path):
+    requests = _requests(2) + [BatchRequest(key="asset-0", prompt="again")]
+
+    with pytest.raises(ValueError):
+        run_batch(requests, "test-model", provider=StubBatchProvider(), workdir=str(tmp_path), poll_seconds=0)
+
+
+def test_stub_provider_is_a_dry_run(tmp_path):
+    assert get_batch_provider("stub").dry_run is True
+    assert run_batch([], "test-model", provider=StubBatchProvider()) == []
+
+    path = write_rows([(1, "bullish", {"score": 3}), {"asset_id": 2}], "rows", workdir=str(tmp_path))
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [[1, "bullish", {"score": 3}], {"asset_id": 2}]